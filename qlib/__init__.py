@@ -48,6 +48,7 @@ def init(default_conf="client", **kwargs):
     if clear_mem_cache:
         H.clear()
     C.set(default_conf, **kwargs)
+    H.configure(C.mem_cache_size_limit, C.mem_cache_limit_type)
     get_module_logger.setLevel(C.logging_level)
 
     # mount nfs
@@ -3,8 +3,9 @@
 from __future__ import annotations
 
 import copy
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from qlib.utils import init_instance_by_config
@@ -237,12 +238,12 @@ class Account:
 
         if not self.current_position.skip_update():
             stock_list = self.current_position.get_stock_list()
-            for code in stock_list:
-                # if suspended, no new price to be updated, profit is 0
-                if trade_exchange.check_stock_suspended(code, trade_start_time, trade_end_time):
+            bar_closes = trade_exchange.get_quote_info_batch(stock_list, trade_start_time, trade_end_time, "$close")
+            for code, bar_close in zip(stock_list, bar_closes):
+                # if suspended (no valid close), no new price to be updated, profit is 0
+                if np.isnan(bar_close):
                     continue
-                bar_close = cast(float, trade_exchange.get_close(code, trade_start_time, trade_end_time))
-                self.current_position.update_stock_price(stock_id=code, price=bar_close)
+                self.current_position.update_stock_price(stock_id=code, price=float(bar_close))
             # update holding day count
             # NOTE: updating bar_count does not only serve portfolio metrics, it also serve the strategy
             self.current_position.add_count_all(bar=self.freq)
@@ -472,6 +472,17 @@ class Exchange:
     ) -> Union[None, int, float, bool, IndexData]:
         return self.quote.get_data(stock_id, start_time, end_time, field=field, method=method)
 
+    def get_quote_info_batch(
+        self,
+        stock_ids: List[str],
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        field: str,
+        method: str = "ts_data_last",
+    ) -> np.ndarray:
+        """get the quote info of a list of stocks in one call, NaN for the stocks without data"""
+        return self.quote.get_data_batch(stock_ids, start_time, end_time, field=field, method=method)
+
     def get_close(
         self,
         stock_id: str,
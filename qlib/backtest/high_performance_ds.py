@@ -99,6 +99,28 @@ class BaseQuote:
 
         raise NotImplementedError(f"Please implement the `get_data` method")
 
+    def get_data_batch(
+        self,
+        stock_ids: List[str],
+        start_time: Union[pd.Timestamp, str],
+        end_time: Union[pd.Timestamp, str],
+        field: str,
+        method: str,
+    ) -> np.ndarray:
+        """get the aggregated `field` of a list of stocks in one call.
+
+        The parameters are the ones of `get_data`, except that `method` can not be None.
+
+        Return
+        ----------
+        np.ndarray
+            the float results of `get_data` for `stock_ids`, NaN where it returns None.
+        """
+        if method is None:
+            raise ValueError("get_data_batch needs an aggregation method")
+        res = [self.get_data(stock_id, start_time, end_time, field, method) for stock_id in stock_ids]
+        return np.array([np.nan if v is None else v for v in res], dtype=np.float64)
+
 
 class PandasQuote(BaseQuote):
     def __init__(self, quote_df: pd.DataFrame, freq: str) -> None:
@@ -129,18 +151,37 @@ class NumpyQuote(BaseQuote):
     def __init__(self, quote_df: pd.DataFrame, freq: str, region: str = "cn") -> None:
         """NumpyQuote
 
+        The quote is stored as one dense (time, instrument) array per field on the time axis shared by all the
+        instruments, with a mask of the (time, instrument) rows in `quote_df`. The aggregations over a time range are
+        answered from prefix arrays which are built the first time a field is aggregated, so a query costs the same
+        whatever the length of the range and a list of instruments is answered at once by `get_data_batch`.
+
         Parameters
         ----------
         quote_df : pd.DataFrame
             the init dataframe from qlib.
-        self.data : Dict(stock_id, IndexData.DataFrame)
         """
         super().__init__(quote_df=quote_df, freq=freq)
-        quote_dict = {}
-        for stock_id, stock_val in quote_df.groupby(level="instrument", group_keys=False):
-            quote_dict[stock_id] = idd.MultiData(stock_val.droplevel(level="instrument"))
-            quote_dict[stock_id].sort_index()  # To support more flexible slicing, we must sort data first
-        self.data = quote_dict
+        stock_codes, stocks = pd.factorize(quote_df.index.get_level_values("instrument"))
+        dates = quote_df.index.get_level_values("datetime").values.astype("datetime64[ns]").view(np.int64)
+        self._dates, date_codes = np.unique(dates, return_inverse=True)
+        date_codes = date_codes.reshape(-1)
+        self._stock_pos: Dict[str, int] = {stock_id: i for i, stock_id in enumerate(stocks)}
+        shape = (len(self._dates), len(stocks))
+
+        self._exists = np.zeros(shape, dtype=bool)
+        self._exists[date_codes, stock_codes] = True
+        self.data: Dict[str, np.ndarray] = {}
+        for field in quote_df.columns:
+            values = quote_df[field].values
+            if values.dtype.kind == "f":
+                data = np.full(shape, np.nan, dtype=values.dtype)
+            else:
+                data = np.zeros(shape, dtype=values.dtype)
+            data[date_codes, stock_codes] = values
+            self.data[field] = data
+        # the prefix arrays of the aggregations, see `_prefix`
+        self._prefix_cache: Dict[tuple, np.ndarray] = {}
 
         n, unit = Freq.parse(freq)
         if unit in Freq.SUPPORT_CAL_LIST:
@@ -150,56 +191,119 @@ class NumpyQuote(BaseQuote):
         self.region = region
 
     def get_all_stock(self):
-        return self.data.keys()
+        return self._stock_pos.keys()
 
     @lru_cache(maxsize=512)
+    def _locate(self, start_time, end_time) -> tuple:
+        """the position of the single date or the [start, stop) positions of the time range"""
+        if is_single_value(start_time, end_time, self.freq, self.region):
+            # FIXME: see the special cases of the single value in `is_single_value`
+            i = np.searchsorted(self._dates, pd.Timestamp(start_time).value)
+            return True, i if i < len(self._dates) and self._dates[i] == pd.Timestamp(start_time).value else None
+        return False, (
+            np.searchsorted(self._dates, pd.Timestamp(start_time).value, side="left"),
+            np.searchsorted(self._dates, pd.Timestamp(end_time).value, side="right"),
+        )
+
+    def _prefix(self, field: str, kind: str) -> np.ndarray:
+        """
+        the arrays to aggregate ``field`` over a time range
+
+        - "count", "valid_count", "sum", "falsy_count": the (time + 1, instrument) cumulated number of the rows, of
+          the non-NaN rows, the sum of the non-NaN values and the number of the falsy values, the aggregation over
+          [start, stop) is ``prefix[stop] - prefix[start]``
+        - "last", "last_valid": the (time, instrument) position of the last row and of the last non-NaN row up to a
+          time, -1 if there isn't any
+        """
+        # the rows of the quote do not depend on the field
+        key = (None if kind in ("count", "last") else field, kind)
+        if key not in self._prefix_cache:
+            data = self.data[field]
+            if kind in ("count", "last"):
+                mask = self._exists
+            elif kind in ("valid_count", "sum", "last_valid"):
+                mask = self._exists & ~pd.isna(data)
+            elif kind == "falsy_count":
+                mask = self._exists & ~data.astype(bool)
+            else:
+                raise ValueError(f"{kind} is not supported")
+
+            if kind in ("last", "last_valid"):
+                pos = np.where(mask, np.arange(len(data), dtype=np.int32)[:, None], np.int32(-1))
+                res = np.maximum.accumulate(pos, axis=0)
+            else:
+                res = np.zeros((len(data) + 1, data.shape[1]), dtype=np.float64 if kind == "sum" else np.int32)
+                np.cumsum(np.where(mask, data, 0) if kind == "sum" else mask, axis=0, out=res[1:])
+            self._prefix_cache[key] = res
+        return self._prefix_cache[key]
+
     def get_data(self, stock_id, start_time, end_time, field, method=None):
         # check stock id
-        if stock_id not in self.get_all_stock():
+        if stock_id not in self._stock_pos:
             return None
+        j = self._stock_pos[stock_id]
 
         # single data
         # If it don't consider the classification of single data, it will consume a lot of time.
-        if is_single_value(start_time, end_time, self.freq, self.region):
+        single, loc = self._locate(start_time, end_time)
+        if single:
             # this is a very special case.
             # skip aggregating function to speed-up the query calculation
-
-            # FIXME:
-            # it will go to the else logic when it comes to the
-            # 1) the day before holiday when daily trading
-            # 2) the last minute of the day when intraday trading
-            try:
-                return self.data[stock_id].loc[start_time, field]
-            except KeyError:
-                return None
-        else:
-            data = self.data[stock_id].loc[start_time:end_time, field]
-            if data.empty:
+            if loc is None or not self._exists[loc, j]:
                 return None
-            if method is not None:
-                data = self._agg_data(data, method)
-            return data
+            return self.data[field][loc, j]
 
-    @staticmethod
-    def _agg_data(data: IndexData, method: str) -> Union[IndexData, np.ndarray, None]:
-        """Agg data by specific method."""
-        # FIXME: why not call the method of data directly?
+        start, stop = loc
+        if start >= stop or self._prefix(field, "count")[stop, j] == self._prefix(field, "count")[start, j]:
+            return None
+        if method is None:
+            rows = np.flatnonzero(self._exists[start:stop, j]) + start
+            return idd.SingleData(self.data[field][rows, j], pd.DatetimeIndex(self._dates[rows]))
+        elif method == "ts_data_last":
+            pos = self._prefix(field, "last_valid")[stop - 1, j]
+            return None if pos < start else self.data[field][pos, j]
+        return self._agg_data(field, start, stop, np.array([j]), method)[0]
+
+    def get_data_batch(self, stock_ids, start_time, end_time, field, method) -> np.ndarray:
+        """get the aggregated `field` of a list of stocks at once, see `BaseQuote.get_data_batch`"""
+        if method is None:
+            raise ValueError("get_data_batch needs an aggregation method")
+        j = np.array([self._stock_pos.get(stock_id, -1) for stock_id in stock_ids], dtype=np.int64)
+        res = np.full(len(j), np.nan)
+        known = j >= 0
+        single, loc = self._locate(start_time, end_time)
+        if single:
+            if loc is not None:
+                exists = known.copy()
+                exists[known] = self._exists[loc, j[known]]
+                res[exists] = self.data[field][loc, j[exists]]
+            return res
+        start, stop = loc
+        if start < stop:
+            count = self._prefix(field, "count")
+            has_rows = known.copy()
+            has_rows[known] = count[stop, j[known]] > count[start, j[known]]
+            res[has_rows] = self._agg_data(field, start, stop, j[has_rows], method)
+        return res
+
+    def _agg_data(self, field: str, start: int, stop: int, j: np.ndarray, method: str) -> np.ndarray:
+        """Agg data in [start, stop) of the stocks at positions `j` which have rows in the range by specific method."""
         if method == "sum":
-            return np.nansum(data)
+            prefix = self._prefix(field, "sum")
+            return prefix[stop, j] - prefix[start, j]
         elif method == "mean":
-            return np.nanmean(data)
+            total = self._prefix(field, "sum")
+            count = self._prefix(field, "valid_count")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return (total[stop, j] - total[start, j]) / (count[stop, j] - count[start, j])
         elif method == "last":
-            # FIXME: I've never seen that this method was called.
-            # Please merge it with "ts_data_last"
-            return data[-1]
+            return self.data[field][self._prefix(field, "last")[stop - 1, j], j]
         elif method == "all":
-            return data.all()
+            prefix = self._prefix(field, "falsy_count")
+            return prefix[stop, j] == prefix[start, j]
         elif method == "ts_data_last":
-            valid_data = data.loc[~data.isna().data.astype(bool)]
-            if len(valid_data) == 0:
-                return None
-            else:
-                return valid_data.iloc[-1]
+            pos = self._prefix(field, "last_valid")[stop - 1, j]
+            return np.where(pos >= start, self.data[field][pos, j], np.nan)
         else:
             raise ValueError(f"{method} is not supported")
 
@@ -0,0 +1,88 @@
+#  Copyright (c) Microsoft Corporation.
+#  Licensed under the MIT License.
+"""
+Update the disk caches of a qlib data directory after new bars have been dumped, e.g. by a cron job running right
+after the data collector:
+
+.. code-block:: bash
+
+    qcache --provider_uri ~/.qlib/qlib_data/crypto_data --freq 1min --region crypto
+
+Only the tail of every cache is computed again (see `DiskExpressionCache.update` and `DiskDatasetCache.update`).
+"""
+
+import logging
+from collections import Counter
+
+import fire
+
+import qlib
+from qlib.config import C
+from qlib.log import get_module_logger
+
+logger = get_module_logger("qcache", logging.INFO)
+
+# the return codes of the `update` methods of the caches
+UPDATE_STATUS = {0: "updated", 1: "skipped", 2: "removed"}
+
+
+def _update_caches(update, cache_files) -> Counter:
+    """call `update` for every cache, a failed cache doesn't stop the others"""
+    status = Counter()
+    for cache_path in cache_files:
+        try:
+            status[UPDATE_STATUS.get(update(cache_path), "failed")] += 1
+        except Exception as e:  # pylint: disable=W0703
+            logger.warning(f"failed to update the cache {cache_path}: {e}")
+            status["failed"] += 1
+    return status
+
+
+def update_cache(
+    provider_uri: str,
+    freq: str = "day",
+    expression_cache: str = "DiskExpressionCache",
+    dataset_cache: str = "DiskDatasetCache",
+    **kwargs,
+):
+    """
+    Update all the expression and dataset caches of `provider_uri` to the latest calendar of `freq`.
+
+    Parameters
+    ----------
+    provider_uri : str
+        the qlib data directory.
+    freq : str
+        the frequency of the caches.
+    expression_cache : str
+        the expression cache to update, None to skip the expression caches.
+    dataset_cache : str
+        the dataset cache to update(DiskDatasetCache or ArrowDatasetCache), None to skip the dataset caches.
+    kwargs :
+        the other parameters of `qlib.init`, e.g. `region`.
+    """
+    qlib.init(provider_uri=provider_uri, expression_cache=expression_cache, dataset_cache=dataset_cache, **kwargs)
+    from qlib.data.data import DatasetD, ExpressionD  # pylint: disable=C0415
+
+    res = {}
+    if C.expression_cache is not None:
+        # the expression caches are stored in the directories of the instruments
+        res["expression"] = _update_caches(
+            lambda p: ExpressionD.update(p.parent.name, p.stem, freq=freq),
+            sorted(ExpressionD.get_cache_dir(freq).glob("*/*.meta")),
+        )
+    if C.dataset_cache is not None:
+        res["dataset"] = _update_caches(
+            lambda p: DatasetD.update(p.stem, freq=freq), sorted(DatasetD.get_cache_dir(freq).glob("*.meta"))
+        )
+    for name, status in res.items():
+        logger.info(f"{name} caches: {dict(status)}")
+    return {name: dict(status) for name, status in res.items()}
+
+
+def run():
+    fire.Fire(update_cache)
+
+
+if __name__ == "__main__":
+    run()
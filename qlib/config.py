@@ -10,6 +10,7 @@ Two modes are supported
 - server
 
 """
+
 from __future__ import annotations
 
 import os
@@ -126,10 +127,11 @@ PROTOCOL_VERSION = 4
 NUM_USABLE_CPU = max(multiprocessing.cpu_count() - 2, 1)
 
 DISK_DATASET_CACHE = "DiskDatasetCache"
+ARROW_DATASET_CACHE = "ArrowDatasetCache"
 SIMPLE_DATASET_CACHE = "SimpleDatasetCache"
 DISK_EXPRESSION_CACHE = "DiskExpressionCache"
 
-DEPENDENCY_REDIS_CACHE = (DISK_DATASET_CACHE, DISK_EXPRESSION_CACHE)
+DEPENDENCY_REDIS_CACHE = (DISK_DATASET_CACHE, ARROW_DATASET_CACHE, DISK_EXPRESSION_CACHE)
 
 _default_config = {
     # data provider config
@@ -165,15 +167,37 @@ _default_config = {
     "maxtasksperchild": None,
     # If joblib_backend is None, use loky
     "joblib_backend": "multiprocessing",
+    # How the workers of `DatasetProvider.dataset_processor` hand their results over to the main process
+    # - None: pickle a DataFrame per instrument and concatenate them
+    # - "memmap": write into a float32 memory mapped block in the temporary directory (`TMPDIR`, e.g. /dev/shm),
+    #   the dataset is built on the block without serialization or concatenation
+    "dataset_handoff": None,
+    # Keep the worker processes of the dataset providers and their memory caches alive between the calls,
+    # the tasks of an instrument always go to the same worker, see `qlib.utils.paral.WorkerPool`
+    "worker_pool": False,
     "default_disk_cache": 1,  # 0:skip/1:use
+    # the number of the memory mapped feature files kept open by the feature providers (an fd per map), the least
+    # recently used ones are closed beyond it
+    "mmap_cache_size": 256,
+    # the size limit of the memory caches `H`, an int for all the units or a dict of the units, e.g.
+    # {"c": 500, "i": 500, "f": 4 * 1024**3} with the limit type "nbytes"
     "mem_cache_size_limit": 500,
+    # length(number of items)/sizeof(sys.getsizeof)/nbytes(bytes of the numpy and pandas buffers)
     "mem_cache_limit_type": "length",
     # memory cache expire second, only in used 'DatasetURICache' and 'client D.calendar'
     # default 1 hour
     "mem_cache_expire": 60 * 60,
     # cache dir name
     "dataset_cache_dir_name": "dataset_cache",
+    "arrow_dataset_cache_dir_name": "dataset_cache_arrow",
     "features_cache_dir_name": "features_cache",
+    # the locks of the disk caches (DiskExpressionCache and DiskDatasetCache)
+    # - "redis": redis locks, the caches are disabled if redis is unreachable
+    # - "file": file locks(`fcntl`), the processes sharing the caches must run on the same host
+    # - "auto": redis locks if redis is reachable, otherwise file locks
+    "cache_lock_backend": "auto",
+    # the directory of the lock files, the temporary directory is used if None
+    "cache_lock_dir": None,
     # redis
     # in order to use cache
     "redis_host": "127.0.0.1",
@@ -448,7 +472,12 @@ class QlibConfig(Config):
         default_conf : str
             the default config template chosen by user: "server", "client"
         """
-        from .utils import set_log_with_config, get_module_logger, can_use_cache  # pylint: disable=C0415
+        from .utils import (  # pylint: disable=C0415
+            set_log_with_config,
+            get_module_logger,
+            can_use_cache,
+            can_use_file_lock,
+        )
 
         self.reset()
 
@@ -477,8 +506,13 @@ class QlibConfig(Config):
         self.resolve_path()
 
         if not (self["expression_cache"] is None and self["dataset_cache"] is None):
-            # check redis
-            if not can_use_cache():
+            # check the lock backend of the disk caches
+            backend = self["cache_lock_backend"]
+            if backend in ("auto", "redis") and can_use_cache():
+                self["cache_lock_backend"] = "redis"
+            elif backend in ("auto", "file") and can_use_file_lock():
+                self["cache_lock_backend"] = "file"
+            else:
                 log_str = ""
                 # check expression cache
                 if self.is_depend_redis(self["expression_cache"]):
@@ -490,7 +524,8 @@ class QlibConfig(Config):
                     self["dataset_cache"] = None
                 if log_str:
                     logger.warning(
-                        f"redis connection failed(host={self['redis_host']} port={self['redis_port']}), "
+                        f"cache lock backend {backend} is unavailable"
+                        f"(redis host={self['redis_host']} port={self['redis_port']}), "
                         f"{log_str} will not be used!"
                     )
 
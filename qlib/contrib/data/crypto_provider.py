@@ -1,12 +1,22 @@
+import os
+import threading
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Tuple
 
 from qlib.config import C
 from qlib.data.data import BaseProvider, Cal, Inst, ProviderBackendMixin
 from qlib.utils import code_to_fname
 
 
+def _to_naive(ts: pd.Timestamp) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+
 class FileDatasetStorage:
     """Simple file-based storage for crypto OHLCV data."""
 
@@ -24,6 +34,142 @@ class FileDatasetStorage:
         return df
 
 
+class ParquetDatasetStorage:
+    """Storage for crypto bars in partitioned parquet files.
+
+    The files are laid out as ``<provider_uri>/<exchange>/<symbol>/<partition>.parquet``, the name of a partition is
+    its first date (e.g. ``2024-01-01.parquet``) and it holds the rows up to the next partition, sorted by
+    ``datetime_column``. The exchange is given by ``exchange`` or by the instrument as ``<exchange>:<symbol>``.
+
+    Only the requested fields are read, the partitions and then the row groups out of the time range are skipped
+    with the file names and the statistics of the footers. The storage is cheap to create, the opened files and
+    their footers are shared by all the storages of the process and reopened when a file is modified.
+    """
+
+    # the maximum number of parquet files kept open
+    MAX_OPEN_FILES = 256
+
+    _files: "OrderedDict[str, Tuple[Tuple[int, int], pq.ParquetFile]]" = OrderedDict()
+    _partitions: Dict[str, Tuple[int, List[Tuple[pd.Timestamp, str]]]] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        instrument: str,
+        freq: str,
+        provider_uri: Dict[str, str] = None,
+        exchange: str = None,
+        datetime_column: str = "datetime",
+        **kwargs,
+    ):
+        if ":" in instrument:
+            exchange, instrument = instrument.split(":", 1)
+        if exchange is None:
+            raise ValueError(f"the exchange of {instrument} is required by {self.__class__.__name__}")
+        self.instrument = code_to_fname(instrument)
+        self.freq = freq
+        self.datetime_column = datetime_column
+        provider_uri = provider_uri or C.provider_uri
+        uri = provider_uri.get(freq, next(iter(provider_uri.values())))
+        self.symbol_dir = Path(uri).expanduser().resolve() / exchange / self.instrument
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._lock:
+            cls._files.clear()
+            cls._partitions.clear()
+
+    def partitions(self) -> List[Tuple[pd.Timestamp, str]]:
+        """the sorted ``(first date, path)`` of the partitions"""
+        key = str(self.symbol_dir)
+        mtime = self.symbol_dir.stat().st_mtime_ns
+        with self._lock:
+            cached = self._partitions.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        res = sorted(
+            (pd.Timestamp(entry.name[: -len(".parquet")]), entry.path)
+            for entry in os.scandir(key)
+            if entry.name.endswith(".parquet")
+        )
+        with self._lock:
+            self._partitions[key] = (mtime, res)
+        return res
+
+    def _open(self, path: str) -> pq.ParquetFile:
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == version:
+                self._files.move_to_end(path)
+                return cached[1]
+        pf = pq.ParquetFile(path, memory_map=True)
+        with self._lock:
+            self._files[path] = (version, pf)
+            self._files.move_to_end(path)
+            while len(self._files) > self.MAX_OPEN_FILES:
+                # the file is closed once the readers release it
+                self._files.popitem(last=False)
+        return pf
+
+    def _row_groups(self, pf: pq.ParquetFile, start_time: pd.Timestamp, end_time: pd.Timestamp) -> List[int]:
+        """the row groups overlapping the time range by the statistics of ``datetime_column``"""
+        metadata = pf.metadata
+        column = pf.schema_arrow.get_field_index(self.datetime_column)
+        res = []
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(column).statistics
+            if (
+                stats is not None
+                and stats.has_min_max
+                and (_to_naive(stats.max) < start_time or _to_naive(stats.min) > end_time)
+            ):
+                continue
+            res.append(i)
+        return res
+
+    def read(self, fields: List[str], start_time: pd.Timestamp, end_time: pd.Timestamp) -> pd.DataFrame:
+        start_time, end_time = _to_naive(start_time), _to_naive(end_time)
+        partitions = self.partitions()
+        tables = []
+        for i, (first, path) in enumerate(partitions):
+            if first > end_time or (i + 1 < len(partitions) and partitions[i + 1][0] <= start_time):
+                continue
+            pf = self._open(path)
+            row_groups = self._row_groups(pf, start_time, end_time)
+            if row_groups:
+                tables.append(pf.read_row_groups(row_groups, columns=[self.datetime_column] + list(fields)))
+        if not tables:
+            return pd.DataFrame(columns=fields, index=pd.DatetimeIndex([]), dtype=float)
+        df = pa.concat_tables(tables).to_pandas()
+        index = pd.DatetimeIndex(df.pop(self.datetime_column))
+        df.index = index.tz_convert(None) if index.tz is not None else index
+        return df.loc[(df.index >= start_time) & (df.index <= end_time), fields]
+
+    @staticmethod
+    def write(
+        df: pd.DataFrame,
+        uri: str,
+        exchange: str,
+        symbol: str,
+        partition_freq: str = "1D",
+        datetime_column: str = "datetime",
+        row_group_size: int = 1440,
+    ):
+        """write the bars of a symbol as partitions of ``partition_freq``, the existing partitions are replaced"""
+        symbol_dir = Path(uri).expanduser().resolve() / exchange / code_to_fname(symbol)
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        df = df.sort_values(datetime_column)
+        date_format = "%Y-%m-%d" if pd.Timedelta(partition_freq) >= pd.Timedelta("1D") else "%Y%m%dT%H%M%S"
+        for first, _df in df.groupby(pd.DatetimeIndex(df[datetime_column]).floor(partition_freq)):
+            pq.write_table(
+                pa.Table.from_pandas(_df, preserve_index=False),
+                symbol_dir / f"{first.strftime(date_format)}.parquet",
+                row_group_size=row_group_size,
+            )
+
+
 class CryptoProvider(BaseProvider, ProviderBackendMixin):
     """Feature provider for cryptocurrency OHLCV data."""
 
@@ -20,6 +20,9 @@ class HighFreqTrans(Processor):
         else:
             return df_features.astype(np.float32)
 
+    def readonly(self):
+        return True
+
 
 class HighFreqNorm(Processor):
     def __init__(
@@ -127,3 +127,7 @@ class ConfigSectionProcessor(Processor):
         TimeInspector.log_cost_time("Finished preprocessing data.")
 
         return df
+
+    def writes(self, df):
+        # the columns are replaced by `df[selected_cols] = ...`
+        return df.columns[:0]
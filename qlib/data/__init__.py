@@ -33,6 +33,7 @@ from .cache import (
     DatasetCache,
     DiskExpressionCache,
     DiskDatasetCache,
+    ArrowDatasetCache,
     SimpleDatasetCache,
     DatasetURICache,
     MemoryCalendarCache,
@@ -63,6 +64,7 @@ __all__ = [
     "DatasetCache",
     "DiskExpressionCache",
     "DiskDatasetCache",
+    "ArrowDatasetCache",
     "SimpleDatasetCache",
     "DatasetURICache",
     "MemoryCalendarCache",
@@ -18,6 +18,10 @@ cdef class Expanding:
     cdef double update(self, double val):
         pass
 
+    def push(self, double val):
+        """update the window with the next value and return the result of the new window"""
+        return self.update(val)
+
 
 cdef class Mean(Expanding):
     """1-D array expanding mean"""
@@ -150,3 +154,82 @@ def expanding_rsquare(np.ndarray a):
 def expanding_resi(np.ndarray a):
     cdef Resi r = Resi()
     return expanding(r, a)
+
+
+# An expanding window is a rolling window as long as the array, so most of the expanding operators
+# reuse the one pass kernels of `rolling.pyx`.
+from .rolling import (
+    prepare,
+    rolling_var,
+    rolling_std,
+    rolling_skew,
+    rolling_kurt,
+    rolling_quantile,
+    rolling_rank,
+    rolling_mad,
+    rolling_idxmax,
+    rolling_idxmin,
+    rolling_wma,
+    rolling_cov,
+    rolling_corr,
+)
+
+
+def expanding_var(np.ndarray a):
+    return rolling_var(a, len(a))
+
+def expanding_std(np.ndarray a):
+    return rolling_std(a, len(a))
+
+def expanding_skew(np.ndarray a):
+    return rolling_skew(a, len(a))
+
+def expanding_kurt(np.ndarray a):
+    return rolling_kurt(a, len(a))
+
+def expanding_quantile(np.ndarray a, double quantile):
+    return rolling_quantile(a, len(a), quantile)
+
+def expanding_rank(np.ndarray a):
+    return rolling_rank(a, len(a))
+
+def expanding_mad(np.ndarray a):
+    return rolling_mad(a, len(a))
+
+def expanding_idxmax(np.ndarray a):
+    return rolling_idxmax(a, len(a))
+
+def expanding_idxmin(np.ndarray a):
+    return rolling_idxmin(a, len(a))
+
+def expanding_wma(np.ndarray a):
+    return rolling_wma(a, len(a))
+
+def expanding_cov(np.ndarray a, np.ndarray b):
+    return rolling_cov(a, b, len(a))
+
+def expanding_corr(np.ndarray a, np.ndarray b):
+    return rolling_corr(a, b, len(a))
+
+def expanding_ema(np.ndarray a):
+    """`np.nansum(w * x)` with the weights `w = alpha ** (L - 1, ..., 1, 0)` normalized to 1, `alpha = 1 - 2 / (1 + L)`
+
+    The decay depends on the length L of the window, so every window is evaluated again (with Horner's method).
+    """
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, j, nobs = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    cdef double alpha, num, den
+    for i in range(n):
+        if not isnan(x[i]):
+            nobs += 1
+        if nobs == 0:
+            ret[i] = NAN
+            continue
+        alpha = 1 - 2. / (i + 2)
+        num = den = 0
+        for j in range(i + 1):
+            num = num * alpha + (0 if isnan(x[j]) else x[j])
+            den = den * alpha + 1
+        ret[i] = num / den
+    return ret
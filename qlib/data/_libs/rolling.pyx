@@ -4,8 +4,9 @@ cimport cython
 cimport numpy as np
 import numpy as np
 
-from libc.math cimport sqrt, isnan, NAN
+from libc.math cimport sqrt, isnan, signbit, round, NAN
 from libcpp.deque cimport deque
+from libcpp.vector cimport vector
 
 
 cdef class Rolling:
@@ -23,6 +24,10 @@ cdef class Rolling:
     cdef double update(self, double val):
         pass
 
+    def push(self, double val):
+        """update the window with the next value and return the result of the new window"""
+        return self.update(val)
+
 
 cdef class Mean(Rolling):
     """1-D array rolling mean"""
@@ -205,3 +210,588 @@ def rolling_rsquare(np.ndarray a, int window):
 def rolling_resi(np.ndarray a, int window):
     cdef Resi r = Resi(window)
     return rolling(r, a)
+
+
+# The kernels below compute a whole rolling window operator in one pass over a 1-D array.
+# They follow the conventions of `pandas.Series.rolling(window, min_periods=1)`:
+# - +/-inf are treated as nan;
+# - the windows without any valid value are nan.
+# An expanding window is a rolling window as long as the array, see `expanding.pyx`.
+
+
+def prepare(np.ndarray a):
+    """float64 values of `a` with +/-inf replaced by nan, like the values passed to the pandas window kernels"""
+    cdef np.ndarray x = np.ascontiguousarray(a, dtype=np.float64)
+    inf = np.isinf(x)
+    if inf.any():
+        x = np.where(inf, np.nan, x)
+    return x
+
+
+cdef inline Py_ssize_t _win_start(Py_ssize_t i, Py_ssize_t window) noexcept nogil:
+    return i - window + 1 if i >= window else 0
+
+
+cdef inline void _kahan_add(double val, double *total, double *compensation) noexcept nogil:
+    cdef double y = val - compensation[0]
+    cdef double t = total[0] + y
+    compensation[0] = t - total[0] - y
+    total[0] = t
+
+
+######## mean / variance (the online algorithms of pandas) ########
+
+cdef inline void _add_mean(double val, Py_ssize_t *nobs, double *sum_x, Py_ssize_t *neg_ct, double *compensation,
+                           Py_ssize_t *n_same, double *prev_value) noexcept nogil:
+    if isnan(val):
+        return
+    nobs[0] += 1
+    _kahan_add(val, sum_x, compensation)
+    if signbit(val):
+        neg_ct[0] += 1
+    if val == prev_value[0]:
+        n_same[0] += 1
+    else:
+        n_same[0] = 1
+    prev_value[0] = val
+
+
+cdef inline void _remove_mean(double val, Py_ssize_t *nobs, double *sum_x, Py_ssize_t *neg_ct,
+                              double *compensation) noexcept nogil:
+    if isnan(val):
+        return
+    nobs[0] -= 1
+    _kahan_add(-val, sum_x, compensation)
+    if signbit(val):
+        neg_ct[0] -= 1
+
+
+cdef inline double _calc_mean(Py_ssize_t nobs, Py_ssize_t neg_ct, double sum_x, Py_ssize_t n_same,
+                              double prev_value) noexcept nogil:
+    cdef double result
+    if nobs == 0:
+        return NAN
+    result = sum_x / <double>nobs
+    if n_same >= nobs:
+        result = prev_value
+    elif neg_ct == 0 and result < 0:
+        result = 0
+    elif neg_ct == nobs and result > 0:
+        result = 0
+    return result
+
+
+cdef inline void _add_var(double val, double *nobs, double *mean_x, double *ssqdm_x, double *compensation,
+                          Py_ssize_t *n_same, double *prev_value) noexcept nogil:
+    cdef double prev_mean, y, t
+    if isnan(val):
+        return
+    nobs[0] += 1
+    if val == prev_value[0]:
+        n_same[0] += 1
+    else:
+        n_same[0] = 1
+    prev_value[0] = val
+    # Welford's method with Kahan summation
+    prev_mean = mean_x[0] - compensation[0]
+    y = val - compensation[0]
+    t = y - mean_x[0]
+    compensation[0] = t + mean_x[0] - y
+    if nobs[0]:
+        mean_x[0] = mean_x[0] + t / nobs[0]
+    else:
+        mean_x[0] = 0
+    ssqdm_x[0] = ssqdm_x[0] + (val - prev_mean) * (val - mean_x[0])
+
+
+cdef inline void _remove_var(double val, double *nobs, double *mean_x, double *ssqdm_x,
+                             double *compensation) noexcept nogil:
+    cdef double prev_mean, y, t
+    if isnan(val):
+        return
+    nobs[0] -= 1
+    if nobs[0]:
+        prev_mean = mean_x[0] - compensation[0]
+        y = val - compensation[0]
+        t = y - mean_x[0]
+        compensation[0] = t + mean_x[0] - y
+        mean_x[0] = mean_x[0] - t / nobs[0]
+        ssqdm_x[0] = ssqdm_x[0] - (val - prev_mean) * (val - mean_x[0])
+    else:
+        mean_x[0] = 0
+        ssqdm_x[0] = 0
+
+
+cdef inline double _calc_var(double nobs, int ddof, double ssqdm_x, Py_ssize_t n_same) noexcept nogil:
+    if nobs >= 1 and nobs > ddof:
+        if nobs == 1 or n_same >= nobs:
+            return 0
+        return ssqdm_x / (nobs - ddof)
+    return NAN
+
+
+cdef void _roll_mean(double[::1] x, Py_ssize_t window, double[::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j, s, prev_s = 0, nobs = 0, neg_ct = 0, n_same = 0
+    cdef double sum_x = 0, comp_add = 0, comp_remove = 0, prev_value = 0
+    for i in range(x.shape[0]):
+        s = _win_start(i, window)
+        if i == 0 or s >= i:
+            prev_value = x[s]
+            n_same = nobs = neg_ct = 0
+            sum_x = comp_add = comp_remove = 0
+            for j in range(s, i + 1):
+                _add_mean(x[j], &nobs, &sum_x, &neg_ct, &comp_add, &n_same, &prev_value)
+        else:
+            for j in range(prev_s, s):
+                _remove_mean(x[j], &nobs, &sum_x, &neg_ct, &comp_remove)
+            _add_mean(x[i], &nobs, &sum_x, &neg_ct, &comp_add, &n_same, &prev_value)
+        out[i] = _calc_mean(nobs, neg_ct, sum_x, n_same, prev_value)
+        prev_s = s
+
+
+cdef void _roll_var(double[::1] x, Py_ssize_t window, int ddof, double[::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j, s, prev_s = 0, n_same = 0
+    cdef double nobs = 0, mean_x = 0, ssqdm_x = 0, comp_add = 0, comp_remove = 0, prev_value = 0
+    for i in range(x.shape[0]):
+        s = _win_start(i, window)
+        if i == 0 or s >= i:
+            prev_value = x[s]
+            n_same = 0
+            nobs = mean_x = ssqdm_x = comp_add = comp_remove = 0
+            for j in range(s, i + 1):
+                _add_var(x[j], &nobs, &mean_x, &ssqdm_x, &comp_add, &n_same, &prev_value)
+        else:
+            for j in range(prev_s, s):
+                _remove_var(x[j], &nobs, &mean_x, &ssqdm_x, &comp_remove)
+            _add_var(x[i], &nobs, &mean_x, &ssqdm_x, &comp_add, &n_same, &prev_value)
+        out[i] = _calc_var(nobs, ddof, ssqdm_x, n_same)
+        prev_s = s
+
+
+def rolling_var(np.ndarray a, int window, int ddof=1):
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef np.ndarray[double, ndim=1] ret = np.empty(len(x))
+    _roll_var(x, max(window, 1), ddof, ret)
+    return ret
+
+
+def rolling_std(np.ndarray a, int window, int ddof=1):
+    cdef np.ndarray[double, ndim=1] ret = rolling_var(a, window, ddof)
+    cdef Py_ssize_t i
+    for i in range(len(ret)):
+        ret[i] = 0 if ret[i] < 0 else sqrt(ret[i])
+    return ret
+
+
+######## covariance / correlation ########
+
+def _rolling_cov_corr(np.ndarray a, np.ndarray b, int window, bint corr):
+    # the values of both series are masked where any of them is nan, like `(a + 0 * b)` in pandas
+    cdef np.ndarray[double, ndim=1] x = np.ascontiguousarray(a, dtype=np.float64)
+    cdef np.ndarray[double, ndim=1] y = np.ascontiguousarray(b, dtype=np.float64)
+    x = prepare(x + 0 * y)
+    y = prepare(y + 0 * x)
+    cdef Py_ssize_t n = len(x), i, s, count = 0
+    cdef np.ndarray[double, ndim=1] mean_xy = np.empty(n), mean_x = np.empty(n), mean_y = np.empty(n)
+    cdef np.ndarray[double, ndim=1] var_x = np.empty(n if corr else 0), var_y = np.empty(n if corr else 0)
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    window = max(window, 1)
+    _roll_mean(x * y, window, mean_xy)
+    _roll_mean(x, window, mean_x)
+    _roll_mean(y, window, mean_y)
+    if corr:
+        _roll_var(x, window, 1, var_x)
+        _roll_var(y, window, 1, var_y)
+    for i in range(n):
+        s = _win_start(i, window)
+        if not isnan(x[i]):
+            count += 1
+        if s > 0 and not isnan(x[s - 1]):
+            count -= 1
+        ret[i] = (mean_xy[i] - mean_x[i] * mean_y[i]) * (<double>count / (count - 1))
+        if corr:
+            ret[i] = ret[i] / sqrt(var_x[i] * var_y[i])
+    return ret
+
+
+def rolling_cov(np.ndarray a, np.ndarray b, int window):
+    return _rolling_cov_corr(a, b, window, False)
+
+
+def rolling_corr(np.ndarray a, np.ndarray b, int window):
+    return _rolling_cov_corr(a, b, window, True)
+
+
+######## skewness / kurtosis ########
+
+cdef double _moments_shift(double[::1] x):
+    # NOTE: pandas shifts all the values by their rounded mean to improve the precision of the power sums
+    cdef Py_ssize_t i, nobs = 0
+    cdef double total = 0, min_val = NAN, mean_val
+    for i in range(x.shape[0]):
+        if not isnan(x[i]):
+            nobs += 1
+            total += x[i]
+            if isnan(min_val) or x[i] < min_val:
+                min_val = x[i]
+    if nobs == 0:
+        return 0
+    mean_val = total / nobs
+    if min_val - mean_val > -1e5:
+        return round(mean_val)
+    return 0
+
+
+cdef inline double _calc_skew(Py_ssize_t nobs, double x, double xx, double xxx, Py_ssize_t n_same) noexcept nogil:
+    cdef double A, B, C, R, dnobs = nobs
+    if nobs < 3:
+        return NAN
+    A = x / dnobs
+    B = xx / dnobs - A * A
+    C = xxx / dnobs - A * A * A - 3 * A * B
+    if n_same >= nobs:
+        return 0.0
+    if B <= 1e-14:
+        return NAN
+    R = sqrt(B)
+    return (sqrt(dnobs * (dnobs - 1.)) * C) / ((dnobs - 2) * R * R * R)
+
+
+cdef inline double _calc_kurt(Py_ssize_t nobs, double x, double xx, double xxx, double xxxx,
+                              Py_ssize_t n_same) noexcept nogil:
+    cdef double A, B, C, D, R, K, dnobs = nobs
+    if nobs < 4:
+        return NAN
+    if n_same >= nobs:
+        return -3.
+    A = x / dnobs
+    R = A * A
+    B = xx / dnobs - R
+    R = R * A
+    C = xxx / dnobs - R - 3 * A * B
+    R = R * A
+    D = xxxx / dnobs - R - 6 * B * A * A - 4 * C * A
+    if B <= 1e-14:
+        return NAN
+    K = (dnobs * dnobs - 1.) * D / (B * B) - 3 * ((dnobs - 1.) ** 2)
+    return K / ((dnobs - 2.) * (dnobs - 3.))
+
+
+cdef void _roll_moments(double[::1] x, Py_ssize_t window, bint kurt, double[::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j, s, prev_s = 0, nobs = 0, n_same = 0
+    cdef double val, prev_value = 0
+    cdef double s1 = 0, s2 = 0, s3 = 0, s4 = 0
+    cdef double c1_add = 0, c2_add = 0, c3_add = 0, c4_add = 0
+    cdef double c1_remove = 0, c2_remove = 0, c3_remove = 0, c4_remove = 0
+    for i in range(x.shape[0]):
+        s = _win_start(i, window)
+        if i == 0 or s >= i:
+            prev_value = x[s]
+            n_same = nobs = 0
+            s1 = s2 = s3 = s4 = 0
+            c1_add = c2_add = c3_add = c4_add = c1_remove = c2_remove = c3_remove = c4_remove = 0
+            j = s
+        else:
+            for j in range(prev_s, s):
+                val = x[j]
+                if not isnan(val):
+                    nobs -= 1
+                    _kahan_add(-val, &s1, &c1_remove)
+                    _kahan_add(-val * val, &s2, &c2_remove)
+                    _kahan_add(-val * val * val, &s3, &c3_remove)
+                    if kurt:
+                        _kahan_add(-val * val * val * val, &s4, &c4_remove)
+            j = i
+        while j <= i:
+            val = x[j]
+            if not isnan(val):
+                nobs += 1
+                _kahan_add(val, &s1, &c1_add)
+                _kahan_add(val * val, &s2, &c2_add)
+                _kahan_add(val * val * val, &s3, &c3_add)
+                if kurt:
+                    _kahan_add(val * val * val * val, &s4, &c4_add)
+                if val == prev_value:
+                    n_same += 1
+                else:
+                    n_same = 1
+                prev_value = val
+            j += 1
+        if kurt:
+            out[i] = _calc_kurt(nobs, s1, s2, s3, s4, n_same)
+        else:
+            out[i] = _calc_skew(nobs, s1, s2, s3, n_same)
+        prev_s = s
+
+
+def _rolling_moments(np.ndarray a, int window, bint kurt):
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef np.ndarray[double, ndim=1] ret = np.empty(len(x))
+    cdef double shift = _moments_shift(x)
+    if shift != 0:
+        x = x - shift
+    _roll_moments(x, max(window, 1), kurt, ret)
+    return ret
+
+
+def rolling_skew(np.ndarray a, int window):
+    return _rolling_moments(a, window, False)
+
+
+def rolling_kurt(np.ndarray a, int window):
+    return _rolling_moments(a, window, True)
+
+
+######## order statistics: quantile / rank / mean absolute deviation ########
+# The values are replaced by their positions in the sorted distinct values of the array,
+# so the counts (and sums) of the values in a window are kept by binary indexed trees: O(n log n) in total.
+
+cdef class _OrderStat:
+    cdef Py_ssize_t size
+    cdef Py_ssize_t top
+    cdef vector[Py_ssize_t] counts
+    cdef vector[double] sums
+
+    def __init__(self, Py_ssize_t size):
+        self.size = size
+        self.top = 1
+        while self.top * 2 <= size:
+            self.top *= 2
+        self.counts.resize(size + 1, 0)
+        self.sums.resize(size + 1, 0)
+
+    cdef inline void add(self, Py_ssize_t code, Py_ssize_t count, double value) noexcept nogil:
+        cdef Py_ssize_t k = code + 1
+        while k <= self.size:
+            self.counts[k] += count
+            self.sums[k] += value
+            k += k & (-k)
+
+    cdef inline Py_ssize_t count_le(self, Py_ssize_t code) noexcept nogil:
+        """number of values whose code <= `code`"""
+        cdef Py_ssize_t k = code + 1, res = 0
+        while k > 0:
+            res += self.counts[k]
+            k -= k & (-k)
+        return res
+
+    cdef inline double sum_le(self, Py_ssize_t code) noexcept nogil:
+        cdef Py_ssize_t k = code + 1
+        cdef double res = 0
+        while k > 0:
+            res += self.sums[k]
+            k -= k & (-k)
+        return res
+
+    cdef inline Py_ssize_t kth(self, Py_ssize_t k) noexcept nogil:
+        """code of the k-th (0-based) smallest value"""
+        cdef Py_ssize_t pos = 0, step = self.top
+        while step > 0:
+            if pos + step <= self.size and self.counts[pos + step] <= k:
+                pos += step
+                k -= self.counts[pos]
+            step >>= 1
+        return pos
+
+
+cdef inline Py_ssize_t _search_right(double[::1] sorted_values, double value) noexcept nogil:
+    """number of the values <= `value`"""
+    cdef Py_ssize_t lo = 0, hi = sorted_values.shape[0], mid
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_values[mid] <= value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _codes(np.ndarray[double, ndim=1] x):
+    """positions of the values in the sorted distinct values (-1 for nan) and the sorted distinct values"""
+    valid = ~np.isnan(x)
+    uniques = np.unique(x[valid])
+    codes = np.full(len(x), -1, dtype=np.intp)
+    codes[valid] = np.searchsorted(uniques, x[valid])
+    return codes, uniques
+
+
+def rolling_quantile(np.ndarray a, int window, double quantile):
+    """linear interpolated quantile"""
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, s, idx, nobs = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    codes_, uniques_ = _codes(x)
+    cdef Py_ssize_t[::1] codes = codes_
+    cdef double[::1] uniques = uniques_
+    cdef double idx_with_fraction, vlow, vhigh
+    cdef _OrderStat tree = _OrderStat(len(uniques_))
+    window = max(window, 1)
+    for i in range(n):
+        s = _win_start(i, window)
+        if codes[i] >= 0:
+            tree.add(codes[i], 1, 0)
+            nobs += 1
+        if s > 0 and codes[s - 1] >= 0:
+            tree.add(codes[s - 1], -1, 0)
+            nobs -= 1
+        if nobs == 0:
+            ret[i] = NAN
+        elif nobs == 1:
+            ret[i] = uniques[tree.kth(0)]
+        else:
+            idx_with_fraction = quantile * (nobs - 1)
+            idx = <Py_ssize_t>idx_with_fraction
+            vlow = uniques[tree.kth(idx)]
+            if idx == idx_with_fraction:
+                ret[i] = vlow
+            else:
+                vhigh = uniques[tree.kth(idx + 1)]
+                ret[i] = vlow + (vhigh - vlow) * (idx_with_fraction - idx)
+    return ret
+
+
+def rolling_rank(np.ndarray a, int window):
+    """percentile rank of the last value of the window (ties get the average rank)"""
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, s, nobs = 0, lt, le
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    codes_, uniques_ = _codes(x)
+    cdef Py_ssize_t[::1] codes = codes_
+    cdef _OrderStat tree = _OrderStat(len(uniques_))
+    window = max(window, 1)
+    for i in range(n):
+        s = _win_start(i, window)
+        if codes[i] >= 0:
+            tree.add(codes[i], 1, 0)
+            nobs += 1
+        if s > 0 and codes[s - 1] >= 0:
+            tree.add(codes[s - 1], -1, 0)
+            nobs -= 1
+        if codes[i] < 0:
+            ret[i] = NAN
+        else:
+            lt = tree.count_le(codes[i] - 1)
+            le = tree.count_le(codes[i])
+            ret[i] = (lt + 1 + le) / 2.0 / nobs
+    return ret
+
+
+def rolling_mad(np.ndarray a, int window):
+    """mean absolute deviation around the mean of the valid values"""
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, s, nobs = 0, n_le, p, n_same = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    valid = ~np.isnan(x)
+    cdef double anchor = x[valid][0] if valid.any() else 0
+    # the values are anchored at the first value to keep the sums small
+    x = x - anchor
+    codes_, uniques_ = _codes(x)
+    cdef Py_ssize_t[::1] codes = codes_
+    cdef double[::1] uniques = uniques_
+    cdef _OrderStat tree = _OrderStat(len(uniques_))
+    cdef double total = 0, comp = 0, mean, sum_le, prev_value = NAN
+    window = max(window, 1)
+    for i in range(n):
+        s = _win_start(i, window)
+        if codes[i] >= 0:
+            tree.add(codes[i], 1, x[i])
+            _kahan_add(x[i], &total, &comp)
+            nobs += 1
+            n_same = n_same + 1 if x[i] == prev_value else 1
+            prev_value = x[i]
+        if s > 0 and codes[s - 1] >= 0:
+            tree.add(codes[s - 1], -1, -x[s - 1])
+            _kahan_add(-x[s - 1], &total, &comp)
+            nobs -= 1
+        if nobs == 0:
+            ret[i] = NAN
+        elif n_same >= nobs:
+            ret[i] = 0
+        else:
+            mean = total / nobs
+            p = _search_right(uniques, mean)
+            n_le = tree.count_le(p - 1)
+            sum_le = tree.sum_le(p - 1)
+            ret[i] = max((mean * n_le - sum_le) + (total - sum_le - mean * (nobs - n_le)), 0) / nobs
+    return ret
+
+
+######## index of max / min ########
+
+cdef np.ndarray _rolling_arg(np.ndarray a, Py_ssize_t window, bint is_max):
+    # `np.argmax` / `np.argmin` of the window (1-based): the position of the first nan if any, like numpy
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, s, nobs = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    cdef deque[Py_ssize_t] best  # positions of the candidates, the values are monotonic
+    cdef deque[Py_ssize_t] nans
+    window = max(window, 1)
+    for i in range(n):
+        s = _win_start(i, window)
+        if isnan(x[i]):
+            nans.push_back(i)
+        else:
+            nobs += 1
+            # the earliest position wins on ties
+            while not best.empty() and (x[best.back()] < x[i] if is_max else x[best.back()] > x[i]):
+                best.pop_back()
+            best.push_back(i)
+        if s > 0 and not isnan(x[s - 1]):
+            nobs -= 1
+        while not best.empty() and best.front() < s:
+            best.pop_front()
+        while not nans.empty() and nans.front() < s:
+            nans.pop_front()
+        if nobs == 0:
+            ret[i] = NAN
+        elif not nans.empty():
+            ret[i] = nans.front() - s + 1
+        else:
+            ret[i] = best.front() - s + 1
+    return ret
+
+
+def rolling_idxmax(np.ndarray a, int window):
+    return _rolling_arg(a, window, True)
+
+
+def rolling_idxmin(np.ndarray a, int window):
+    return _rolling_arg(a, window, False)
+
+
+######## weighted moving average ########
+
+def rolling_wma(np.ndarray a, int window):
+    """`np.nanmean(w * x)` with the linear weights `w = (1, 2, ..., L) / sum(1, 2, ..., L)` of a window of length L"""
+    cdef np.ndarray[double, ndim=1] x = prepare(a)
+    cdef Py_ssize_t n = len(x), i, j, s, length, nobs = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(n)
+    cdef double val, wsum = 0, vsum = 0
+    window = max(window, 1)
+    for i in range(n):
+        s = _win_start(i, window)
+        length = i - s + 1
+        val = 0 if isnan(x[i]) else x[i]
+        if not isnan(x[i]):
+            nobs += 1
+        if s > 0 and not isnan(x[s - 1]):
+            nobs -= 1
+        if s > 0 and (i % window) == 0:
+            # recompute the sums from time to time, so the rounding errors don't accumulate
+            wsum = vsum = 0
+            for j in range(s, i + 1):
+                if not isnan(x[j]):
+                    wsum += (j - s + 1) * x[j]
+                    vsum += x[j]
+        elif s > 0:
+            # all the weights decrease by one and the first value leaves the window
+            wsum = wsum - vsum + length * val
+            vsum = vsum - (0 if isnan(x[s - 1]) else x[s - 1]) + val
+        else:
+            wsum += length * val
+            vsum += val
+        if nobs == 0:
+            ret[i] = NAN
+        else:
+            ret[i] = wsum / (length * (length + 1) / 2.0) / nobs
+    return ret
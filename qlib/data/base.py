@@ -6,10 +6,93 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import threading
+import contextlib
+import numpy as np
 import pandas as pd
+from typing import Tuple
 from ..log import get_module_logger
 
 
+class _ExpressionMemo(threading.local):
+    """The results shared by all the expressions loaded in an `expression_memo` context (per thread)"""
+
+    cache = None
+
+
+_expression_memo = _ExpressionMemo()
+
+
+@contextlib.contextmanager
+def expression_memo():
+    """Evaluate every distinct sub-expression only once in this context
+
+    Inside the context, `Expression.load` remembers every loaded series by `(str(expression), instrument,
+    start_index, end_index, *args)`, independent of the size limit of the `H["f"]` memory cache.
+    So the shared sub-expressions of several fields (e.g. `$close` or `Ref($close, 1)`) are computed once
+    when the fields are loaded with the same range. The results are released when the context exits.
+    Nested contexts share the outermost memo.
+    """
+    if _expression_memo.cache is not None:
+        yield _expression_memo.cache
+        return
+    _expression_memo.cache = {}
+    try:
+        yield _expression_memo.cache
+    finally:
+        _expression_memo.cache = None
+
+
+class _ArrayMode(threading.local):
+    """Whether the expressions are evaluated on raw arrays in the current thread, see `array_mode`"""
+
+    enabled = False
+
+
+_array_mode = _ArrayMode()
+
+
+@contextlib.contextmanager
+def array_mode(enabled: bool = True):
+    """Evaluate the expressions on raw ndarrays in this context
+
+    Inside the context every node of an expression tree passes a `(start_index, values)` pair (the calendar index of
+    the first value and a numpy array) to its parent instead of a `pd.Series`, see `Expression.load_array`. So the
+    operators skip the index alignment and the Series construction of pandas. `Expression.load` wraps the array into
+    a `pd.Series` only for the operators without an array implementation.
+
+    The arrays are indexed by the calendar index, so the array mode only works for expressions loaded by
+    calendar index (e.g. not for the point-in-time data or the operators based on a time index like `TResample`).
+    """
+    enabled_before = _array_mode.enabled
+    _array_mode.enabled = enabled
+    try:
+        yield
+    finally:
+        _array_mode.enabled = enabled_before
+
+
+def series_to_array(series: pd.Series, start_index: int = None) -> Tuple[int, np.ndarray]:
+    """Convert a series indexed by calendar index to a `(start_index, values)` pair
+
+    The gaps in the index are filled with nan. `start_index` is the start of an empty series.
+    """
+    if series.empty:
+        return (0 if start_index is None else start_index), series.to_numpy()
+    index = series.index
+    if not pd.api.types.is_integer_dtype(index.dtype):
+        raise TypeError(f"Only the series indexed by calendar index can be converted to array, got {index.dtype}")
+    first, last = int(index[0]), int(index[-1])
+    if last - first + 1 != len(series) or not index.is_monotonic_increasing:
+        series = series.reindex(pd.RangeIndex(first, last + 1))
+    return first, series.to_numpy()
+
+
+def array_to_series(start_index: int, values: np.ndarray, name: str = None) -> pd.Series:
+    """Wrap a `(start_index, values)` pair into a series indexed by calendar index"""
+    return pd.Series(values, index=pd.RangeIndex(start_index, start_index + len(values)), name=name, copy=False)
+
+
 class Expression(abc.ABC):
     """
     Expression base class
@@ -183,10 +266,19 @@ class Expression(abc.ABC):
         """
         from .cache import H  # pylint: disable=C0415
 
+        if _array_mode.enabled:
+            return array_to_series(*self.load_array(instrument, start_index, end_index, *args), name=str(self))
+
         # cache
         cache_key = str(self), instrument, start_index, end_index, *args
-        if cache_key in H["f"]:
-            return H["f"][cache_key]
+        memo = _expression_memo.cache
+        if memo is not None and cache_key in memo:
+            return memo[cache_key]
+        series = H["f"].get(cache_key)
+        if series is not None:
+            if memo is not None:
+                memo[cache_key] = series
+            return series
         if start_index is not None and end_index is not None and start_index > end_index:
             raise ValueError("Invalid index range: {} {}".format(start_index, end_index))
         try:
@@ -200,12 +292,58 @@ class Expression(abc.ABC):
             raise
         series.name = str(self)
         H["f"][cache_key] = series
+        if memo is not None:
+            memo[cache_key] = series
         return series
 
     @abc.abstractmethod
     def _load_internal(self, instrument, start_index, end_index, *args) -> pd.Series:
         raise NotImplementedError("This function must be implemented in your newly defined feature")
 
+    def load_array(self, instrument, start_index, end_index, *args) -> Tuple[int, np.ndarray]:
+        """load feature as raw array
+
+        The array counterpart of `load`, the results are cached in the same way.
+
+        Returns
+        ----------
+        Tuple[int, np.ndarray]
+            the calendar index of the first value and the values.
+        """
+        from .cache import H  # pylint: disable=C0415
+
+        cache_key = "array", str(self), instrument, start_index, end_index, *args
+        memo = _expression_memo.cache
+        if memo is not None and cache_key in memo:
+            return memo[cache_key]
+        res = H["f"].get(cache_key)
+        if res is not None:
+            if memo is not None:
+                memo[cache_key] = res
+            return res
+        if start_index is not None and end_index is not None and start_index > end_index:
+            raise ValueError("Invalid index range: {} {}".format(start_index, end_index))
+        try:
+            res = self._load_array_internal(instrument, start_index, end_index, *args)
+        except Exception as e:
+            get_module_logger("data").debug(
+                f"Loading data error: instrument={instrument}, expression={str(self)}, "
+                f"start_index={start_index}, end_index={end_index}, args={args}. "
+                f"error info: {str(e)}"
+            )
+            raise
+        H["f"][cache_key] = res
+        if memo is not None:
+            memo[cache_key] = res
+        return res
+
+    def _load_array_internal(self, instrument, start_index, end_index, *args) -> Tuple[int, np.ndarray]:
+        # The expressions without an array implementation are calculated with pandas.
+        # Their operands are still loaded as arrays and wrapped by `load` in the array mode.
+        with array_mode():
+            series = self._load_internal(instrument, start_index, end_index, *args)
+        return series_to_array(series, start_index)
+
     @abc.abstractmethod
     def get_longest_back_rolling(self):
         """Get the longest length of historical data the feature has accessed
@@ -256,6 +394,11 @@ class Feature(Expression):
 
         return FeatureD.feature(instrument, str(self), start_index, end_index, freq)
 
+    def _load_array_internal(self, instrument, start_index, end_index, freq):
+        from .data import FeatureD  # pylint: disable=C0415
+
+        return FeatureD.feature_array(instrument, str(self), start_index, end_index, freq)
+
     def get_longest_back_rolling(self):
         return 0
 
@@ -272,6 +415,10 @@ class PFeature(Feature):
 
         return PITD.period_feature(instrument, str(self), start_index, end_index, cur_time, period)
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        # the period data is not indexed by calendar index
+        raise NotImplementedError("The point-in-time features can't be loaded in the array mode")
+
 
 class ExpressionOps(Expression):
     """Operator Expression
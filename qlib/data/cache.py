@@ -10,6 +10,9 @@ import sys
 import stat
 import time
 import pickle
+import hashlib
+import tempfile
+import threading
 import traceback
 import redis_lock
 import contextlib
@@ -17,7 +20,10 @@ import abc
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from typing import Union, Iterable
+import pyarrow as pa
+import pyarrow.compute  # pylint: disable=W0611  # noqa: F401
+import pyarrow.ipc  # pylint: disable=W0611  # noqa: F401
+from typing import Union, Iterable, List
 from collections import OrderedDict
 
 from ..config import C
@@ -32,7 +38,13 @@ from ..utils import (
 )
 
 from ..log import get_module_logger
+
+try:
+    import fcntl
+except ImportError:  # the file locks are not supported on Windows
+    fcntl = None
 from .base import Feature
+from .planner import is_window_stable
 from .ops import Operators  # pylint: disable=W0611  # noqa: F401
 
 
@@ -41,36 +53,53 @@ class QlibCacheException(RuntimeError):
 
 
 class MemCacheUnit(abc.ABC):
-    """Memory Cache Unit."""
+    """Memory Cache Unit.
+
+    A thread-safe LRU cache, the least recently used items are evicted when the total size of the values exceeds
+    `size_limit`. The size of a value is measured once when it is set.
+
+    The lookups are counted: `key in unit` and `unit.get(key)` count a hit or a miss, the evicted items are counted
+    as evictions, see `stats`.
+    """
 
     def __init__(self, *args, **kwargs):
         self.size_limit = kwargs.pop("size_limit", 0)
         self._size = 0
         self.od = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def __setitem__(self, key, value):
-        # TODO: thread safe?__setitem__ failure might cause inconsistent size?
-
-        # precalculate the size after od.__setitem__
-        self._adjust_size(key, value)
+        value_size = self._get_value_size(value)
+        with self._lock:
+            if key in self.od:
+                self._size -= self._sizes[key]
+            self.od.__setitem__(key, value)
+            self._sizes[key] = value_size
+            self._size += value_size
 
-        self.od.__setitem__(key, value)
+            # move the key to end,make it latest
+            self.od.move_to_end(key)
 
-        # move the key to end,make it latest
-        self.od.move_to_end(key)
-
-        if self.limited:
-            # pop the oldest items beyond size limit
-            while self._size > self.size_limit:
-                self.popitem(last=False)
+            self._evict()
 
     def __getitem__(self, key):
-        v = self.od.__getitem__(key)
-        self.od.move_to_end(key)
-        return v
+        with self._lock:
+            v = self.od.__getitem__(key)
+            self.od.move_to_end(key)
+            return v
 
     def __contains__(self, key):
-        return key in self.od
+        with self._lock:
+            found = key in self.od
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return found
 
     def __len__(self):
         return self.od.__len__()
@@ -78,8 +107,20 @@ class MemCacheUnit(abc.ABC):
     def __repr__(self):
         return f"{self.__class__.__name__}<size_limit:{self.size_limit if self.limited else 'no limit'} total_size:{self._size}>\n{self.od.__repr__()}"
 
+    def get(self, key, default=None):
+        """get the value of `key` and make it latest, return `default` if the key is not cached"""
+        with self._lock:
+            if key not in self.od:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.od.move_to_end(key)
+            return self.od[key]
+
     def set_limit_size(self, limit):
-        self.size_limit = limit
+        with self._lock:
+            self.size_limit = limit
+            self._evict()
 
     @property
     def limited(self):
@@ -90,27 +131,46 @@ class MemCacheUnit(abc.ABC):
     def total_size(self):
         return self._size
 
+    def stats(self) -> dict:
+        """the counters and the size of the cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "items": len(self.od),
+                "total_size": self._size,
+                "size_limit": self.size_limit,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
     def clear(self):
-        self._size = 0
-        self.od.clear()
+        with self._lock:
+            self._size = 0
+            self.od.clear()
+            self._sizes.clear()
 
     def popitem(self, last=True):
-        k, v = self.od.popitem(last=last)
-        self._size -= self._get_value_size(v)
-
-        return k, v
+        with self._lock:
+            k, v = self.od.popitem(last=last)
+            self._size -= self._sizes.pop(k)
+            return k, v
 
     def pop(self, key):
-        v = self.od.pop(key)
-        self._size -= self._get_value_size(v)
-
-        return v
+        with self._lock:
+            v = self.od.pop(key)
+            self._size -= self._sizes.pop(key)
+            return v
 
-    def _adjust_size(self, key, value):
-        if key in self.od:
-            self._size -= self._get_value_size(self.od[key])
-
-        self._size += self._get_value_size(value)
+    def _evict(self):
+        if self.limited:
+            # pop the oldest items beyond size limit
+            while self._size > self.size_limit and len(self.od) > 0:
+                self.popitem(last=False)
+                self.evictions += 1
 
     @abc.abstractmethod
     def _get_value_size(self, value):
@@ -125,6 +185,35 @@ class MemCacheLengthUnit(MemCacheUnit):
         return 1
 
 
+class MemCacheOpenedUnit(MemCacheLengthUnit):
+    """LRU of the opened objects (e.g. the memory mapped feature storages), limited by the number of the objects.
+
+    The objects are closed by their `close()` (if any) when they are evicted, popped or cleared.
+    """
+
+    @staticmethod
+    def _close(value):
+        close = getattr(value, "close", None)
+        if close is not None:
+            close()
+
+    def popitem(self, last=True):
+        k, v = super().popitem(last=last)
+        self._close(v)
+        return k, v
+
+    def pop(self, key):
+        v = super().pop(key)
+        self._close(v)
+        return v
+
+    def clear(self):
+        with self._lock:
+            for v in self.od.values():
+                self._close(v)
+            super().clear()
+
+
 class MemCacheSizeofUnit(MemCacheUnit):
     def __init__(self, size_limit=0):
         super().__init__(size_limit=size_limit)
@@ -133,48 +222,90 @@ class MemCacheSizeofUnit(MemCacheUnit):
         return sys.getsizeof(value)
 
 
+class MemCacheNbytesUnit(MemCacheUnit):
+    """Memory Cache Unit measuring the values by the bytes of their buffers.
+
+    The numpy arrays and the pandas objects (including their indexes) are measured by `nbytes`, the tuples, lists and
+    dicts by their items. The other values fall back to `sys.getsizeof`.
+    """
+
+    def __init__(self, size_limit=0):
+        super().__init__(size_limit=size_limit)
+
+    def _get_value_size(self, value):
+        return self.nbytes(value)
+
+    @classmethod
+    def nbytes(cls, value) -> int:
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (pd.Series, pd.Index)):
+            return int(value.memory_usage(index=True, deep=False))
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=False).sum())
+        if isinstance(value, (tuple, list)):
+            return sys.getsizeof(value) + sum(cls.nbytes(v) for v in value)
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(cls.nbytes(k) + cls.nbytes(v) for k, v in value.items())
+        return sys.getsizeof(value)
+
+
 class MemCache:
     """Memory cache."""
 
+    UNIT_CLASSES = {"length": MemCacheLengthUnit, "sizeof": MemCacheSizeofUnit, "nbytes": MemCacheNbytesUnit}
+
     def __init__(self, mem_cache_size_limit=None, limit_type="length"):
         """
 
         Parameters
         ----------
         mem_cache_size_limit:
-            cache max size.
+            cache max size, an int for all the units or a dict of the limits of the units, e.g.
+            `{"c": 500, "i": 500, "f": 2 * 1024**3}`, the missing units are not limited.
         limit_type:
-            length or sizeof; length(call fun: len), size(call fun: sys.getsizeof).
+            length, sizeof or nbytes; length(call fun: len), size(call fun: sys.getsizeof),
+            nbytes(the bytes of the numpy arrays and the pandas objects).
         """
+        self.__units = {}
+        self.configure(mem_cache_size_limit, limit_type)
 
+    def configure(self, mem_cache_size_limit=None, limit_type=None):
+        """Set the size limits and the limit type of the units
+
+        The cached items are kept if the limit type doesn't change (the items beyond the new limits are evicted).
+        """
         size_limit = C.mem_cache_size_limit if mem_cache_size_limit is None else mem_cache_size_limit
         limit_type = C.mem_cache_limit_type if limit_type is None else limit_type
 
-        if limit_type == "length":
-            klass = MemCacheLengthUnit
-        elif limit_type == "sizeof":
-            klass = MemCacheSizeofUnit
-        else:
-            raise ValueError(f"limit_type must be length or sizeof, your limit_type is {limit_type}")
-
-        self.__calendar_mem_cache = klass(size_limit)
-        self.__instrument_mem_cache = klass(size_limit)
-        self.__feature_mem_cache = klass(size_limit)
+        if limit_type not in self.UNIT_CLASSES:
+            raise ValueError(f"limit_type must be length, sizeof or nbytes, your limit_type is {limit_type}")
+        klass = self.UNIT_CLASSES[limit_type]
+        if not isinstance(size_limit, dict):
+            size_limit = {key: size_limit for key in ("c", "i", "f")}
+        unknown = set(size_limit) - {"c", "i", "f"}
+        if unknown:
+            raise KeyError(f"Unknown memcache unit {unknown}")
+
+        for key in ("c", "i", "f"):
+            limit = size_limit.get(key, 0) or 0
+            if type(self.__units.get(key)) is klass:  # pylint: disable=C0123
+                self.__units[key].set_limit_size(limit)
+            else:
+                self.__units[key] = klass(limit)
 
     def __getitem__(self, key):
-        if key == "c":
-            return self.__calendar_mem_cache
-        elif key == "i":
-            return self.__instrument_mem_cache
-        elif key == "f":
-            return self.__feature_mem_cache
-        else:
+        if key not in self.__units:
             raise KeyError("Unknown memcache unit")
+        return self.__units[key]
+
+    def stats(self) -> dict:
+        """the counters and the sizes of the units, see `MemCacheUnit.stats`"""
+        return {key: unit.stats() for key, unit in self.__units.items()}
 
     def clear(self):
-        self.__calendar_mem_cache.clear()
-        self.__instrument_mem_cache.clear()
-        self.__feature_mem_cache.clear()
+        for unit in self.__units.values():
+            unit.clear()
 
 
 class MemCacheExpire:
@@ -218,6 +349,29 @@ class CacheUtils:
         r = get_redis_connection()
         redis_lock.reset_all(r)
 
+    @staticmethod
+    def get_lock_client():
+        """Get the redis connection of the cache locks, None if the caches are locked by the file locks"""
+        if C.get("cache_lock_backend") == "file":
+            return None
+        return get_redis_connection()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def atomic_path(path: Union[str, Path]):
+        """
+        Yield a temporary path beside `path`, the temporary file replaces `path` after the block succeeds.
+        So the readers see either the old file or the completely written new one.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            yield tmp_path
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
     @staticmethod
     def visit(cache_path: Union[str, Path]):
         # FIXME: Because read_lock was canceled when reading the cache, multiple processes may have read and write exceptions here
@@ -226,13 +380,12 @@ class CacheUtils:
             meta_path = cache_path.with_suffix(".meta")
             with meta_path.open("rb") as f:
                 d = pickle.load(f)
-            with meta_path.open("wb") as f:
-                try:
-                    d["meta"]["last_visit"] = str(time.time())
-                    d["meta"]["visits"] = d["meta"]["visits"] + 1
-                except KeyError as key_e:
-                    raise KeyError("Unknown meta keyword") from key_e
-                pickle.dump(d, f, protocol=C.dump_protocol_version)
+            try:
+                d["meta"]["last_visit"] = str(time.time())
+                d["meta"]["visits"] = d["meta"]["visits"] + 1
+            except KeyError as key_e:
+                raise KeyError("Unknown meta keyword") from key_e
+            CacheUtils.dump_meta(d, meta_path)
         except Exception as e:
             get_module_logger("CacheUtils").warning(f"visit {cache_path} cache error: {e}")
 
@@ -252,9 +405,41 @@ class CacheUtils:
                 """
             ) from lock_acquired
 
+    @staticmethod
+    def dump_meta(meta: dict, meta_path: Path):
+        """write the meta file atomically"""
+        with CacheUtils.atomic_path(meta_path) as tmp_path:
+            with tmp_path.open("wb") as f:
+                pickle.dump(meta, f, protocol=C.dump_protocol_version)
+            tmp_path.chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def file_lock(lock_name: str, shared: bool = False):
+        """
+        The file lock of the processes on the same host, it is shared by the readers and exclusive for the writer.
+
+        The lock files are placed in `C.cache_lock_dir` (the temporary directory by default).
+        """
+        lock_dir = C.get("cache_lock_dir")
+        lock_dir = Path(tempfile.gettempdir()).joinpath("qlib_cache_locks") if lock_dir is None else Path(lock_dir)
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = lock_dir.joinpath(hashlib.md5(lock_name.encode("utf-8")).hexdigest() + ".lock")
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
     @staticmethod
     @contextlib.contextmanager
     def reader_lock(redis_t, lock_name: str):
+        if redis_t is None:
+            with CacheUtils.file_lock(lock_name, shared=True):
+                yield
+            return
         current_cache_rlock = redis_lock.Lock(redis_t, f"{lock_name}-rlock")
         current_cache_wlock = redis_lock.Lock(redis_t, f"{lock_name}-wlock")
         lock_reader = f"{lock_name}-reader"
@@ -283,6 +468,10 @@ class CacheUtils:
     @staticmethod
     @contextlib.contextmanager
     def writer_lock(redis_t, lock_name):
+        if redis_t is None:
+            with CacheUtils.file_lock(lock_name):
+                yield
+            return
         current_cache_wlock = redis_lock.Lock(redis_t, f"{lock_name}-wlock", id=CacheUtils.LOCK_ID)
         CacheUtils.acquire(current_cache_wlock, lock_name)
         try:
@@ -344,6 +533,10 @@ class ExpressionCache(BaseProviderCache):
         except NotImplementedError:
             return self.provider.expression(instrument, field, start_time, end_time, freq)
 
+    def expressions(self, instrument, fields, start_time, end_time, freq):
+        """Get the data of several expressions, each of them goes through the cache."""
+        return {field: self.expression(instrument, field, start_time, end_time, freq) for field in fields}
+
     def _uri(self, instrument, field, start_time, end_time, freq):
         """Get expression cache file uri.
 
@@ -491,7 +684,7 @@ class DiskExpressionCache(ExpressionCache):
 
     def __init__(self, provider, **kwargs):
         super(DiskExpressionCache, self).__init__(provider)
-        self.r = get_redis_connection()
+        self.r = CacheUtils.get_lock_client()
         # remote==True means client is using this module, writing behaviour will not be allowed.
         self.remote = kwargs.get("remote", False)
 
@@ -572,15 +765,13 @@ class DiskExpressionCache(ExpressionCache):
         }
         self.logger.debug(f"generating expression cache: {meta}")
         self.clear_cache(cache_path)
-        meta_path = cache_path.with_suffix(".meta")
 
-        with meta_path.open("wb") as f:
-            pickle.dump(meta, f, protocol=C.dump_protocol_version)
-        meta_path.chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
         df = expression_data.to_frame()
-
         r = np.hstack([df.index[0], expression_data]).astype("<f")
-        r.tofile(str(cache_path))
+        # the readers check the meta file, so it is written after the data
+        with CacheUtils.atomic_path(cache_path) as tmp_path:
+            r.tofile(str(tmp_path))
+        CacheUtils.dump_meta(meta, cache_path.with_suffix(".meta"))
 
     def update(self, sid, cache_uri, freq: str = "day"):
         cp_cache_uri = self.get_cache_dir(freq).joinpath(sid).joinpath(cache_uri)
@@ -590,7 +781,7 @@ class DiskExpressionCache(ExpressionCache):
             self.clear_cache(cp_cache_uri)
             return 2
 
-        with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri())}:expression-{cache_uri}"):
+        with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri(freq))}:expression-{cache_uri}"):
             with meta_path.open("rb") as f:
                 d = pickle.load(f)
             instrument = d["info"]["instrument"]
@@ -610,36 +801,41 @@ class DiskExpressionCache(ExpressionCache):
                 # Including last updated calendar, we only get 1 item.
                 # No future updating is needed.
                 return 1
-            else:
-                # get the data needed after the historical data are removed.
-                # The start index of new data
-                current_index = len(whole_calendar) - len(new_calendar) + 1
 
-                # The existing data length
-                size_bytes = os.path.getsize(cp_cache_uri)
-                ele_size = np.dtype("<f").itemsize
-                assert size_bytes % ele_size == 0
-                ele_n = size_bytes // ele_size - 1
-
-                expr = ExpressionD.get_expression_instance(field)
-                lft_etd, rght_etd = expr.get_extended_window_size()
-                # The expression used the future data after rght_etd days.
-                # So the last rght_etd data should be removed.
-                # There are most `ele_n` period of data can be remove
-                remove_n = min(rght_etd, ele_n)
-                assert new_calendar[1] == whole_calendar[current_index]
-                data = self.provider.expression(
-                    instrument, field, whole_calendar[current_index - remove_n], new_calendar[-1], freq
-                )
-                with open(cp_cache_uri, "ab") as f:
-                    data = np.array(data).astype("<f")
-                    # Remove the last bits
-                    f.truncate(size_bytes - ele_size * remove_n)
-                    f.write(data)
-                # update meta file
-                d["info"]["last_update"] = str(new_calendar[-1])
-                with meta_path.open("wb") as f:
-                    pickle.dump(d, f, protocol=C.dump_protocol_version)
+            expr = ExpressionD.get_expression_instance(field)
+            if not is_window_stable(expr):
+                # the values of the recursive or expanding expressions depend on the whole history
+                series = self.provider.expression(instrument, field, whole_calendar[0], whole_calendar[-1], freq)
+                if series.empty:
+                    self.clear_cache(cp_cache_uri)
+                    return 2
+                self.gen_expression_cache(series, cp_cache_uri, instrument, field, freq, str(whole_calendar[-1]))
+                return 0
+
+            # The existing data: the calendar index of the first value and the number of values
+            size_bytes = os.path.getsize(cp_cache_uri)
+            ele_size = np.dtype("<f").itemsize
+            assert size_bytes % ele_size == 0
+            ele_n = size_bytes // ele_size - 1
+            start_index = int(np.fromfile(cp_cache_uri, dtype="<f", count=1)[0])
+
+            lft_etd, rght_etd = expr.get_extended_window_size()
+            # The expression used the future data after rght_etd periods.
+            # So the last rght_etd values are computed again with the new bars, the earlier ones are kept.
+            update_index = max(start_index + ele_n - rght_etd, start_index)
+            data = self.provider.expression(instrument, field, whole_calendar[update_index], whole_calendar[-1], freq)
+            if data.empty:
+                values = np.array([], dtype="<f")
+            else:
+                values = data.reindex(pd.RangeIndex(update_index, data.index[-1] + 1)).values.astype("<f")
+            # the values before `update_index` are copied, the new values are written after them.
+            # The readers don't take the lock, so the file is replaced instead of written in place
+            kept = np.fromfile(cp_cache_uri, dtype="<f", count=1 + update_index - start_index)
+            with CacheUtils.atomic_path(cp_cache_uri) as tmp_path:
+                np.hstack([kept, values]).astype("<f").tofile(str(tmp_path))
+            # update meta file
+            d["info"]["last_update"] = str(whole_calendar[-1])
+            CacheUtils.dump_meta(d, meta_path)
         return 0
 
 
@@ -648,7 +844,7 @@ class DiskDatasetCache(DatasetCache):
 
     def __init__(self, provider, **kwargs):
         super(DiskDatasetCache, self).__init__(provider)
-        self.r = get_redis_connection()
+        self.r = CacheUtils.get_lock_client()
         self.remote = kwargs.get("remote", False)
 
     @staticmethod
@@ -813,9 +1009,10 @@ class DiskDatasetCache(DatasetCache):
             if self._data is None:
                 raise ValueError("No data to sync to disk.")
             self._data.sort_index(inplace=True)
-            self._data.to_hdf(self.index_path, key=self.KEY, mode="w", format="table")
-            # The index should be readable for all users
-            self.index_path.chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
+            with CacheUtils.atomic_path(self.index_path) as tmp_path:
+                self._data.to_hdf(tmp_path, key=self.KEY, mode="w", format="table")
+                # The index should be readable for all users
+                tmp_path.chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
 
         def sync_from_disk(self):
             # The file will not be closed directly if we read_hdf from the disk directly
@@ -853,6 +1050,41 @@ class DiskDatasetCache(DatasetCache):
             index_data += start_index
             return index_data
 
+    @staticmethod
+    def to_cache_features(features: pd.DataFrame) -> pd.DataFrame:
+        """rename the fields of the features to the cache fields(without spaces), the cache fields are sorted"""
+        cache_to_orig_map = dict(zip(remove_fields_space(features.columns), features.columns))
+        orig_to_cache_map = dict(zip(features.columns, remove_fields_space(features.columns)))
+        cache_features = features[list(cache_to_orig_map.values())].rename(columns=orig_to_cache_map)
+        # cache columns
+        cache_columns = sorted(cache_features.columns)
+        cache_features = cache_features.loc[:, cache_columns]
+        return cache_features.loc[:, ~cache_features.columns.duplicated()]
+
+    def write_cache(self, cache_path: Path, features: pd.DataFrame, info: dict):
+        """write the data, meta and index files of the cache
+
+        :param cache_path: The path to store the cache.
+        :param features: The features indexed by <datetime, instrument> and sorted.
+        :param info: The info of the meta file, the cache fields are added.
+        """
+        # the data file is moved to `cache_path` after the meta and index files have been written
+        with CacheUtils.atomic_path(cache_path) as data_path:
+            cache_features = self.to_cache_features(features)
+            # write cache data
+            with pd.HDFStore(str(data_path)) as store:
+                store.append(DatasetCache.HDF_KEY, cache_features, append=False)
+            # write meta file
+            meta = {
+                "info": {**info, "fields": list(cache_features.columns)},
+                "meta": {"last_visit": time.time(), "visits": 1},
+            }
+            CacheUtils.dump_meta(meta, cache_path.with_suffix(".meta"))
+            # write index file
+            im = DiskDatasetCache.IndexManager(cache_path)
+            index_data = im.build_index_from_data(features)
+            im.update(index_data)
+
     def gen_dataset_cache(self, cache_path: Union[str, Path], instruments, fields, freq, inst_processors=[]):
         """gen_dataset_cache
 
@@ -912,39 +1144,16 @@ class DiskDatasetCache(DatasetCache):
         # swap index and sorted
         features = features.swaplevel("instrument", "datetime").sort_index()
 
-        # write cache data
-        with pd.HDFStore(str(cache_path.with_suffix(".data"))) as store:
-            cache_to_orig_map = dict(zip(remove_fields_space(features.columns), features.columns))
-            orig_to_cache_map = dict(zip(features.columns, remove_fields_space(features.columns)))
-            cache_features = features[list(cache_to_orig_map.values())].rename(columns=orig_to_cache_map)
-            # cache columns
-            cache_columns = sorted(cache_features.columns)
-            cache_features = cache_features.loc[:, cache_columns]
-            cache_features = cache_features.loc[:, ~cache_features.columns.duplicated()]
-            store.append(DatasetCache.HDF_KEY, cache_features, append=False)
-        # write meta file
-        meta = {
-            "info": {
+        self.write_cache(
+            cache_path,
+            features,
+            {
                 "instruments": instruments,
-                "fields": list(cache_features.columns),
                 "freq": freq,
                 "last_update": str(_calendar[-1]),  # The last_update to store the cache
                 "inst_processors": inst_processors,  # The last_update to store the cache
             },
-            "meta": {"last_visit": time.time(), "visits": 1},
-        }
-        with cache_path.with_suffix(".meta").open("wb") as f:
-            pickle.dump(meta, f, protocol=C.dump_protocol_version)
-        cache_path.with_suffix(".meta").chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
-        # write index file
-        im = DiskDatasetCache.IndexManager(cache_path)
-        index_data = im.build_index_from_data(features)
-        im.update(index_data)
-
-        # rename the file after the cache has been generated
-        # this doesn't work well on windows, but our server won't use windows
-        # temporarily
-        cache_path.with_suffix(".data").rename(cache_path)
+        )
         # the fields of the cached features are converted to the original fields
         return features.swaplevel("datetime", "instrument")
 
@@ -957,7 +1166,7 @@ class DiskDatasetCache(DatasetCache):
             return 2
 
         im = DiskDatasetCache.IndexManager(cp_cache_uri)
-        with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri())}:dataset-{cache_uri}"):
+        with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri(freq))}:dataset-{cache_uri}"):
             with meta_path.open("rb") as f:
                 d = pickle.load(f)
             instruments = d["info"]["instruments"]
@@ -994,10 +1203,14 @@ class DiskDatasetCache(DatasetCache):
                 # To avoid recursive import
                 from .data import ExpressionD  # pylint: disable=C0415
 
+                exprs = [ExpressionD.get_expression_instance(field) for field in fields]
+                if not all(is_window_stable(expr) for expr in exprs):
+                    # the values of the recursive or expanding expressions depend on the whole history
+                    self.gen_dataset_cache(cp_cache_uri, instruments, fields, freq, inst_processors=inst_processors)
+                    return 0
                 # The existing data length
                 lft_etd = rght_etd = 0
-                for field in fields:
-                    expr = ExpressionD.get_expression_instance(field)
+                for expr in exprs:
                     l, r = expr.get_extended_window_size()
                     lft_etd = max(lft_etd, l)
                     rght_etd = max(rght_etd, r)
@@ -1055,9 +1268,215 @@ class DiskDatasetCache(DatasetCache):
 
                 # update meta file
                 d["info"]["last_update"] = str(new_calendar[-1])
-                with meta_path.open("wb") as f:
-                    pickle.dump(d, f, protocol=C.dump_protocol_version)
+                CacheUtils.dump_meta(d, meta_path)
+                return 0
+
+
+class ArrowDatasetCache(DiskDatasetCache):
+    """Prepared cache mechanism for server, the datasets are stored in the Arrow IPC file format.
+
+    The data file of a cache is an Arrow IPC file sorted by <datetime, instrument>. It is split into record batches
+    at the datetime boundaries, and the time range of every batch is kept in the metadata of the schema, so the
+    index file of `DiskDatasetCache` is not needed. A cache hit maps the file into the memory, and only reads the
+    batches overlapping the time range (predicate pushdown) and the requested fields (column projection).
+    """
+
+    # the minimum number of rows of a record batch
+    BATCH_ROWS = 1 << 16
+
+    def get_cache_dir(self, freq: str = None) -> Path:
+        return DatasetCache.get_cache_dir(C.arrow_dataset_cache_dir_name, freq)
+
+    @staticmethod
+    def check_cache_exists(cache_path: Union[str, Path], suffix_list: Iterable = (".meta",)) -> bool:
+        return DiskDatasetCache.check_cache_exists(cache_path, suffix_list)
+
+    @classmethod
+    def read_data_from_cache(cls, cache_path: Union[str, Path], start_time, end_time, fields):
+        """read the features of `fields` between `start_time` and `end_time` from the cache
+
+        :param fields: The original fields, the columns of the cache are sorted cache fields.
+        :return: the features indexed by <instrument, datetime>.
+        """
+        with pa.memory_map(str(cache_path), "r") as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata
+            batch_start = np.frombuffer(metadata[b"batch_start"], dtype=np.int64)
+            batch_end = np.frombuffer(metadata[b"batch_end"], dtype=np.int64)
+            start = -np.inf if start_time is None else pd.Timestamp(start_time).value
+            end = np.inf if end_time is None else pd.Timestamp(end_time).value
+            cache_fields = [f for f in dict.fromkeys(remove_fields_space(fields)) if f in reader.schema.names]
+            columns = ["datetime", "instrument"] + cache_fields
+            batches = [
+                reader.get_batch(i).select(columns) for i in np.flatnonzero((batch_end >= start) & (batch_start <= end))
+            ]
+            if len(batches) == 0:
+                return pd.DataFrame(
+                    index=pd.MultiIndex.from_arrays([[], []], names=["instrument", "datetime"]), columns=fields
+                )
+            table = pa.Table.from_batches(batches)
+            datetime = table.column("datetime").to_numpy().view(np.int64)
+            lo, hi = datetime.searchsorted(start, side="left"), datetime.searchsorted(end, side="right")
+            table = table.slice(lo, hi - lo)
+            datetime = datetime[lo:hi]
+            instrument = table.column("instrument").combine_chunks()
+            # sort the rows by <instrument, datetime>
+            dt_codes, dt_levels = pd.factorize(datetime, sort=True)
+            inst_codes = instrument.indices.to_numpy(zero_copy_only=False)
+            order = np.lexsort((dt_codes, inst_codes))
+            index = pd.MultiIndex(
+                levels=[instrument.dictionary.to_pylist(), pd.DatetimeIndex(dt_levels.astype("datetime64[ns]"))],
+                codes=[inst_codes[order], dt_codes[order]],
+                names=["instrument", "datetime"],
+                verify_integrity=False,
+            ).remove_unused_levels()
+            df = pd.DataFrame(
+                {f: table.column(f).to_numpy()[order] for f in cache_fields}, index=index, columns=cache_fields
+            )
+        return cls.cache_to_origin_data(df, fields)
+
+    @staticmethod
+    def _to_table(cache_features: pd.DataFrame, instruments: list) -> pa.Table:
+        """convert the features indexed by <datetime, instrument> to a table, `instruments` is the dictionary"""
+        datetime = cache_features.index.get_level_values("datetime")
+        inst_codes = pd.Index(instruments).get_indexer(cache_features.index.get_level_values("instrument"))
+        return pa.table(
+            {
+                "datetime": pa.array(datetime.values.astype("datetime64[ns]")),
+                "instrument": pa.DictionaryArray.from_arrays(inst_codes.astype(np.int32), instruments),
+                # NOTE: the nan values are kept as values instead of nulls, so the columns can be read without a copy
+                **{f: pa.array(cache_features[f].values, from_pandas=False) for f in cache_features.columns},
+            }
+        )
+
+    def _split_batches(self, table: pa.Table) -> List[pa.RecordBatch]:
+        """split the rows into the batches of at least `BATCH_ROWS` rows at the datetime boundaries"""
+        dt_values = table.column("datetime").to_numpy().view(np.int64)
+        splits = [0]
+        for b in np.flatnonzero(np.diff(dt_values)) + 1:
+            if b - splits[-1] >= self.BATCH_ROWS:
+                splits.append(b)
+        splits.append(len(table))
+        return [
+            table.slice(begin, stop - begin).combine_chunks().to_batches()[0]
+            for begin, stop in zip(splits[:-1], splits[1:])
+            if stop > begin
+        ]
+
+    def _write_batches(self, cache_path: Path, batches: List[pa.RecordBatch], info: dict):
+        """write the batches to the data file and the meta file, the time ranges of the batches are in the schema"""
+        bounds = np.array(
+            [b.column("datetime").to_numpy().view(np.int64)[[0, -1]] for b in batches], dtype=np.int64
+        ).reshape(-1, 2)
+        metadata = {"batch_start": bounds[:, 0].tobytes(), "batch_end": bounds[:, 1].tobytes()}
+        with CacheUtils.atomic_path(cache_path) as data_path:
+            with pa.OSFile(str(data_path), "wb") as sink:
+                with pa.ipc.new_file(sink, batches[0].schema.with_metadata(metadata)) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+            data_path.chmod(stat.S_IRWXU | stat.S_IRGRP | stat.S_IROTH)
+            meta = {
+                "info": {**info, "fields": batches[0].schema.names[2:]},
+                "meta": {"last_visit": time.time(), "visits": 1},
+            }
+            CacheUtils.dump_meta(meta, cache_path.with_suffix(".meta"))
+
+    def write_cache(self, cache_path: Path, features: pd.DataFrame, info: dict):
+        cache_features = self.to_cache_features(features)
+        instruments = sorted(cache_features.index.get_level_values("instrument").unique())
+        self._write_batches(cache_path, self._split_batches(self._to_table(cache_features, instruments)), info)
+
+    def update(self, cache_uri, freq: str = "day"):
+        """
+        Update the cache to the latest calendar.
+
+        The batches before the recomputed tail are copied from the memory mapped data file without being converted,
+        the last small batch is merged with the new rows.
+        """
+        cp_cache_uri = self.get_cache_dir(freq).joinpath(cache_uri)
+        meta_path = cp_cache_uri.with_suffix(".meta")
+        if not self.check_cache_exists(cp_cache_uri):
+            self.logger.info(f"The cache {cp_cache_uri} has corrupted. It will be removed")
+            self.clear_cache(cp_cache_uri)
+            return 2
+
+        with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri(freq))}:dataset-{cache_uri}"):
+            with meta_path.open("rb") as f:
+                d = pickle.load(f)
+            info = d["info"]
+            self.logger.debug("Updating dataset: {}".format(d))
+            from .data import Cal, Inst, ExpressionD  # pylint: disable=C0415
+
+            if Inst.get_inst_type(info["instruments"]) == Inst.DICT:
+                self.logger.info(f"The file {cache_uri} has dict cache. Skip updating")
+                return 1
+
+            whole_calendar = Cal.calendar(start_time=None, end_time=None, freq=info["freq"])
+            # The calendar since last updated
+            new_calendar = Cal.calendar(start_time=info["last_update"], end_time=None, freq=info["freq"])
+            if len(new_calendar) <= 1:
+                # Including last updated calendar, we only get 1 item.
+                # No future updating is needed.
+                return 1
+            exprs = [ExpressionD.get_expression_instance(f) for f in info["fields"]]
+            if not all(is_window_stable(expr) for expr in exprs):
+                # the values of the recursive or expanding expressions depend on the whole history
+                self.gen_dataset_cache(
+                    cp_cache_uri,
+                    info["instruments"],
+                    info["fields"],
+                    info["freq"],
+                    inst_processors=info.get("inst_processors", []),
+                )
                 return 0
+            # The start index of new data
+            current_index = len(whole_calendar) - len(new_calendar) + 1
+            # the last periods using the future data are computed again
+            rght_etd = max(expr.get_extended_window_size()[1] for expr in exprs)
+            update_start = pd.Timestamp(whole_calendar[max(current_index - rght_etd, 0)])
+
+            data = self.provider.dataset(
+                info["instruments"],
+                info["fields"],
+                update_start,
+                new_calendar[-1],
+                info["freq"],
+                inst_processors=info.get("inst_processors", []),
+            )
+            if data.empty:
+                return 0  # No data to update cache
+            new_features = self.to_cache_features(data.swaplevel("instrument", "datetime").sort_index())
+
+            with pa.memory_map(str(cp_cache_uri), "r") as source:
+                reader = pa.ipc.open_file(source)
+                schema = reader.schema.remove_metadata()
+                batch_start = np.frombuffer(reader.schema.metadata[b"batch_start"], dtype=np.int64)
+                batch_end = np.frombuffer(reader.schema.metadata[b"batch_end"], dtype=np.int64)
+                keep = np.flatnonzero(batch_start < update_start.value)
+                old_instruments = (
+                    reader.get_batch(0).column("instrument").dictionary.to_pylist() if reader.num_record_batches else []
+                )
+                instruments = sorted(set(old_instruments) | set(new_features.index.get_level_values("instrument")))
+                remap = pa.array(pd.Index(instruments).get_indexer(old_instruments).astype(np.int32))
+                batches = []
+                for i in keep:
+                    batch = reader.get_batch(i)
+                    if batch_end[i] >= update_start.value:
+                        n_rows = batch.column("datetime").to_numpy().view(np.int64).searchsorted(update_start.value)
+                        batch = batch.slice(0, n_rows)
+                        if n_rows == 0:
+                            continue
+                    # the batches of an Arrow file share the dictionary of the instruments
+                    codes = pa.compute.take(remap, batch.column("instrument").indices)
+                    columns = batch.columns
+                    columns[1] = pa.DictionaryArray.from_arrays(codes, instruments)
+                    batches.append(pa.RecordBatch.from_arrays(columns, schema=schema))
+                table = self._to_table(new_features, instruments).cast(schema)
+                if batches and batches[-1].num_rows < self.BATCH_ROWS:
+                    table = pa.concat_tables([pa.Table.from_batches([batches.pop()]), table])
+                batches.extend(self._split_batches(table))
+                self._write_batches(cp_cache_uri, batches, {**info, "last_update": str(new_calendar[-1])})
+            return 0
 
 
 class SimpleDatasetCache(DatasetCache):
@@ -1,24 +1,127 @@
 """Calendar provider for crypto markets.
 
-This provider generates continuous timestamps for both daily and intraday
-frequencies using :func:`pandas.date_range`.  Unlike equity markets the
-crypto market trades 24/7, so weekends are not filtered out.
+The crypto market trades 24/7, so the calendar of any fixed frequency is a
+plain arithmetic sequence ``START + i * step``.  Instead of materializing
+millions of :class:`pandas.Timestamp` objects (about 14 million for
+``1min`` since 2000) the provider keeps a tiny :class:`CryptoCalendar`
+description per frequency and computes positions arithmetically.  Only the
+requested slice is materialized, as an int64 backed
+:class:`pandas.DatetimeIndex`.
+
+Frequencies without a fixed length (e.g. ``"M"``) fall back to
+:func:`pandas.date_range`.
 """
+
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
 
+from qlib.data.cache import H
 from qlib.data.data import CalendarProvider as BaseCalendarProvider
 
 
+class CryptoCalendar:
+    """Evenly spaced calendar described by ``(start, step, size)``.
+
+    Parameters
+    ----------
+    start : int
+        first timestamp of the calendar in nanoseconds since epoch.
+    step : int
+        distance between two consecutive timestamps in nanoseconds.
+    size : int
+        number of timestamps in the calendar.
+    """
+
+    def __init__(self, start: int, step: int, size: int):
+        self.start = int(start)
+        self.step = int(step)
+        self.size = max(int(size), 0)
+        self._values = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def first(self) -> pd.Timestamp:
+        return pd.Timestamp(self.start)
+
+    @property
+    def last(self) -> pd.Timestamp:
+        return pd.Timestamp(self.start + (self.size - 1) * self.step)
+
+    def timestamp(self, index: int) -> pd.Timestamp:
+        return pd.Timestamp(self.start + int(index) * self.step)
+
+    def search(self, time: Union[pd.Timestamp, str], side: str = "left") -> int:
+        """Arithmetic equivalent of :func:`numpy.searchsorted` on the calendar."""
+        offset = pd.Timestamp(time).value - self.start
+        if side == "left":
+            pos = -(-offset // self.step)
+        else:
+            pos = offset // self.step + 1
+        return int(min(max(pos, 0), self.size))
+
+    def slice(self, start_index: int, end_index: int) -> pd.DatetimeIndex:
+        """Materialize the timestamps in ``[start_index, end_index]``."""
+        start_index = max(int(start_index), 0)
+        end_index = min(int(end_index), self.size - 1)
+        if self._values is not None:
+            return self._values[start_index : end_index + 1]
+        values = np.arange(start_index, max(end_index + 1, start_index), dtype=np.int64)
+        values *= self.step
+        values += self.start
+        return pd.DatetimeIndex(values.view("M8[ns]"))
+
+    @property
+    def values(self) -> pd.DatetimeIndex:
+        """Full calendar, materialized once and kept for later slicing."""
+        if self._values is None:
+            self._values = self.slice(0, self.size - 1)
+        return self._values
+
+
 class CalendarProvider(BaseCalendarProvider):
     """Calendar provider for crypto data."""
 
     START = pd.Timestamp("2000-01-01")
 
-    def load_calendar(self, freq: str, future: bool) -> List[pd.Timestamp]:
+    @staticmethod
+    def _pandas_freq(freq: str) -> str:
+        return "D" if freq in ("day", "1d") else freq
+
+    @staticmethod
+    def _freq_step(pd_freq: str) -> Optional[int]:
+        """Length of ``pd_freq`` in nanoseconds or None if it is not fixed."""
+        try:
+            return int(to_offset(pd_freq).nanos)
+        except ValueError:
+            return None
+
+    def _end(self, future: bool) -> pd.Timestamp:
+        end = pd.Timestamp.today()
+        if future:
+            end += pd.Timedelta(days=365)
+        return end
+
+    def _get_crypto_calendar(self, freq: str, future: bool) -> Optional[CryptoCalendar]:
+        """Return the cached arithmetic calendar or None for irregular frequencies."""
+        flag = f"{freq}_future_{future}_arith"
+        if flag not in H["c"]:
+            step = self._freq_step(self._pandas_freq(freq))
+            if step is None:
+                H["c"][flag] = None
+            else:
+                start = self.START.value
+                size = (self._end(future).value - start) // step + 1
+                H["c"][flag] = CryptoCalendar(start, step, size)
+        return H["c"][flag]
+
+    def load_calendar(self, freq: str, future: bool) -> Union[pd.DatetimeIndex, List[pd.Timestamp]]:
         """Generate calendar timestamps.
 
         Parameters
@@ -27,15 +130,43 @@ class CalendarProvider(BaseCalendarProvider):
             Frequency string, e.g. ``"day"`` or ``"1min"``.
         future : bool
             If True, include future dates up to one year from today.
+
+        Returns
+        -------
+        The cached index of the arithmetic calendar for a fixed frequency; otherwise a list of ``pd.Timestamp`` as
+        expected by the base ``_get_calendar``.
         """
-        if freq in ("day", "1d"):
-            pd_freq = "D"
-        else:
-            pd_freq = freq
+        crypto_cal = self._get_crypto_calendar(freq, future)
+        if crypto_cal is not None:
+            return crypto_cal.values
+        return pd.date_range(start=self.START, end=self._end(future), freq=self._pandas_freq(freq)).to_list()
 
-        end = pd.Timestamp.today()
-        if future:
-            end += pd.Timedelta(days=365)
+    def calendar(self, start_time=None, end_time=None, freq="day", future=False):
+        crypto_cal = self._get_crypto_calendar(freq, future)
+        if crypto_cal is None:
+            return super().calendar(start_time, end_time, freq, future)
+        if start_time == "None":
+            start_time = None
+        if end_time == "None":
+            end_time = None
+        si = crypto_cal.search(start_time, "left") if start_time else 0
+        ei = crypto_cal.search(end_time, "right") - 1 if end_time else crypto_cal.size - 1
+        if si > ei:
+            return pd.DatetimeIndex([])
+        return crypto_cal.slice(si, ei)
 
-        calendar = pd.date_range(start=self.START, end=end, freq=pd_freq)
-        return calendar.to_list()
+    def locate_index(
+        self, start_time: Union[pd.Timestamp, str], end_time: Union[pd.Timestamp, str], freq: str, future: bool = False
+    ) -> Tuple[pd.Timestamp, pd.Timestamp, int, int]:
+        crypto_cal = self._get_crypto_calendar(freq, future)
+        if crypto_cal is None:
+            return super().locate_index(start_time, end_time, freq, future)
+        start_index = crypto_cal.search(start_time, "left")
+        if start_index >= crypto_cal.size:
+            raise IndexError(
+                "`start_time` uses a future date, if you want to get future trading days, you can use: `future=True`"
+            )
+        end_index = crypto_cal.search(end_time, "right") - 1
+        if end_index < 0:
+            raise IndexError("`end_time` is earlier than the first calendar timestamp")
+        return crypto_cal.timestamp(start_index), crypto_cal.timestamp(end_index), start_index, end_index
@@ -5,21 +5,25 @@
 from __future__ import division
 from __future__ import print_function
 
+import os
 import re
 import abc
 import copy
 import queue
 import bisect
+import tempfile
 import numpy as np
 import pandas as pd
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Tuple
 
 # For supporting multiprocessing in outer code, joblib is used
 from joblib import delayed
 
-from .cache import H
+from .cache import H, MemCacheOpenedUnit
 from ..config import C
 from .inst_processor import InstProcessor
+from .base import array_mode, expression_memo, series_to_array
+from .planner import ExpressionPlan
 
 from ..log import get_module_logger
 from .cache import DiskDatasetCache
@@ -30,13 +34,14 @@ from ..utils import (
     get_module_by_module_path,
     parse_field,
     hash_args,
+    remove_fields_space,
     normalize_cache_fields,
     code_to_fname,
     time_to_slc_point,
     read_period_data,
     get_period_list,
 )
-from ..utils.paral import ParallelExt
+from ..utils.paral import ParallelExt, get_worker_pool
 from .ops import Operators  # pylint: disable=W0611  # noqa: F401
 
 
@@ -334,6 +339,16 @@ class FeatureProvider(abc.ABC):
         """
         raise NotImplementedError("Subclass of FeatureProvider must implement `feature` method")
 
+    def feature_array(self, instrument, field, start_index, end_index, freq) -> Tuple[int, np.ndarray]:
+        """Get feature data as raw array, it is used by the array mode of the expression engine
+
+        Returns
+        -------
+        Tuple[int, np.ndarray]
+            the calendar index of the first value and the values.
+        """
+        return series_to_array(self.feature(instrument, field, start_index, end_index, freq), start_index)
+
 
 class PITProvider(abc.ABC):
     @abc.abstractmethod
@@ -442,6 +457,23 @@ class ExpressionProvider(abc.ABC):
         """
         raise NotImplementedError("Subclass of ExpressionProvider must implement `Expression` method")
 
+    def expressions(self, instrument, fields, start_time=None, end_time=None, freq="day") -> dict:
+        """Get the data of several expressions of an instrument.
+
+        Parameters
+        ----------
+        fields : list
+            fields of features.
+
+        Other parameters are the same as `expression`.
+
+        Returns
+        -------
+        dict
+            {field: data of the expression}
+        """
+        return {field: self.expression(instrument, field, start_time, end_time, freq) for field in fields}
+
 
 class DatasetProvider(abc.ABC):
     """Dataset provider class
@@ -555,6 +587,11 @@ class DatasetProvider(abc.ABC):
         # One process for one task, so that the memory will be freed quicker.
         workers = max(min(C.get_kernels(freq), len(instruments_d)), 1)
 
+        if C.get("dataset_handoff") == "memmap" and not inst_processors:
+            return DatasetProvider._memmap_dataset_processor(
+                instruments_d, column_names, normalize_column_names, start_time, end_time, freq, workers
+            )
+
         # create iterator
         if isinstance(instruments_d, dict):
             it = instruments_d.items()
@@ -574,7 +611,7 @@ class DatasetProvider(abc.ABC):
         data = dict(
             zip(
                 inst_l,
-                ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(task_l),
+                DatasetProvider._run_tasks(task_l, inst_l, workers, freq),
             )
         )
 
@@ -588,14 +625,143 @@ class DatasetProvider(abc.ABC):
             data = pd.concat(new_data, names=["instrument"], sort=False)
             data = DiskDatasetCache.cache_to_origin_data(data, column_names)
         else:
-            data = pd.DataFrame(
-                index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
-                columns=column_names,
-                dtype=np.float32,
-            )
+            data = DatasetProvider._empty_dataset(column_names)
 
         return data
 
+    @staticmethod
+    def _run_tasks(task_l, inst_l, workers, freq):
+        """
+        Run the tasks of the instruments and return their results in order.
+
+        The tasks go to the shared `WorkerPool` by instrument if `C.worker_pool` is enabled, so that the repeated
+        queries of an instrument hit the memory caches of its worker. Otherwise new workers are started by
+        `ParallelExt`.
+        """
+        kernels = C.get_kernels(freq)
+        if C.get("worker_pool", False) and kernels > 1:
+            return get_worker_pool(kernels)(task_l, keys=inst_l)
+        return ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(task_l)
+
+    @staticmethod
+    def _memmap_dataset_processor(
+        instruments_d, column_names, normalize_column_names, start_time, end_time, freq, workers
+    ):
+        """
+        `dataset_processor` with the results of the workers handed over in a memory mapped float32 block.
+
+        Every instrument owns the rows of its calendar range in a (rows, fields) block. The workers write their
+        results into the block and only return the positions of their rows, so the main process neither unpickles
+        nor concatenates the per-instrument frames: the dataset is a view of the block (or one gather of its
+        non-empty rows).
+        """
+        calendar = DatasetProvider._dataset_calendar(start_time, end_time, freq)
+        if isinstance(instruments_d, dict):
+            items = sorted(instruments_d.items())
+        else:
+            items = [(inst, None) for inst in sorted(instruments_d)]
+        # the range [lo, hi) of the calendar positions of every instrument
+        ranges = []
+        for _, spans in items:
+            if spans is None:
+                lo, hi = 0, len(calendar)
+            elif len(spans) == 0:
+                lo, hi = 0, 0
+            else:
+                lo = min(calendar.searchsorted(pd.Timestamp(begin), side="left") for begin, _ in spans)
+                hi = max(calendar.searchsorted(pd.Timestamp(end), side="right") for _, end in spans)
+            ranges.append((lo, max(lo, hi)))
+        offsets = np.cumsum([0] + [hi - lo for lo, hi in ranges])
+        # the columns of the block are already in the order of `column_names`
+        columns = [normalize_column_names.index(f) for f in remove_fields_space(column_names)]
+        shape = (int(offsets[-1]), len(columns))
+        if shape[0] == 0:
+            return DatasetProvider._empty_dataset(column_names)
+
+        fd, path = tempfile.mkstemp(prefix="qlib_dataset_", suffix=".f32")
+        os.close(fd)
+        block = None
+        try:
+            # NOTE: the rows not written by the workers are dropped, the block doesn't need to be initialized
+            block = np.memmap(path, dtype=np.float32, mode="w+", shape=shape)
+            task_l = [
+                delayed(DatasetProvider.inst_calculator_to_block)(
+                    path,
+                    shape,
+                    int(offset),
+                    lo,
+                    hi,
+                    columns,
+                    inst,
+                    start_time,
+                    end_time,
+                    freq,
+                    normalize_column_names,
+                    spans,
+                    C,
+                )
+                for (inst, spans), offset, (lo, hi) in zip(items, offsets, ranges)
+            ]
+            positions = DatasetProvider._run_tasks(task_l, [inst for inst, _ in items], workers, freq)
+            rows = np.concatenate([offset + pos for offset, pos in zip(offsets, positions)])
+            if len(rows) == 0:
+                return DatasetProvider._empty_dataset(column_names)
+            values = np.asarray(block) if len(rows) == shape[0] else block[rows]
+            if os.name == "nt":
+                # a mapped file can not be removed on Windows
+                values = np.array(values)
+        finally:
+            del block
+            os.remove(path)
+
+        inst_codes = np.repeat(np.arange(len(items)), [len(pos) for pos in positions])
+        time_codes = np.concatenate([lo + pos for (lo, _), pos in zip(ranges, positions)])
+        index = pd.MultiIndex(
+            levels=[[inst for inst, _ in items], calendar],
+            codes=[inst_codes, time_codes],
+            names=["instrument", "datetime"],
+            verify_integrity=False,
+        ).remove_unused_levels()
+        return pd.DataFrame(values, index=index, columns=[str(f) for f in column_names], copy=False)
+
+    @staticmethod
+    def _dataset_calendar(start_time, end_time, freq) -> pd.DatetimeIndex:
+        """the calendar of the dataset, cached in the calendar cache of the process"""
+        flag = f"{freq}_{start_time}_{end_time}_dataset_calendar"
+        if flag not in H["c"]:
+            H["c"][flag] = pd.DatetimeIndex(Cal.calendar(start_time, end_time, freq=freq))
+        return H["c"][flag]
+
+    @staticmethod
+    def _empty_dataset(column_names):
+        return pd.DataFrame(
+            index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
+            columns=column_names,
+            dtype=np.float32,
+        )
+
+    @staticmethod
+    def inst_calculator_to_block(
+        path, shape, offset, lo, hi, columns, inst, start_time, end_time, freq, column_names, spans=None, g_config=None
+    ):
+        """
+        Calculate the expressions for **one** instrument and write them into the rows `offset + (pos - lo)` of the
+        memory mapped block at `path`, `pos` being the positions of the results in the calendar of the dataset.
+        The column `i` of the block is the column `columns[i]` of the results.
+
+        return value: the positions of the written rows relative to `lo`.
+        """
+        data = DatasetProvider.inst_calculator(inst, start_time, end_time, freq, column_names, spans, g_config)
+        if data.empty:
+            return np.empty(0, dtype=np.int64)
+        pos = DatasetProvider._dataset_calendar(start_time, end_time, freq).searchsorted(data.index) - lo
+        if pos[0] < 0 or pos[-1] >= hi - lo:
+            raise ValueError(f"{inst}: the data is out of the calendar range of the instrument")
+        block = np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+        block[offset + pos] = data.iloc[:, columns].to_numpy(dtype=np.float32)
+        del block
+        return pos
+
     @staticmethod
     def inst_calculator(inst, start_time, end_time, freq, column_names, spans=None, g_config=None, inst_processors=[]):
         """
@@ -609,10 +775,8 @@ class DatasetProvider(abc.ABC):
         # NOTE: This place is compatible with windows, windows multi-process is spawn
         C.register_from_C(g_config)
 
-        obj = dict()
-        for field in column_names:
-            #  The client does not have expression provider, the data will be loaded from cache using static method.
-            obj[field] = ExpressionD.expression(inst, field, start_time, end_time, freq)
+        #  The client does not have expression provider, the data will be loaded from cache using static method.
+        obj = ExpressionD.expressions(inst, column_names, start_time, end_time, freq)
 
         data = pd.DataFrame(obj)
         if not data.empty and not np.issubdtype(data.index.dtype, np.dtype("M")):
@@ -733,12 +897,54 @@ class LocalFeatureProvider(FeatureProvider, ProviderBackendMixin):
         super().__init__()
         self.remote = remote
         self.backend = backend
+        # the storage objects are kept alive so that their memory maps are reused across the queries, the least
+        # recently used ones are closed beyond `C.mmap_cache_size` to bound the open files
+        self._storage_cache = MemCacheOpenedUnit(size_limit=C.get("mmap_cache_size", 256))
+
+    def _get_storage(self, instrument, field, freq):
+        key = (instrument, field, freq)
+        storage = self._storage_cache.get(key)
+        if storage is None:
+            storage = self._storage_cache[key] = self.backend_obj(instrument=instrument, field=field, freq=freq)
+        return storage
 
     def feature(self, instrument, field, start_index, end_index, freq):
         # validate
         field = str(field)[1:]
         instrument = code_to_fname(instrument)
-        return self.backend_obj(instrument=instrument, field=field, freq=freq)[start_index : end_index + 1]
+        return self._get_storage(instrument, field, freq)[start_index : end_index + 1]
+
+    def feature_array(self, instrument, field, start_index, end_index, freq):
+        field = str(field)[1:]
+        instrument = code_to_fname(instrument)
+        storage = self._get_storage(instrument, field, freq)
+        if not hasattr(storage, "read_array"):
+            return series_to_array(storage[start_index : end_index + 1], start_index)
+        si, values = storage.read_array(slice(start_index, end_index + 1))
+        return (start_index if si is None else si), values
+
+    def multi_feature(self, instrument, fields, start_index, end_index, freq) -> pd.DataFrame:
+        """Get several features of an instrument
+
+        The fields are read with a single access if the backend supports it (e.g. `FileMultiFieldFeatureStorage`),
+        otherwise they are read one by one.
+
+        Returns
+        -------
+        pd.DataFrame
+            columns are the fields (e.g. `$close`), index is the calendar index.
+        """
+        names = [str(f)[1:] for f in fields]
+        instrument = code_to_fname(instrument)
+        storage = self._get_storage(instrument, names[0], freq)
+        if hasattr(storage, "read_fields"):
+            df = storage.read_fields(names, slice(start_index, end_index + 1))
+        else:
+            df = pd.DataFrame(
+                {name: self._get_storage(instrument, name, freq)[start_index : end_index + 1] for name in names}
+            )
+        df.columns = [str(f) for f in fields]
+        return df
 
 
 class LocalPITProvider(PITProvider):
@@ -836,9 +1042,54 @@ class LocalExpressionProvider(ExpressionProvider):
     Provide expression data from local data source.
     """
 
-    def __init__(self, time2idx=True):
+    def __init__(self, time2idx=True, array_mode=False):
+        """
+        Parameters
+        ----------
+        time2idx : bool
+            query the expressions by calendar index.
+        array_mode : bool
+            evaluate the expressions on raw arrays instead of `pd.Series` (see :func:`qlib.data.base.array_mode`),
+            the result is wrapped into a `pd.Series` only once per field. It requires `time2idx`.
+        """
         super().__init__()
         self.time2idx = time2idx
+        self.array_mode = array_mode and time2idx
+        self.plan_cache = {}
+
+    def get_plan(self, fields) -> ExpressionPlan:
+        key = tuple(fields)
+        if key not in self.plan_cache:
+            self.plan_cache[key] = ExpressionPlan(fields, [self.get_expression_instance(f) for f in fields])
+        return self.plan_cache[key]
+
+    @staticmethod
+    def _format_series(series, start_index, end_index):
+        # Ensure that each column type is consistent
+        # FIXME:
+        # 1) The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
+        # 2) The precision should be configurable
+        try:
+            series = series.astype(np.float32)
+        except ValueError:
+            pass
+        except TypeError:
+            pass
+        if not series.empty:
+            series = series.loc[start_index:end_index]
+        return series
+
+    @staticmethod
+    def _format_array(start, values, start_index, end_index, name=None):
+        """the array counterpart of `_format_series`: slice, cast and wrap the values in one step"""
+        lft = min(max(start_index - start, 0), len(values))
+        rght = max(min(end_index - start + 1, len(values)), lft)
+        values = values[lft:rght]
+        try:
+            values = values.astype(np.float32)
+        except (ValueError, TypeError):
+            pass
+        return pd.Series(values, index=pd.RangeIndex(start + lft, start + rght), name=name, copy=False)
 
     def expression(self, instrument, field, start_time=None, end_time=None, freq="day"):
         expression = self.get_expression_instance(field)
@@ -855,7 +1106,19 @@ class LocalExpressionProvider(ExpressionProvider):
         else:
             start_index, end_index = query_start, query_end = start_time, end_time
 
+        return self._load_expression(
+            expression, instrument, field, query_start, query_end, start_index, end_index, start_time, end_time, freq
+        )
+
+    def _load_expression(
+        self, expression, instrument, field, query_start, query_end, start_index, end_index, start_time, end_time, freq
+    ):
+        """load `expression` on `[query_start, query_end]` and return its values in `[start_index, end_index]`"""
         try:
+            if self.array_mode:
+                with array_mode():
+                    start, values = expression.load_array(instrument, query_start, query_end, freq)
+                return self._format_array(start, values, start_index, end_index, name=str(expression))
             series = expression.load(instrument, query_start, query_end, freq)
         except Exception as e:
             get_module_logger("data").debug(
@@ -864,19 +1127,36 @@ class LocalExpressionProvider(ExpressionProvider):
                 f"error info: {str(e)}"
             )
             raise
-        # Ensure that each column type is consistent
-        # FIXME:
-        # 1) The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
-        # 2) The precision should be configurable
-        try:
-            series = series.astype(np.float32)
-        except ValueError:
-            pass
-        except TypeError:
-            pass
-        if not series.empty:
-            series = series.loc[start_index:end_index]
-        return series
+        return self._format_series(series, start_index, end_index)
+
+    def expressions(self, instrument, fields, start_time=None, end_time=None, freq="day"):
+        """Load the fields as one DAG, see :class:`~qlib.data.planner.ExpressionPlan`"""
+        if not self.time2idx:
+            return super().expressions(instrument, fields, start_time, end_time, freq)
+        plan = self.get_plan(fields)
+        start_time = time_to_slc_point(start_time)
+        end_time = time_to_slc_point(end_time)
+        _, _, start_index, end_index = Cal.locate_index(start_time, end_time, freq=freq, future=False)
+        query_start, query_end = plan.query_range(start_index, end_index)
+        res = {}
+        with expression_memo():
+            for field, expression, shared in plan:
+                if shared:
+                    res[field] = self._load_expression(
+                        expression,
+                        instrument,
+                        field,
+                        query_start,
+                        query_end,
+                        start_index,
+                        end_index,
+                        start_time,
+                        end_time,
+                        freq,
+                    )
+                else:
+                    res[field] = self.expression(instrument, field, start_time, end_time, freq)
+        return res
 
 
 class LocalDatasetProvider(DatasetProvider):
@@ -942,9 +1222,15 @@ class LocalDatasetProvider(DatasetProvider):
         end_time = cal[-1]
         workers = max(min(C.kernels, len(instruments_d)), 1)
 
-        ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(
-            delayed(LocalDatasetProvider.cache_walker)(inst, start_time, end_time, freq, column_names)
-            for inst in instruments_d
+        inst_l = list(instruments_d)
+        DatasetProvider._run_tasks(
+            [
+                delayed(LocalDatasetProvider.cache_walker)(inst, start_time, end_time, freq, column_names)
+                for inst in inst_l
+            ],
+            inst_l,
+            workers,
+            freq,
         )
 
     @staticmethod
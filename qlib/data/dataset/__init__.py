@@ -562,6 +562,55 @@ class TSDataSampler:
             assert self.fillna_type == "none"
         return indices
 
+    def _get_indices_batch(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        The batch version of `_get_indices`: the (sample, step) matrix of the series indices of self.data_arr
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            the rows in self.idx_df
+        cols : np.ndarray
+            the cols in self.idx_df
+
+        Returns
+        -------
+        np.ndarray:
+            The indices of data with the shape (len(rows), step_len), the missing ones are nan
+        """
+        steps = np.arange(1 - self.step_len, 1)
+        window_rows = rows[:, None] + steps
+        indices = self.idx_arr[np.maximum(window_rows, 0), cols[:, None]]
+        indices[window_rows < 0] = np.nan  # the steps before the first row
+
+        if self.fillna_type in ("ffill", "ffill+bfill"):
+            indices = self._ffill_rows(indices)
+            if self.fillna_type == "ffill+bfill":
+                indices = self._ffill_rows(indices[:, ::-1])[:, ::-1]
+        else:
+            assert self.fillna_type == "none"
+        return indices
+
+    @staticmethod
+    def _ffill_rows(arr: np.ndarray) -> np.ndarray:
+        """forward fill the rows of a 2D array like `np_ffill`"""
+        idx = np.where(np.isnan(arr), 0, np.arange(arr.shape[1]))
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        return np.take_along_axis(arr, idx, axis=1)
+
+    def _get_rows_cols(self, idx: Union[List, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """the batch version of `_get_row_col`"""
+        idx_arr = np.asarray(idx)
+        if idx_arr.ndim == 1 and np.issubdtype(idx_arr.dtype, np.integer):
+            out_of_range = (idx_arr < 0) | (idx_arr >= len(self.idx_map))
+            if out_of_range.any():
+                raise KeyError(f"{idx_arr[out_of_range][0]} is out of [0, {len(self.idx_map)})")
+            rows_cols = self.idx_map[idx_arr]
+        else:
+            # e.g. <datetime, instrument> pairs
+            rows_cols = np.array([self._get_row_col(i) for i in idx], dtype=int).reshape(-1, 2)
+        return rows_cols[:, 0].astype(int), rows_cols[:, 1].astype(int)
+
     def _get_row_col(self, idx) -> Tuple[int]:
         """
         get the col index and row index of a given sample index in self.idx_df
@@ -615,8 +664,8 @@ class TSDataSampler:
         # Multi-index type
         mtit = (list, np.ndarray)
         if isinstance(idx, mtit):
-            indices = [self._get_indices(*self._get_row_col(i)) for i in idx]
-            indices = np.concatenate(indices)
+            # the indices of all the samples are gathered at once
+            indices = self._get_indices_batch(*self._get_rows_cols(idx)).ravel()
         else:
             indices = self._get_indices(*self._get_row_col(idx))
 
@@ -0,0 +1,194 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Mergeable accumulators of column statistics.
+
+An accumulator is updated with the values of a chunk of rows (2D array, a column per statistic) and merged with the
+accumulators of the other chunks, so the statistics of a large data can be computed chunk by chunk in parallel
+without loading all the data at once. The nan values are ignored.
+"""
+
+import abc
+from functools import reduce
+from typing import Iterable, List
+
+import numpy as np
+
+
+class Accumulator(abc.ABC):
+    @abc.abstractmethod
+    def update(self, values: np.ndarray) -> "Accumulator":
+        """
+        accumulate the values of a chunk of rows
+
+        Parameters
+        ----------
+        values : np.ndarray
+            2D array with the shape (n_rows, n_columns)
+
+        Returns
+        -------
+        Accumulator:
+            self
+        """
+
+    @abc.abstractmethod
+    def merge(self, other: "Accumulator") -> "Accumulator":
+        """
+        merge the accumulator of other rows into this accumulator
+
+        Returns
+        -------
+        Accumulator:
+            self
+        """
+
+    @staticmethod
+    def merge_all(accumulators: Iterable["Accumulator"]) -> "Accumulator":
+        """merge the accumulators of the chunks"""
+        return reduce(lambda x, y: x.merge(y), accumulators)
+
+
+class MeanVarAccumulator(Accumulator):
+    """
+    Count, mean and variance (Welford), the chunks are merged by the parallel algorithm of Chan et al.
+
+    The statistics are accumulated in float64.
+    """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns)
+        self._mean = np.zeros(n_columns)
+        self._m2 = np.zeros(n_columns)  # the sum of the squared deviations from the mean
+
+    def _merge_stats(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray):
+        total = np.maximum(self.count + count, 1)
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + np.square(delta) * self.count * count / total
+        self.count += count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        count = np.sum(~np.isnan(values), axis=0)
+        mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+        self._merge_stats(count, mean, np.nansum(np.square(values - mean), axis=0))
+        return self
+
+    def merge(self, other):
+        self._merge_stats(other.count, other._mean, other._m2)
+        return self
+
+    @property
+    def mean(self) -> np.ndarray:
+        """the mean, nan if no value"""
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def var(self) -> np.ndarray:
+        """the population variance (ddof=0), nan if no value"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var)
+
+
+class MinMaxAccumulator(Accumulator):
+    """Min and max, nan if no value. They keep the dtype of the values."""
+
+    def __init__(self, n_columns: int):
+        self.min = np.full(n_columns, np.nan)
+        self.max = np.full(n_columns, np.nan)
+        self._empty = True
+
+    def _merge_stats(self, min_val: np.ndarray, max_val: np.ndarray):
+        # `fmin` and `fmax` ignore nan like `nanmin` and `nanmax`
+        if self._empty:
+            self.min, self.max = min_val, max_val
+        else:
+            self.min, self.max = np.fmin(self.min, min_val), np.fmax(self.max, max_val)
+        self._empty = False
+
+    def update(self, values):
+        if len(values) > 0:
+            self._merge_stats(np.fmin.reduce(values, axis=0), np.fmax.reduce(values, axis=0))
+        return self
+
+    def merge(self, other):
+        if not other._empty:
+            self._merge_stats(other.min, other.max)
+        return self
+
+
+class QuantileAccumulator(Accumulator):
+    """
+    Approximate quantiles by a t-digest per column.
+
+    The values are summarized by at most about `compression` centroids (mean and weight) of equal weights, i.e. the
+    t-digest with the uniform scale function, so the quantiles in the middle (e.g. the median) are as accurate as the
+    tails. The quantiles are exact if a column has no more than `compression` values.
+
+    Reference:
+        Dunning, T., & Ertl, O. (2019). Computing extremely accurate quantiles using t-digests.
+    """
+
+    def __init__(self, n_columns: int, compression: int = 1000):
+        self.compression = compression
+        self.means: List[np.ndarray] = [np.empty(0) for _ in range(n_columns)]
+        self.weights: List[np.ndarray] = [np.empty(0) for _ in range(n_columns)]
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        # the centroids starting in the same 1 / compression of the quantiles are merged
+        group = np.floor((np.cumsum(weights) - weights) / total * self.compression)
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        if len(starts) == len(means):
+            return means, weights
+        weights_c = np.add.reduceat(weights, starts)
+        return np.add.reduceat(means * weights, starts) / weights_c, weights_c
+
+    def _merge_centroids(self, j: int, means: np.ndarray, weights: np.ndarray):
+        if len(means) > 0:
+            self.means[j], self.weights[j] = self._compress(
+                np.concatenate([self.means[j], means]), np.concatenate([self.weights[j], weights])
+            )
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        for j in range(values.shape[1]):
+            column = values[:, j]
+            column = column[~np.isnan(column)]
+            self._merge_centroids(j, column, np.ones(len(column)))
+        return self
+
+    def merge(self, other):
+        for j in range(len(self.means)):
+            self._merge_centroids(j, other.means[j], other.weights[j])
+        return self
+
+    @staticmethod
+    def _centroid_quantile(means: np.ndarray, weights: np.ndarray, q: float) -> float:
+        """interpolate the quantile between the centroids located at the middle of their weights"""
+        if len(means) == 0:
+            return np.nan
+        return np.interp(q * weights.sum(), np.cumsum(weights) - weights / 2, means)
+
+    def quantile(self, q: float) -> np.ndarray:
+        """the quantile `q` of the columns (interpolated like `np.quantile(method="hazen")`), nan if no value"""
+        return np.array([self._centroid_quantile(m, w, q) for m, w in zip(self.means, self.weights)])
+
+    def median(self) -> np.ndarray:
+        return self.quantile(0.5)
+
+    def abs_deviation_median(self, center: np.ndarray) -> np.ndarray:
+        """the median of the absolute deviations from `center` (e.g. the MAD when `center` is the median)"""
+        res = []
+        for m, w, c in zip(self.means, self.weights, center):
+            deviations = np.abs(m - c)
+            order = np.argsort(deviations, kind="stable")
+            res.append(self._centroid_quantile(deviations[order], w[order], 0.5))
+        return np.array(res)
@@ -3,13 +3,18 @@
 
 # coding=utf-8
 from abc import abstractmethod
+import shutil
+import tempfile
 import warnings
+import weakref
+from pathlib import Path
 from typing import Callable, Union, Tuple, List, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 
 from qlib.typehint import Literal
-from ...log import get_module_logger, TimeInspector
+from ...log import get_module_logger, MemoryInspector, TimeInspector
 from ...utils import init_instance_by_config
 from ...utils.serial import Serializable
 from .utils import fetch_df_by_index, fetch_df_by_col
@@ -407,6 +412,11 @@ class DataHandlerLP(DataHandler):
     - To reduce the memory cost
 
         - `drop_raw=True`: this will modify the data inplace on raw data;
+        - only the columns written inplace by the processors are copied (please refer to `Processor.writes`), so the
+          processors should declare the columns they write; the peak memory of processing the data is logged, it is
+          exact when `tracemalloc` is tracing (e.g. `PYTHONTRACEMALLOC=1`);
+        - `chunk_freq`: the data is loaded and processed chunk by chunk and stored on disk, so only a chunk of data
+          is in memory at once (please refer to `ChunkedDFStorage`);
 
     - Please note processed data like `self._infer` or `self._learn` are concepts different from `segments` in Qlib's `Dataset` like "train" and "test"
 
@@ -445,6 +455,9 @@ class DataHandlerLP(DataHandler):
         shared_processors: List = [],
         process_type=PTYPE_A,
         drop_raw=False,
+        chunk_freq: Optional[str] = None,
+        chunk_dir: Union[str, Path, None] = None,
+        chunk_n_jobs: int = 1,
         **kwargs,
     ):
         """
@@ -488,6 +501,18 @@ class DataHandlerLP(DataHandler):
               - (e.g. self._infer processed by learn_processors )
         drop_raw: bool
             Whether to drop the raw data
+        chunk_freq: Optional[str]
+            The frequency of the time chunks (e.g. "MS", "90D") to load and process the data chunk by chunk.
+
+            - The data is stored in a `ChunkedDFStorage` per data key instead of a pd.DataFrame, and fetched lazily
+            - The processors are fitted with `Processor.fit_chunks` on the chunks
+            - The features depending on the whole history (e.g. EMA) may be different at the start of the chunks
+
+            If None, all the data is loaded at once.
+        chunk_dir: Union[str, Path, None]
+            The directory to store the chunks, a temporary directory removed with the handler if None.
+        chunk_n_jobs: int
+            The number of the jobs to fit the processors on the chunks in parallel (`Processor.fit_chunks`).
         """
 
         # Setup preprocessor
@@ -506,6 +531,9 @@ class DataHandlerLP(DataHandler):
 
         self.process_type = process_type
         self.drop_raw = drop_raw
+        self.chunk_freq = chunk_freq
+        self.chunk_dir = chunk_dir
+        self.chunk_n_jobs = chunk_n_jobs
         super().__init__(instruments, start_time, end_time, data_loader, **kwargs)
 
     def get_all_processors(self):
@@ -517,7 +545,10 @@ class DataHandlerLP(DataHandler):
         """
         for proc in self.get_all_processors():
             with TimeInspector.logt(f"{proc.__class__.__name__}"):
-                proc.fit(self._data)
+                if self._is_chunked():
+                    proc.fit_chunks(self._data, n_jobs=getattr(self, "chunk_n_jobs", 1))
+                else:
+                    proc.fit(self._data)
 
     def fit_process_data(self):
         """
@@ -529,17 +560,135 @@ class DataHandlerLP(DataHandler):
 
     @staticmethod
     def _run_proc_l(
-        df: pd.DataFrame, proc_l: List[processor_module.Processor], with_fit: bool, check_for_infer: bool
+        df: pd.DataFrame,
+        proc_l: List[processor_module.Processor],
+        with_fit: bool,
+        check_for_infer: bool,
+        inplace: bool = False,
     ) -> pd.DataFrame:
+        """
+        Run the processors on ``df``. The data of ``df`` is not modified unless ``inplace``.
+
+        Before each processor which is not readonly, ``df`` is forked into a frame sharing the data of ``df`` but the
+        columns the processor writes in place (``Processor.writes``). So only the columns changed by the processors
+        are copied, and only once.
+        """
+        src, src_bases = df, None
         for proc in proc_l:
             if check_for_infer and not proc.is_for_infer():
                 raise TypeError("Only processors usable for inference can be used in `infer_processors` ")
             with TimeInspector.logt(f"{proc.__class__.__name__}"):
                 if with_fit:
                     proc.fit(df)
+                if not inplace and not proc.readonly() and isinstance(df, pd.DataFrame):
+                    if src_bases is None:
+                        src_bases = DataHandlerLP._data_bases(src)
+                    df = DataHandlerLP._fork(df, src, src_bases, proc.writes(df))
                 df = proc(df)
         return df
 
+    @staticmethod
+    def _data_base(values):
+        """the object owning the memory of ``values``"""
+        while isinstance(values, np.ndarray) and values.base is not None:
+            values = values.base
+        return values
+
+    @staticmethod
+    def _data_bases(df: pd.DataFrame) -> set:
+        """the ids of the objects owning the memory of the columns of ``df``"""
+        return {id(DataHandlerLP._data_base(col.to_numpy(copy=False))) for _, col in df.items()}
+
+    @staticmethod
+    def _fork(df: pd.DataFrame, src: pd.DataFrame, src_bases: set, cols: Optional[pd.Index]) -> pd.DataFrame:
+        """
+        Make sure the columns ``cols`` of ``df`` can be written in place without modifying ``src``.
+
+        ``df`` is shallow copied if it is ``src``, and the columns of ``cols`` sharing their data with ``src`` are
+        copied. All the columns are copied if ``cols`` is None.
+        """
+        if df is src:
+            df = df.copy(deep=False)
+        shared = []
+        for i in range(df.shape[1]) if cols is None else df.columns.get_indexer_for(cols):
+            col = df.iloc[:, i]
+            # the extension arrays are always copied
+            if (
+                not isinstance(col.dtype, np.dtype)
+                or id(DataHandlerLP._data_base(col.to_numpy(copy=False))) in src_bases
+            ):
+                shared.append(i)
+        if cols is None and len(shared) > 0:
+            return df.copy()
+        for i in shared:
+            df.isetitem(i, df.iloc[:, i])  # the data of a Series is copied when it is set
+        return df
+
+    def _is_chunked(self) -> bool:
+        return getattr(self, "chunk_freq", None) is not None
+
+    def _get_chunk_storage(self, name: str):
+        """create an empty chunk storage named ``name`` in the chunk directory"""
+        from .storage import ChunkedDFStorage  # pylint: disable=C0415
+
+        if getattr(self, "_chunk_root", None) is None:
+            if getattr(self, "chunk_dir", None) is None:
+                self._chunk_root = Path(tempfile.mkdtemp(prefix="qlib_handler_"))
+                weakref.finalize(self, shutil.rmtree, str(self._chunk_root), True)
+            else:
+                self._chunk_root = Path(self.chunk_dir)
+        return ChunkedDFStorage(self._chunk_root.joinpath(name))
+
+    def _load_chunks(self):
+        """load the raw data chunk by chunk into a chunk storage"""
+        if self.start_time is None or self.end_time is None:
+            raise ValueError("start_time and end_time are required to load the data in chunks")
+        start_time, end_time = pd.Timestamp(self.start_time), pd.Timestamp(self.end_time)
+        edges = [start_time] + [t for t in pd.date_range(start_time, end_time, freq=self.chunk_freq) if t > start_time]
+        storage = self._get_chunk_storage("raw")
+        for i, chunk_start in enumerate(edges):
+            chunk_end = edges[i + 1] - pd.Timedelta(1, unit="ns") if i + 1 < len(edges) else end_time
+            storage.append(lazy_sort_index(self.data_loader.load(self.instruments, chunk_start, chunk_end)))
+        return storage
+
+    @staticmethod
+    def _needs_fit(proc: processor_module.Processor) -> bool:
+        return type(proc).fit is not processor_module.Processor.fit
+
+    def _process_chunks(
+        self, src, proc_l: List[processor_module.Processor], with_fit: bool, check_for_infer: bool, name: str
+    ):
+        """
+        Run the processors on the chunk storage ``src`` chunk by chunk, the result is stored in a new chunk storage.
+
+        The processors are split into segments before each processor to fit, which is fitted on the output of the
+        previous segment by ``Processor.fit_chunks``. The intermediate storages are removed.
+        """
+        if len(proc_l) == 0:
+            return src
+        bounds = [0]
+        if with_fit:
+            bounds += [i for i, proc in enumerate(proc_l) if i > 0 and self._needs_fit(proc)]
+        bounds.append(len(proc_l))
+        storage = src
+        for k in range(len(bounds) - 1):
+            seg = proc_l[bounds[k] : bounds[k + 1]]
+            if with_fit and self._needs_fit(seg[0]):
+                with TimeInspector.logt(f"{seg[0].__class__.__name__} fit"):
+                    seg[0].fit_chunks(storage, n_jobs=getattr(self, "chunk_n_jobs", 1))
+            out = self._get_chunk_storage(f"{name}_{k}")
+            for i in range(len(storage)):
+                # the chunks are read into frames of their own, so they are processed inplace
+                out.append(
+                    self._run_proc_l(
+                        storage.read(i), seg, with_fit=False, check_for_infer=check_for_infer, inplace=True
+                    )
+                )
+            if storage is not src:
+                storage.clear()
+            storage = out
+        return storage
+
     @staticmethod
     def _is_proc_readonly(proc_l: List[processor_module.Processor]):
         """
@@ -575,41 +724,53 @@ class DataHandlerLP(DataHandler):
         with_fit : bool
             The input of the `fit` will be the output of the previous processor
         """
-        # shared data processors
-        # 1) assign
-        _shared_df = self._data
-        if not self._is_proc_readonly(self.shared_processors):  # avoid modifying the original data
-            _shared_df = _shared_df.copy()
-        # 2) process
-        _shared_df = self._run_proc_l(_shared_df, self.shared_processors, with_fit=with_fit, check_for_infer=True)
-
-        # data for inference
-        # 1) assign
-        _infer_df = _shared_df
-        if not self._is_proc_readonly(self.infer_processors):  # avoid modifying the original data
-            _infer_df = _infer_df.copy()
-        # 2) process
-        _infer_df = self._run_proc_l(_infer_df, self.infer_processors, with_fit=with_fit, check_for_infer=True)
-
-        self._infer = _infer_df
-
-        # data for learning
-        # 1) assign
+        if self._is_chunked():
+            self._process_data_chunks(with_fit=with_fit)
+            return
+        with MemoryInspector.logm("process data"):
+            # shared data processors
+            # the columns written by the processors are copied to avoid modifying the original data, even if the raw
+            # data is dropped: it may be shared with the data loader (e.g. the frame given to `StaticDataLoader`)
+            _shared_df = self._run_proc_l(self._data, self.shared_processors, with_fit=with_fit, check_for_infer=True)
+
+            # data for inference
+            _infer_df = self._run_proc_l(_shared_df, self.infer_processors, with_fit=with_fit, check_for_infer=True)
+
+            self._infer = _infer_df
+
+            # data for learning
+            # 1) assign
+            if self.process_type == DataHandlerLP.PTYPE_I:
+                _learn_df = _shared_df
+            elif self.process_type == DataHandlerLP.PTYPE_A:
+                # based on `infer_df` and append the processor
+                _learn_df = _infer_df
+            else:
+                raise NotImplementedError(f"This type of input is not supported")
+            # 2) process
+            _learn_df = self._run_proc_l(_learn_df, self.learn_processors, with_fit=with_fit, check_for_infer=False)
+
+            self._learn = _learn_df
+
+            if self.drop_raw:
+                del self._data
+
+    def _process_data_chunks(self, with_fit: bool = False):
+        """the same as `process_data`, but the data is stored in chunks"""
+        _shared = self._process_chunks(self._data, self.shared_processors, with_fit, True, "shared")
+        self._infer = self._process_chunks(_shared, self.infer_processors, with_fit, True, "infer")
         if self.process_type == DataHandlerLP.PTYPE_I:
-            _learn_df = _shared_df
+            _learn = _shared
         elif self.process_type == DataHandlerLP.PTYPE_A:
-            # based on `infer_df` and append the processor
-            _learn_df = _infer_df
+            _learn = self._infer
         else:
             raise NotImplementedError(f"This type of input is not supported")
-        if not self._is_proc_readonly(self.learn_processors):  # avoid modifying the original  data
-            _learn_df = _learn_df.copy()
-        # 2) process
-        _learn_df = self._run_proc_l(_learn_df, self.learn_processors, with_fit=with_fit, check_for_infer=False)
-
-        self._learn = _learn_df
-
+        self._learn = self._process_chunks(_learn, self.learn_processors, with_fit, False, "learn")
+        if _shared is not self._data and _shared is not self._infer and _shared is not self._learn:
+            _shared.clear()
         if self.drop_raw:
+            if self._data is not self._infer and self._data is not self._learn:
+                self._data.clear()
             del self._data
 
     def config(self, processor_kwargs: dict = None, **kwargs):
@@ -648,7 +809,11 @@ class DataHandlerLP(DataHandler):
                 when we call `init` next time
         """
         # init raw data
-        super().setup_data(**kwargs)
+        if self._is_chunked():
+            with TimeInspector.logt("Loading data"):
+                self._data = self._load_chunks()
+        else:
+            super().setup_data(**kwargs)
 
         with TimeInspector.logt("fit & process data"):
             if init_type == DataHandlerLP.IT_FIT_IND:
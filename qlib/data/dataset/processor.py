@@ -2,18 +2,25 @@
 # Licensed under the MIT License.
 
 import abc
-from typing import Union, Text, Optional
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Union, Text, Optional
 import numpy as np
 import pandas as pd
+from joblib import delayed
 
 from qlib.utils.data import robust_zscore, zscore
 from ...constant import EPS
 from .utils import fetch_df_by_index
 from ...utils.serial import Serializable
-from ...utils.paral import datetime_groupby_apply
+from ...utils.paral import ParallelExt, datetime_groupby_apply
+from ...config import C
+from .accumulator import Accumulator, MeanVarAccumulator, MinMaxAccumulator, QuantileAccumulator
 from qlib.data.inst_processor import InstProcessor
 from qlib.data import D
 
+if TYPE_CHECKING:
+    from .storage import ChunkedDFStorage
+
 
 def get_group_columns(df: pd.DataFrame, group: Union[Text, None]):
     """
@@ -32,6 +39,115 @@ def get_group_columns(df: pd.DataFrame, group: Union[Text, None]):
         return df.columns[df.columns.get_loc(group)]
 
 
+def cs_apply(df: pd.DataFrame, cols, func: Callable[[pd.DataFrame], pd.DataFrame]) -> np.ndarray:
+    """
+    Apply ``func`` to the cross section of every datetime of ``df[cols]``.
+
+    It gives the same values as ``df[cols].groupby("datetime", group_keys=False).apply(func)`` without calling
+    ``func`` once per datetime: the cross sections with the same number of rows are stacked side by side into one
+    dense (rows, cross sections * columns) frame and ``func`` is called once per size of cross section.
+    On a balanced panel, e.g. 24/7 crypto data, that is a single call on the dense (instrument, datetime * feature)
+    array. The reductions of ``func`` run column by column over the same values in the same order as in the
+    group of ``groupby``, so the results are bit-identical.
+
+    Returns
+    -------
+    np.ndarray
+        the (len(df), len(cols)) results in the order of the rows of ``df``.
+    """
+    values = get_group_values(df, cols)
+    n_cols = values.shape[1]
+    codes, _ = pd.factorize(df.index.get_level_values("datetime"), sort=True)
+    # the rows of each datetime keep their order as in the groups of groupby
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes)
+    starts = np.cumsum(sizes) - sizes
+    res = None
+    for size in np.unique(sizes):
+        groups = np.flatnonzero(sizes == size)
+        rows = order[starts[groups][:, None] + np.arange(size)]
+        # one contiguous column of `size` values per (datetime, column) like the block of a group
+        block = np.ascontiguousarray(values[rows].transpose(0, 2, 1).reshape(-1, size))
+        # numexpr is only used by pandas on large frames and it computes float32 in float64
+        with pd.option_context("compute.use_numexpr", False):
+            out = np.asarray(func(pd.DataFrame(block.T)))
+        if res is None:
+            res = np.empty(values.shape, dtype=out.dtype)
+        res[rows] = out.T.reshape(len(groups), n_cols, size).transpose(0, 2, 1)
+    return values.copy() if res is None else res
+
+
+def get_group_values(df: pd.DataFrame, cols) -> np.ndarray:
+    """
+    Get a copy of ``df[cols].values``.
+
+    ``df[cols].values`` copies the data twice when the columns are held by many blocks (e.g. the columns copied by
+    the Handler before a processor writes them), the data is only copied once here.
+    """
+    locs = df.columns.get_indexer_for(cols)
+    dtypes = set(df.dtypes.iloc[locs])
+    if len(dtypes) != 1 or not isinstance(next(iter(dtypes)), np.dtype):
+        return df[cols].values
+    values = np.empty((len(df), len(locs)), dtype=dtypes.pop(), order="F")
+    # `items` is much faster than `iloc` to get the columns
+    columns = [col for _, col in df.items()]
+    for j, i in enumerate(locs):
+        values[:, j] = columns[i].to_numpy(copy=False)
+    return values
+
+
+def set_group_values(df: pd.DataFrame, cols, values: Union[np.ndarray, pd.DataFrame]):
+    """
+    Set the values of the columns ``cols`` of ``df``.
+
+    The values are written into the data of the columns in place when all the columns have the dtype of ``values``,
+    so ``cols`` must be in the ``Processor.writes`` of the caller. Else the columns are replaced like
+    ``df[cols] = values``, which copies ``values`` and may change the dtypes of the columns.
+    """
+    array = np.asarray(values)
+    if (df.dtypes[cols] == array.dtype).all():
+        df.loc(axis=1)[cols] = array
+    else:
+        df[cols] = values
+
+
+def _accumulate_chunk(chunks: "ChunkedDFStorage", i: int, cols, selector, make_acc) -> Accumulator:
+    df = fetch_df_by_index(chunks.read(i, cols), selector, level="datetime")
+    acc = make_acc(len(cols))
+    if len(df) > 0:
+        acc.update(get_group_values(df, cols))
+    return acc
+
+
+def accumulate_chunks(
+    chunks: "ChunkedDFStorage", cols, selector, make_acc: Callable[[int], Accumulator], n_jobs: int = 1
+) -> Accumulator:
+    """
+    Accumulate the values of the columns ``cols`` in the rows of ``selector`` (on the datetime level) of ``chunks``.
+
+    An accumulator made by ``make_acc(len(cols))`` is updated per chunk, in parallel if ``n_jobs != 1``, and they are
+    merged in the order of the chunks.
+    """
+    chunk_ids = chunks.select_chunks(selector)
+    if len(chunk_ids) == 0:
+        return make_acc(len(cols))
+    if n_jobs != 1 and len(chunk_ids) > 1:
+        accs = ParallelExt(n_jobs=n_jobs, backend=C.joblib_backend)(
+            delayed(_accumulate_chunk)(chunks, i, cols, selector, make_acc) for i in chunk_ids
+        )
+    else:
+        accs = (_accumulate_chunk(chunks, i, cols, selector, make_acc) for i in chunk_ids)
+    return Accumulator.merge_all(accs)
+
+
+def get_chunks_dtype(chunks: "ChunkedDFStorage", cols) -> np.dtype:
+    """the float dtype of the statistics of the columns ``cols``, the dtype of the columns if they are all floats"""
+    dtypes = set(chunks.dtypes[chunks.columns.get_indexer_for(cols)])
+    if len(dtypes) == 1 and np.issubdtype(next(iter(dtypes)), np.floating):
+        return dtypes.pop()
+    return np.dtype(np.float64)
+
+
 class Processor(Serializable):
     def fit(self, df: pd.DataFrame = None):
         """
@@ -45,6 +161,22 @@ class Processor(Serializable):
 
         """
 
+    def fit_chunks(self, chunks: "ChunkedDFStorage", n_jobs: int = 1):
+        """
+        learn data processing parameters from the data stored in chunks (please refer to `ChunkedDFStorage`)
+
+        The processors with a fitting state should override it to fit chunk by chunk (e.g. with the accumulators of
+        `accumulate_chunks`), the default implementation loads all the chunks into memory and calls `fit`.
+
+        Parameters
+        ----------
+        chunks : ChunkedDFStorage
+            The data of the handler or the result from previous processor, stored in chunks.
+        n_jobs : int
+            The number of the jobs to process the chunks in parallel.
+        """
+        self.fit(chunks.fetch())
+
     @abc.abstractmethod
     def __call__(self, df: pd.DataFrame):
         """
@@ -79,6 +211,26 @@ class Processor(Serializable):
         """
         return False
 
+    def writes(self, df: pd.DataFrame) -> Optional[pd.Index]:
+        """
+        The columns of ``df`` whose data the processor writes in place when processing ``df``.
+
+        It is the contract between the processor and the Handler when the processor is not ``readonly``:
+
+        - the processor may replace, add or drop the columns of ``df`` (e.g. ``df[cols] = values``), the Handler
+          gives it a frame of its own.
+        - the processor may write the data of the returned columns in place (e.g. ``df.loc[:, cols] = values`` or
+          ``fillna(inplace=True)``), the Handler copies the data of these columns before if it is shared with the
+          data kept by the Handler.
+        - ``None`` means any column may be written in place, the whole ``df`` is copied before.
+
+        Returns
+        -------
+        Optional[pd.Index]:
+            the columns written in place, or None if they are unknown.
+        """
+        return df.columns[:0] if self.readonly() else None
+
     def config(self, **kwargs):
         attr_list = {"fit_start_time", "fit_end_time"}
         for k, v in kwargs.items():
@@ -157,6 +309,9 @@ class TanhProcess(Processor):
 
         return tanh_denoise(df)
 
+    def writes(self, df):
+        return df.columns[:0]
+
 
 class ProcessInf(Processor):
     """Process infinity"""
@@ -175,6 +330,9 @@ class ProcessInf(Processor):
 
         return replace_inf(df)
 
+    def writes(self, df):
+        return df.columns[:0]
+
 
 class Fillna(Processor):
     """Process NaN"""
@@ -189,9 +347,23 @@ class Fillna(Processor):
         else:
             # this implementation is extremely slow
             # df.fillna({col: self.fill_value for col in cols}, inplace=True)
-            df[self.fields_group] = df[self.fields_group].fillna(self.fill_value)
+            cols = get_group_columns(df, self.fields_group)
+            values = get_group_values(df, cols)
+            if (
+                (df.dtypes[cols] == values.dtype).all()
+                and values.dtype.kind == "f"
+                and np.can_cast(np.min_scalar_type(self.fill_value), values.dtype)
+            ):
+                # fill the copy instead of allocating the filled values
+                np.copyto(values, self.fill_value, where=np.isnan(values))
+                df.loc(axis=1)[cols] = values
+            else:
+                df[cols] = df[cols].fillna(self.fill_value)
         return df
 
+    def writes(self, df):
+        return get_group_columns(df, self.fields_group)
+
 
 class MinMaxNorm(Processor):
     def __init__(self, fit_start_time, fit_end_time, fields_group=None):
@@ -204,8 +376,16 @@ class MinMaxNorm(Processor):
     def fit(self, df: pd.DataFrame = None):
         df = fetch_df_by_index(df, slice(self.fit_start_time, self.fit_end_time), level="datetime")
         cols = get_group_columns(df, self.fields_group)
-        self.min_val = np.nanmin(df[cols].values, axis=0)
-        self.max_val = np.nanmax(df[cols].values, axis=0)
+        self._set_state(cols, np.nanmin(df[cols].values, axis=0), np.nanmax(df[cols].values, axis=0))
+
+    def fit_chunks(self, chunks, n_jobs=1):
+        cols = get_group_columns(chunks.head(0), self.fields_group)
+        acc = accumulate_chunks(chunks, cols, slice(self.fit_start_time, self.fit_end_time), MinMaxAccumulator, n_jobs)
+        self._set_state(cols, acc.min, acc.max)
+
+    def _set_state(self, cols, min_val, max_val):
+        self.min_val = min_val
+        self.max_val = max_val
         self.ignore = self.min_val == self.max_val
         # To improve the speed, we set the value of `min_val` to `0` for the columns that do not need to be processed,
         # and the value of `max_val` to `1`, when using `(x - min_val) / (max_val - min_val)` for uniform calculation,
@@ -221,9 +401,12 @@ class MinMaxNorm(Processor):
         def normalize(x, min_val=self.min_val, max_val=self.max_val):
             return (x - min_val) / (max_val - min_val)
 
-        df.loc(axis=1)[self.cols] = normalize(df[self.cols].values)
+        df.loc(axis=1)[self.cols] = normalize(get_group_values(df, self.cols))
         return df
 
+    def writes(self, df):
+        return self.cols
+
 
 class ZScoreNorm(Processor):
     """ZScore Normalization"""
@@ -238,8 +421,17 @@ class ZScoreNorm(Processor):
     def fit(self, df: pd.DataFrame = None):
         df = fetch_df_by_index(df, slice(self.fit_start_time, self.fit_end_time), level="datetime")
         cols = get_group_columns(df, self.fields_group)
-        self.mean_train = np.nanmean(df[cols].values, axis=0)
-        self.std_train = np.nanstd(df[cols].values, axis=0)
+        self._set_state(cols, np.nanmean(df[cols].values, axis=0), np.nanstd(df[cols].values, axis=0))
+
+    def fit_chunks(self, chunks, n_jobs=1):
+        cols = get_group_columns(chunks.head(0), self.fields_group)
+        acc = accumulate_chunks(chunks, cols, slice(self.fit_start_time, self.fit_end_time), MeanVarAccumulator, n_jobs)
+        dtype = get_chunks_dtype(chunks, cols)
+        self._set_state(cols, acc.mean.astype(dtype), acc.std.astype(dtype))
+
+    def _set_state(self, cols, mean_train, std_train):
+        self.mean_train = mean_train
+        self.std_train = std_train
         self.ignore = self.std_train == 0
         # To improve the speed, we set the value of `std_train` to `1` for the columns that do not need to be processed,
         # and the value of `mean_train` to `0`, when using `(x - mean_train) / std_train` for uniform calculation,
@@ -255,9 +447,12 @@ class ZScoreNorm(Processor):
         def normalize(x, mean_train=self.mean_train, std_train=self.std_train):
             return (x - mean_train) / std_train
 
-        df.loc(axis=1)[self.cols] = normalize(df[self.cols].values)
+        df.loc(axis=1)[self.cols] = normalize(get_group_values(df, self.cols))
         return df
 
+    def writes(self, df):
+        return self.cols
+
 
 class RobustZScoreNorm(Processor):
     """Robust ZScore Normalization
@@ -268,34 +463,84 @@ class RobustZScoreNorm(Processor):
 
     Reference:
         https://en.wikipedia.org/wiki/Median_absolute_deviation.
+
+    The medians fitted by `fit_chunks` are exact by default. They are approximated by a quantile sketch
+    (`QuantileAccumulator`) in one pass over the chunks if `sketch_compression` is given.
     """
 
-    def __init__(self, fit_start_time, fit_end_time, fields_group=None, clip_outlier=True):
+    # the max size of the values loaded at once by `fit_chunks`, the medians are computed for a batch of columns at once
+    FIT_CHUNK_BYTES = 1 << 30
+
+    def __init__(
+        self,
+        fit_start_time,
+        fit_end_time,
+        fields_group=None,
+        clip_outlier=True,
+        sketch_compression: Optional[int] = None,
+    ):
         # NOTE: correctly set the `fit_start_time` and `fit_end_time` is very important !!!
         # `fit_end_time` **must not** include any information from the test data!!!
         self.fit_start_time = fit_start_time
         self.fit_end_time = fit_end_time
         self.fields_group = fields_group
         self.clip_outlier = clip_outlier
+        self.sketch_compression = sketch_compression
 
     def fit(self, df: pd.DataFrame = None):
         df = fetch_df_by_index(df, slice(self.fit_start_time, self.fit_end_time), level="datetime")
         self.cols = get_group_columns(df, self.fields_group)
-        X = df[self.cols].values
+        self._fit_values(get_group_values(df, self.cols))
+
+    def fit_chunks(self, chunks, n_jobs=1):
+        self.cols = get_group_columns(chunks.head(0), self.fields_group)
+        if getattr(self, "sketch_compression", None) is not None:
+            acc = accumulate_chunks(
+                chunks,
+                self.cols,
+                slice(self.fit_start_time, self.fit_end_time),
+                partial(QuantileAccumulator, compression=self.sketch_compression),
+                n_jobs,
+            )
+            dtype = get_chunks_dtype(chunks, self.cols)
+            self.mean_train = acc.median()
+            self.std_train = (acc.abs_deviation_median(self.mean_train) + EPS) * 1.4826
+            self.mean_train, self.std_train = self.mean_train.astype(dtype), self.std_train.astype(dtype)
+            return
+        # the medians are exact, all the values of the fitting range of a batch of columns are loaded at once
+        batch_size = max(1, self.FIT_CHUNK_BYTES // (max(chunks.n_rows, 1) * 8))
+        mean_train, std_train = [], []
+        for i in range(0, len(self.cols), batch_size):
+            cols = self.cols[i : i + batch_size]
+            values = [
+                get_group_values(df, cols)
+                for df in chunks.iter_chunks(slice(self.fit_start_time, self.fit_end_time), columns=cols)
+            ]
+            self._fit_values(np.concatenate(values) if len(values) > 0 else get_group_values(chunks.head(0), cols))
+            mean_train.append(self.mean_train)
+            std_train.append(self.std_train)
+        if len(mean_train) > 0:
+            self.mean_train, self.std_train = np.concatenate(mean_train), np.concatenate(std_train)
+
+    def _fit_values(self, X: np.ndarray):
         self.mean_train = np.nanmedian(X, axis=0)
-        self.std_train = np.nanmedian(np.abs(X - self.mean_train), axis=0)
+        X -= self.mean_train
+        self.std_train = np.nanmedian(np.abs(X, out=X), axis=0)
         self.std_train += EPS
         self.std_train *= 1.4826
 
     def __call__(self, df):
-        X = df[self.cols]
+        X = get_group_values(df, self.cols)
         X -= self.mean_train
         X /= self.std_train
         if self.clip_outlier:
-            X = np.clip(X, -3, 3)
-        df[self.cols] = X
+            np.clip(X, -3, 3, out=X)
+        set_group_values(df, self.cols, X)
         return df
 
+    def writes(self, df):
+        return self.cols
+
 
 class CSZScoreNorm(Processor):
     """Cross Sectional ZScore Normalization"""
@@ -319,9 +564,13 @@ class CSZScoreNorm(Processor):
         with pd.option_context("mode.chained_assignment", None):
             for g in self.fields_group:
                 cols = get_group_columns(df, g)
-                df[cols] = df[cols].groupby("datetime", group_keys=False).apply(self.zscore_func)
+                set_group_values(df, cols, cs_apply(df, cols, self.zscore_func))
         return df
 
+    def writes(self, df):
+        groups = self.fields_group if isinstance(self.fields_group, list) else [self.fields_group]
+        return get_group_columns(df, groups[0]).append([get_group_columns(df, g) for g in groups[1:]])
+
 
 class CSRankNorm(Processor):
     """
@@ -352,12 +601,15 @@ class CSRankNorm(Processor):
     def __call__(self, df):
         # try not modify original dataframe
         cols = get_group_columns(df, self.fields_group)
-        t = df[cols].groupby("datetime", group_keys=False).rank(pct=True)
+        t = cs_apply(df, cols, lambda x: x.rank(pct=True))
         t -= 0.5
         t *= 3.46  # NOTE: towards unit std
-        df[cols] = t
+        set_group_values(df, cols, t)
         return df
 
+    def writes(self, df):
+        return get_group_columns(df, self.fields_group)
+
 
 class CSZFillna(Processor):
     """Cross Sectional Fill Nan"""
@@ -367,9 +619,12 @@ class CSZFillna(Processor):
 
     def __call__(self, df):
         cols = get_group_columns(df, self.fields_group)
-        df[cols] = df[cols].groupby("datetime", group_keys=False).apply(lambda x: x.fillna(x.mean()))
+        set_group_values(df, cols, cs_apply(df, cols, lambda x: np.where(x.isna(), x.mean().values, x.values)))
         return df
 
+    def writes(self, df):
+        return get_group_columns(df, self.fields_group)
+
 
 class HashStockFormat(Processor):
     """Process the storage of from df into hasing stock format"""
@@ -379,6 +634,9 @@ class HashStockFormat(Processor):
 
         return HashingStockStorage.from_df(df)
 
+    def readonly(self):
+        return True
+
 
 class TimeRangeFlt(InstProcessor):
     """
@@ -1,12 +1,17 @@
+import shutil
 from abc import abstractmethod
+from pathlib import Path
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.ipc  # pylint: disable=W0611  # noqa: F401
 
 from .handler import DataHandler
-from typing import Union, List
+from typing import Iterator, Union, List, Optional
 from qlib.log import get_module_logger
 
 from .utils import get_level_index, fetch_df_by_index, fetch_df_by_col
+from ...utils import lazy_sort_index
 
 
 class BaseHandlerStorage:
@@ -190,3 +195,174 @@ class HashingStockStorage(BaseHandlerStorage):
             return fetch_stock_df_list[0]
         else:
             return pd.concat(fetch_stock_df_list, sort=False, copy=~fetch_orig)
+
+
+class ChunkedDFStorage(BaseHandlerStorage):
+    """Chunked data storage for datahandler
+    - The data is split into time chunks which are stored on disk, so it does not have to fit into the memory
+    - Every chunk is an Arrow IPC file with the index levels as dictionary columns and the data columns in the order
+      of `columns`. The files are memory mapped when they are read.
+    - `fetch` only reads the chunks overlapping the datetime selector and the columns of `col_set`
+    - The chunks must be appended in time order and be sorted like the data of a handler
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Parameters
+        ----------
+        path : Union[str, Path]
+            the directory of the chunk files, the files already in it are removed.
+        """
+        self.path = Path(path)
+        self.clear()
+        self.path.mkdir(parents=True)
+        self.columns = None
+        self.dtypes = None
+        self.index_names = None
+        # the first and the last datetime (ns) of every chunk
+        self.bounds = []
+        self.n_rows = 0
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def clear(self):
+        """remove the chunk files"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _chunk_path(self, i: int) -> Path:
+        return self.path.joinpath(f"{i:05d}.arrow")
+
+    def append(self, df: pd.DataFrame):
+        """write `df` as the next chunk"""
+        if self.columns is None:
+            self.columns, self.dtypes, self.index_names = df.columns, df.dtypes.values, df.index.names
+        elif not df.columns.equals(self.columns):
+            raise ValueError("the chunks of a storage must have the same columns")
+        index = df.index if isinstance(df.index, pd.MultiIndex) else pd.MultiIndex.from_arrays([df.index])
+        arrays = {}
+        for i, (level, codes) in enumerate(zip(index.levels, index.codes)):
+            arrays[f"__index_level_{i}__"] = pa.DictionaryArray.from_arrays(
+                pa.array(codes.astype(np.int32), mask=codes < 0), pa.array(level.values, from_pandas=True)
+            )
+        if len(set(df.dtypes)) == 1 and isinstance(df.dtypes.iloc[0], np.dtype):
+            # the columns of a frame with a single block are views of its data
+            data = df.to_numpy()
+            columns = (data[:, j] for j in range(data.shape[1]))
+        else:
+            columns = (col.to_numpy() for _, col in df.items())
+        for j, values in enumerate(columns):
+            # NOTE: the nan values are kept as values instead of nulls, so the columns can be read without a copy
+            arrays[str(j)] = pa.array(values, from_pandas=values.dtype == object)
+        table = pa.table(arrays)
+        with pa.OSFile(str(self._chunk_path(len(self.bounds))), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        if len(df) > 0:
+            datetime = df.index.get_level_values(get_level_index(df, "datetime"))
+            self.bounds.append((datetime.min().value, datetime.max().value))
+        else:
+            self.bounds.append((np.iinfo(np.int64).max, np.iinfo(np.int64).min))
+        self.n_rows += len(df)
+
+    def read(self, i: int, columns: Optional[pd.Index] = None) -> pd.DataFrame:
+        """read the chunk `i`, only with `columns` if given"""
+        locs = np.arange(len(self.columns)) if columns is None else self.columns.get_indexer_for(columns)
+        with pa.memory_map(str(self._chunk_path(i)), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            levels, codes = [], []
+            for name in table.schema.names[: len(self.index_names)]:
+                level = table.column(name).combine_chunks()
+                levels.append(pd.Index(level.dictionary.to_numpy(zero_copy_only=False)))
+                codes.append(level.indices.fill_null(-1).to_numpy(zero_copy_only=False))
+            if len(levels) == 1:
+                index = levels[0].take(codes[0])
+                index.name = self.index_names[0]
+            else:
+                index = pd.MultiIndex(levels=levels, codes=codes, names=self.index_names, verify_integrity=False)
+            # the data is copied into the blocks of the frame, so the file can be closed
+            df = pd.DataFrame(
+                {j: table.column(str(loc)).to_numpy() for j, loc in enumerate(locs)},
+                index=index,
+                columns=range(len(locs)),
+            )
+        df.columns = self.columns[locs]
+        dtypes = df.dtypes.values
+        for j, loc in enumerate(locs):
+            if dtypes[j] != self.dtypes[loc]:
+                df.isetitem(j, df.iloc[:, j].astype(self.dtypes[loc]))
+        return df
+
+    def _level_index(self, level: Union[str, int]) -> int:
+        if isinstance(level, str):
+            # NOTE: If level index is not given in the data, the default level index will be ('datetime', 'instrument')
+            return (
+                list(self.index_names).index(level)
+                if self.index_names is not None and level in self.index_names
+                else ("datetime", "instrument").index(level)
+            )
+        return level
+
+    def select_chunks(
+        self, selector: Union[pd.Timestamp, slice, str, pd.Index], level: Union[str, int] = "datetime"
+    ) -> np.ndarray:
+        """the ids of the chunks which may have the rows of `selector`"""
+        chunks = np.arange(len(self.bounds))
+        if level is None or self._level_index(level) != self._level_index("datetime"):
+            return chunks
+        if isinstance(selector, (str, pd.Timestamp)):
+            selector = slice(selector, selector)
+        if not isinstance(selector, slice):
+            return chunks
+        bounds = np.array(self.bounds, dtype=np.int64).reshape(-1, 2)
+        mask = np.ones(len(bounds), dtype=bool)
+        if selector.start is not None:
+            mask &= bounds[:, 1] >= pd.Timestamp(selector.start).value
+        if selector.stop is not None:
+            mask &= bounds[:, 0] <= pd.Timestamp(selector.stop).value
+        return chunks[mask]
+
+    def iter_chunks(
+        self,
+        selector: Union[pd.Timestamp, slice, str, pd.Index] = slice(None, None),
+        level: Union[str, int] = "datetime",
+        columns: Optional[pd.Index] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """iterate over the rows of `selector` chunk by chunk, only with `columns` if given"""
+        for i in self.select_chunks(selector, level):
+            df = fetch_df_by_index(self.read(i, columns), selector, level)
+            if len(df) > 0:
+                yield df
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        if self.columns is None:
+            return pd.DataFrame()
+        return self.read(0).head(n)
+
+    def fetch(
+        self,
+        selector: Union[pd.Timestamp, slice, str, pd.Index] = slice(None, None),
+        level: Union[str, int] = "datetime",
+        col_set: Union[str, List[str]] = DataHandler.CS_ALL,
+        fetch_orig: bool = True,
+    ) -> pd.DataFrame:
+        if isinstance(selector, (tuple, list)) and level is not None:
+            # when level is None, the argument will be passed in directly
+            # we don't have to convert it into slice
+            try:
+                selector = slice(*selector)
+            except ValueError:
+                get_module_logger("DataHandlerLP").info(f"Fail to converting to query to slice. It will used directly")
+
+        columns = None
+        if isinstance(self.columns, pd.MultiIndex) and col_set not in (DataHandler.CS_ALL, DataHandler.CS_RAW):
+            # only read the columns of the selected groups
+            columns = self.columns[
+                self.columns.get_level_values(0).isin([col_set] if isinstance(col_set, str) else col_set)
+            ]
+        df_list = list(self.iter_chunks(selector, level, columns))
+        if len(df_list) == 0:
+            df_list = [fetch_df_by_index(self.read(0, columns), selector, level).iloc[:0]]
+        df = lazy_sort_index(pd.concat(df_list) if len(df_list) > 1 else df_list[0])
+        return fetch_df_by_col(df, col_set)
@@ -9,14 +9,46 @@ import numpy as np
 import pandas as pd
 
 from typing import Union, List, Type
-from scipy.stats import percentileofscore
 from .base import Expression, ExpressionOps, Feature, PFeature
 from ..log import get_module_logger
 from ..utils import get_callable_kwargs
 
 try:
-    from ._libs.rolling import rolling_slope, rolling_rsquare, rolling_resi
-    from ._libs.expanding import expanding_slope, expanding_rsquare, expanding_resi
+    from ._libs.rolling import (
+        rolling_slope,
+        rolling_rsquare,
+        rolling_resi,
+        rolling_std,
+        rolling_var,
+        rolling_skew,
+        rolling_kurt,
+        rolling_quantile,
+        rolling_rank,
+        rolling_mad,
+        rolling_idxmax,
+        rolling_idxmin,
+        rolling_wma,
+        rolling_cov,
+        rolling_corr,
+    )
+    from ._libs.expanding import (
+        expanding_slope,
+        expanding_rsquare,
+        expanding_resi,
+        expanding_std,
+        expanding_var,
+        expanding_skew,
+        expanding_kurt,
+        expanding_quantile,
+        expanding_rank,
+        expanding_mad,
+        expanding_idxmax,
+        expanding_idxmin,
+        expanding_wma,
+        expanding_ema,
+        expanding_cov,
+        expanding_corr,
+    )
 except ImportError:
     print(
         "#### Do not import qlib package in the repository directory in case of importing qlib from . without compiling #####"
@@ -33,6 +65,46 @@ except ValueError:
 np.seterr(invalid="ignore")
 
 
+def _reindex_array(start, values, new_start, size):
+    """put the `values` starting at `start` into a nan filled array of `size` values starting at `new_start`"""
+    if start == new_start and len(values) == size:
+        return values
+    res = np.full(size, np.nan, dtype=values.dtype if values.dtype.kind == "f" else np.float64)
+    if len(values) > 0:
+        res[start - new_start : start - new_start + len(values)] = values
+    return res
+
+
+def _align_arrays(left, right):
+    """align two `(start_index, values)` pairs on the union of their ranges, like the index alignment of pandas"""
+    (start_left, values_left), (start_right, values_right) = left, right
+    if start_left == start_right and len(values_left) == len(values_right):
+        return start_left, values_left, values_right
+    ranges = [(start, start + len(values)) for start, values in (left, right) if len(values) > 0]
+    if not ranges:
+        return start_left, values_left, values_right
+    start = min(r[0] for r in ranges)
+    size = max(r[1] for r in ranges) - start
+    return (
+        start,
+        _reindex_array(start_left, values_left, start, size),
+        _reindex_array(start_right, values_right, start, size),
+    )
+
+
+def _shift_array(values, n):
+    """numpy counterpart of `pd.Series.shift`"""
+    res = np.empty(len(values), dtype=values.dtype if values.dtype.kind == "f" else np.float64)
+    k = min(abs(n), len(values))
+    if n > 0:
+        res[:k] = np.nan
+        res[k:] = values[: len(values) - k]
+    else:
+        res[len(values) - k :] = np.nan
+        res[: len(values) - k] = values[k:]
+    return res
+
+
 #################### Element-Wise Operator ####################
 class ElemOperator(ExpressionOps):
     """Element-wise Operator
@@ -93,6 +165,12 @@ class ChangeInstrument(ElemOperator):
     def _load_internal(self, instrument, start_index, end_index, *args):
         return self.feature.load(instrument, start_index, end_index, *args)
 
+    def load_array(self, instrument, start_index, end_index, *args):
+        return super().load_array(self.instrument, start_index, end_index, *args)
+
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        return self.feature.load_array(instrument, start_index, end_index, *args)
+
 
 class NpElemOperator(ElemOperator):
     """Numpy Element-wise Operator
@@ -118,6 +196,10 @@ class NpElemOperator(ElemOperator):
         series = self.feature.load(instrument, start_index, end_index, *args)
         return getattr(np, self.func)(series)
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values = self.feature.load_array(instrument, start_index, end_index, *args)
+        return start, getattr(np, self.func)(values)
+
 
 class Abs(NpElemOperator):
     """Feature Absolute Value
@@ -163,6 +245,10 @@ class Sign(NpElemOperator):
         series = series.astype(np.float32)
         return getattr(np, self.func)(series)
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values = self.feature.load_array(instrument, start_index, end_index, *args)
+        return start, getattr(np, self.func)(values.astype(np.float32))
+
 
 class Log(NpElemOperator):
     """Feature Log
@@ -208,6 +294,9 @@ class Mask(NpElemOperator):
     def _load_internal(self, instrument, start_index, end_index, *args):
         return self.feature.load(self.instrument, start_index, end_index, *args)
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        return self.feature.load_array(self.instrument, start_index, end_index, *args)
+
 
 class Not(NpElemOperator):
     """Not Operator
@@ -334,6 +423,23 @@ class NpPairOperator(PairOperator):
                 get_module_logger("ops").debug(warning_info)
         return res
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        if isinstance(self.feature_left, (Expression,)):
+            start_left, values_left = self.feature_left.load_array(instrument, start_index, end_index, *args)
+        else:
+            start_left, values_left = None, self.feature_left  # numeric value
+        if isinstance(self.feature_right, (Expression,)):
+            start_right, values_right = self.feature_right.load_array(instrument, start_index, end_index, *args)
+        else:
+            start_right, values_right = None, self.feature_right
+        if start_left is None:
+            start = start_right
+        elif start_right is None:
+            start = start_left
+        else:
+            start, values_left, values_right = _align_arrays((start_left, values_left), (start_right, values_right))
+        return start, getattr(np, self.func)(values_left, values_right)
+
 
 class Power(NpPairOperator):
     """Power Operator
@@ -670,6 +776,18 @@ class If(ExpressionOps):
         series = pd.Series(np.where(series_cond, series_left, series_right), index=series_cond.index)
         return series
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values_cond = self.condition.load_array(instrument, start_index, end_index, *args)
+        if isinstance(self.feature_left, (Expression,)):
+            _, values_left = self.feature_left.load_array(instrument, start_index, end_index, *args)
+        else:
+            values_left = self.feature_left
+        if isinstance(self.feature_right, (Expression,)):
+            _, values_right = self.feature_right.load_array(instrument, start_index, end_index, *args)
+        else:
+            values_right = self.feature_right
+        return start, np.where(values_cond, values_left, values_right)
+
     def get_longest_back_rolling(self):
         if isinstance(self.feature_left, (Expression,)):
             left_br = self.feature_left.get_longest_back_rolling()
@@ -741,6 +859,14 @@ class Rolling(ExpressionOps):
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
+        return self._rolling(series)
+
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values = self.feature.load_array(instrument, start_index, end_index, *args)
+        return start, self._rolling(pd.Series(values, copy=False)).to_numpy()
+
+    def _rolling(self, series: pd.Series) -> pd.Series:
+        """calculate the operator on the loaded `feature`, the index of `series` is not used"""
         # NOTE: remove all null check,
         # now it's user's responsibility to decide whether use features in null days
         # isnull = series.isnull() # NOTE: isnull = NaN, inf is not null
@@ -797,8 +923,7 @@ class Ref(Rolling):
     def __init__(self, feature, N):
         super(Ref, self).__init__(feature, N, "ref")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
         # N = 0, return first day
         if series.empty:
             return series  # Pandas bug, see: https://github.com/pandas-dev/pandas/issues/21049
@@ -808,6 +933,14 @@ class Ref(Rolling):
             series = series.shift(self.N)  # copy
         return series
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values = self.feature.load_array(instrument, start_index, end_index, *args)
+        if len(values) == 0:
+            return start, values
+        elif self.N == 0:
+            return start, np.full(len(values), values[0])
+        return start, _shift_array(values, self.N)
+
     def get_longest_back_rolling(self):
         if self.N == 0:
             return np.inf
@@ -883,6 +1016,15 @@ class Std(Rolling):
     def __init__(self, feature, N):
         super(Std, self).__init__(feature, N, "std")
 
+    def _rolling(self, series):
+        if not isinstance(self.N, int):
+            return super(Std, self)._rolling(series)
+        if self.N == 0:
+            series = pd.Series(expanding_std(series.values), index=series.index)
+        else:
+            series = pd.Series(rolling_std(series.values, self.N), index=series.index)
+        return series
+
 
 class Var(Rolling):
     """Rolling Variance
@@ -903,6 +1045,15 @@ class Var(Rolling):
     def __init__(self, feature, N):
         super(Var, self).__init__(feature, N, "var")
 
+    def _rolling(self, series):
+        if not isinstance(self.N, int):
+            return super(Var, self)._rolling(series)
+        if self.N == 0:
+            series = pd.Series(expanding_var(series.values), index=series.index)
+        else:
+            series = pd.Series(rolling_var(series.values, self.N), index=series.index)
+        return series
+
 
 class Skew(Rolling):
     """Rolling Skewness
@@ -925,6 +1076,15 @@ class Skew(Rolling):
             raise ValueError("The rolling window size of Skewness operation should >= 3")
         super(Skew, self).__init__(feature, N, "skew")
 
+    def _rolling(self, series):
+        if not isinstance(self.N, int):
+            return super(Skew, self)._rolling(series)
+        if self.N == 0:
+            series = pd.Series(expanding_skew(series.values), index=series.index)
+        else:
+            series = pd.Series(rolling_skew(series.values, self.N), index=series.index)
+        return series
+
 
 class Kurt(Rolling):
     """Rolling Kurtosis
@@ -947,6 +1107,15 @@ class Kurt(Rolling):
             raise ValueError("The rolling window size of Kurtosis operation should >= 5")
         super(Kurt, self).__init__(feature, N, "kurt")
 
+    def _rolling(self, series):
+        if not isinstance(self.N, int):
+            return super(Kurt, self)._rolling(series)
+        if self.N == 0:
+            series = pd.Series(expanding_kurt(series.values), index=series.index)
+        else:
+            series = pd.Series(rolling_kurt(series.values, self.N), index=series.index)
+        return series
+
 
 class Max(Rolling):
     """Rolling Max
@@ -987,12 +1156,12 @@ class IdxMax(Rolling):
     def __init__(self, feature, N):
         super(IdxMax, self).__init__(feature, N, "idxmax")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
+        # NOTE: same as `x.argmax() + 1` of every window, i.e. the position of the first nan if any
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(lambda x: x.argmax() + 1, raw=True)
+            series = pd.Series(expanding_idxmax(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(lambda x: x.argmax() + 1, raw=True)
+            series = pd.Series(rolling_idxmax(series.values, self.N), index=series.index)
         return series
 
 
@@ -1035,12 +1204,12 @@ class IdxMin(Rolling):
     def __init__(self, feature, N):
         super(IdxMin, self).__init__(feature, N, "idxmin")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
+        # NOTE: same as `x.argmin() + 1` of every window, i.e. the position of the first nan if any
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(lambda x: x.argmin() + 1, raw=True)
+            series = pd.Series(expanding_idxmin(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(lambda x: x.argmin() + 1, raw=True)
+            series = pd.Series(rolling_idxmin(series.values, self.N), index=series.index)
         return series
 
 
@@ -1067,12 +1236,11 @@ class Quantile(Rolling):
     def __str__(self):
         return "{}({},{},{})".format(type(self).__name__, self.feature, self.N, self.qscore)
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
         if self.N == 0:
-            series = series.expanding(min_periods=1).quantile(self.qscore)
+            series = pd.Series(expanding_quantile(series.values, self.qscore), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).quantile(self.qscore)
+            series = pd.Series(rolling_quantile(series.values, self.N, self.qscore), index=series.index)
         return series
 
 
@@ -1115,18 +1283,12 @@ class Mad(Rolling):
     def __init__(self, feature, N):
         super(Mad, self).__init__(feature, N, "mad")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
-        # TODO: implement in Cython
-
-        def mad(x):
-            x1 = x[~np.isnan(x)]
-            return np.mean(np.abs(x1 - x1.mean()))
-
+    def _rolling(self, series):
+        # NOTE: the mean absolute deviation of the valid values of every window
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(mad, raw=True)
+            series = pd.Series(expanding_mad(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(mad, raw=True)
+            series = pd.Series(rolling_mad(series.values, self.N), index=series.index)
         return series
 
 
@@ -1149,23 +1311,13 @@ class Rank(Rolling):
     def __init__(self, feature, N):
         super(Rank, self).__init__(feature, N, "rank")
 
-    # for compatiblity of python 3.7, which doesn't support pandas 1.4.0+ which implements Rolling.rank
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
-
-        rolling_or_expending = series.expanding(min_periods=1) if self.N == 0 else series.rolling(self.N, min_periods=1)
-        if hasattr(rolling_or_expending, "rank"):
-            return rolling_or_expending.rank(pct=True)
-
-        def rank(x):
-            if np.isnan(x[-1]):
-                return np.nan
-            x1 = x[~np.isnan(x)]
-            if x1.shape[0] == 0:
-                return np.nan
-            return percentileofscore(x1, x1[-1]) / 100
-
-        return rolling_or_expending.apply(rank, raw=True)
+    def _rolling(self, series):
+        # NOTE: same as `rolling.rank(pct=True)` of pandas, the ties get their average rank
+        if self.N == 0:
+            series = pd.Series(expanding_rank(series.values), index=series.index)
+        else:
+            series = pd.Series(rolling_rank(series.values, self.N), index=series.index)
+        return series
 
 
 class Count(Rolling):
@@ -1207,14 +1359,21 @@ class Delta(Rolling):
     def __init__(self, feature, N):
         super(Delta, self).__init__(feature, N, "delta")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
         if self.N == 0:
             series = series - series.iloc[0]
         else:
             series = series - series.shift(self.N)
         return series
 
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        start, values = self.feature.load_array(instrument, start_index, end_index, *args)
+        if len(values) == 0:
+            return start, values
+        elif self.N == 0:
+            return start, values - values[0]
+        return start, values - _shift_array(values, self.N)
+
 
 # TODO:
 # support pair-wise rolling like `Slope(A, B, N)`
@@ -1245,8 +1404,7 @@ class Slope(Rolling):
     def __init__(self, feature, N):
         super(Slope, self).__init__(feature, N, "slope")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
         if self.N == 0:
             series = pd.Series(expanding_slope(series.values), index=series.index)
         else:
@@ -1273,13 +1431,12 @@ class Rsquare(Rolling):
     def __init__(self, feature, N):
         super(Rsquare, self).__init__(feature, N, "rsquare")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        _series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, _series):
         if self.N == 0:
             series = pd.Series(expanding_rsquare(_series.values), index=_series.index)
         else:
             series = pd.Series(rolling_rsquare(_series.values, self.N), index=_series.index)
-            series.loc[np.isclose(_series.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)] = np.nan
+            series.loc[np.isclose(rolling_std(_series.values, self.N), 0, atol=2e-05)] = np.nan
         return series
 
 
@@ -1302,8 +1459,7 @@ class Resi(Rolling):
     def __init__(self, feature, N):
         super(Resi, self).__init__(feature, N, "resi")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
+    def _rolling(self, series):
         if self.N == 0:
             series = pd.Series(expanding_resi(series.values), index=series.index)
         else:
@@ -1330,19 +1486,12 @@ class WMA(Rolling):
     def __init__(self, feature, N):
         super(WMA, self).__init__(feature, N, "wma")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
-        # TODO: implement in Cython
-
-        def weighted_mean(x):
-            w = np.arange(len(x)) + 1
-            w = w / w.sum()
-            return np.nanmean(w * x)
-
+    def _rolling(self, series):
+        # NOTE: `np.nanmean(w * x)` of every window with the linear weights `w = (1, 2, ..., L) / sum(1, 2, ..., L)`
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(weighted_mean, raw=True)
+            series = pd.Series(expanding_wma(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(weighted_mean, raw=True)
+            series = pd.Series(rolling_wma(series.values, self.N), index=series.index)
         return series
 
 
@@ -1365,17 +1514,10 @@ class EMA(Rolling):
     def __init__(self, feature, N):
         super(EMA, self).__init__(feature, N, "ema")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        series = self.feature.load(instrument, start_index, end_index, *args)
-
-        def exp_weighted_mean(x):
-            a = 1 - 2 / (1 + len(x))
-            w = a ** np.arange(len(x))[::-1]
-            w /= w.sum()
-            return np.nansum(w * x)
-
+    def _rolling(self, series):
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(exp_weighted_mean, raw=True)
+            # the decay of every window depends on its length: alpha = 1 - 2 / (1 + len(window))
+            series = pd.Series(expanding_ema(series.values), index=series.index)
         elif 0 < self.N < 1:
             series = series.ewm(alpha=self.N, min_periods=1).mean()
         else:
@@ -1426,6 +1568,20 @@ class PairRolling(ExpressionOps):
         else:
             series_right = self.feature_right
 
+        return self._pair_rolling(series_left, series_right)
+
+    def _load_array_internal(self, instrument, start_index, end_index, *args):
+        if not (isinstance(self.feature_left, Expression) and isinstance(self.feature_right, Expression)):
+            return super()._load_array_internal(instrument, start_index, end_index, *args)
+        start, values_left, values_right = _align_arrays(
+            self.feature_left.load_array(instrument, start_index, end_index, *args),
+            self.feature_right.load_array(instrument, start_index, end_index, *args),
+        )
+        series = self._pair_rolling(pd.Series(values_left, copy=False), pd.Series(values_right, copy=False))
+        return start, series.to_numpy()
+
+    def _pair_rolling(self, series_left, series_right):
+        """calculate the operator on the loaded features, the index of the series is not used"""
         if self.N == 0:
             series = getattr(series_left.expanding(min_periods=1), self.func)(series_right)
         else:
@@ -1485,16 +1641,16 @@ class Corr(PairRolling):
     def __init__(self, feature_left, feature_right, N):
         super(Corr, self).__init__(feature_left, feature_right, N, "corr")
 
-    def _load_internal(self, instrument, start_index, end_index, *args):
-        res: pd.Series = super(Corr, self)._load_internal(instrument, start_index, end_index, *args)
-
-        # NOTE: Load uses MemCache, so calling load again will not cause performance degradation
-        series_left = self.feature_left.load(instrument, start_index, end_index, *args)
-        series_right = self.feature_right.load(instrument, start_index, end_index, *args)
-        res.loc[
-            np.isclose(series_left.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)
-            | np.isclose(series_right.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)
-        ] = np.nan
+    def _pair_rolling(self, series_left, series_right):
+        series_left, series_right = series_left.align(series_right)
+        left, right = series_left.values, series_right.values
+        if self.N == 0:
+            res = pd.Series(expanding_corr(left, right), index=series_left.index)
+            std_left, std_right = expanding_std(left), expanding_std(right)
+        else:
+            res = pd.Series(rolling_corr(left, right, self.N), index=series_left.index)
+            std_left, std_right = rolling_std(left, self.N), rolling_std(right, self.N)
+        res.loc[np.isclose(std_left, 0, atol=2e-05) | np.isclose(std_right, 0, atol=2e-05)] = np.nan
         return res
 
 
@@ -1519,6 +1675,14 @@ class Cov(PairRolling):
     def __init__(self, feature_left, feature_right, N):
         super(Cov, self).__init__(feature_left, feature_right, N, "cov")
 
+    def _pair_rolling(self, series_left, series_right):
+        series_left, series_right = series_left.align(series_right)
+        if self.N == 0:
+            values = expanding_cov(series_left.values, series_right.values)
+        else:
+            values = rolling_cov(series_left.values, series_right.values, self.N)
+        return pd.Series(values, index=series_left.index)
+
 
 #################### Operator which only support data with time index ####################
 # Convention
@@ -15,6 +15,7 @@ Qlib will use the operator `P` to perform the collapse.
 """
 import numpy as np
 import pandas as pd
+from qlib.data.base import array_mode
 from qlib.data.ops import ElemOperator
 from qlib.log import get_module_logger
 from .data import Cal
@@ -36,7 +37,9 @@ class P(ElemOperator):
 
             # The calculated value will always the last element, so the end_offset is zero.
             try:
-                s = self._load_feature(instrument, -start_ws, 0, cur_time)
+                # the period data is not indexed by calendar index, so it is always loaded as pd.Series
+                with array_mode(False):
+                    s = self._load_feature(instrument, -start_ws, 0, cur_time)
                 resample_data[cur_index - start_index] = s.iloc[-1] if len(s) > 0 else np.nan
             except FileNotFoundError:
                 get_module_logger("base").warning(f"WARN: period data not found for {str(self)}")
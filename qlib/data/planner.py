@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Plan the evaluation of all the fields of a dataset for one instrument.
+
+Loading the fields one by one evaluates every field on its own extended window, so the sub-expressions shared by
+several fields (e.g. `$close` or `Ref($close, 1)`) are loaded with different ranges and computed again for each field.
+
+`ExpressionPlan` merges the fields into one DAG (the nodes are deduplicated by their string representation) and
+loads all the *window stable* fields on the union of their extended windows inside an
+:func:`~qlib.data.base.expression_memo`, so every node of the DAG is evaluated once per instrument.
+
+A field is window stable if its values in the queried range do not depend on how much data is loaded before/after
+its extended window. Fields with recursive or expanding operators (e.g. `EMA`, `Mean($close, 0)`) or operators
+unknown to the planner keep being loaded on their own extended window, so the results are not changed.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+from . import ops
+from .base import Expression, ExpressionOps, Feature, PFeature
+
+
+def get_sub_expressions(expression: Expression) -> List[Expression]:
+    """Get the direct operands of an expression"""
+    if not isinstance(expression, ExpressionOps):
+        return []
+    return [v for v in vars(expression).values() if isinstance(v, Expression)]
+
+
+def is_window_stable(expression: Expression) -> bool:
+    """Whether the values of `expression` in a range are independent of the data loaded beyond its extended window"""
+    if isinstance(expression, Feature):
+        return not isinstance(expression, PFeature)
+    if type(expression).__module__ != ops.__name__:
+        # custom operators: their dependency on the loaded range is unknown
+        return False
+    if isinstance(expression, (ops.Rolling, ops.PairRolling)):
+        # NOTE: `Delta` reads `N` periods back but only declares `N - 1` in its extended window, so its first value
+        # depends on whether more data is loaded
+        if isinstance(expression, (ops.EMA, ops.Delta)) or not isinstance(expression.N, int):
+            return False
+        if expression.N == 0:
+            return False
+    elif not isinstance(expression, (ops.NpElemOperator, ops.NpPairOperator, ops.If, ops.ChangeInstrument)):
+        return False
+    return all(is_window_stable(e) for e in get_sub_expressions(expression))
+
+
+class ExpressionPlan:
+    """Evaluation plan of a group of fields
+
+    Parameters
+    ----------
+    fields : List[str]
+        the fields to be loaded.
+    expressions : List[Expression]
+        the parsed expressions of the fields.
+    """
+
+    def __init__(self, fields: List[str], expressions: List[Expression]):
+        self.fields = list(fields)
+        self.expressions = list(expressions)
+        self.shared = [is_window_stable(e) for e in self.expressions]
+        lft_etd, rght_etd = 0, 0
+        for expression, shared in zip(self.expressions, self.shared):
+            if shared:
+                lft, rght = expression.get_extended_window_size()
+                lft_etd, rght_etd = max(lft_etd, lft), max(rght_etd, rght)
+        self.extended_window_size = lft_etd, rght_etd
+        self.nodes = self._get_nodes(self.expressions)
+
+    @staticmethod
+    def _get_nodes(expressions: Iterable[Expression]) -> Dict[str, int]:
+        """count how many times each distinct node appears in the expressions"""
+        nodes = {}
+        stack = list(expressions)
+        while stack:
+            expression = stack.pop()
+            key = str(expression)
+            nodes[key] = nodes.get(key, 0) + 1
+            stack.extend(get_sub_expressions(expression))
+        return nodes
+
+    @property
+    def n_nodes(self) -> int:
+        """number of nodes of all the expression trees"""
+        return sum(self.nodes.values())
+
+    @property
+    def n_unique_nodes(self) -> int:
+        """number of nodes in the DAG after removing the common sub-expressions"""
+        return len(self.nodes)
+
+    def query_range(self, start_index: int, end_index: int) -> Tuple[int, int]:
+        """the calendar range to load the shared fields for the output range `[start_index, end_index]`"""
+        lft_etd, rght_etd = self.extended_window_size
+        return max(0, start_index - lft_etd), end_index + rght_etd
+
+    def __iter__(self):
+        return iter(zip(self.fields, self.expressions, self.shared))
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(fields={len(self.fields)}, shared={sum(self.shared)}, "
+            f"nodes={self.n_nodes}, unique_nodes={self.n_unique_nodes}, window={self.extended_window_size})"
+        )
@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import struct
 from pathlib import Path
 from typing import Iterable, Union, Dict, Mapping, Tuple, List
 
@@ -233,7 +232,6 @@ class FileInstrumentStorage(FileStorageMixin, InstrumentStorage):
         df.loc[:, [self.SYMBOL_FIELD_NAME, self.INSTRUMENT_START_FIELD, self.INSTRUMENT_END_FIELD]].to_csv(
             self.uri, header=False, sep=self.INSTRUMENT_SEP, index=False
         )
-        df.to_csv(self.uri, sep="\t", encoding="utf-8", header=False, index=False)
 
     def clear(self) -> None:
         self._write_instrument(data={})
@@ -283,12 +281,83 @@ class FileInstrumentStorage(FileStorageMixin, InstrumentStorage):
 
 
 class FileFeatureStorage(FileStorageMixin, FeatureStorage):
+    """Feature stored as ``<instrument>/<field>.<freq>.bin``
+
+    The file is a float32 array whose first element is the calendar index of the first value.
+
+    Reading goes through a read-only memory map that is created once per storage object and reused for
+    every following query, so slicing returns views of the page cache instead of fresh copies of the file.
+    The map is dropped when the storage is written through this object or closed, and re-created when the
+    file has changed since it was mapped (its inode, size or modification time, e.g. another process appended
+    new bars or replaced the file).
+
+    NOTE: the map holds a file descriptor until it is closed and the returned views are released, keep the
+    storages in a bounded cache (e.g. `MemCacheOpenedUnit`).
+    """
+
     def __init__(self, instrument: str, field: str, freq: str, provider_uri: dict = None, **kwargs):
         super(FileFeatureStorage, self).__init__(instrument, field, freq, **kwargs)
         self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
         self.file_name = f"{instrument.lower()}/{field.lower()}.{freq.lower()}.bin"
+        self._reset_mmap()
+
+    def _reset_mmap(self):
+        self._mmap_uri = None
+        self._mmap_stat = None
+        self._mmap_start = None
+        self._mmap_data = None
+
+    @staticmethod
+    def _file_stat(uri: Path) -> Union[Tuple[int, int, int], None]:
+        try:
+            st = uri.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def close(self):
+        """drop the memory map, it is unmapped when the views returned by the queries are released"""
+        self._reset_mmap()
+
+    def _load_mmap(self) -> Union[Tuple[int, np.ndarray], Tuple[None, None]]:
+        """map the file and cache ``(start_index, data)``; return ``(None, None)`` if there is no data"""
+        self._reset_mmap()
+        uri = self.uri
+        file_stat = self._file_stat(uri)
+        if file_stat is None:
+            return None, None
+        nbytes = file_stat[1]
+        self._mmap_uri, self._mmap_stat = uri, file_stat
+        if nbytes < 4:
+            return None, None
+        _map = np.asarray(np.memmap(uri, dtype="<f", mode="r", shape=(nbytes // 4,)))
+        self._mmap_start = int(_map[0])
+        self._mmap_data = _map[1:]
+        return self._mmap_start, self._mmap_data
+
+    def read_array(self, i: slice) -> Tuple[Union[int, None], np.ndarray]:
+        """zero-copy read of the calendar index range ``i``
+
+        Returns
+        -------
+        Tuple[int, np.ndarray]
+            the calendar index of the first returned value and a read-only float32 view of the data.
+            The index is None if there is no data in the range.
+        """
+        if self._mmap_uri is None or self._file_stat(self._mmap_uri) != self._mmap_stat:
+            # map for the first time or the file has changed since it was mapped
+            self._load_mmap()
+        start, data = self._mmap_start, self._mmap_data
+        if data is None:
+            return None, np.empty(0, dtype=np.float32)
+        si = start if i.start is None else max(i.start, start)
+        ei = start + len(data) if i.stop is None else min(i.stop, start + len(data))
+        if si >= ei:
+            return None, np.empty(0, dtype=np.float32)
+        return si, data[si - start : ei - start]
 
     def clear(self):
+        self._reset_mmap()
         with self.uri.open("wb") as _:
             pass
 
@@ -303,6 +372,7 @@ class FileFeatureStorage(FileStorageMixin, FeatureStorage):
                 "if you need to clear the FeatureStorage, please execute: FeatureStorage.clear"
             )
             return
+        self._reset_mmap()
         if not self.uri.exists():
             # write
             index = 0 if index is None else index
@@ -344,35 +414,22 @@ class FileFeatureStorage(FileStorageMixin, FeatureStorage):
         return self.start_index + len(self) - 1
 
     def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
-        if not self.uri.exists():
-            if isinstance(i, int):
-                return None, None
-            elif isinstance(i, slice):
+        if isinstance(i, int):
+            si, data = self.read_array(slice(i, i + 1))
+            if si is None:
+                if self._mmap_data is None:
+                    return None, None
+                if self._mmap_start > i:
+                    raise IndexError(f"{i}: start index is {self._mmap_start}")
+                raise IndexError(f"{i}: end index is {self._mmap_start + len(self._mmap_data) - 1}")
+            return i, float(data[0])
+        elif isinstance(i, slice):
+            si, data = self.read_array(i)
+            if si is None:
                 return pd.Series(dtype=np.float32)
-            else:
-                raise TypeError(f"type(i) = {type(i)}")
-
-        storage_start_index = self.start_index
-        storage_end_index = self.end_index
-        with self.uri.open("rb") as fp:
-            if isinstance(i, int):
-                if storage_start_index > i:
-                    raise IndexError(f"{i}: start index is {storage_start_index}")
-                fp.seek(4 * (i - storage_start_index) + 4)
-                return i, struct.unpack("f", fp.read(4))[0]
-            elif isinstance(i, slice):
-                start_index = storage_start_index if i.start is None else i.start
-                end_index = storage_end_index if i.stop is None else i.stop - 1
-                si = max(start_index, storage_start_index)
-                if si > end_index:
-                    return pd.Series(dtype=np.float32)
-                fp.seek(4 * (si - storage_start_index) + 4)
-                # read n bytes
-                count = end_index - si + 1
-                data = np.frombuffer(fp.read(4 * count), dtype="<f")
-                return pd.Series(data, index=pd.RangeIndex(si, si + len(data)))
-            else:
-                raise TypeError(f"type(i) = {type(i)}")
+            return pd.Series(data, index=pd.RangeIndex(si, si + len(data)), copy=False)
+        else:
+            raise TypeError(f"type(i) = {type(i)}")
 
     def __len__(self) -> int:
         self.check()
@@ -0,0 +1,367 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Per-instrument multi-field feature storage.
+
+All fields of an instrument are kept in a single row-major float32 file
+``features/<instrument>/fields.<freq>.mbin`` instead of one ``<field>.<freq>.bin`` file per field.
+
+File layout (little endian)::
+
+    | magic "QMFB" | version: uint16 | n_fields: uint16 | start_index: int32 | header_size: uint32 |
+    | field names: utf-8, separated by "\\0", zero padded so that header_size % 64 == 0          |
+    | row start_index     : n_fields * float32                                                    |
+    | row start_index + 1 : n_fields * float32                                                    |
+    | ...                                                                                         |
+
+A query for several fields of an instrument is served by one memory map of one file, and appending new
+bars only appends complete rows.
+"""
+
+import struct
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.data.cache import MemCacheOpenedUnit
+from qlib.log import get_module_logger
+from qlib.data.storage import FeatureStorage
+from qlib.data.storage.file_storage import FileStorageMixin
+
+logger = get_module_logger("multi_field_storage")
+
+
+class MultiFieldBin:
+    """Reader/writer of one ``.mbin`` file
+
+    The instances returned by :meth:`open` are cached per path, so all the fields of an instrument share the
+    same memory map. At most ``C.mmap_cache_size`` instances are cached, the least recently used ones are closed.
+    The file is mapped again when it has changed since it was mapped (its inode, size or modification time).
+    """
+
+    MAGIC = b"QMFB"
+    VERSION = 1
+    HEADER_STRUCT = struct.Struct("<4sHHiI")
+    HEADER_ALIGN = 64
+    DTYPE = "<f"
+
+    _opened = MemCacheOpenedUnit(size_limit=C.get("mmap_cache_size", 256))
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._reset()
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "MultiFieldBin":
+        size_limit = C.get("mmap_cache_size", 256)
+        if cls._opened.size_limit != size_limit:
+            cls._opened.set_limit_size(size_limit)
+        key = str(path)
+        obj = cls._opened.get(key)
+        if obj is None:
+            obj = cls._opened[key] = cls(path)
+        return obj
+
+    @classmethod
+    def clear_cache(cls):
+        cls._opened.clear()
+
+    def _reset(self):
+        self._stat = None
+        self._header_size = None
+        self.fields: List[str] = []
+        self.start_index = None
+        self._data = None
+
+    def _file_stat(self) -> Union[Tuple[int, int, int], None]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _load(self):
+        self._reset()
+        file_stat = self._file_stat()
+        if file_stat is None:
+            return
+        self._stat = file_stat
+        nbytes = file_stat[1]
+        if nbytes < self.HEADER_STRUCT.size:
+            return
+        with self.path.open("rb") as fp:
+            magic, _, n_fields, start_index, header_size = self.HEADER_STRUCT.unpack(fp.read(self.HEADER_STRUCT.size))
+            if magic != self.MAGIC:
+                raise ValueError(f"{self.path} is not a multi-field feature file")
+            names = fp.read(header_size - self.HEADER_STRUCT.size).rstrip(b"\0")
+        self.fields = names.decode("utf-8").split("\0") if n_fields else []
+        self.start_index = start_index
+        self._header_size = header_size
+        n_rows = (nbytes - header_size) // (4 * n_fields) if n_fields else 0
+        if n_rows > 0:
+            self._data = np.asarray(
+                np.memmap(self.path, dtype=self.DTYPE, mode="r", offset=header_size, shape=(n_rows, n_fields))
+            )
+        else:
+            self._data = np.empty((0, n_fields), dtype=self.DTYPE)
+
+    def refresh(self, force: bool = False):
+        """re-map the file if it has been changed since it was mapped"""
+        if force or self._stat is None or self._file_stat() != self._stat:
+            self._load()
+
+    def close(self):
+        """drop the memory map, it is unmapped when the views returned by :meth:`read` are released"""
+        self._reset()
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        if self._data is None or len(self._data) == 0:
+            return None
+        return self.start_index + len(self._data) - 1
+
+    def read(self, fields: Iterable[str], i: slice) -> Tuple[Union[int, None], np.ndarray]:
+        """read the calendar index range ``i`` of ``fields`` with a single access to the file
+
+        Returns
+        -------
+        Tuple[int, np.ndarray]
+            the calendar index of the first row and a (rows, len(fields)) float32 array.
+            Missing fields are filled with nan. The index is None if there is no data in the range.
+        """
+        fields = list(fields)
+        self.refresh()
+        if self._data is None or len(self._data) == 0:
+            return None, np.empty((0, len(fields)), dtype=np.float32)
+        start = self.start_index
+        si = start if i.start is None else max(i.start, start)
+        ei = start + len(self._data) if i.stop is None else min(i.stop, start + len(self._data))
+        if si >= ei:
+            return None, np.empty((0, len(fields)), dtype=np.float32)
+        rows = self._data[si - start : ei - start]
+        col_idx = [self.fields.index(f) if f in self.fields else -1 for f in fields]
+        if -1 not in col_idx:
+            if len(col_idx) == 1:
+                return si, rows[:, col_idx[0]]
+            return si, rows[:, col_idx]
+        res = np.full((len(rows), len(fields)), np.nan, dtype=np.float32)
+        for j, c in enumerate(col_idx):
+            if c >= 0:
+                res[:, j] = rows[:, c]
+        return si, res
+
+    def write(self, df: pd.DataFrame, start_index: int):
+        """rewrite the whole file with the columns of ``df``, the first row is at calendar index ``start_index``"""
+        fields = [str(f).lower() for f in df.columns]
+        names = "\0".join(fields).encode("utf-8")
+        header_size = self.HEADER_STRUCT.size + len(names)
+        header_size += -header_size % self.HEADER_ALIGN
+        header = self.HEADER_STRUCT.pack(self.MAGIC, self.VERSION, len(fields), int(start_index), header_size)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as fp:
+            fp.write(header + names.ljust(header_size - len(header), b"\0"))
+            np.ascontiguousarray(df.values, dtype=self.DTYPE).tofile(fp)
+        tmp_path.replace(self.path)
+        self._reset()
+
+    def append(self, df: pd.DataFrame, start_index: int = None):
+        """append rows of ``df`` at calendar index ``start_index`` (default: right after the last row)
+
+        The stored values of the rows and the columns of ``df`` are overwritten, nan included; a gap is filled with nan.
+        The columns of ``df`` must be the stored fields; a different set of fields rewrites the file.
+        """
+        self.refresh()
+        fields = [str(f).lower() for f in df.columns]
+        if self.end_index is None:
+            self.write(df, 0 if start_index is None else start_index)
+            return
+        start_index = self.end_index + 1 if start_index is None else start_index
+        if fields != self.fields or start_index < self.start_index:
+            # the layout changes, rewrite the file
+            old = self.to_frame()
+            merged = old.reindex(
+                index=pd.RangeIndex(min(start_index, old.index[0]), max(start_index + len(df), old.index[-1] + 1)),
+                columns=old.columns.tolist() + [f for f in fields if f not in old.columns],
+            )
+            # the same rule as the append in place: the new rows replace the stored ones in the columns of `df`
+            merged.loc[start_index : start_index + len(df) - 1, fields] = np.asarray(df.values, dtype=self.DTYPE)
+            self.write(merged, merged.index[0])
+            return
+        header_size = self._header_size
+        gap = start_index - self.end_index - 1
+        values = np.ascontiguousarray(df.values, dtype=self.DTYPE)
+        if gap > 0:
+            values = np.vstack([np.full((gap, len(fields)), np.nan, dtype=self.DTYPE), values])
+        row_offset = min(start_index, self.end_index + 1) - self.start_index
+        self._reset()
+        with self.path.open("rb+") as fp:
+            fp.seek(header_size + row_offset * 4 * len(fields))
+            values.tofile(fp)
+
+    def write_field(self, field: str, values: Union[List, np.ndarray], start_index: int):
+        """write the values of one field from calendar index ``start_index``
+
+        The values of a stored field are written in place: the stored rows are overwritten in the column of the field
+        (nan included) and the rows after the last one are appended with nan in the other fields, so the cost is the
+        size of ``values`` rather than the size of the file. A new field or rows before the first row rewrite the file
+        by :meth:`append`.
+        """
+        self.refresh()
+        field = field.lower()
+        values = np.asarray(values, dtype=self.DTYPE)
+        if self.end_index is None or field not in self.fields or start_index < self.start_index:
+            self.append(pd.DataFrame({field: values}), start_index)
+            return
+        header_size, n_fields, col = self._header_size, len(self.fields), self.fields.index(field)
+        n_rows = self.end_index - self.start_index + 1
+        row = start_index - self.start_index
+        n_overlap = max(min(len(values), n_rows - row), 0)
+        self._reset()
+        if n_overlap > 0:
+            data = np.memmap(self.path, dtype=self.DTYPE, mode="r+", offset=header_size, shape=(n_rows, n_fields))
+            data[row : row + n_overlap, col] = values[:n_overlap]
+            data.flush()
+            del data
+        if row + len(values) > n_rows:
+            # the new rows, after a gap of nan rows if `start_index` is beyond the last row
+            tail = np.full((row + len(values) - n_rows, n_fields), np.nan, dtype=self.DTYPE)
+            tail[max(row - n_rows, 0) :, col] = values[n_overlap:]
+            with self.path.open("ab") as fp:
+                tail.tofile(fp)
+
+    def to_frame(self) -> pd.DataFrame:
+        self.refresh()
+        if self._data is None or len(self._data) == 0:
+            return pd.DataFrame(columns=self.fields, dtype=np.float32)
+        return pd.DataFrame(
+            np.array(self._data), columns=self.fields, index=pd.RangeIndex(self.start_index, self.end_index + 1)
+        )
+
+
+class FileMultiFieldFeatureStorage(FileStorageMixin, FeatureStorage):
+    """FeatureStorage of one field backed by the per-instrument :class:`MultiFieldBin` file
+
+    Use it as the backend of ``LocalFeatureProvider``:
+
+    .. code-block:: python
+
+        qlib.init(
+            provider_uri=...,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {
+                        "class": "FileMultiFieldFeatureStorage",
+                        "module_path": "qlib.data.storage.multi_field_storage",
+                    }
+                },
+            },
+        )
+    """
+
+    FILE_SUFFIX = ".mbin"
+
+    def __init__(self, instrument: str, field: str, freq: str, provider_uri: dict = None, **kwargs):
+        super(FileMultiFieldFeatureStorage, self).__init__(instrument, field, freq, **kwargs)
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.field = field.lower()
+        self.file_name = f"{instrument.lower()}/fields.{freq.lower()}{self.FILE_SUFFIX}"
+
+    @property
+    def storage_name(self) -> str:
+        return "feature"
+
+    @property
+    def bin(self) -> MultiFieldBin:
+        # not kept by the storage, so a bin closed by the cache of `MultiFieldBin.open` is not mapped again outside it
+        return MultiFieldBin.open(self.uri)
+
+    def read_fields(self, fields: Iterable[str], i: slice) -> pd.DataFrame:
+        """read several fields of the instrument with one access to the file"""
+        fields = [f.lower() for f in fields]
+        si, data = self.bin.read(fields, i)
+        if si is None:
+            return pd.DataFrame(columns=fields, dtype=np.float32)
+        return pd.DataFrame(
+            data.reshape(len(data), len(fields)), columns=fields, index=pd.RangeIndex(si, si + len(data))
+        )
+
+    def read_array(self, i: slice) -> Tuple[Union[int, None], np.ndarray]:
+        """read the calendar index range ``i`` of the field without building a series
+
+        Returns
+        -------
+        Tuple[int, np.ndarray]
+            the calendar index of the first value and a float32 view of the data.
+            The index is None if there is no data in the range.
+        """
+        si, data = self.bin.read([self.field], i)
+        if si is None or self.field not in self.bin.fields:
+            return None, np.empty(0, dtype=np.float32)
+        return si, data
+
+    def clear(self):
+        df = self.bin.to_frame()
+        if self.field in df.columns:
+            df = df.drop(columns=self.field)
+            self.bin.write(df, 0 if df.empty else df.index[0])
+
+    @property
+    def data(self) -> pd.Series:
+        return self[:]
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        if len(data_array) == 0:
+            logger.info(
+                "len(data_array) == 0, write"
+                "if you need to clear the FeatureStorage, please execute: FeatureStorage.clear"
+            )
+            return
+        self.bin.refresh()
+        if index is None:
+            end_index = self.end_index
+            index = 0 if end_index is None else end_index + 1
+        self.bin.write_field(self.field, data_array, index)
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        self.bin.refresh()
+        if self.field not in self.bin.fields:
+            return None
+        return self.bin.start_index
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        self.bin.refresh()
+        if self.field not in self.bin.fields:
+            return None
+        return self.bin.end_index
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        if isinstance(i, int):
+            si, data = self.bin.read([self.field], slice(i, i + 1))
+            if self.field not in self.bin.fields:
+                return None, None
+            if si is None:
+                raise IndexError(f"{i}: out of range [{self.bin.start_index}, {self.bin.end_index}]")
+            return i, float(data[0])
+        elif isinstance(i, slice):
+            si, data = self.bin.read([self.field], i)
+            if si is None or self.field not in self.bin.fields:
+                return pd.Series(dtype=np.float32)
+            return pd.Series(data, index=pd.RangeIndex(si, si + len(data)), copy=False)
+        else:
+            raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        self.check()
+        self.bin.refresh()
+        return 0 if self.bin.end_index is None else self.bin.end_index - self.bin.start_index + 1
@@ -0,0 +1,721 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Incremental evaluation of expressions on live bars.
+
+Producing the newest value of `Mean($close, 60)` with `Expression.load` reloads and recomputes the whole extended
+window of the field (all the history for `EMA` or the expanding operators) every time a new bar arrives.
+
+:class:`StreamEvaluator` compiles the fields into one DAG (the nodes are deduplicated by their string representation,
+like :class:`~qlib.data.planner.ExpressionPlan`) and keeps the state of every node per instrument: running sums,
+windows, monotonic deques, EMA accumulators... :meth:`StreamEvaluator.update` feeds a new bar to the states in O(1)
+(O(N) for the order statistics, a binary search and an insertion into the sorted window, and for `Mad`) and returns
+the newest value of every field. The expanding states (`N == 0`) keep no window.
+
+The values are the last values of the fields loaded from the first bar fed to the evaluator, up to floating point
+rounding. The operators reading future data (`Ref($close, -1)`) or other instruments (`ChangeInstrument`, `Mask`),
+the point-in-time features, `TResample`, `EMA(..., 0)`, the expanding order statistics and `Mad` (`Quantile`, `Med`,
+`Rank` and `Mad` with `N == 0`, which would keep all the history) and the custom operators are not supported.
+
+.. code-block:: python
+
+    stream = StreamEvaluator(["Mean($close, 60) / $close", "EMA($close, 10)"])
+    stream.warmup("BTCUSDT", history)  # the bars before, e.g. D.features(["BTCUSDT"], ["$close"])
+    row = stream.update("BTCUSDT", {"close": 42000.0}, time=pd.Timestamp("2024-01-01 00:01"))
+"""
+
+import bisect
+import math
+from collections import deque
+from functools import partial
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from . import ops
+from ._libs import expanding as _expanding
+from ._libs import rolling as _rolling
+from .base import Expression, Feature, PFeature
+from .ops import Operators  # pylint: disable=W0611  # noqa: F401
+from ..utils import parse_field
+
+
+def _prepare(value) -> float:
+    """the value used by the window operators: float64 with +/-inf replaced by nan, like pandas"""
+    value = float(value)
+    return math.nan if math.isinf(value) else value
+
+
+def _kahan_add(val: float, total: float, compensation: float) -> Tuple[float, float]:
+    y = val - compensation
+    t = total + y
+    return t, t - total - y
+
+
+class StreamState:
+    """Incremental state of one node of an expression for one instrument"""
+
+    def update(self, *values):
+        """feed the newest values of the operands and return the newest value of the node"""
+        raise NotImplementedError("`update` is not implemented")
+
+
+#################### Element-Wise ####################
+
+
+class _ElemState(StreamState):
+    def __init__(self, func: str):
+        self.func = getattr(np, func)
+
+    def update(self, value):
+        return self.func(value)
+
+
+class _SignState(StreamState):
+    def update(self, value):
+        return np.sign(np.float32(value))
+
+
+class _PairState(_ElemState):
+    def update(self, left, right):
+        return self.func(left, right)
+
+
+class _IfState(StreamState):
+    def update(self, condition, left, right):
+        return left if condition else right
+
+
+#################### Rolling ####################
+
+
+class _WindowState(StreamState):
+    """state keeping the last `N` values of the operand, the expanding states (`N` is 0) keep no value"""
+
+    def __init__(self, N: int):
+        self.N = N
+        self.window = deque()
+
+    def _push(self, value) -> Union[float, None]:
+        """append `value` to the window and return the value leaving the window (None if no value leaves it)"""
+        if not self.N:
+            return None
+        self.window.append(value)
+        if len(self.window) > self.N:
+            return self.window.popleft()
+        return None
+
+
+class _RefState(_WindowState):
+    def __init__(self, N: int, delta: bool = False):
+        super().__init__(N)
+        self.delta = delta
+        self.first = None
+
+    def update(self, value):
+        if self.N == 0:
+            if self.first is None:
+                self.first = value
+            ref = self.first
+        else:
+            self.window.append(value)
+            ref = self.window.popleft() if len(self.window) > self.N else np.nan
+        return value - ref if self.delta else ref
+
+
+class _MeanState(_WindowState):
+    """rolling mean / sum of pandas: Kahan summation, the sign of the result and the runs of the same value"""
+
+    def __init__(self, N: int, func: str = "mean"):
+        super().__init__(N)
+        self.func = func
+        self._reset()
+
+    def _reset(self):
+        self.nobs = self.neg_ct = self.n_same = 0
+        self.sum_x = self.comp_add = self.comp_remove = 0.0
+        self.prev_value = math.nan
+        self.window.clear()
+
+    def add(self, val: float):
+        if self.N == 1:
+            # pandas computes the windows not overlapping the previous one from scratch
+            self._reset()
+        removed = self._push(val)
+        if removed is not None and not math.isnan(removed):
+            self.nobs -= 1
+            self.sum_x, self.comp_remove = _kahan_add(-removed, self.sum_x, self.comp_remove)
+            self.neg_ct -= math.copysign(1, removed) < 0
+        if not math.isnan(val):
+            self.nobs += 1
+            self.sum_x, self.comp_add = _kahan_add(val, self.sum_x, self.comp_add)
+            self.neg_ct += math.copysign(1, val) < 0
+            self.n_same = self.n_same + 1 if val == self.prev_value else 1
+            self.prev_value = val
+
+    @property
+    def mean(self) -> float:
+        if self.nobs == 0:
+            return math.nan
+        if self.n_same >= self.nobs:
+            return self.prev_value
+        result = self.sum_x / self.nobs
+        if (self.neg_ct == 0 and result < 0) or (self.neg_ct == self.nobs and result > 0):
+            return 0.0
+        return result
+
+    @property
+    def sum(self) -> float:
+        if self.nobs == 0:
+            return math.nan
+        if self.n_same >= self.nobs:
+            return self.prev_value * self.nobs
+        return self.sum_x
+
+    def update(self, value):
+        self.add(_prepare(value))
+        return self.mean if self.func == "mean" else self.sum
+
+
+class _VarState(_WindowState):
+    """rolling variance of pandas: Welford's method with Kahan summation"""
+
+    def __init__(self, N: int, func: str = "var"):
+        super().__init__(N)
+        self.func = func
+        self._reset()
+
+    def _reset(self):
+        self.nobs = self.n_same = 0
+        self.mean_x = self.ssqdm_x = self.comp_add = self.comp_remove = 0.0
+        self.prev_value = math.nan
+        self.window.clear()
+
+    def add(self, val: float):
+        if self.N == 1:
+            self._reset()
+        removed = self._push(val)
+        if removed is not None and not math.isnan(removed):
+            self.nobs -= 1
+            if self.nobs:
+                prev_mean = self.mean_x - self.comp_remove
+                y = removed - self.comp_remove
+                t = y - self.mean_x
+                self.comp_remove = t + self.mean_x - y
+                self.mean_x -= t / self.nobs
+                self.ssqdm_x -= (removed - prev_mean) * (removed - self.mean_x)
+            else:
+                self.mean_x = self.ssqdm_x = 0.0
+        if not math.isnan(val):
+            self.nobs += 1
+            self.n_same = self.n_same + 1 if val == self.prev_value else 1
+            self.prev_value = val
+            prev_mean = self.mean_x - self.comp_add
+            y = val - self.comp_add
+            t = y - self.mean_x
+            self.comp_add = t + self.mean_x - y
+            self.mean_x += t / self.nobs
+            self.ssqdm_x += (val - prev_mean) * (val - self.mean_x)
+
+    @property
+    def var(self) -> float:
+        if self.nobs <= 1:
+            return math.nan
+        if self.n_same >= self.nobs:
+            return 0.0
+        return self.ssqdm_x / (self.nobs - 1)
+
+    @property
+    def std(self) -> float:
+        var = self.var
+        return 0.0 if var < 0 else math.sqrt(var)
+
+    def update(self, value):
+        self.add(_prepare(value))
+        return self.var if self.func == "var" else self.std
+
+
+class _MomentState(_WindowState):
+    """rolling skewness / kurtosis of pandas from the power sums of the values"""
+
+    def __init__(self, N: int, func: str):
+        super().__init__(N)
+        self.kurt = func == "kurt"
+        self.nobs = self.n_same = 0
+        self.sums = [0.0] * 4
+        self.comp_add = [0.0] * 4
+        self.comp_remove = [0.0] * 4
+        self.prev_value = math.nan
+        # NOTE: pandas shifts the values by their rounded mean to keep the power sums small, the mean of the values
+        # is unknown when streaming so the first value is used instead
+        self.shift = None
+
+    def _add(self, val: float, sign: int, comp: List[float]):
+        power = 1.0
+        for k in range(4 if self.kurt else 3):
+            power *= val
+            self.sums[k], comp[k] = _kahan_add(sign * power, self.sums[k], comp[k])
+
+    def update(self, value):
+        val = _prepare(value)
+        if self.shift is None and not math.isnan(val):
+            self.shift = round(val)
+        removed = self._push(val)
+        if removed is not None and not math.isnan(removed):
+            self.nobs -= 1
+            self._add(removed - self.shift, -1, self.comp_remove)
+        if not math.isnan(val):
+            self.nobs += 1
+            self._add(val - self.shift, 1, self.comp_add)
+            self.n_same = self.n_same + 1 if val == self.prev_value else 1
+            self.prev_value = val
+        return self._kurt() if self.kurt else self._skew()
+
+    def _skew(self) -> float:
+        nobs = self.nobs
+        if nobs < 3:
+            return math.nan
+        if self.n_same >= nobs:
+            return 0.0
+        A = self.sums[0] / nobs
+        B = self.sums[1] / nobs - A * A
+        C = self.sums[2] / nobs - A * A * A - 3 * A * B
+        if B <= 1e-14:
+            return math.nan
+        R = math.sqrt(B)
+        return (math.sqrt(nobs * (nobs - 1.0)) * C) / ((nobs - 2) * R * R * R)
+
+    def _kurt(self) -> float:
+        nobs = self.nobs
+        if nobs < 4:
+            return math.nan
+        if self.n_same >= nobs:
+            return -3.0
+        A = self.sums[0] / nobs
+        R = A * A
+        B = self.sums[1] / nobs - R
+        R = R * A
+        C = self.sums[2] / nobs - R - 3 * A * B
+        R = R * A
+        D = self.sums[3] / nobs - R - 6 * B * A * A - 4 * C * A
+        if B <= 1e-14:
+            return math.nan
+        K = (nobs * nobs - 1.0) * D / (B * B) - 3 * ((nobs - 1.0) ** 2)
+        return K / ((nobs - 2.0) * (nobs - 3.0))
+
+
+class _ExtremeState(StreamState):
+    """rolling max / min (or their position in the window) with a monotonic deque of the candidates"""
+
+    def __init__(self, N: int, func: str):
+        self.N = N
+        self.is_max = func in ("max", "idxmax")
+        self.arg = func.startswith("idx")
+        self.i = -1
+        self.nobs = 0
+        self.best = deque()  # (position, value), the values are monotonic
+        self.nans = deque()  # positions of the nan in the window
+        self.valid = deque()  # positions of the valid values in the window
+
+    def update(self, value):
+        val = _prepare(value)
+        self.i += 1
+        start = self.i - self.N + 1 if self.N and self.i >= self.N else 0
+        if math.isnan(val):
+            self.nans.append(self.i)
+        else:
+            self.valid.append(self.i)
+            # the earliest position wins on ties
+            while self.best and (self.best[-1][1] < val if self.is_max else self.best[-1][1] > val):
+                self.best.pop()
+            self.best.append((self.i, val))
+        for positions in (self.nans, self.valid):
+            while positions and positions[0] < start:
+                positions.popleft()
+        while self.best and self.best[0][0] < start:
+            self.best.popleft()
+        if not self.valid:
+            return math.nan
+        if not self.arg:
+            return self.best[0][1]
+        # same as `np.argmax(window) + 1`: the position of the first nan if any
+        return float((self.nans[0] if self.nans else self.best[0][0]) - start + 1)
+
+
+class _CountState(_WindowState):
+    def __init__(self, N: int):
+        super().__init__(N)
+        self.count = 0
+
+    def update(self, value):
+        # NOTE: +/-inf are counted by pandas
+        valid = not math.isnan(value)
+        removed = self._push(valid)
+        self.count += valid - bool(removed)
+        return float(self.count)
+
+
+class _OrderState(_WindowState):
+    """rolling quantile / median / rank with the sorted valid values of the window"""
+
+    def __init__(self, N: int, func: str, qscore: float = None):
+        super().__init__(N)
+        self.func = func
+        self.qscore = qscore
+        self.sorted = []
+
+    def update(self, value):
+        val = _prepare(value)
+        removed = self._push(val)
+        if removed is not None and not math.isnan(removed):
+            del self.sorted[bisect.bisect_left(self.sorted, removed)]
+        if not math.isnan(val):
+            bisect.insort(self.sorted, val)
+        nobs = len(self.sorted)
+        if self.func == "rank":
+            if math.isnan(val):
+                return math.nan
+            # the ties get their average rank
+            return (bisect.bisect_left(self.sorted, val) + 1 + bisect.bisect_right(self.sorted, val)) / 2.0 / nobs
+        if nobs == 0:
+            return math.nan
+        if self.func == "median":
+            mid = nobs // 2
+            return self.sorted[mid] if nobs % 2 else (self.sorted[mid - 1] + self.sorted[mid]) / 2
+        idx_with_fraction = self.qscore * (nobs - 1)
+        idx = int(idx_with_fraction)
+        vlow = self.sorted[idx]
+        if idx == idx_with_fraction:
+            return vlow
+        return vlow + (self.sorted[idx + 1] - vlow) * (idx_with_fraction - idx)
+
+
+class _MadState(_WindowState):
+    def update(self, value):
+        self._push(_prepare(value))
+        values = np.fromiter(self.window, dtype=np.float64, count=len(self.window))
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return math.nan
+        return np.mean(np.abs(values - values.mean()))
+
+
+class _WMAState(_WindowState):
+    """`np.nanmean(w * x)` of the window with the linear weights `w = (1, 2, ..., L) / sum(1, 2, ..., L)`"""
+
+    def __init__(self, N: int):
+        super().__init__(N)
+        self.nobs = 0
+        self.total = 0.0  # sum of the valid values
+        self.weighted = 0.0  # sum of k * x_k, k is the 1-based position in the window
+        self.size = 0  # the number of the values in the window
+        self.steps = 0
+
+    def update(self, value):
+        val = _prepare(value)
+        removed = self._push(val)
+        self.size = len(self.window) if self.N else self.size + 1
+        if removed is not None:
+            # the positions of the values left in the window decrease by one
+            if not math.isnan(removed):
+                self.nobs -= 1
+                self.total -= removed
+                self.weighted -= removed
+            self.weighted -= self.total
+        if not math.isnan(val):
+            self.nobs += 1
+            self.total += val
+            self.weighted += self.size * val
+        self.steps += 1
+        if self.N and self.steps % self.N == 0:
+            # sum the window again from time to time to avoid the accumulation of the rounding errors
+            values = np.fromiter(self.window, dtype=np.float64, count=len(self.window))
+            valid = ~np.isnan(values)
+            self.total = values[valid].sum()
+            self.weighted = (np.arange(1, len(values) + 1)[valid] * values[valid]).sum()
+        if self.nobs == 0:
+            return math.nan
+        return self.weighted / (self.size * (self.size + 1) / 2) / self.nobs
+
+
+class _EWMState(StreamState):
+    """`ewm(alpha=alpha, min_periods=1).mean()` of pandas"""
+
+    def __init__(self, alpha: float):
+        self.old_wt_factor = 1.0 - alpha
+        self.weighted = None
+        self.old_wt = 1.0
+
+    def update(self, value):
+        cur = _prepare(value)
+        if self.weighted is None:
+            self.weighted = cur
+        elif not math.isnan(self.weighted):
+            self.old_wt *= self.old_wt_factor
+            if not math.isnan(cur):
+                # avoid numerical errors on constant series
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + cur) / (self.old_wt + 1.0)
+                self.old_wt += 1.0
+        elif not math.isnan(cur):
+            self.weighted = cur
+        return self.weighted
+
+
+class _RegressionState(StreamState):
+    """slope / r-square / residuals, computed by the same cython windows as the batch operators"""
+
+    def __init__(self, N: int, func: str):
+        name = func.capitalize()
+        self.window = getattr(_rolling, name)(N) if N else getattr(_expanding, name)()
+        # the r-square of the batch operator is masked where the values are constant
+        self.std = _VarState(N, "std") if func == "rsquare" and N else None
+
+    def update(self, value):
+        res = self.window.push(value)
+        if self.std is not None and self.std.update(value) <= 2e-05:
+            return math.nan
+        return res
+
+
+#################### Pair-Wise Rolling ####################
+
+
+class _PairRollingState(StreamState):
+    """rolling covariance / correlation of pandas from the rolling means of the pairs of valid values"""
+
+    def __init__(self, N: int, func: str):
+        self.corr = func == "corr"
+        self.mean_xy, self.mean_x, self.mean_y = _MeanState(N), _MeanState(N), _MeanState(N)
+        if self.corr:
+            self.var_x, self.var_y = _VarState(N), _VarState(N)
+            self.std_left, self.std_right = _VarState(N, "std"), _VarState(N, "std")
+
+    def update(self, left, right):
+        # the values of both sides are masked where any of them is nan, like `(left + 0 * right)` in pandas
+        x, y = _prepare(left), _prepare(right)
+        if math.isnan(x) or math.isnan(y):
+            x = y = math.nan
+        self.mean_xy.add(x * y)
+        self.mean_x.add(x)
+        self.mean_y.add(y)
+        count = self.mean_x.nobs
+        if count <= 1:
+            res = math.nan
+        else:
+            res = (self.mean_xy.mean - self.mean_x.mean * self.mean_y.mean) * (count / (count - 1))
+        if not self.corr:
+            return res
+        self.var_x.add(x)
+        self.var_y.add(y)
+        std_left, std_right = self.std_left.update(left), self.std_right.update(right)
+        if std_left <= 2e-05 or std_right <= 2e-05:
+            return math.nan
+        denominator = math.sqrt(self.var_x.var * self.var_y.var)
+        return res / denominator if denominator != 0 else math.nan
+
+
+def _rolling_state(expression: ops.Rolling) -> Callable[[], StreamState]:
+    N = expression.N
+    if isinstance(expression, (ops.Ref, ops.Delta)):
+        if not isinstance(N, int) or N < 0:
+            raise NotImplementedError(f"{expression}: the future data can not be streamed")
+        return partial(_RefState, N, isinstance(expression, ops.Delta))
+    if isinstance(expression, ops.EMA):
+        if N == 0:
+            raise NotImplementedError(f"{expression}: the decay of the expanding EMA changes with every new value")
+        return partial(_EWMState, N if 0 < N < 1 else 2.0 / (N + 1))
+    if isinstance(N, float) and 0 < N < 1 and type(expression)._rolling is ops.Rolling._rolling:
+        # the rolling operators with a float window are exponentially weighted means
+        return partial(_EWMState, N)
+    if not isinstance(N, int) or N < 0:
+        raise NotImplementedError(f"{expression}: unsupported window {N}")
+    func = expression.func
+    if N == 0 and isinstance(expression, (ops.Quantile, ops.Med, ops.Rank, ops.Mad)):
+        raise NotImplementedError(f"{expression}: the expanding order statistics would keep all the history")
+    if isinstance(expression, (ops.Mean, ops.Sum)):
+        return partial(_MeanState, N, func)
+    if isinstance(expression, (ops.Std, ops.Var)):
+        return partial(_VarState, N, func)
+    if isinstance(expression, (ops.Skew, ops.Kurt)):
+        return partial(_MomentState, N, func)
+    if isinstance(expression, (ops.Max, ops.Min, ops.IdxMax, ops.IdxMin)):
+        return partial(_ExtremeState, N, func)
+    if isinstance(expression, ops.Count):
+        return partial(_CountState, N)
+    if isinstance(expression, ops.Quantile):
+        return partial(_OrderState, N, func, expression.qscore)
+    if isinstance(expression, (ops.Med, ops.Rank)):
+        return partial(_OrderState, N, func)
+    if isinstance(expression, ops.Mad):
+        return partial(_MadState, N)
+    if isinstance(expression, ops.WMA):
+        return partial(_WMAState, N)
+    if isinstance(expression, (ops.Slope, ops.Rsquare, ops.Resi)):
+        return partial(_RegressionState, N, func)
+    raise NotImplementedError(f"{expression}: unsupported rolling operator")
+
+
+def get_stream_state(expression: Expression) -> Tuple[Callable[[], StreamState], list]:
+    """Get the factory of the state of an operator and its operands
+
+    Raises
+    ------
+    NotImplementedError
+        if the operator can not be evaluated incrementally.
+    """
+    if type(expression).__module__ != ops.__name__:
+        raise NotImplementedError(f"{expression}: the custom operators can not be streamed")
+    if isinstance(expression, (ops.ChangeInstrument, ops.Mask)):
+        raise NotImplementedError(f"{expression}: the operators reading other instruments can not be streamed")
+    if isinstance(expression, ops.Sign):
+        return _SignState, [expression.feature]
+    if isinstance(expression, ops.NpElemOperator):
+        return partial(_ElemState, expression.func), [expression.feature]
+    if isinstance(expression, ops.NpPairOperator):
+        return partial(_PairState, expression.func), [expression.feature_left, expression.feature_right]
+    if isinstance(expression, ops.If):
+        return _IfState, [expression.condition, expression.feature_left, expression.feature_right]
+    if isinstance(expression, ops.Rolling):
+        return _rolling_state(expression), [expression.feature]
+    if isinstance(expression, (ops.Corr, ops.Cov)):
+        if not isinstance(expression.N, int) or expression.N < 0:
+            raise NotImplementedError(f"{expression}: unsupported window {expression.N}")
+        return partial(_PairRollingState, expression.N, expression.func), [
+            expression.feature_left,
+            expression.feature_right,
+        ]
+    raise NotImplementedError(f"{expression}: unsupported operator")
+
+
+class StreamEvaluator:
+    """Evaluate fields incrementally, one bar at a time
+
+    Parameters
+    ----------
+    fields : List[Union[str, Expression]]
+        the fields to be computed, e.g. `["$close", "Mean($close, 5) / $close"]`.
+
+    Raises
+    ------
+    NotImplementedError
+        if a field contains an operator which can not be evaluated incrementally.
+    """
+
+    def __init__(self, fields: List[Union[str, Expression]]):
+        self.fields = [str(f) for f in fields]
+        self.expressions = [f if isinstance(f, Expression) else eval(parse_field(f)) for f in fields]
+        self._index: Dict[str, int] = {}
+        self._factories: List[Union[Callable[[], StreamState], None]] = []
+        self._operands: List[List[int]] = []
+        self._features: List[Tuple[int, str]] = []  # (node, name)
+        self._constants: List[Tuple[int, object]] = []  # (node, value)
+        self._outputs = [self._compile(e) for e in self.expressions]
+        self._states: Dict[str, List[Union[StreamState, None]]] = {}
+        self._last_time: Dict[str, pd.Timestamp] = {}
+
+    def _compile(self, expression) -> int:
+        """add the nodes of `expression` (operands first) and return the index of its node"""
+        key = str(expression) if isinstance(expression, Expression) else f"{type(expression).__name__}:{expression}"
+        if key in self._index:
+            return self._index[key]
+        if not isinstance(expression, Expression):
+            self._constants.append((len(self._factories), expression))
+            factory, operands = None, []
+        elif isinstance(expression, PFeature):
+            raise NotImplementedError(f"{expression}: the point-in-time features can not be streamed")
+        elif isinstance(expression, Feature):
+            self._features.append((len(self._factories), str(expression)[1:].lower()))
+            factory, operands = None, []
+        else:
+            factory, operands = get_stream_state(expression)
+            operands = [self._compile(e) for e in operands]
+        self._index[key] = len(self._factories)
+        self._factories.append(factory)
+        self._operands.append(operands)
+        return self._index[key]
+
+    @property
+    def n_nodes(self) -> int:
+        """number of nodes in the DAG after removing the common sub-expressions"""
+        return len(self._factories)
+
+    @property
+    def features(self) -> List[str]:
+        """names of the raw features (without `$`) the bars must contain"""
+        return [name for _, name in self._features]
+
+    def reset(self, instrument: str = None):
+        """forget the states of `instrument` (of all the instruments if None)"""
+        if instrument is None:
+            self._states.clear()
+            self._last_time.clear()
+        else:
+            self._states.pop(instrument, None)
+            self._last_time.pop(instrument, None)
+
+    def _get_states(self, instrument: str) -> List[Union[StreamState, None]]:
+        states = self._states.get(instrument)
+        if states is None:
+            states = self._states[instrument] = [None if f is None else f() for f in self._factories]
+        return states
+
+    def _update(self, instrument: str, bar) -> list:
+        values = [None] * len(self._factories)
+        for i, value in self._constants:
+            values[i] = value
+        for i, name in self._features:
+            # the features are float32 like the data loaded from the bin files
+            values[i] = np.float32(bar.get(name, bar.get("$" + name, np.nan)))
+        for i, (state, operands) in enumerate(zip(self._get_states(instrument), self._operands)):
+            if state is not None:
+                values[i] = state.update(*[values[j] for j in operands])
+        return [values[i] for i in self._outputs]
+
+    def update(self, instrument: str, bar, time: pd.Timestamp = None) -> pd.Series:
+        """Feed the next bar of `instrument` and get the newest values of the fields
+
+        Parameters
+        ----------
+        instrument : str
+            the instrument of the bar.
+        bar : Union[dict, pd.Series]
+            the raw features of the bar, the keys are the feature names with or without `$`, e.g. `{"close": 1.0}`.
+            The missing features are nan. A missing bar must be fed as a bar of nan to keep the windows aligned.
+        time : pd.Timestamp
+            the time of the bar. If given, the bars of an instrument must be fed in ascending order of time.
+
+        Returns
+        -------
+        pd.Series
+            the values of the fields, named by `time`.
+        """
+        if time is not None:
+            last_time = self._last_time.get(instrument)
+            if last_time is not None and time <= last_time:
+                raise ValueError(f"{instrument}: the bar at {time} is not after the last bar at {last_time}")
+            self._last_time[instrument] = time
+        return pd.Series(self._update(instrument, bar), index=self.fields, name=time, dtype=np.float64)
+
+    def warmup(self, instrument: str, data: pd.DataFrame) -> pd.DataFrame:
+        """Feed the historical bars of `instrument` in order
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            the raw features of the bars, one row per bar; the columns are the feature names with or without `$`.
+            The index (e.g. the output of `D.features` for one instrument) is the time of the bars.
+
+        Returns
+        -------
+        pd.DataFrame
+            the values of the fields for every bar.
+        """
+        if isinstance(data.index, pd.MultiIndex):
+            data = data.droplevel([n for n in data.index.names if n != "datetime"])
+        columns = [str(c).lstrip("$").lower() for c in data.columns]
+        rows = [self._update(instrument, dict(zip(columns, row))) for row in data.itertuples(index=False, name=None)]
+        if len(data) > 0 and isinstance(data.index, pd.DatetimeIndex):
+            self._last_time[instrument] = data.index[-1]
+        return pd.DataFrame(rows, index=data.index, columns=self.fields, dtype=np.float64)
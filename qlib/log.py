@@ -5,12 +5,19 @@
 import logging
 from typing import Optional, Text, Dict, Any
 import re
+import sys
+import tracemalloc
 from logging import config as logging_config
 from time import time
 from contextlib import contextmanager
 
 from .config import C
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 
 class MetaLogger(type):
     def __new__(mcs, name, bases, attrs):  # pylint: disable=C0204
@@ -149,6 +156,51 @@ class TimeInspector:
         cls.log_cost_time(info=f"{name} Done")
 
 
+class MemoryInspector:
+    memory_logger = get_module_logger("memory")
+
+    @classmethod
+    @contextmanager
+    def logm(cls, name=""):
+        """logm.
+        Log the peak memory of the inside code
+
+        If ``tracemalloc`` is tracing (e.g. ``PYTHONTRACEMALLOC=1``), the peak of the memory allocated by the code
+        above the memory allocated before it is logged. Else the increase of the peak RSS of the process is logged,
+        which is 0 if the process used more memory before. The blocks should not be nested.
+
+        Parameters
+        ----------
+        name :
+            name
+
+        Returns
+        -------
+        dict
+            ``{"peak": <bytes>}`` is set when the inside code is done
+        """
+        stats = {}
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                yield stats
+            finally:
+                stats["peak"] = tracemalloc.get_traced_memory()[1] - start
+                cls.memory_logger.info(f"Peak memory: {stats['peak'] / 2**20:.1f}MB | {name}")
+        elif resource is not None:
+            # KB on linux, bytes on macOS
+            unit = 1 if sys.platform == "darwin" else 1024
+            start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            try:
+                yield stats
+            finally:
+                stats["peak"] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start) * unit
+                cls.memory_logger.info(f"Peak RSS increase: {stats['peak'] / 2**20:.1f}MB | {name}")
+        else:
+            yield stats
+
+
 def set_log_with_config(log_config: Dict[Text, Any]):
     """set log with config
 
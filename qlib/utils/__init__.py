@@ -16,6 +16,7 @@ import struct
 import difflib
 import inspect
 import hashlib
+import importlib.util
 import datetime
 import requests
 import collections
@@ -575,6 +576,11 @@ def can_use_cache():
     return res
 
 
+def can_use_file_lock():
+    """whether the file locks of the disk caches are supported on this platform"""
+    return importlib.util.find_spec("fcntl") is not None
+
+
 def exists_qlib_data(qlib_dir):
     qlib_dir = Path(qlib_dir).expanduser()
     if not qlib_dir.exists():
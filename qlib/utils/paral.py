@@ -1,10 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import atexit
+import hashlib
+import pickle
 import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import partial
 from threading import Thread
-from typing import Callable, Text, Union
+from typing import Callable, Hashable, Iterable, List, Optional, Text, Union
 
 import joblib
 from joblib import Parallel, delayed
@@ -30,6 +36,130 @@ class ParallelExt(Parallel):
                 self._backend_kwargs["maxtasksperchild"] = maxtasksperchild  # pylint: disable=E1101
 
 
+def _register_worker(qlib_config: QlibConfig, fingerprint: str, reset: bool):
+    """register the qlib config in a worker of `WorkerPool`"""
+    from qlib.data.cache import H  # pylint: disable=C0415
+
+    if reset:
+        # the config has changed, the cached data may be stale
+        H.clear()
+    C.register_from_C(qlib_config, skip_register=not reset)
+    return fingerprint
+
+
+class WorkerPool:
+    """
+    Long-lived worker processes for the tasks created by `joblib.delayed`.
+
+    `ParallelExt` starts new workers for every call: they register the qlib config again and their memory caches
+    (`H`) are empty. The processes of a `WorkerPool` are kept alive between calls together with their caches, and the
+    tasks with the same key (e.g. the instrument) always go to the same worker, so the repeated queries of a key hit
+    the warm caches of its worker.
+
+    The workers register the config of the main process again (and clear their caches) when it changes, e.g. after
+    `qlib.init`. Call `shutdown` to drop the caches after the data has been updated on the disk.
+
+    Parameters
+    ----------
+    n_workers : int
+        number of worker processes, they are started on demand.
+    """
+
+    def __init__(self, n_workers: int):
+        self.n_workers = max(int(n_workers), 1)
+        self._executors: List[Optional[ProcessPoolExecutor]] = [None] * self.n_workers
+        self._fingerprints: List[Optional[str]] = [None] * self.n_workers
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def worker_of(self, key: Hashable) -> int:
+        """the index of the worker running the tasks of `key`"""
+        return zlib.crc32(str(key).encode("utf-8")) % self.n_workers
+
+    @staticmethod
+    def _config_fingerprint() -> str:
+        return hashlib.md5(pickle.dumps(C.__getstate__(), protocol=C.dump_protocol_version)).hexdigest()
+
+    def _get_executor(self, i: int, fingerprint: str) -> ProcessPoolExecutor:
+        if self._executors[i] is None:
+            self._executors[i] = ProcessPoolExecutor(max_workers=1)
+            self._fingerprints[i] = None
+        if self._fingerprints[i] != fingerprint:
+            # a worker runs its tasks in order, so the config is registered before the next tasks
+            self._executors[i].submit(_register_worker, C, fingerprint, self._fingerprints[i] is not None)
+            self._fingerprints[i] = fingerprint
+        return self._executors[i]
+
+    def __call__(self, tasks: Iterable[tuple], keys: Iterable[Hashable] = None) -> list:
+        """Run the tasks and return their results in order
+
+        Parameters
+        ----------
+        tasks : Iterable[tuple]
+            the tasks created by `joblib.delayed`.
+        keys : Iterable[Hashable]
+            the affinity key of every task. The tasks are dispatched in a round-robin way if None.
+        """
+        tasks = list(tasks)
+        if keys is None:
+            workers = [(self._next + i) % self.n_workers for i in range(len(tasks))]
+            self._next = (self._next + len(tasks)) % self.n_workers
+        else:
+            workers = [self.worker_of(key) for key in keys]
+        fingerprint = self._config_fingerprint()
+        with self._lock:
+            futures = [
+                (i, self._get_executor(i, fingerprint).submit(func, *args, **kwargs))
+                for (func, args, kwargs), i in zip(tasks, workers)
+            ]
+        res = []
+        for i, future in futures:
+            try:
+                res.append(future.result())
+            except BrokenProcessPool:
+                # the worker died (e.g. killed by the OOM killer), it will be restarted by the next call
+                with self._lock:
+                    self._executors[i] = None
+                raise
+        return res
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        """stop the workers, they are started again by the next call"""
+        with self._lock:
+            for executor in self._executors:
+                if executor is not None:
+                    executor.shutdown(wait=wait)
+            self._executors = [None] * self.n_workers
+            self._fingerprints = [None] * self.n_workers
+
+
+_worker_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool(n_workers: int) -> WorkerPool:
+    """Get the worker pool shared by the data providers, it is replaced if `n_workers` changes"""
+    global _worker_pool  # pylint: disable=W0603
+    if _worker_pool is None or _worker_pool.n_workers != n_workers:
+        if _worker_pool is None:
+            atexit.register(shutdown_worker_pool)
+        else:
+            _worker_pool.shutdown()
+        _worker_pool = WorkerPool(n_workers)
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    """Stop the workers of the shared worker pool and drop their caches"""
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+
+
 def datetime_groupby_apply(
     df, apply_func: Union[Callable, Text], axis=0, level="datetime", resample_rule="ME", n_jobs=-1
 ):
@@ -0,0 +1,109 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+End-to-end benchmark of `dump_bin.py` on a synthetic universe of high frequency csv files.
+
+The source files look like the 1min bars of the crypto collector: the symbols are listed one after another, some bars
+are missing. `DumpDataAll` dumps the first part of the bars and `DumpDataUpdate` appends the rest.
+
+Usage:
+    python benchmark_dump_bin.py run --work_dir ~/.qlib/dump_bin_benchmark --n_symbols 5000 --max_workers 1
+"""
+
+import resource
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from dump_bin import DumpDataAll, DumpDataUpdate  # noqa: E402
+
+FIELDS = ["open", "high", "low", "close", "volume", "vwap"]
+
+
+def make_source(
+    source_dir: Path, n_symbols: int, start: pd.Timestamp, periods: int, freq: str, seed: int, list_step: int = 1
+):
+    """write a csv file of bars per symbol, the i-th symbol is listed `i * list_step` bars after `start`"""
+    source_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=periods, freq=freq)
+    for i in range(n_symbols):
+        symbol_dates = dates[min(i * list_step, periods - 1) :]
+        symbol_dates = symbol_dates[rng.random(len(symbol_dates)) > 0.02]  # the missing bars
+        close = 100 + rng.normal(size=len(symbol_dates)).cumsum()
+        df = pd.DataFrame({f: close + rng.normal(size=len(close)) for f in FIELDS[:4]})
+        df["volume"] = rng.integers(0, 1000, size=len(close)).astype(float)
+        df["vwap"] = close
+        df.insert(0, "date", symbol_dates)
+        df["symbol"] = f"PAIR{i:05d}"
+        df.to_csv(source_dir.joinpath(f"PAIR{i:05d}.csv"), index=False)
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _max_rss_mb() -> float:
+    # KB on linux, the children are the workers of the dumpers
+    usage = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return max(usage) / 1024
+
+
+def run(
+    work_dir: str = "~/.qlib/dump_bin_benchmark",
+    n_symbols: int = 5000,
+    periods: int = 2000,
+    update_periods: int = 400,
+    freq: str = "1min",
+    max_workers: int = 1,
+):
+    """
+    Parameters
+    ----------
+    work_dir: str
+        the directory of the source files and the dumped data, it is cleared first
+    n_symbols: int
+        the number of the symbols
+    periods: int
+        the number of the bars dumped by `DumpDataAll`
+    update_periods: int
+        the number of the bars appended by `DumpDataUpdate`
+    freq: str
+        the frequency of the bars, in pandas format
+    max_workers: int
+        the processes of the dumpers
+    """
+    work_dir = Path(work_dir).expanduser()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    start = pd.Timestamp("2024-01-01")
+    all_dir, update_dir, qlib_dir = work_dir.joinpath("source"), work_dir.joinpath("update"), work_dir.joinpath("qlib")
+    make_source(all_dir, n_symbols, start, periods, freq, seed=0)
+    update_start = start + periods * pd.Timedelta(freq)
+    make_source(update_dir, n_symbols, update_start, update_periods, freq, seed=1, list_step=0)
+    logger.info(f"source: {_dir_size(all_dir) / 2**20:.0f}MB, update: {_dir_size(update_dir) / 2**20:.0f}MB")
+
+    kwargs = dict(qlib_dir=qlib_dir, freq=freq, max_workers=max_workers, exclude_fields="symbol")
+    for dumper_cls, data_path in [(DumpDataAll, all_dir), (DumpDataUpdate, update_dir)]:
+        # `DumpDataUpdate` reads the calendar of the dumped data when it is created
+        dumper = dumper_cls(data_path=data_path, **kwargs)
+        t = time.time()
+        dumper.dump()
+        logger.info(f"{dumper_cls.__name__}: {time.time() - t:.1f}s, max rss {_max_rss_mb():.0f}MB")
+
+    # sanity check of the dumped data
+    calendar = qlib_dir.joinpath("calendars", f"{freq}.txt").read_text().split("\n")[:-1]
+    instruments = qlib_dir.joinpath("instruments", "all.txt").read_text().split("\n")[:-1]
+    assert len(calendar) == periods + update_periods, len(calendar)
+    assert len(instruments) == n_symbols, len(instruments)
+    logger.info(f"dumped {len(instruments)} instruments on {len(calendar)} {freq} bars")
+
+
+if __name__ == "__main__":
+    fire.Fire({"run": run})
@@ -0,0 +1,230 @@
+"""Asynchronous OHLCV fetching shared by all the symbols of an exchange.
+
+The requests of the symbols are pipelined in one event loop: a bounded pool of workers takes the symbols one by one,
+the requested range of a symbol is split into pages of ``limit`` bars which are fetched concurrently, and every request
+takes a token from the rate limiter of its exchange first, so the whole universe is fetched as fast as the exchange
+allows while only the pages of the symbols in progress are scheduled and kept in memory.
+
+The exchange can be any object with the async ``fetch_ohlcv(symbol, timeframe, since, limit)`` interface of
+``ccxt.async_support`` (e.g. a fake exchange serving canned pages in the tests).
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+
+
+class TokenBucket:
+    """Token bucket rate limiter of the coroutines.
+
+    The tokens are kept across the event loops (e.g. the successive ``asyncio.run`` of the retries), the lock serving
+    the waiting coroutines in order is created per event loop.
+
+    Parameters
+    ----------
+    rate : float
+        the number of tokens added per second, i.e. the sustained number of requests per second.
+    capacity : float
+        the maximum number of tokens, i.e. the burst size. Defaults to ``rate``.
+    clock : Callable
+        the clock in seconds.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = None
+        self._loop = None
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1):
+        """wait until `tokens` are available and take them, the waiting coroutines are served in order"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+# the rate limiters shared by the fetchers of the same exchange and rate
+_rate_limiters: Dict[Tuple[str, float, Optional[float]], TokenBucket] = {}
+
+
+def get_rate_limiter(exchange_id: str, rate: float, capacity: float = None) -> TokenBucket:
+    """Get the token bucket of `exchange_id` with `rate` and `capacity`, it is created by the first call"""
+    key = (exchange_id, float(rate), capacity)
+    if key not in _rate_limiters:
+        _rate_limiters[key] = TokenBucket(rate, capacity)
+    return _rate_limiters[key]
+
+
+async def _run_pool(items: Iterable, func: Callable[..., Awaitable], n_workers: int):
+    """await `func(item)` for all the items by `n_workers` coroutines, so the items are not all scheduled up front"""
+    items = iter(items)
+
+    async def _worker():
+        for item in items:
+            await func(item)
+
+    await asyncio.gather(*[_worker() for _ in range(max(n_workers, 1))])
+
+
+class AsyncOHLCVFetcher:
+    """Fetch the OHLCV bars of many symbols concurrently.
+
+    Parameters
+    ----------
+    exchange :
+        the ``ccxt.async_support`` exchange.
+    limiter : TokenBucket
+        the rate limiter of the exchange.
+    timeframe : str
+        the ccxt timeframe, e.g. "1m".
+    limit : int
+        the maximum number of bars per request.
+    max_concurrency : int
+        the maximum number of requests in flight.
+    max_symbols : int
+        the maximum number of symbols fetched at the same time. Defaults to ``max_concurrency``.
+    max_retries : int
+        the number of retries of a failed request.
+    retry_delay : float
+        the delay in seconds before the first retry, it is doubled after every retry.
+    """
+
+    def __init__(
+        self,
+        exchange,
+        limiter: TokenBucket,
+        timeframe: str,
+        limit: int = 1000,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        max_symbols: int = None,
+    ):
+        self.exchange = exchange
+        self.limiter = limiter
+        self.timeframe = timeframe
+        self.limit = limit
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_symbols = max_concurrency if max_symbols is None else max_symbols
+        self.step = int(exchange.parse_timeframe(timeframe) * 1000)
+        self.n_requests = 0
+        self._semaphore = None
+
+    async def _request(self, symbol: str, since: int) -> list:
+        delay = self.retry_delay
+        for i in range(self.max_retries + 1):
+            async with self._semaphore:
+                await self.limiter.acquire()
+                self.n_requests += 1
+                try:
+                    return await self.exchange.fetch_ohlcv(
+                        symbol, timeframe=self.timeframe, since=since, limit=self.limit
+                    )
+                except Exception as e:  # pylint: disable=W0703
+                    if i == self.max_retries:
+                        raise
+                    logger.warning(f"{symbol}-{self.timeframe}-{since}: {e}, retry in {delay}s")
+            await asyncio.sleep(delay)
+            delay *= 2
+        return []
+
+    async def _fetch_page(self, symbol: str, start: int, stop: int) -> list:
+        """fetch the bars in [start, stop), the exchange may return less than `limit` bars per request"""
+        bars = []
+        since = start
+        while since < stop:
+            ohlcvs = await self._request(symbol, since)
+            ohlcvs = [bar for bar in ohlcvs or [] if since <= bar[0] < stop]
+            if not ohlcvs:
+                break
+            bars.extend(ohlcvs)
+            since = ohlcvs[-1][0] + self.step
+        return bars
+
+    async def fetch_symbol(self, symbol: str, start: int, end: int) -> List[list]:
+        """fetch the bars of `symbol` in [start, end] (milliseconds), the pages are fetched concurrently"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        page = self.step * self.limit
+        bars = {}
+
+        async def _fetch(since):
+            for bar in await self._fetch_page(symbol, since, min(since + page, end + 1)):
+                bars.setdefault(bar[0], bar)
+
+        await _run_pool(range(start, end + 1, page), _fetch, self.max_concurrency)
+        return [bars[ts] for ts in sorted(bars)]
+
+    async def fetch_each(
+        self,
+        symbols: Iterable[str],
+        start: Union[int, Dict[str, int]],
+        end: int,
+        callback: Callable[[str, list], None],
+    ) -> List[str]:
+        """
+        Fetch the bars of the symbols in [start, end] (milliseconds), `start` can be given per symbol.
+
+        `callback(symbol, bars)` is called as soon as a symbol is fetched (e.g. to save it), the bars are not kept.
+
+        Returns
+        -------
+        List[str]:
+            the failed symbols
+        """
+        failed = []
+
+        async def _fetch(symbol):
+            try:
+                bars = await self.fetch_symbol(symbol, start[symbol] if isinstance(start, dict) else start, end)
+            except Exception as e:  # pylint: disable=W0703
+                logger.warning(f"{symbol}-{self.timeframe}: {e}")
+                failed.append(symbol)
+                return
+            callback(symbol, bars)
+
+        await _run_pool(symbols, _fetch, self.max_symbols)
+        return failed
+
+    async def fetch_all(
+        self,
+        symbols: Iterable[str],
+        start: Union[int, Dict[str, int]],
+        end: int,
+        callback: Optional[Callable[[str, list], None]] = None,
+    ) -> Dict[str, Optional[List[list]]]:
+        """
+        Fetch and return the bars of all the symbols, see `fetch_each`. The result of a failed symbol is None.
+
+        All the bars are kept until the end, use `fetch_each` for a large universe.
+        """
+        res = {}
+
+        def _callback(symbol, bars):
+            res[symbol] = bars
+            if callback is not None:
+                callback(symbol, bars)
+
+        for symbol in await self.fetch_each(symbols, start, end, _callback):
+            res[symbol] = None
+        return res
@@ -0,0 +1,212 @@
+"""Incremental update of a crypto qlib directory.
+
+Instead of downloading the whole history and dumping it again, the last stored bar of every symbol is read from
+``FileFeatureStorage.end_index``, only the missing bars are fetched and they are appended to the feature files.
+
+An update run keeps a checkpoint manifest ``<qlib_dir>/.backfill.<freq>.json`` with the bars appended to every
+finished symbol. An interrupted run started again with the same ``end`` skips the finished symbols, and the
+instruments file is only rewritten once at the end of the run.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from qlib.data.storage.file_storage import FileCalendarStorage, FileFeatureStorage, FileInstrumentStorage
+
+# the offsets of the calendars of the intervals supported by the crypto collector
+FREQ_OFFSET = {"1min": "1min", "1h": "1h", "1d": "1D"}
+
+
+def last_complete_bar(freq: str, now=None) -> pd.Timestamp:
+    """the last bar of `freq` which is closed at `now` (UTC)"""
+    now = pd.Timestamp.utcnow().tz_localize(None) if now is None else pd.Timestamp(now)
+    return now.floor(FREQ_OFFSET[freq]) - pd.Timedelta(FREQ_OFFSET[freq])
+
+
+class BackfillCheckpoint:
+    """The checkpoint manifest of an update run.
+
+    Parameters
+    ----------
+    path : Path
+        the json file of the manifest, it is loaded if it exists.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.end = None
+        self.symbols = {}
+        if self.path.exists():
+            with self.path.open("r") as f:
+                manifest = json.load(f)
+            self.end, self.symbols = manifest["end"], manifest["symbols"]
+
+    def reset(self, end: pd.Timestamp):
+        self.end = str(end)
+        self.symbols = {}
+        self.save()
+
+    def commit(self, symbol: str, first: Optional[pd.Timestamp], last: Optional[pd.Timestamp]):
+        """record that the bars of `symbol` in [first, last] have been appended, None if there are no new bars"""
+        self.symbols[symbol] = [None if first is None else str(first), None if last is None else str(last)]
+        self.save()
+
+    def save(self):
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"end": self.end, "symbols": self.symbols}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+def _end_index(fs: FileFeatureStorage) -> Optional[int]:
+    return fs.end_index if fs.uri.exists() and fs.uri.stat().st_size >= 4 else None
+
+
+def _extend_calendar(cs: FileCalendarStorage, freq: str, start, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """extend the calendar with the bars of `freq` until `end`, crypto is traded around the clock"""
+    if not cs.uri.exists():
+        cs.clear()
+    calendar = pd.DatetimeIndex(pd.to_datetime(cs[:]))
+    if len(calendar) > 0:
+        first = calendar[-1] + pd.Timedelta(FREQ_OFFSET[freq])
+    elif start is not None:
+        first = pd.Timestamp(start).ceil(FREQ_OFFSET[freq])
+    else:
+        raise ValueError("start is required to update an empty qlib directory")
+    new_calendar = pd.date_range(first, end, freq=FREQ_OFFSET[freq])
+    if len(new_calendar) > 0:
+        fmt = "%Y-%m-%d" if freq == "1d" else "%Y-%m-%d %H:%M:%S"
+        cs.extend([d.strftime(fmt) for d in new_calendar])
+    return calendar.append(new_calendar)
+
+
+def _update_instruments(is_storage: FileInstrumentStorage, instruments: dict, ranges: Dict[str, list]):
+    for symbol, (first, last) in ranges.items():
+        if last is None:
+            continue
+        start = instruments[symbol][0][0] if symbol in instruments else pd.Timestamp(first)
+        instruments[symbol] = [(start, pd.Timestamp(last))]
+    is_storage.update(instruments)
+
+
+def update_qlib(
+    qlib_dir: [str, Path],
+    freq: str,
+    fetch: Callable[[Dict[str, pd.Timestamp], pd.Timestamp, Callable[[str, pd.DataFrame], None]], None],
+    symbols: Iterable[str] = None,
+    start=None,
+    end=None,
+    date_field_name: str = "date",
+    symbol_field_name: str = "symbol",
+) -> Dict[str, List[str]]:
+    """
+    Append the missing bars of `symbols` to `qlib_dir`.
+
+    Parameters
+    ----------
+    qlib_dir : [str, Path]
+        the qlib directory written by ``dump_to_qlib``.
+    freq : str
+        the interval of the collector, 1min, 1h or 1d.
+    fetch : Callable
+        ``fetch(since, end, callback)`` downloads the bars of every symbol in ``[since[symbol], end]`` and calls
+        ``callback(symbol, df)`` with the bars of each symbol, the columns of `df` are `date_field_name` and the
+        fields.
+    symbols : Iterable[str]
+        the instruments to update, by default all the instruments of `qlib_dir`.
+    start :
+        the first bar of the new instruments, by default the first bar of the calendar.
+    end :
+        the last bar to update, by default the last complete bar.
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        the updated, skipped(up to date or resumed) and failed symbols.
+    """
+    qlib_dir = Path(qlib_dir).expanduser()
+    for sub in ["calendars", "features", "instruments"]:
+        qlib_dir.joinpath(sub).mkdir(parents=True, exist_ok=True)
+    provider_uri = {freq: str(qlib_dir)}
+    end = last_complete_bar(freq) if end is None else pd.Timestamp(end)
+
+    is_storage = FileInstrumentStorage(market="all", freq=freq, provider_uri=provider_uri)
+    instruments = is_storage.data if is_storage.uri.exists() else {}
+    checkpoint = BackfillCheckpoint(qlib_dir.joinpath(f".backfill.{freq}.json"))
+    if checkpoint.end != str(end):
+        if checkpoint.end is not None:
+            # the previous run was interrupted, the bars of its finished symbols have been appended already
+            logger.warning(f"discard the checkpoint of the update to {checkpoint.end}")
+            _update_instruments(is_storage, instruments, checkpoint.symbols)
+        checkpoint.reset(end)
+
+    calendar = _extend_calendar(
+        FileCalendarStorage(freq=freq, future=False, provider_uri=provider_uri), freq, start, end
+    )
+    start = calendar[0] if start is None else max(pd.Timestamp(start), calendar[0])
+    res = {"updated": [], "skipped": [], "failed": []}
+    since = {}
+    for symbol in sorted(instruments) if symbols is None else symbols:
+        if symbol in checkpoint.symbols:
+            res["skipped"].append(symbol)
+            continue
+        feature_dir = qlib_dir.joinpath("features", symbol.lower())
+        end_indexes = [
+            _end_index(FileFeatureStorage(symbol, p.name.split(".")[0], freq, provider_uri=provider_uri))
+            for p in feature_dir.glob(f"*.{freq.lower()}.bin")
+        ]
+        end_indexes = [i for i in end_indexes if i is not None]
+        if not end_indexes:
+            since[symbol] = start
+        elif min(end_indexes) + 1 < len(calendar):
+            since[symbol] = calendar[min(end_indexes) + 1]
+        else:
+            res["skipped"].append(symbol)
+
+    def _append(symbol: str, df: pd.DataFrame):
+        df = df[(df[date_field_name] >= since[symbol]) & (df[date_field_name] <= end)]
+        df = df.drop_duplicates(date_field_name).sort_values(date_field_name)
+        index = calendar.get_indexer(df[date_field_name])
+        if (index < 0).any():
+            logger.warning(f"{symbol}: {(index < 0).sum()} bars are not on the calendar of {freq}")
+            df, index = df[index >= 0], index[index >= 0]
+        if df.empty:
+            checkpoint.commit(symbol, None, None)
+            res["skipped"].append(symbol)
+            return
+        first, last = index[0], index[-1]
+        qlib_dir.joinpath("features", symbol.lower()).mkdir(parents=True, exist_ok=True)
+        for field in [c for c in df.columns if c not in [date_field_name, symbol_field_name]]:
+            values = np.full(last - first + 1, np.nan)
+            values[index - first] = df[field].astype(float).values
+            fs = FileFeatureStorage(symbol, field, freq, provider_uri=provider_uri)
+            end_index = _end_index(fs)
+            # the fields may have been appended partly before an interruption
+            write_index = first if end_index is None else max(first, end_index + 1)
+            if write_index <= last:
+                fs.write(values[write_index - first :], index=write_index)
+        checkpoint.commit(symbol, calendar[first], calendar[last])
+        res["updated"].append(symbol)
+
+    if since:
+        logger.info(f"update {len(since)} symbols to {end}")
+        fetch(since, end, _append)
+    res["failed"] = [symbol for symbol in since if symbol not in checkpoint.symbols]
+
+    _update_instruments(is_storage, instruments, checkpoint.symbols)
+    if res["failed"]:
+        # the next run with the same end only fetches the failed symbols
+        logger.warning(f"failed symbols: {res['failed']}")
+    else:
+        checkpoint.remove()
+    return res
@@ -0,0 +1,229 @@
+"""Build the bars of higher frequencies from the 1min bars of a qlib directory.
+
+A bar of ``freq`` is labelled with its first minute (UTC) and holds the 1min bars up to the next label. The bars are
+written next to the 1min bars as ``calendars/<freq>.txt`` and ``features/<symbol>/<field>.<freq>.bin`` (or
+``fields.<freq>.mbin``), so ``D.features(..., freq=freq)`` reads them from disk instead of resampling them at query
+time. Hours are stored as minutes (``4h`` is ``240min``) because qlib only parses minutes, days, weeks and months.
+
+All the bars of a symbol are built at once by a segmented reduction: the 1min rows are split where their label
+changes and every field is reduced over the segments with ``ufunc.reduceat``.
+"""
+
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from pandas.tseries.frequencies import to_offset
+from tqdm import tqdm
+
+from data_collector.crypto.dump import format_calendar, load_calendar, make_executor, release_calendar, write_features
+from qlib.data.storage.file_storage import FileCalendarStorage
+from qlib.data.storage.multi_field_storage import MultiFieldBin
+from qlib.utils.time import Freq
+
+MINUTE = pd.Timedelta("1min").value
+DAY = pd.Timedelta("1D").value
+
+# the reduction of a field over the 1min bars of a bar, the other fields take the last value
+AGGREGATIONS = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+    "amount": "sum",
+    "trades": "sum",
+}
+
+
+def parse_freq(freq: str) -> Tuple[str, int]:
+    """the qlib name and the length (ns) of a bar frequency, e.g. ``("240min", 4 * 3600 * 10**9)`` for ``4h``"""
+    try:
+        count, base = Freq.parse(freq)
+        step = {Freq.NORM_FREQ_MINUTE: count * MINUTE, Freq.NORM_FREQ_DAY: count * DAY}.get(base)
+    except ValueError:
+        try:
+            step = pd.Timedelta(to_offset(freq)).value
+        except ValueError:
+            step = None
+    if step is None or step <= 0 or step % MINUTE:
+        raise ValueError(f"the bars of {freq} can not be built from 1min bars")
+    name = str(Freq(f"{step // DAY}day")) if step % DAY == 0 else f"{step // MINUTE}min"
+    return name, step
+
+
+def aggregate_bars(
+    dates: np.ndarray, values: np.ndarray, fields: List[str], step: int
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Reduce sorted bars to the bars of length ``step``.
+
+    Parameters
+    ----------
+    dates: np.ndarray
+        the sorted int64 (ns) dates of the bars.
+    values: np.ndarray
+        the (fields, rows) values of the bars, the rows with only nan are skipped.
+    fields: List[str]
+        the fields of ``values``, they are reduced by ``AGGREGATIONS``.
+    step: int
+        the length (ns) of the new bars.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, List[str]]
+        the labels of the new bars, their (fields, bars) float64 values and their fields. ``vwap`` is added if there
+        is a ``volume``, it is the volume-weighted ``vwap`` of the bars or else their typical price.
+    """
+    valid = ~np.isnan(values).all(axis=0)
+    dates, values = dates[valid], values[:, valid].astype(np.float64)
+    columns = dict(zip(fields, values))
+    price_fields = ["vwap"] if "vwap" in columns else [f for f in ["high", "low", "close"] if f in columns]
+    with_vwap = "volume" in columns and len(price_fields) > 0
+    out_fields = list(fields) + (["vwap"] if with_vwap and "vwap" not in columns else [])
+    if len(dates) == 0:
+        return dates, np.empty((len(out_fields), 0)), out_fields
+
+    labels = dates - dates % step
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+    res = {}
+    for field, x in columns.items():
+        how = AGGREGATIONS.get(field, "last")
+        if how == "first":
+            res[field] = x[starts]
+        elif how == "max":
+            res[field] = np.fmax.reduceat(x, starts)
+        elif how == "min":
+            res[field] = np.fmin.reduceat(x, starts)
+        elif how == "sum":
+            res[field] = np.add.reduceat(np.nan_to_num(x), starts)
+        else:
+            res[field] = x[ends]
+    if with_vwap:
+        price = np.mean([columns[f] for f in price_fields], axis=0)
+        value = np.add.reduceat(np.nan_to_num(price * columns["volume"]), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res["vwap"] = np.where(res["volume"] > 0, value / res["volume"], np.nan)
+    return labels[starts], np.array([res[f] for f in out_fields]), out_fields
+
+
+def read_features(symbol_dir: Path, freq: str, multi_field: bool = False) -> Tuple[List[str], int, np.ndarray]:
+    """read all the fields of a symbol as (fields, start index, (fields, rows) values)"""
+    freq = freq.lower()
+    if multi_field:
+        mbin = MultiFieldBin(symbol_dir.joinpath(f"fields.{freq}.mbin"))
+        mbin.refresh()
+        if mbin.end_index is None:
+            return [], 0, np.empty((0, 0), dtype="<f")
+        _, values = mbin.read(mbin.fields, slice(None, None))
+        return list(mbin.fields), mbin.start_index, values.reshape(len(values), -1).T
+    data = {}
+    for path in sorted(symbol_dir.glob(f"*.{freq}.bin")):
+        field_values = np.fromfile(path, dtype="<f")
+        if len(field_values) > 1:
+            data[path.name[: -len(f".{freq}.bin")]] = field_values
+    if not data:
+        return [], 0, np.empty((0, 0), dtype="<f")
+    start_index = min(int(v[0]) for v in data.values())
+    end_index = max(int(v[0]) + len(v) - 1 for v in data.values())
+    values = np.full((len(data), end_index - start_index), np.nan, dtype="<f")
+    for row, v in zip(values, data.values()):
+        row[int(v[0]) - start_index : int(v[0]) - start_index + len(v) - 1] = v[1:]
+    return list(data), start_index, values
+
+
+def build_symbol(
+    symbol_dir: Path,
+    base_freq: str,
+    calendar_path: str,
+    targets: List[Tuple[str, int, str]],
+    multi_field: bool = False,
+) -> List[str]:
+    """
+    Build the bars of a symbol from its ``base_freq`` bars.
+
+    Parameters
+    ----------
+    targets: List[Tuple[str, int, str]]
+        the name, the length and the path of the ``.npy`` calendar of the frequencies to build.
+
+    Returns
+    -------
+    List[str]
+        the frequencies built.
+    """
+    fields, start_index, values = read_features(symbol_dir, base_freq, multi_field)
+    if values.size == 0:
+        return []
+    dates = np.asarray(load_calendar(calendar_path)[start_index : start_index + values.shape[1]])
+    res = []
+    for name, step, target_path in targets:
+        labels, bars, bar_fields = aggregate_bars(dates, values, fields, step)
+        if len(labels) == 0:
+            continue
+        index = np.searchsorted(load_calendar(target_path), labels)
+        out = np.full((len(bar_fields), int(index[-1] - index[0]) + 1), np.nan, dtype="<f")
+        out[:, index - index[0]] = bars
+        write_features(symbol_dir, name, bar_fields, out, int(index[0]), multi_field)
+        res.append(name)
+    return res
+
+
+def build_bars(
+    qlib_dir: Union[str, Path],
+    freqs: Union[str, Iterable[str]],
+    base_freq: str = "1min",
+    multi_field: bool = False,
+    max_workers: int = 1,
+) -> List[str]:
+    """
+    Build the bars of ``freqs`` from the ``base_freq`` bars of ``qlib_dir``, the existing bars of ``freqs`` are
+    rebuilt.
+
+    Parameters
+    ----------
+    freqs: Union[str, Iterable[str]]
+        the frequencies, e.g. ``"5min,15min,4h,1d"``, they must be multiples of ``base_freq``.
+
+    Returns
+    -------
+    List[str]
+        the qlib names of the frequencies built.
+    """
+    qlib_dir = Path(qlib_dir).expanduser()
+    freqs = freqs.split(",") if isinstance(freqs, str) else list(freqs)
+    _, base_step = parse_freq(base_freq)
+    cs = FileCalendarStorage(freq=base_freq, future=False, provider_uri={base_freq: str(qlib_dir)})
+    calendar = pd.to_datetime(pd.read_csv(cs.uri, header=None)[0]).values.astype("datetime64[ns]").view(np.int64)
+    symbol_dirs = sorted(p for p in qlib_dir.joinpath("features").iterdir() if p.is_dir())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        calendar_path = str(Path(tmp_dir).joinpath(f"{base_freq}.npy"))
+        np.save(calendar_path, calendar)
+        targets = []
+        for freq in freqs:
+            name, step = parse_freq(freq.strip())
+            if step <= base_step or step % base_step:
+                raise ValueError(f"the bars of {freq} can not be built from the bars of {base_freq}")
+            bar_calendar = np.unique(calendar - calendar % step)
+            cs = FileCalendarStorage(freq=name, future=False, provider_uri={name: str(qlib_dir)})
+            cs.clear()
+            cs.extend(format_calendar(bar_calendar, "1d" if step % DAY == 0 else name))
+            targets.append((name, step, str(Path(tmp_dir).joinpath(f"{name}.npy"))))
+            np.save(targets[-1][2], bar_calendar)
+
+        logger.info(f"build the {', '.join(t[0] for t in targets)} bars of {len(symbol_dirs)} symbols")
+        _build = partial(
+            build_symbol, base_freq=base_freq, calendar_path=calendar_path, targets=targets, multi_field=multi_field
+        )
+        with make_executor(max_workers) as executor:
+            for _ in tqdm(executor.map(_build, symbol_dirs), total=len(symbol_dirs)):
+                pass
+        for path in [calendar_path] + [t[2] for t in targets]:
+            release_calendar(path)
+    return [t[0] for t in targets]
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 from pathlib import Path
 
@@ -8,64 +9,16 @@ import fire
 import pandas as pd
 from loguru import logger
 
+import qlib
+
 CUR_DIR = Path(__file__).resolve().parent
 sys.path.append(str(CUR_DIR.parent.parent))
 from data_collector.base import BaseCollector, BaseNormalize, BaseRun
 from data_collector.utils import deco_retry
-from qlib.data.storage.file_storage import (
-    FileCalendarStorage,
-    FileFeatureStorage,
-    FileInstrumentStorage,
-)
-
-
-def dump_to_qlib(
-    normalize_dir: Path,
-    qlib_dir: Path,
-    freq: str,
-    date_field_name: str = "date",
-    symbol_field_name: str = "symbol",
-):
-    """Convert normalized csv data to Qlib format."""
-
-    normalize_dir = Path(normalize_dir).expanduser()
-    qlib_dir = Path(qlib_dir).expanduser()
-
-    # 创建 Qlib 所需的文件夹结构
-    for sub in ["calendars", "features", "instruments"]:
-        qlib_dir.joinpath(sub).mkdir(parents=True, exist_ok=True)
-
-    provider_uri = {freq: str(qlib_dir)}
-
-    file_list = sorted(normalize_dir.glob("*.csv"))
-    calendar_set = set()
-    inst_dict = {}
-    data_map = {}
-    for file_path in file_list:
-        df = pd.read_csv(file_path, parse_dates=[date_field_name])
-        symbol = file_path.stem
-        # 收集日历和标的信息
-        calendar_set.update(df[date_field_name])
-        inst_dict[symbol] = [(df[date_field_name].min(), df[date_field_name].max())]
-        data_map[symbol] = df
-
-    calendar_list = sorted(calendar_set)
-    fmt = "%Y-%m-%d" if freq == "1d" else "%Y-%m-%d %H:%M:%S"
-    cs = FileCalendarStorage(freq=freq, future=False, provider_uri=provider_uri)
-    cs.clear()
-    cs.extend([pd.Timestamp(d).strftime(fmt) for d in calendar_list])
-
-    # 写入交易所和股票信息
-    is_storage = FileInstrumentStorage(market="all", freq=freq, provider_uri=provider_uri)
-    is_storage.clear()
-    is_storage.update(inst_dict)
-
-    # 写入特征数据
-    for symbol, df in data_map.items():
-        for field in [c for c in df.columns if c not in [date_field_name, symbol_field_name]]:
-            fs = FileFeatureStorage(symbol, field, freq, provider_uri=provider_uri)
-            fs.clear()
-            fs.write(df[field].astype(float).values, index=0)
+from data_collector.crypto.async_ohlcv import AsyncOHLCVFetcher, get_rate_limiter
+from data_collector.crypto.backfill import update_qlib
+from data_collector.crypto.bars import build_bars
+from data_collector.crypto.dump import dump_to_qlib
 
 
 class CryptoCollector(BaseCollector):
@@ -82,6 +35,8 @@ class CryptoCollector(BaseCollector):
     DEFAULT_START_DATETIME_1H = pd.Timestamp("2017-01-01")
     DEFAULT_END_DATETIME_1H = BaseCollector.DEFAULT_END_DATETIME_1D
 
+    OHLCV_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+
     def __init__(
         self,
         save_dir: [str, Path],
@@ -95,9 +50,26 @@ class CryptoCollector(BaseCollector):
         delay=1,
         check_data_length: int = None,
         limit_nums: int = None,
+        async_mode: bool = False,
+        max_concurrency: int = 16,
+        rate_limit: float = None,
     ):
+        """
+        Parameters
+        ----------
+        async_mode: bool
+            fetch all the symbols concurrently with ``ccxt.async_support``, the page requests of all the symbols share
+            one rate limiter of the exchange, by default False
+        max_concurrency: int
+            the maximum number of requests in flight in async mode, by default 16
+        rate_limit: float
+            the number of requests per second in async mode, by default the rate limit of the exchange in ccxt
+        """
         self._symbols = symbols or []
         self.exchange = exchange
+        self.async_mode = async_mode
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
         super().__init__(
             save_dir=save_dir,
             start=start,
@@ -112,18 +84,23 @@ class CryptoCollector(BaseCollector):
         if self.interval not in self.TIMEFRAME_MAP:
             raise ValueError(f"interval error: {self.interval}")
 
-        api_key = os.getenv("OKX_API_KEY")
-        secret = os.getenv("OKX_API_SECRET")
-        password = os.getenv("OKX_API_PASSPHRASE")
         exchange_cls = getattr(ccxt, self.exchange)
-        self._client = exchange_cls(
-            {
-                "apiKey": api_key,
-                "secret": secret,
-                "password": password,
-                "enableRateLimit": True,
-            }
-        )
+        self._client = exchange_cls(self._client_config(enable_rate_limit=True))
+
+    @staticmethod
+    def _client_config(enable_rate_limit: bool) -> dict:
+        return {
+            "apiKey": os.getenv("OKX_API_KEY"),
+            "secret": os.getenv("OKX_API_SECRET"),
+            "password": os.getenv("OKX_API_PASSPHRASE"),
+            "enableRateLimit": enable_rate_limit,
+        }
+
+    def _create_async_client(self):
+        """the client of ``ccxt.async_support``, its own rate limiter is disabled in favour of the shared one"""
+        import ccxt.async_support as ccxt_async  # pylint: disable=C0415
+
+        return getattr(ccxt_async, self.exchange)(self._client_config(enable_rate_limit=False))
 
     def get_instrument_list(self):
         return self._symbols
@@ -163,6 +140,86 @@ class CryptoCollector(BaseCollector):
     ) -> pd.DataFrame:
         return self.get_data_from_remote(symbol, interval, start_datetime, end_datetime)
 
+    @classmethod
+    def ohlcv_to_df(cls, ohlcvs: list) -> pd.DataFrame:
+        df = pd.DataFrame(ohlcvs, columns=cls.OHLCV_COLUMNS)
+        df["date"] = pd.to_datetime(df["ts"], unit="ms")
+        return df[["date", "open", "high", "low", "close", "volume"]]
+
+    @staticmethod
+    def _to_ms(dt) -> int:
+        return int(pd.Timestamp(dt, tz="UTC").timestamp() * 1000)
+
+    async def _async_collector(self, instrument_list, callback, start=None, end=None) -> list:
+        """
+        fetch `instrument_list` concurrently and call `callback(symbol, ohlcvs)` per fetched symbol, `start` can be
+        given per symbol. Return the failed symbols.
+        """
+        start = self.start_datetime if start is None else start
+        end = self.end_datetime if end is None else end
+        client = self._create_async_client()
+        try:
+            rate = self.rate_limit or 1000 / self._client.rateLimit
+            fetcher = AsyncOHLCVFetcher(
+                client,
+                get_rate_limiter(self.exchange, rate),
+                self.TIMEFRAME_MAP[self.interval],
+                max_concurrency=self.max_concurrency,
+                max_retries=self.max_collector_count,
+                retry_delay=self.delay,
+            )
+            symbols = {symbol.replace("_", "/"): symbol for symbol in instrument_list}
+            if isinstance(start, dict):
+                start = {s: self._to_ms(start[symbol]) for s, symbol in symbols.items()}
+            else:
+                start = self._to_ms(start)
+            failed = await fetcher.fetch_each(
+                list(symbols), start, self._to_ms(end), lambda s, ohlcvs: callback(symbols[s], ohlcvs)
+            )
+        finally:
+            await client.close()
+        return [symbols[s] for s in failed]
+
+    def fetch_since(self, since: dict, end: pd.Timestamp, callback):
+        """fetch the bars of every symbol in [since[symbol], end] and call `callback(symbol, df)`, see `update_qlib`"""
+        if self.async_mode:
+            asyncio.run(
+                self._async_collector(
+                    list(since), lambda symbol, ohlcvs: callback(symbol, self.ohlcv_to_df(ohlcvs)), since, end
+                )
+            )
+            return
+        for symbol, start in since.items():
+            try:
+                df = self.get_data_from_remote(symbol, self.interval, start, end)
+            except Exception as e:  # pylint: disable=W0703
+                logger.warning(f"{symbol}-{self.interval}: {e}")
+                continue
+            callback(symbol, df)
+            self.sleep()
+
+    def _collector(self, instrument_list):
+        if not self.async_mode:
+            return super(CryptoCollector, self)._collector(instrument_list)
+        error_symbol = []
+
+        def _save(symbol, ohlcvs):
+            # every symbol is saved as soon as it is fetched, the bars of the universe are not kept in memory
+            df = self.ohlcv_to_df(ohlcvs)
+            _result = self.NORMAL_FLAG
+            if self.check_data_length > 0:
+                _result = self.cache_small_data(symbol, df)
+            if _result == self.NORMAL_FLAG:
+                self.save_instrument(symbol, df)
+            else:
+                error_symbol.append(symbol)
+
+        error_symbol.extend(asyncio.run(self._async_collector(instrument_list, _save)))
+        logger.info(f"error symbol nums: {len(error_symbol)}")
+        logger.info(f"current get symbol nums: {len(instrument_list)}")
+        error_symbol.extend(self.mini_symbol_map.keys())
+        return sorted(set(error_symbol))
+
 
 class CryptoNormalize(BaseNormalize):
     DAILY_FORMAT = "%Y-%m-%d"
@@ -229,6 +286,9 @@ class Run(BaseRun):
         check_data_length: int = None,
         limit_nums=None,
         symbols: list = None,
+        async_mode: bool = False,
+        max_concurrency: int = 16,
+        rate_limit: float = None,
     ):
         # 默认延迟 1 秒，配合 ccxt 的限流机制
         super(Run, self).download_data(
@@ -239,15 +299,91 @@ class Run(BaseRun):
             check_data_length,
             limit_nums,
             symbols=symbols,
+            async_mode=async_mode,
+            max_concurrency=max_concurrency,
+            rate_limit=rate_limit,
         )
 
+    def update_data(
+        self,
+        qlib_dir,
+        start=None,
+        end=None,
+        symbols: list = None,
+        exchange: str = "okx",
+        delay=1,
+        async_mode: bool = False,
+        max_concurrency: int = 16,
+        rate_limit: float = None,
+        freqs: str = None,
+    ):
+        """append the missing bars to `qlib_dir`, an interrupted update continues from its checkpoint
+
+        Parameters
+        ----------
+        freqs: str
+            rebuild the bars of these frequencies from the updated bars, see `build_bars`
+
+        Examples
+        ---------
+            # update all the instruments of qlib_dir to the last complete bar
+            $ python collector.py update_data --qlib_dir ~/.qlib/qlib_data/crypto --interval 1d
+            # add new symbols from 2024-01-01
+            $ python collector.py update_data --qlib_dir ~/.qlib/qlib_data/crypto --interval 1d --symbols SOL-USDT --start 2024-01-01
+        """
+        collector = CryptoCollector(
+            self.source_dir,
+            symbols=symbols,
+            interval=self.interval,
+            exchange=exchange,
+            delay=delay,
+            async_mode=async_mode,
+            max_concurrency=max_concurrency,
+            rate_limit=rate_limit,
+        )
+        if symbols is not None:
+            symbols = [collector.normalize_symbol(symbol) for symbol in symbols]
+        qlib.init(provider_uri=str(Path(qlib_dir).expanduser()), expression_cache=None, dataset_cache=None)
+        res = update_qlib(qlib_dir, self.interval, collector.fetch_since, symbols, start, end)
+        logger.info({k: len(v) for k, v in res.items()})
+        if freqs:
+            build_bars(qlib_dir, freqs, self.interval, max_workers=self.max_workers)
+
     def normalize_data(self, date_field_name: str = "date", symbol_field_name: str = "symbol"):
         # 调用父类方法完成数据规范化
         super(Run, self).normalize_data(date_field_name, symbol_field_name)
 
-    def dump_to_qlib(self, qlib_dir, date_field_name: str = "date", symbol_field_name: str = "symbol"):
+    def dump_to_qlib(
+        self,
+        qlib_dir,
+        date_field_name: str = "date",
+        symbol_field_name: str = "symbol",
+        multi_field: bool = False,
+        freqs: str = None,
+    ):
         # 将规范化后的数据写入 Qlib 目录
-        dump_to_qlib(self.normalize_dir, qlib_dir, self.interval, date_field_name, symbol_field_name)
+        qlib.init(provider_uri=str(Path(qlib_dir).expanduser()), expression_cache=None, dataset_cache=None)
+        dump_to_qlib(
+            self.normalize_dir,
+            qlib_dir,
+            self.interval,
+            date_field_name,
+            symbol_field_name,
+            multi_field,
+            max_workers=self.max_workers,
+        )
+        if freqs:
+            build_bars(qlib_dir, freqs, self.interval, multi_field, self.max_workers)
+
+    def build_bars(self, qlib_dir, freqs: str, multi_field: bool = False):
+        """build the bars of higher frequencies from the bars of `interval` in `qlib_dir`
+
+        Examples
+        ---------
+            $ python collector.py build_bars --qlib_dir ~/.qlib/qlib_data/crypto --interval 1min --freqs 5min,15min,4h,1d
+        """
+        qlib.init(provider_uri=str(Path(qlib_dir).expanduser()), expression_cache=None, dataset_cache=None)
+        logger.info(f"built {build_bars(qlib_dir, freqs, self.interval, multi_field, self.max_workers)}")
 
 
 if __name__ == "__main__":
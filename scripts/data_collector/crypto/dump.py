@@ -0,0 +1,211 @@
+"""Convert the normalized csv files of the crypto collector to the qlib format.
+
+The conversion streams over the files twice and never holds the whole universe in memory:
+
+1. the dates of every file are scanned and merged into the calendar, a sorted int64 array (ns);
+2. the files are written one symbol at a time by worker processes, the dates are mapped to the calendar indices with
+   ``np.searchsorted`` and the features are written from one float32 buffer per symbol.
+
+The workers read the calendar from a memory-mapped ``.npy`` file, so it is shared through the page cache.
+"""
+
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from tqdm import tqdm
+
+from qlib.data.storage.file_storage import FileCalendarStorage, FileInstrumentStorage
+from qlib.data.storage.multi_field_storage import MultiFieldBin
+
+# the pending dates are merged into the calendar when they exceed this number of values
+MERGE_SIZE = 1 << 22
+
+# the calendars loaded by the current process
+_calendars: Dict[str, np.ndarray] = {}
+
+
+def read_dates(file_path: Path, date_field_name: str = "date") -> np.ndarray:
+    """the sorted unique dates of a normalized csv file as int64 (ns)"""
+    dates = pd.read_csv(file_path, usecols=[date_field_name])[date_field_name]
+    return np.unique(pd.to_datetime(dates).values.astype("datetime64[ns]").view(np.int64))
+
+
+def build_calendar(
+    file_list: Iterable[Path], date_field_name: str = "date", max_workers: int = 1
+) -> Tuple[np.ndarray, Dict[str, Tuple[int, int]]]:
+    """
+    The first pass: scan the dates of all the files.
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict[str, Tuple[int, int]]]
+        the calendar as a sorted int64 array and the first and last date of every symbol.
+    """
+    file_list = list(file_list)
+    calendar = np.empty(0, dtype=np.int64)
+    pending, n_pending = [], 0
+    ranges = {}
+    with make_executor(max_workers) as executor:
+        for file_path, dates in zip(
+            file_list,
+            tqdm(executor.map(partial(read_dates, date_field_name=date_field_name), file_list), total=len(file_list)),
+        ):
+            if len(dates) == 0:
+                continue
+            ranges[file_path.stem] = (dates[0], dates[-1])
+            pending.append(dates)
+            n_pending += len(dates)
+            if n_pending > max(len(calendar), MERGE_SIZE):
+                calendar = np.unique(np.concatenate([calendar] + pending))
+                pending, n_pending = [], 0
+    if pending:
+        calendar = np.unique(np.concatenate([calendar] + pending))
+    return calendar, ranges
+
+
+def format_calendar(calendar: np.ndarray, freq: str) -> np.ndarray:
+    """format the int64 calendar as the strings of the calendar file"""
+    dates = np.datetime_as_string(calendar.view("datetime64[ns]"), unit="D" if freq == "1d" else "s")
+    return np.char.replace(dates, "T", " ")
+
+
+def load_calendar(calendar_path: str) -> np.ndarray:
+    """load the int64 calendar saved by ``np.save`` as a memory map, it is kept by the process until released"""
+    if calendar_path not in _calendars:
+        _calendars[calendar_path] = np.load(calendar_path, mmap_mode="r")
+    return _calendars[calendar_path]
+
+
+def release_calendar(calendar_path: str):
+    """forget the calendar loaded by :func:`load_calendar`, e.g. before its temporary file is removed"""
+    _calendars.pop(calendar_path, None)
+
+
+def write_features(
+    symbol_dir: Path, freq: str, fields: List[str], values: np.ndarray, start_index: int, multi_field: bool
+):
+    """write the (fields, rows) float32 ``values`` of a symbol, the first row is at calendar index ``start_index``"""
+    symbol_dir.mkdir(parents=True, exist_ok=True)
+    if multi_field:
+        MultiFieldBin(symbol_dir.joinpath(f"fields.{freq.lower()}.mbin")).write(
+            pd.DataFrame(values.T, columns=fields), start_index
+        )
+        return
+    header = np.array([start_index], dtype="<f")
+    for field, field_values in zip(fields, values):
+        with symbol_dir.joinpath(f"{field.lower()}.{freq.lower()}.bin").open("wb") as fp:
+            header.tofile(fp)
+            field_values.tofile(fp)
+
+
+def dump_symbol(
+    file_path: Path,
+    features_dir: Path,
+    calendar_path: str,
+    freq: str,
+    date_field_name: str = "date",
+    symbol_field_name: str = "symbol",
+    multi_field: bool = False,
+) -> List[str]:
+    """
+    The second pass: write the features of one normalized csv file, the rows of the missing dates are NaN.
+
+    Returns
+    -------
+    List[str]
+        the fields written.
+    """
+    df = pd.read_csv(file_path)
+    if df.empty:
+        return []
+    calendar = load_calendar(calendar_path)
+    dates = pd.to_datetime(df.pop(date_field_name)).values.astype("datetime64[ns]").view(np.int64)
+    fields = [c for c in df.columns if c != symbol_field_name]
+    index = np.searchsorted(calendar, dates)
+    # the first row of a duplicated date is kept
+    index, rows = np.unique(index, return_index=True)
+    start_index = int(index[0])
+    values = np.full((len(fields), int(index[-1]) - start_index + 1), np.nan, dtype="<f")
+    values[:, index - start_index] = df[fields].values[rows].astype("<f").T
+
+    write_features(Path(features_dir).joinpath(file_path.stem.lower()), freq, fields, values, start_index, multi_field)
+    return fields
+
+
+def make_executor(max_workers: int):
+    """a process pool of ``max_workers`` processes, or an executor running the tasks in the current process if 1"""
+    return ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else _InProcessExecutor()
+
+
+class _InProcessExecutor:
+    """the executor running the tasks in the current process"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    @staticmethod
+    def map(fn, *iterables):
+        return map(fn, *iterables)
+
+
+def dump_to_qlib(
+    normalize_dir: Path,
+    qlib_dir: Path,
+    freq: str,
+    date_field_name: str = "date",
+    symbol_field_name: str = "symbol",
+    multi_field: bool = False,
+    max_workers: int = 1,
+):
+    """Convert normalized csv data to Qlib format.
+
+    If ``multi_field`` is True, all fields of a symbol are written into one ``fields.<freq>.mbin`` file
+    which is read by :class:`~qlib.data.storage.multi_field_storage.FileMultiFieldFeatureStorage`.
+
+    The memory used is bounded by the calendar and one symbol per worker, see the module docstring.
+    """
+    normalize_dir = Path(normalize_dir).expanduser()
+    qlib_dir = Path(qlib_dir).expanduser()
+    for sub in ["calendars", "features", "instruments"]:
+        qlib_dir.joinpath(sub).mkdir(parents=True, exist_ok=True)
+    provider_uri = {freq: str(qlib_dir)}
+    file_list = sorted(normalize_dir.glob("*.csv"))
+
+    logger.info(f"scan the dates of {len(file_list)} files")
+    calendar, ranges = build_calendar(file_list, date_field_name, max_workers)
+    cs = FileCalendarStorage(freq=freq, future=False, provider_uri=provider_uri)
+    cs.clear()
+    cs.extend(format_calendar(calendar, freq))
+
+    is_storage = FileInstrumentStorage(market="all", freq=freq, provider_uri=provider_uri)
+    is_storage.clear()
+    is_storage.update({symbol: [(pd.Timestamp(first), pd.Timestamp(last))] for symbol, (first, last) in ranges.items()})
+
+    logger.info(f"dump the features of {len(ranges)} symbols")
+    file_list = [file_path for file_path in file_list if file_path.stem in ranges]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        calendar_path = str(Path(tmp_dir).joinpath("calendar.npy"))
+        np.save(calendar_path, calendar)
+        del calendar
+        _dump = partial(
+            dump_symbol,
+            features_dir=qlib_dir.joinpath("features"),
+            calendar_path=calendar_path,
+            freq=freq,
+            date_field_name=date_field_name,
+            symbol_field_name=symbol_field_name,
+            multi_field=multi_field,
+        )
+        with make_executor(max_workers) as executor:
+            for _ in tqdm(executor.map(_dump, file_list), total=len(file_list)):
+                pass
+        release_calendar(calendar_path)
@@ -3,11 +3,11 @@
 
 import abc
 import shutil
+import tempfile
 import traceback
 from pathlib import Path
-from typing import Iterable, List, Union
-from functools import partial
-from concurrent.futures import ThreadPoolExecutor, as_completed, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
 import fire
 import numpy as np
@@ -15,9 +15,10 @@ import pandas as pd
 from tqdm import tqdm
 from loguru import logger
 from qlib.utils import fname_to_code, code_to_fname
+from qlib.data.storage.multi_field_storage import MultiFieldBin, FileMultiFieldFeatureStorage
 
 
-def read_as_df(file_path: Union[str, Path], **kwargs) -> pd.DataFrame:
+def read_as_df(file_path: Union[str, Path], columns: Iterable[str] = None, **kwargs) -> pd.DataFrame:
     """
     Read a csv or parquet file into a pandas DataFrame.
 
@@ -25,6 +26,8 @@ def read_as_df(file_path: Union[str, Path], **kwargs) -> pd.DataFrame:
     ----------
     file_path : Union[str, Path]
         Path to the data file.
+    columns : Iterable[str]
+        only read these columns, the missing ones are ignored. By default all the columns are read.
     **kwargs :
         Additional keyword arguments passed to the underlying pandas
         reader.
@@ -43,13 +46,41 @@ def read_as_df(file_path: Union[str, Path], **kwargs) -> pd.DataFrame:
             kept_kwargs[k] = kwargs[k]
 
     if suffix == ".csv":
+        if columns is not None:
+            columns = set(columns)
+            kept_kwargs["usecols"] = lambda c: c in columns
         return pd.read_csv(file_path, **kept_kwargs)
     elif suffix == ".parquet":
+        if columns is not None:
+            import pyarrow.parquet as pq  # pylint: disable=C0415
+
+            names = pq.read_schema(file_path).names
+            kept_kwargs["columns"] = [c for c in names if c in set(columns)]
         return pd.read_parquet(file_path, **kept_kwargs)
     else:
         raise ValueError(f"Unsupported file format: {suffix}")
 
 
+def to_int64_dates(dates: Union[pd.Series, Iterable]) -> np.ndarray:
+    """the dates as int64 nanoseconds, the calendars are kept in this form to map dates with `np.searchsorted`"""
+    return pd.to_datetime(dates).values.astype("datetime64[ns]").view(np.int64)
+
+
+# the dumper of a worker process, see `DumpDataBase._map`
+_worker_dumper = None
+
+
+def _init_worker(dumper: "DumpDataBase"):
+    global _worker_dumper  # pylint: disable=W0603
+    _worker_dumper = dumper
+    if dumper._calendar_path is not None:
+        dumper._calendar = np.load(dumper._calendar_path, mmap_mode="r")
+
+
+def _call_worker(func_name: str, item):
+    return getattr(_worker_dumper, func_name)(item)
+
+
 class DumpDataBase:
     INSTRUMENTS_START_FIELD = "start_datetime"
     INSTRUMENTS_END_FIELD = "end_datetime"
@@ -65,6 +96,9 @@ class DumpDataBase:
     UPDATE_MODE = "update"
     ALL_MODE = "all"
 
+    # the pending dates are merged into the calendar when they exceed this number of values
+    CALENDAR_MERGE_SIZE = 1 << 22
+
     def __init__(
         self,
         data_path: str,
@@ -78,6 +112,7 @@ class DumpDataBase:
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        multi_field: bool = False,
     ):
         """
 
@@ -92,7 +127,7 @@ class DumpDataBase:
         freq: str, default "day"
             transaction frequency
         max_workers: int, default None
-            number of threads
+            number of processes, the files are processed in the current process if it is 1
         date_field_name: str, default "date"
             the name of the date field in the csv
         file_suffix: str, default ".csv"
@@ -105,6 +140,9 @@ class DumpDataBase:
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        multi_field: bool
+            dump all fields of an instrument into one `fields.<freq>.mbin` file
+            (read by `qlib.data.storage.multi_field_storage.FileMultiFieldFeatureStorage`), default False
         """
         data_path = Path(data_path).expanduser()
         if isinstance(exclude_fields, str):
@@ -128,16 +166,26 @@ class DumpDataBase:
 
         self.works = max_workers
         self.date_field_name = date_field_name
+        self.multi_field = multi_field
 
         self._calendars_dir = self.qlib_dir.joinpath(self.CALENDARS_DIR_NAME)
         self._features_dir = self.qlib_dir.joinpath(self.FEATURES_DIR_NAME)
         self._instruments_dir = self.qlib_dir.joinpath(self.INSTRUMENTS_DIR_NAME)
 
-        self._calendars_list = []
+        # the sorted calendar as int64 nanoseconds
+        self._calendar = np.empty(0, dtype=np.int64)
+        # the calendar is shared with the worker processes through this file
+        self._calendar_path = None
 
         self._mode = self.ALL_MODE
         self._kwargs = {}
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the workers load the calendar from `_calendar_path`
+        state["_calendar"] = None
+        return state
+
     def _backup_qlib_dir(self, target_dir: Path):
         shutil.copytree(str(self.qlib_dir.resolve()), str(target_dir.resolve()))
 
@@ -145,52 +193,117 @@ class DumpDataBase:
         datetime_d = pd.Timestamp(datetime_d)
         return datetime_d.strftime(self.calendar_format)
 
-    def _get_date(
-        self, file_or_df: [Path, pd.DataFrame], *, is_begin_end: bool = False, as_set: bool = False
-    ) -> Iterable[pd.Timestamp]:
-        if not isinstance(file_or_df, pd.DataFrame):
-            df = self._get_source_data(file_or_df)
-        else:
-            df = file_or_df
-        if df.empty or self.date_field_name not in df.columns.tolist():
-            _calendars = pd.Series(dtype=np.float32)
-        else:
-            _calendars = df[self.date_field_name]
-
-        if is_begin_end and as_set:
-            return (_calendars.min(), _calendars.max()), set(_calendars)
-        elif is_begin_end:
-            return _calendars.min(), _calendars.max()
-        elif as_set:
-            return set(_calendars)
-        else:
-            return _calendars.tolist()
+    def _format_dates(self, dates: np.ndarray) -> np.ndarray:
+        """the vectorized `_format_datetime` of int64 dates"""
+        dates = np.datetime_as_string(
+            np.asarray(dates, dtype=np.int64).view("datetime64[ns]"), unit="D" if self.freq == "day" else "s"
+        )
+        return np.char.replace(dates, "T", " ")
+
+    def _map(self, func_name: str, items: Iterable) -> Iterator[Tuple[object, Future]]:
+        """
+        Call the method `func_name` for every item in `self.works` processes.
 
-    def _get_source_data(self, file_path: Path) -> pd.DataFrame:
-        df = read_as_df(file_path, low_memory=False)
+        The dumper (without the calendar) is sent to every worker once. At most `2 * self.works` items are queued,
+        so the results which are not consumed yet stay bounded.
+
+        Returns
+        -------
+        Iterator[Tuple[object, Future]]
+            the items and their futures in the order of completion
+        """
+        if self.works <= 1:
+            for item in items:
+                future = Future()
+                try:
+                    future.set_result(getattr(self, func_name)(item))
+                except Exception as e:  # pylint: disable=W0703
+                    future.set_exception(e)
+                yield item, future
+            return
+        with ProcessPoolExecutor(max_workers=self.works, initializer=_init_worker, initargs=(self,)) as executor:
+            pending = {}
+            for item in items:
+                pending[executor.submit(_call_worker, func_name, item)] = item
+                if len(pending) >= 2 * self.works:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+
+    def _share_calendar(self, tmp_dir: str):
+        """save the calendar for the worker processes"""
+        self._calendar_path = str(Path(tmp_dir).joinpath("calendar.npy"))
+        np.save(self._calendar_path, self._calendar)
+
+    def _get_source_data(self, file_path: Path, columns: Iterable[str] = None) -> pd.DataFrame:
+        df = read_as_df(file_path, columns=columns, low_memory=False)
         if self.date_field_name in df.columns:
             df[self.date_field_name] = pd.to_datetime(df[self.date_field_name])
-        # df.drop_duplicates([self.date_field_name], inplace=True)
         return df
 
+    def _iter_symbols(self, file_path: Path, df: pd.DataFrame) -> Iterable[Tuple[str, pd.DataFrame]]:
+        """the symbols of a source file and their data, the symbol is the name of the file"""
+        yield self.get_symbol_from_file(file_path), df
+
+    def _get_dates(self, file_path: Path) -> List[Tuple[str, np.ndarray]]:
+        """the sorted unique int64 dates of every symbol in `file_path`, only the date and symbol columns are read"""
+        df = self._get_source_data(file_path, columns=[self.date_field_name, self.symbol_field_name])
+        if df.empty or self.date_field_name not in df.columns:
+            return []
+        return [
+            (code, np.unique(to_int64_dates(_df[self.date_field_name].dropna())))
+            for code, _df in self._iter_symbols(file_path, df)
+            if _df[self.date_field_name].notna().any()
+        ]
+
+    def _merge_calendar(self, calendar: np.ndarray, dates_list: List[np.ndarray]) -> np.ndarray:
+        return np.unique(np.concatenate([calendar] + dates_list))
+
+    def _scan_dates(self, files: List[Path]) -> Tuple[np.ndarray, Dict[str, Tuple[int, int]], Dict[str, List[Path]]]:
+        """
+        Scan the dates of `files`.
+
+        Returns
+        -------
+        Tuple[np.ndarray, Dict[str, Tuple[int, int]], Dict[str, List[Path]]]
+            the sorted unique dates of all the files, the first and last date of every symbol and the files of every
+            symbol
+        """
+        calendar = np.empty(0, dtype=np.int64)
+        pending, n_pending = [], 0
+        date_ranges, symbol_files = {}, {}
+        with tqdm(total=len(files)) as p_bar:
+            for file_path, future in self._map("_get_dates", files):
+                for code, dates in future.result():
+                    first, last = date_ranges.get(code, (dates[0], dates[-1]))
+                    date_ranges[code] = (min(first, dates[0]), max(last, dates[-1]))
+                    symbol_files.setdefault(code, []).append(file_path)
+                    pending.append(dates)
+                    n_pending += len(dates)
+                if n_pending > max(len(calendar), self.CALENDAR_MERGE_SIZE):
+                    calendar = self._merge_calendar(calendar, pending)
+                    pending, n_pending = [], 0
+                p_bar.update()
+        if pending:
+            calendar = self._merge_calendar(calendar, pending)
+        return calendar, date_ranges, symbol_files
+
     def get_symbol_from_file(self, file_path: Path) -> str:
         return fname_to_code(file_path.stem.strip().lower())
 
     def get_dump_fields(self, df_columns: Iterable[str]) -> Iterable[str]:
-        return (
-            self._include_fields
-            if self._include_fields
-            else set(df_columns) - set(self._exclude_fields) if self._exclude_fields else df_columns
-        )
+        if self._include_fields:
+            return self._include_fields
+        return [c for c in df_columns if c not in self._exclude_fields]
 
     @staticmethod
-    def _read_calendars(calendar_path: Path) -> List[pd.Timestamp]:
-        return sorted(
-            map(
-                pd.Timestamp,
-                pd.read_csv(calendar_path, header=None).loc[:, 0].tolist(),
-            )
-        )
+    def _read_calendars(calendar_path: Path) -> np.ndarray:
+        """the calendar as sorted int64 dates"""
+        return np.sort(to_int64_dates(pd.read_csv(calendar_path, header=None).loc[:, 0]))
 
     def _read_instruments(self, instrument_path: Path) -> pd.DataFrame:
         df = pd.read_csv(
@@ -205,11 +318,13 @@ class DumpDataBase:
 
         return df
 
-    def save_calendars(self, calendars_data: list):
+    def save_calendars(self, calendars_data: Union[np.ndarray, list]):
         self._calendars_dir.mkdir(parents=True, exist_ok=True)
-        calendars_path = str(self._calendars_dir.joinpath(f"{self.freq}.txt").expanduser().resolve())
-        result_calendars_list = [self._format_datetime(x) for x in calendars_data]
-        np.savetxt(calendars_path, result_calendars_list, fmt="%s", encoding="utf-8")
+        calendars_path = self._calendars_dir.joinpath(f"{self.freq}.txt").expanduser().resolve()
+        if not (isinstance(calendars_data, np.ndarray) and calendars_data.dtype == np.int64):
+            calendars_data = to_int64_dates(calendars_data)
+        with calendars_path.open("w", encoding="utf-8") as fp:
+            fp.writelines(f"{d}\n" for d in self._format_dates(calendars_data))
 
     def save_instruments(self, instruments_data: Union[list, pd.DataFrame]):
         self._instruments_dir.mkdir(parents=True, exist_ok=True)
@@ -224,75 +339,116 @@ class DumpDataBase:
         else:
             np.savetxt(instruments_path, instruments_data, fmt="%s", encoding="utf-8")
 
-    def data_merge_calendar(self, df: pd.DataFrame, calendars_list: List[pd.Timestamp]) -> pd.DataFrame:
-        # calendars
-        calendars_df = pd.DataFrame(data=calendars_list, columns=[self.date_field_name])
-        calendars_df[self.date_field_name] = calendars_df[self.date_field_name].astype("datetime64[ns]")
-        cal_df = calendars_df[
-            (calendars_df[self.date_field_name] >= df[self.date_field_name].min())
-            & (calendars_df[self.date_field_name] <= df[self.date_field_name].max())
-        ]
-        # align index
-        cal_df.set_index(self.date_field_name, inplace=True)
-        df.set_index(self.date_field_name, inplace=True)
-        r_df = df.reindex(cal_df.index)
-        return r_df
+    def get_calendar_index(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Map the dates of `df` to the calendar with `np.searchsorted`.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            the sorted calendar indices and the rows of `df` at these indices, the dates which are not in the calendar
+            are dropped and the first row of a duplicated date is kept
+        """
+        dates = to_int64_dates(df[self.date_field_name])
+        index = np.searchsorted(self._calendar, dates)
+        valid = index < len(self._calendar)
+        valid[valid] = self._calendar[index[valid]] == dates[valid]
+        index, rows = np.unique(index[valid], return_index=True)
+        return index, np.flatnonzero(valid)[rows]
 
     @staticmethod
-    def get_datetime_index(df: pd.DataFrame, calendar_list: List[pd.Timestamp]) -> int:
-        return calendar_list.index(df.index.min())
+    def _bin_end_index(bin_path: Path) -> Union[int, None]:
+        nbytes = bin_path.stat().st_size if bin_path.exists() else 0
+        if nbytes < 4:
+            return None
+        return int(np.fromfile(bin_path, dtype="<f", count=1)[0]) + nbytes // 4 - 2
 
-    def _data_to_bin(self, df: pd.DataFrame, calendar_list: List[pd.Timestamp], features_dir: Path):
+    def _data_to_bin(self, df: pd.DataFrame, features_dir: Path):
         if df.empty:
             logger.warning(f"{features_dir.name} data is None or empty")
             return
-        if not calendar_list:
-            logger.warning("calendar_list is empty")
+        if len(self._calendar) == 0:
+            logger.warning("calendar is empty")
             return
-        # align index
-        _df = self.data_merge_calendar(df, calendar_list)
-        if _df.empty:
+        fields = [
+            f
+            for f in self.get_dump_fields(df.columns)
+            if f in df.columns and f not in (self.date_field_name, self.symbol_field_name)
+        ]
+        index, rows = self.get_calendar_index(df)
+        if len(index) == 0:
             logger.warning(f"{features_dir.name} data is not in calendars")
             return
-        # used when creating a bin file
-        date_index = self.get_datetime_index(_df, calendar_list)
-        for field in self.get_dump_fields(_df.columns):
-            bin_path = features_dir.joinpath(f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}")
-            if field not in _df.columns:
-                continue
-            if bin_path.exists() and self._mode == self.UPDATE_MODE:
-                # update
-                with bin_path.open("ab") as fp:
-                    np.array(_df[field]).astype("<f").tofile(fp)
-            else:
-                # append; self._mode == self.ALL_MODE or not bin_path.exists()
-                np.hstack([date_index, _df[field]]).astype("<f").tofile(str(bin_path.resolve()))
 
-    def _dump_bin(self, file_or_data: [Path, pd.DataFrame], calendar_list: List[pd.Timestamp]):
-        if not calendar_list:
-            logger.warning("calendar_list is empty")
-            return
-        if isinstance(file_or_data, pd.DataFrame):
-            if file_or_data.empty:
-                return
-            code = fname_to_code(str(file_or_data.iloc[0][self.symbol_field_name]).lower())
-            df = file_or_data
-        elif isinstance(file_or_data, Path):
-            code = self.get_symbol_from_file(file_or_data)
-            df = self._get_source_data(file_or_data)
+        if self.multi_field:
+            mf_bin = MultiFieldBin(
+                features_dir.joinpath(f"fields.{self.freq}{FileMultiFieldFeatureStorage.FILE_SUFFIX}")
+            )
+            mf_bin.refresh()
+            end_indexes = [mf_bin.end_index if self._mode == self.UPDATE_MODE else None]
         else:
-            raise ValueError(f"not support {type(file_or_data)}")
-        if df is None or df.empty:
-            logger.warning(f"{code} data is None or empty")
-            return
-
-        # try to remove dup rows or it will cause exception when reindex.
-        df = df.drop_duplicates(self.date_field_name)
+            bin_paths = [features_dir.joinpath(f"{f.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}") for f in fields]
+            end_indexes = [self._bin_end_index(p) if self._mode == self.UPDATE_MODE else None for p in bin_paths]
+        if None not in end_indexes:
+            # only the rows after the stored data are appended
+            keep = index > min(end_indexes)
+            index, rows = index[keep], rows[keep]
+            if len(index) == 0:
+                return
 
-        # features save dir
-        features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
-        features_dir.mkdir(parents=True, exist_ok=True)
-        self._data_to_bin(df, calendar_list, features_dir)
+        # one contiguous float32 buffer per field, the missing dates are nan
+        start_index = int(index[0])
+        values = np.full((len(fields), int(index[-1]) - start_index + 1), np.nan, dtype="<f")
+        values[:, index - start_index] = df[fields].to_numpy(dtype="<f")[rows].T
+        if self.multi_field:
+            df = pd.DataFrame(values.T, columns=fields)
+            if end_indexes[0] is None:
+                mf_bin.write(df, start_index)
+            else:
+                mf_bin.append(df, start_index)
+            return
+        for bin_path, end_index, field_values in zip(bin_paths, end_indexes, values):
+            if end_index is None:
+                with bin_path.open("wb") as fp:
+                    np.array([start_index], dtype="<f").tofile(fp)
+                    field_values.tofile(fp)
+                continue
+            # append; the gap between the stored data and the new data is nan
+            gap = start_index - end_index - 1
+            with bin_path.open("ab") as fp:
+                if gap > 0:
+                    np.full(gap, np.nan, dtype="<f").tofile(fp)
+                field_values[max(-gap, 0) :].tofile(fp)
+
+    def _dump_bin(self, file_path: Path):
+        df = self._get_source_data(file_path)
+        if df.empty or self.date_field_name not in df.columns:
+            logger.warning(f"{file_path.name} data is None or empty")
+            return
+        for code, _df in self._iter_symbols(file_path, df):
+            # features save dir
+            features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
+            features_dir.mkdir(parents=True, exist_ok=True)
+            self._data_to_bin(_df, features_dir)
+
+    def _dump_features(self, files: List[Path] = None) -> Dict[Path, str]:
+        """dump the features of `files`(by default all the files), return the errors of the files"""
+        logger.info("start dump features......")
+        files = self.df_files if files is None else files
+        error_code = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._share_calendar(tmp_dir)
+            try:
+                with tqdm(total=len(files)) as p_bar:
+                    for file_path, future in self._map("_dump_bin", files):
+                        e = future.exception()
+                        if e is not None:
+                            error_code[file_path] = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                        p_bar.update()
+            finally:
+                self._calendar_path = None
+        logger.info("end of features dump.\n")
+        return error_code
 
     @abc.abstractmethod
     def dump(self):
@@ -305,30 +461,16 @@ class DumpDataBase:
 class DumpDataAll(DumpDataBase):
     def _get_all_date(self):
         logger.info("start get all date......")
-        all_datetime = set()
-        date_range_list = []
-        _fun = partial(self._get_date, as_set=True, is_begin_end=True)
-        with tqdm(total=len(self.df_files)) as p_bar:
-            with ProcessPoolExecutor(max_workers=self.works) as executor:
-                for file_path, ((_begin_time, _end_time), _set_calendars) in zip(
-                    self.df_files, executor.map(_fun, self.df_files)
-                ):
-                    all_datetime = all_datetime | _set_calendars
-                    if isinstance(_begin_time, pd.Timestamp) and isinstance(_end_time, pd.Timestamp):
-                        _begin_time = self._format_datetime(_begin_time)
-                        _end_time = self._format_datetime(_end_time)
-                        symbol = self.get_symbol_from_file(file_path)
-                        _inst_fields = [symbol.upper(), _begin_time, _end_time]
-                        date_range_list.append(f"{self.INSTRUMENTS_SEP.join(_inst_fields)}")
-                    p_bar.update()
-        self._kwargs["all_datetime_set"] = all_datetime
-        self._kwargs["date_range_list"] = date_range_list
+        self._calendar, date_ranges, _ = self._scan_dates(self.df_files)
+        self._kwargs["date_range_list"] = [
+            self.INSTRUMENTS_SEP.join([code.upper(), *self._format_dates([first, last])])
+            for code, (first, last) in sorted(date_ranges.items())
+        ]
         logger.info("end of get all date.\n")
 
     def _dump_calendars(self):
         logger.info("start dump calendars......")
-        self._calendars_list = sorted(map(pd.Timestamp, self._kwargs["all_datetime_set"]))
-        self.save_calendars(self._calendars_list)
+        self.save_calendars(self._calendar)
         logger.info("end of calendars dump.\n")
 
     def _dump_instruments(self):
@@ -336,15 +478,11 @@ class DumpDataAll(DumpDataBase):
         self.save_instruments(self._kwargs["date_range_list"])
         logger.info("end of instruments dump.\n")
 
-    def _dump_features(self):
-        logger.info("start dump features......")
-        _dump_func = partial(self._dump_bin, calendar_list=self._calendars_list)
-        with tqdm(total=len(self.df_files)) as p_bar:
-            with ProcessPoolExecutor(max_workers=self.works) as executor:
-                for _ in executor.map(_dump_func, self.df_files):
-                    p_bar.update()
-
-        logger.info("end of features dump.\n")
+    def _dump_features(self, files: List[Path] = None) -> Dict[Path, str]:
+        error_code = super(DumpDataAll, self)._dump_features(files)
+        if error_code:
+            raise RuntimeError(f"dump bin errors: {error_code}")
+        return error_code
 
     def dump(self):
         self._get_all_date()
@@ -356,29 +494,25 @@ class DumpDataAll(DumpDataBase):
 class DumpDataFix(DumpDataAll):
     def _dump_instruments(self):
         logger.info("start dump instruments......")
-        _fun = partial(self._get_date, is_begin_end=True)
         new_stock_files = sorted(
             filter(
                 lambda x: self.get_symbol_from_file(x).upper() not in self._old_instruments,
                 self.df_files,
             )
         )
-        with tqdm(total=len(new_stock_files)) as p_bar:
-            with ProcessPoolExecutor(max_workers=self.works) as execute:
-                for file_path, (_begin_time, _end_time) in zip(new_stock_files, execute.map(_fun, new_stock_files)):
-                    if isinstance(_begin_time, pd.Timestamp) and isinstance(_end_time, pd.Timestamp):
-                        symbol = self.get_symbol_from_file(file_path).upper()
-                        _dt_map = self._old_instruments.setdefault(symbol, dict())
-                        _dt_map[self.INSTRUMENTS_START_FIELD] = self._format_datetime(_begin_time)
-                        _dt_map[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end_time)
-                    p_bar.update()
+        _, date_ranges, _ = self._scan_dates(new_stock_files)
+        for code, (first, last) in date_ranges.items():
+            _dt_map = self._old_instruments.setdefault(code.upper(), dict())
+            _dt_map[self.INSTRUMENTS_START_FIELD], _dt_map[self.INSTRUMENTS_END_FIELD] = self._format_dates(
+                [first, last]
+            )
         _inst_df = pd.DataFrame.from_dict(self._old_instruments, orient="index")
         _inst_df.index.names = [self.symbol_field_name]
         self.save_instruments(_inst_df.reset_index())
         logger.info("end of instruments dump.\n")
 
     def dump(self):
-        self._calendars_list = self._read_calendars(self._calendars_dir.joinpath(f"{self.freq}.txt"))
+        self._calendar = self._read_calendars(self._calendars_dir.joinpath(f"{self.freq}.txt"))
         # noinspection PyAttributeOutsideInit
         self._old_instruments = (
             self._read_instruments(self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME))
@@ -403,6 +537,7 @@ class DumpDataUpdate(DumpDataBase):
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        multi_field: bool = False,
     ):
         """
 
@@ -417,7 +552,7 @@ class DumpDataUpdate(DumpDataBase):
         freq: str, default "day"
             transaction frequency
         max_workers: int, default None
-            number of threads
+            number of processes, the files are processed in the current process if it is 1
         date_field_name: str, default "date"
             the name of the date field in the csv
         file_suffix: str, default ".csv"
@@ -430,6 +565,8 @@ class DumpDataUpdate(DumpDataBase):
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        multi_field: bool
+            dump all fields of an instrument into one `fields.<freq>.mbin` file, default False
         """
         super().__init__(
             data_path,
@@ -442,9 +579,11 @@ class DumpDataUpdate(DumpDataBase):
             symbol_field_name,
             exclude_fields,
             include_fields,
+            limit_nums,
+            multi_field=multi_field,
         )
         self._mode = self.UPDATE_MODE
-        self._old_calendar_list = self._read_calendars(self._calendars_dir.joinpath(f"{self.freq}.txt"))
+        self._old_calendar = self._read_calendars(self._calendars_dir.joinpath(f"{self.freq}.txt"))
         # NOTE: all.txt only exists once for each stock
         # NOTE: if a stock corresponds to multiple different time ranges, user need to modify self._update_instruments
         self._update_instruments = (
@@ -453,36 +592,13 @@ class DumpDataUpdate(DumpDataBase):
             .to_dict(orient="index")
         )  # type: dict
 
-        # load all csv files
-        self._all_data = self._load_all_source_data()  # type: pd.DataFrame
-        self._new_calendar_list = self._old_calendar_list + sorted(
-            filter(lambda x: x > self._old_calendar_list[-1], self._all_data[self.date_field_name].unique())
-        )
-
-    def _load_all_source_data(self):
-        # NOTE: Need more memory
-        logger.info("start load all source data....")
-        all_df = []
-
-        def _read_df(file_path: Path):
-            _df = read_as_df(file_path)
-            if self.date_field_name in _df.columns and not np.issubdtype(
-                _df[self.date_field_name].dtype, np.datetime64
-            ):
-                _df[self.date_field_name] = pd.to_datetime(_df[self.date_field_name])
-            if self.symbol_field_name not in _df.columns:
-                _df[self.symbol_field_name] = self.get_symbol_from_file(file_path)
-            return _df
-
-        with tqdm(total=len(self.df_files)) as p_bar:
-            with ThreadPoolExecutor(max_workers=self.works) as executor:
-                for df in executor.map(_read_df, self.df_files):
-                    if not df.empty:
-                        all_df.append(df)
-                    p_bar.update()
-
-        logger.info("end of load all data.\n")
-        return pd.concat(all_df, sort=False)
+    def _iter_symbols(self, file_path: Path, df: pd.DataFrame) -> Iterable[Tuple[str, pd.DataFrame]]:
+        """a source file may contain several symbols, the symbol is the name of the file if there is no symbol field"""
+        if self.symbol_field_name not in df.columns:
+            yield self.get_symbol_from_file(file_path), df
+            return
+        for code, _df in df.groupby(self.symbol_field_name, group_keys=False):
+            yield fname_to_code(str(code).lower()), _df
 
     def _dump_calendars(self):
         pass
@@ -490,49 +606,32 @@ class DumpDataUpdate(DumpDataBase):
     def _dump_instruments(self):
         pass
 
-    def _dump_features(self):
-        logger.info("start dump features......")
-        error_code = {}
-        with ProcessPoolExecutor(max_workers=self.works) as executor:
-            futures = {}
-            for _code, _df in self._all_data.groupby(self.symbol_field_name, group_keys=False):
-                _code = fname_to_code(str(_code).lower()).upper()
-                _start, _end = self._get_date(_df, is_begin_end=True)
-                if not (isinstance(_start, pd.Timestamp) and isinstance(_end, pd.Timestamp)):
-                    continue
-                if _code in self._update_instruments:
-                    # exists stock, will append data
-                    _update_calendars = (
-                        _df[_df[self.date_field_name] > self._update_instruments[_code][self.INSTRUMENTS_END_FIELD]][
-                            self.date_field_name
-                        ]
-                        .sort_values()
-                        .to_list()
-                    )
-                    if _update_calendars:
-                        self._update_instruments[_code][self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
-                        futures[executor.submit(self._dump_bin, _df, _update_calendars)] = _code
-                else:
-                    # new stock
-                    _dt_range = self._update_instruments.setdefault(_code, dict())
-                    _dt_range[self.INSTRUMENTS_START_FIELD] = self._format_datetime(_start)
-                    _dt_range[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
-                    futures[executor.submit(self._dump_bin, _df, self._new_calendar_list)] = _code
-
-            with tqdm(total=len(futures)) as p_bar:
-                for _future in as_completed(futures):
-                    try:
-                        _future.result()
-                    except Exception:
-                        error_code[futures[_future]] = traceback.format_exc()
-                    p_bar.update()
-            logger.info(f"dump bin errors: {error_code}")
-
-        logger.info("end of features dump.\n")
-
     def dump(self):
-        self.save_calendars(self._new_calendar_list)
-        self._dump_features()
+        # the source data is scanned instead of being loaded into memory
+        logger.info("start get all date......")
+        new_dates, date_ranges, symbol_files = self._scan_dates(self.df_files)
+        self._calendar = np.concatenate([self._old_calendar, new_dates[new_dates > self._old_calendar[-1]]])
+        logger.info("end of get all date.\n")
+        self.save_calendars(self._calendar)
+
+        update_files = set()
+        for code, (first, last) in date_ranges.items():
+            _code = code.upper()
+            if _code in self._update_instruments:
+                # exists stock, will append data
+                if last > to_int64_dates([self._update_instruments[_code][self.INSTRUMENTS_END_FIELD]])[0]:
+                    self._update_instruments[_code][self.INSTRUMENTS_END_FIELD] = self._format_dates([last])[0]
+                    update_files.update(symbol_files[code])
+            else:
+                # new stock
+                _dt_range = self._update_instruments.setdefault(_code, dict())
+                _dt_range[self.INSTRUMENTS_START_FIELD], _dt_range[self.INSTRUMENTS_END_FIELD] = self._format_dates(
+                    [first, last]
+                )
+                update_files.update(symbol_files[code])
+        error_code = self._dump_features(sorted(update_files))
+        logger.info(f"dump bin errors: {error_code}")
+
         df = pd.DataFrame.from_dict(self._update_instruments, orient="index")
         df.index.names = [self.symbol_field_name]
         self.save_instruments(df.reset_index())
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qlib.backtest.high_performance_ds import NumpyQuote, PandasQuote
+
+
+@pytest.fixture(scope="module")
+def quote_df():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", periods=120, freq="1min")
+    index = pd.MultiIndex.from_product([["AAA", "BBB", "CCC"], dates], names=["instrument", "datetime"])
+    df = pd.DataFrame(
+        {
+            "$close": rng.normal(10, 1, len(index)),
+            "$volume": rng.integers(0, 100, len(index)).astype(float),
+            "limit_buy": rng.random(len(index)) < 0.5,
+        },
+        index=index,
+    )
+    df.loc[rng.random(len(df)) < 0.2, "$close"] = np.nan
+    # CCC is not traded in the first hour and the last bars of AAA are missing
+    return df.drop(index=[("CCC", d) for d in dates[:60]] + [("AAA", d) for d in dates[-10:]])
+
+
+def _expected(df, stock_id, start_time, end_time, field, method):
+    if stock_id not in df.index.get_level_values("instrument"):
+        return None
+    data = df.loc[stock_id].loc[start_time:end_time, field]
+    if data.empty:
+        return None
+    if method == "sum":
+        return np.nansum(data)
+    elif method == "mean":
+        return np.nanmean(data) if data.notna().any() else np.nan
+    elif method == "all":
+        return data.all()
+    elif method == "last":
+        return data.iloc[-1]
+    valid = data.dropna()
+    return None if valid.empty else valid.iloc[-1]
+
+
+@pytest.mark.parametrize(
+    "field,method",
+    [("$close", "ts_data_last"), ("$close", "mean"), ("$close", "last"), ("$volume", "sum"), ("limit_buy", "all")],
+)
+def test_numpy_quote_agg(quote_df, field, method):
+    quote = NumpyQuote(quote_df, "1min")
+    stock_ids = ["AAA", "BBB", "CCC", "DDD"]
+    for start, end in [
+        ("2024-01-01 00:00", "2024-01-01 00:29"),
+        ("2024-01-01 00:50", "2024-01-01 01:10"),
+        ("2024-01-01 01:50", "2024-01-01 02:30"),
+        ("2024-01-01 03:00", "2024-01-01 04:00"),
+    ]:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        expected = [_expected(quote_df, s, start, end, field, method) for s in stock_ids]
+        for stock_id, value in zip(stock_ids, expected):
+            res = quote.get_data(stock_id, start, end, field, method)
+            if value is None:
+                assert res is None
+            else:
+                np.testing.assert_allclose(float(res), float(value), equal_nan=True)
+        batch = quote.get_data_batch(stock_ids, start, end, field, method)
+        np.testing.assert_allclose(batch, [np.nan if v is None else float(v) for v in expected], equal_nan=True)
+
+
+def test_numpy_quote_single_value_and_series(quote_df):
+    quote = NumpyQuote(quote_df, "1min")
+    t = pd.Timestamp("2024-01-01 00:10")
+    assert quote.get_data("AAA", t, t, "$volume", "sum") == quote_df.loc[("AAA", t), "$volume"]
+    assert quote.get_data("CCC", t, t, "$close") is None
+    assert quote.get_data("AAA", pd.Timestamp("2024-01-01 01:55"), pd.Timestamp("2024-01-01 01:55"), "$close") is None
+
+    start, end = pd.Timestamp("2024-01-01 00:55"), pd.Timestamp("2024-01-01 01:05")
+    res = quote.get_data("CCC", start, end, "$close")
+    expected = quote_df.loc["CCC"].loc[start:end, "$close"]
+    np.testing.assert_array_equal(res.data, expected.values)
+    assert list(res.index) == list(expected.index)
+    # the default batch accessor of the other quotes gives the same results
+    np.testing.assert_allclose(
+        quote.get_data_batch(["AAA", "CCC"], start, end, "$volume", "sum"),
+        PandasQuote(quote_df, "1min").get_data_batch(["AAA", "CCC"], start, end, "$volume", "sum"),
+    )
@@ -1,6 +1,10 @@
 import os
 import sys
 
+import numpy as np
+import pandas as pd
+import pytest
+
 """Ignore RL tests on non-linux platform."""
 collect_ignore = []
 
@@ -8,3 +12,33 @@ if sys.platform != "linux":
     for root, dirs, files in os.walk("rl"):
         for file in files:
             collect_ignore.append(os.path.join(root, file))
+
+
+@pytest.fixture(scope="session")
+def synthetic_qlib_dir(tmp_path_factory):
+    """A small daily qlib dataset (4 instruments, 120 days) written without downloading anything."""
+    qlib_dir = tmp_path_factory.mktemp("synthetic_qlib")
+    calendar = pd.date_range("2020-01-01", periods=120, freq="D")
+    qlib_dir.joinpath("calendars").mkdir()
+    qlib_dir.joinpath("calendars", "day.txt").write_text("\n".join(calendar.strftime("%Y-%m-%d")) + "\n")
+    rng = np.random.default_rng(42)
+    spans = {"AAA": (0, 120), "BBB": (0, 120), "CCC": (10, 120), "DDD": (0, 90)}
+    lines = []
+    for inst, (si, ei) in spans.items():
+        lines.append(f"{inst}\t{calendar[si]:%Y-%m-%d}\t{calendar[ei - 1]:%Y-%m-%d}")
+        inst_dir = qlib_dir.joinpath("features", inst.lower())
+        inst_dir.mkdir(parents=True)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, ei - si)))
+        fields = {
+            "open": close * (1 + rng.normal(0, 0.005, ei - si)),
+            "high": close * 1.01,
+            "low": close * 0.99,
+            "close": close,
+            "volume": rng.integers(100, 1000, ei - si).astype(float),
+            "factor": np.ones(ei - si),
+        }
+        for field, values in fields.items():
+            np.hstack([si, values]).astype("<f").tofile(inst_dir.joinpath(f"{field}.day.bin"))
+    qlib_dir.joinpath("instruments").mkdir()
+    qlib_dir.joinpath("instruments", "all.txt").write_text("\n".join(lines) + "\n")
+    return qlib_dir
@@ -0,0 +1,109 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.joinpath("scripts")))
+from data_collector.crypto.async_ohlcv import AsyncOHLCVFetcher, TokenBucket, get_rate_limiter  # noqa: E402
+
+MINUTE = 60 * 1000
+
+
+class FakeExchange:
+    """serve the 1m bars of [0, n_bars) with at most `page_size` bars per response"""
+
+    def __init__(self, n_bars, page_size=7, failures=0, latency=0.005):
+        self.n_bars = n_bars
+        self.page_size = page_size
+        self.failures = failures
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_times = []
+        self.symbols = set()
+
+    @staticmethod
+    def parse_timeframe(timeframe):
+        assert timeframe == "1m"
+        return 60
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None):
+        self.request_times.append(time.monotonic())
+        self.symbols.add(symbol)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("fake network error")
+            first = -(-since // MINUTE)
+            last = min(first + min(limit, self.page_size), self.n_bars)
+            return [[i * MINUTE, i, i, i, i, hash(symbol) % 100] for i in range(first, last)]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.parametrize("start, end", [(0, 99 * MINUTE), (5 * MINUTE + 1, 57 * MINUTE), (0, 200 * MINUTE)])
+def test_fetch_all(start, end):
+    exchange = FakeExchange(n_bars=100)
+    fetcher = AsyncOHLCVFetcher(exchange, TokenBucket(10000), "1m", limit=20, max_concurrency=4)
+    saved = {}
+    res = asyncio.run(fetcher.fetch_all(["BTC/USDT", "ETH/USDT"], start, end, callback=saved.__setitem__))
+    expected = [ts for ts in range(0, 100 * MINUTE, MINUTE) if start <= ts <= end]
+    for symbol in ["BTC/USDT", "ETH/USDT"]:
+        # complete, ordered and without duplicates though the pages are fetched concurrently
+        assert [bar[0] for bar in res[symbol]] == expected
+        assert saved[symbol] == res[symbol]
+    assert 1 < exchange.max_in_flight <= 4
+
+
+def test_retry_and_failure():
+    exchange = FakeExchange(n_bars=30, failures=2)
+    fetcher = AsyncOHLCVFetcher(exchange, TokenBucket(10000), "1m", limit=10, max_retries=2, retry_delay=0.001)
+    res = asyncio.run(fetcher.fetch_all(["BTC/USDT"], 0, 29 * MINUTE))
+    assert len(res["BTC/USDT"]) == 30
+
+    exchange = FakeExchange(n_bars=30, failures=100)
+    fetcher = AsyncOHLCVFetcher(exchange, TokenBucket(10000), "1m", limit=10, max_retries=1, retry_delay=0.001)
+    assert asyncio.run(fetcher.fetch_all(["BTC/USDT"], 0, 29 * MINUTE)) == {"BTC/USDT": None}
+
+
+def test_shared_rate_limit():
+    exchange = FakeExchange(n_bars=100, page_size=10, latency=0)
+    limiter = TokenBucket(rate=200, capacity=5)
+    fetcher = AsyncOHLCVFetcher(exchange, limiter, "1m", limit=10, max_concurrency=32)
+    asyncio.run(fetcher.fetch_all([f"S{i}/USDT" for i in range(4)], 0, 99 * MINUTE))
+    # 4 symbols * 10 pages, the burst of 5 requests and then 200 requests per second
+    assert fetcher.n_requests == len(exchange.request_times) == 40
+    elapsed = exchange.request_times[-1] - exchange.request_times[0]
+    assert elapsed >= (40 - 5) / 200 * 0.9
+
+
+def test_fetch_each_bounded_symbols():
+    exchange = FakeExchange(n_bars=30, page_size=10)
+    fetcher = AsyncOHLCVFetcher(exchange, TokenBucket(10000), "1m", limit=10, max_concurrency=8, max_symbols=2)
+    in_progress = []
+
+    def _callback(symbol, bars):
+        assert [bar[0] for bar in bars] == list(range(0, 30 * MINUTE, MINUTE))
+        # only the symbols taken by the 2 workers have been requested
+        in_progress.append(len(exchange.symbols))
+        exchange.symbols.discard(symbol)
+
+    symbols = (f"S{i}/USDT" for i in range(10))
+    assert asyncio.run(fetcher.fetch_each(symbols, 0, 29 * MINUTE, _callback)) == []
+    assert len(in_progress) == 10 and max(in_progress) <= 2
+
+
+def test_rate_limiter_across_event_loops():
+    # the retries of the collector run the fetchers in successive `asyncio.run` with the same limiter
+    limiter = get_rate_limiter("fake", rate=200, capacity=1)
+    assert get_rate_limiter("fake", rate=200, capacity=1) is limiter
+    assert get_rate_limiter("fake", rate=100, capacity=1).rate == 100
+    for _ in range(2):
+        fetcher = AsyncOHLCVFetcher(FakeExchange(n_bars=30, page_size=10, latency=0), limiter, "1m", limit=10)
+        res = asyncio.run(fetcher.fetch_all([f"S{i}/USDT" for i in range(3)], 0, 29 * MINUTE))
+        assert all(len(bars) == 30 for bars in res.values())
@@ -0,0 +1,135 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.joinpath("scripts")))
+from data_collector.crypto.backfill import BackfillCheckpoint, update_qlib  # noqa: E402
+from qlib.data.storage.file_storage import FileFeatureStorage, FileInstrumentStorage  # noqa: E402
+
+FREQ = "1min"
+# BBB is listed later and CCC has no bars at the end
+LISTING = {
+    "AAA": ("2024-01-01 00:00", "2024-01-03"),
+    "BBB": ("2024-01-01 05:07", "2024-01-03"),
+    "CCC": ("2024-01-01", "2024-01-01 20:00"),
+}
+
+
+def _bars(symbol, start, end):
+    first, last = LISTING[symbol]
+    dates = pd.date_range(max(pd.Timestamp(first), start), min(pd.Timestamp(last), end), freq=FREQ)
+    # some bars are missing
+    dates = dates[(dates.minute != 3) | (dates.hour % 7 != 0)]
+    value = (dates - pd.Timestamp("2024-01-01")) / pd.Timedelta(FREQ) + (ord(symbol[0]) - ord("A")) * 1e4
+    return pd.DataFrame({"date": dates, "close": value, "volume": value * 2})
+
+
+@pytest.fixture(autouse=True)
+def init_qlib(tmp_path):
+    qlib.init(provider_uri=str(tmp_path.joinpath("qlib")), expression_cache=None, dataset_cache=None)
+
+
+class FakeFetch:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.requests = []
+
+    def __call__(self, since, end, callback):
+        for symbol, start in since.items():
+            self.requests.append((symbol, start))
+            if symbol in self.fail:
+                continue
+            callback(symbol, _bars(symbol, start, end))
+
+
+def _read(qlib_dir, symbol, field):
+    return FileFeatureStorage(symbol, field, FREQ, provider_uri={FREQ: str(qlib_dir)})[:]
+
+
+def _expected(symbol, field, calendar):
+    df = _bars(symbol, calendar[0], calendar[-1]).set_index("date").reindex(calendar)[field]
+    df.index = range(len(calendar))
+    return df.loc[df.first_valid_index() : df.last_valid_index()]
+
+
+def _check(qlib_dir, end):
+    calendar = pd.to_datetime(qlib_dir.joinpath("calendars", f"{FREQ}.txt").read_text().split("\n")[:-1])
+    assert calendar[-1] == pd.Timestamp(end) and (np.diff(calendar) == pd.Timedelta(FREQ)).all()
+    for symbol in LISTING:
+        for field in ["close", "volume"]:
+            res = _read(qlib_dir, symbol, field)
+            pd.testing.assert_series_equal(
+                res, _expected(symbol, field, calendar), check_dtype=False, check_names=False
+            )
+    instruments = FileInstrumentStorage("all", FREQ, provider_uri={FREQ: str(qlib_dir)}).data
+    for symbol, (first, last) in LISTING.items():
+        assert instruments[symbol][0][0] == pd.Timestamp(first)
+        expected_last = _bars(symbol, calendar[0], pd.Timestamp(end))["date"].iloc[-1]
+        assert instruments[symbol][0][1] == expected_last
+
+
+def test_update_qlib(tmp_path):
+    qlib_dir = tmp_path.joinpath("qlib")
+    fetch = FakeFetch()
+    update_qlib(qlib_dir, FREQ, fetch, list(LISTING), start="2024-01-01", end="2024-01-01 10:59")
+    _check(qlib_dir, "2024-01-01 10:59")
+
+    fetch = FakeFetch()
+    res = update_qlib(qlib_dir, FREQ, fetch, end="2024-01-02 05:00")
+    _check(qlib_dir, "2024-01-02 05:00")
+    # only the missing bars are requested
+    assert dict(fetch.requests) == {
+        "AAA": pd.Timestamp("2024-01-01 11:00"),
+        "BBB": pd.Timestamp("2024-01-01 11:00"),
+        "CCC": pd.Timestamp("2024-01-01 11:00"),
+    }
+    assert res == {"updated": ["AAA", "BBB", "CCC"], "skipped": [], "failed": []}
+
+    # up to date, the delisted CCC is requested but has no new bars
+    fetch = FakeFetch()
+    res = update_qlib(qlib_dir, FREQ, fetch, end="2024-01-02 05:00")
+    assert [symbol for symbol, _ in fetch.requests] == ["CCC"]
+    assert res == {"updated": [], "skipped": ["AAA", "BBB", "CCC"], "failed": []}
+    assert not qlib_dir.joinpath(f".backfill.{FREQ}.json").exists()
+
+
+def test_resume_update(tmp_path):
+    qlib_dir = tmp_path.joinpath("qlib")
+    update_qlib(qlib_dir, FREQ, FakeFetch(), list(LISTING), start="2024-01-01", end="2024-01-01 10:59")
+
+    # BBB fails, the checkpoint keeps the finished symbols
+    res = update_qlib(qlib_dir, FREQ, FakeFetch(fail=["BBB"]), end="2024-01-02 12:00")
+    assert res["failed"] == ["BBB"]
+    checkpoint = BackfillCheckpoint(qlib_dir.joinpath(f".backfill.{FREQ}.json"))
+    assert sorted(checkpoint.symbols) == ["AAA", "CCC"]
+    assert checkpoint.symbols["CCC"] == ["2024-01-01 11:00:00", "2024-01-01 20:00:00"]
+
+    fetch = FakeFetch()
+    res = update_qlib(qlib_dir, FREQ, fetch, end="2024-01-02 12:00")
+    assert [symbol for symbol, _ in fetch.requests] == ["BBB"] and res["updated"] == ["BBB"]
+    _check(qlib_dir, "2024-01-02 12:00")
+    assert not checkpoint.path.exists()
+
+
+def test_interrupted_update(tmp_path):
+    qlib_dir = tmp_path.joinpath("qlib")
+    update_qlib(qlib_dir, FREQ, FakeFetch(), list(LISTING), start="2024-01-01", end="2024-01-01 10:59")
+
+    def _interrupted(since, end, callback):
+        symbol = next(iter(since))
+        callback(symbol, _bars(symbol, since[symbol], end))
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        update_qlib(qlib_dir, FREQ, _interrupted, end="2024-01-01 15:00")
+    # the next run goes further, the bars of the interrupted run are kept
+    fetch = FakeFetch()
+    update_qlib(qlib_dir, FREQ, fetch, end="2024-01-01 23:00")
+    assert dict(fetch.requests)["AAA"] == pd.Timestamp("2024-01-01 15:01")
+    assert dict(fetch.requests)["BBB"] == pd.Timestamp("2024-01-01 11:00")
+    _check(qlib_dir, "2024-01-01 23:00")
@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data import D
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.joinpath("scripts")))
+from data_collector.crypto.bars import build_bars, parse_freq  # noqa: E402
+from data_collector.crypto.dump import dump_to_qlib  # noqa: E402
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+def _bars(symbol, start, periods, drop=()):
+    rng = np.random.default_rng(ord(symbol[0]))
+    close = 100 + rng.normal(size=periods).cumsum()
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range(start, periods=periods, freq="1min"),
+            "open": close + rng.normal(size=periods),
+            "high": close + 2,
+            "low": close - 2,
+            "close": close,
+            "volume": rng.integers(0, 10, size=periods).astype(float),
+        }
+    )
+    df["symbol"] = symbol
+    return df.drop(index=list(drop)).reset_index(drop=True)
+
+
+def _resample(df, freq):
+    df = df.set_index("date")
+    res = df.resample(freq, label="left", closed="left").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    )
+    typical = df[["high", "low", "close"]].mean(axis=1) * df["volume"]
+    res["vwap"] = typical.resample(freq, label="left", closed="left").sum() / res["volume"].replace(0, np.nan)
+    # the bars without any 1min bar are missing
+    return res[df["close"].resample(freq, label="left", closed="left").count() > 0]
+
+
+def test_parse_freq():
+    assert parse_freq("5min") == ("5min", 5 * 60 * 10**9)
+    assert parse_freq("4h") == ("240min", 4 * 3600 * 10**9)
+    assert parse_freq("1d") == ("day", 24 * 3600 * 10**9)
+    for freq in ["1mon", "1w", "30s"]:
+        with pytest.raises(ValueError):
+            parse_freq(freq)
+
+
+@pytest.mark.parametrize("multi_field", [False, True])
+def test_build_bars(tmp_path, multi_field):
+    normalize_dir = tmp_path.joinpath("normalize")
+    normalize_dir.mkdir()
+    data = {
+        # a gap of a whole 5min bar and a bar with a single 1min bar
+        "AAA": _bars("AAA", "2024-01-01 00:00", 600, drop=range(20, 29)),
+        "BBB": _bars("BBB", "2024-01-01 04:00", 300),
+    }
+    for symbol, df in data.items():
+        df.to_csv(normalize_dir.joinpath(f"{symbol}.csv"), index=False)
+    qlib_dir = tmp_path.joinpath("qlib")
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    dump_to_qlib(normalize_dir, qlib_dir, "1min", multi_field=multi_field)
+    assert build_bars(qlib_dir, "5min,4h", multi_field=multi_field) == ["5min", "240min"]
+
+    assert qlib_dir.joinpath("calendars", "240min.txt").read_text().split("\n")[:-1] == [
+        "2024-01-01 00:00:00",
+        "2024-01-01 04:00:00",
+        "2024-01-01 08:00:00",
+    ]
+    kwargs = {}
+    if multi_field:
+        kwargs["feature_provider"] = {
+            "class": "LocalFeatureProvider",
+            "kwargs": {
+                "backend": {
+                    "class": "FileMultiFieldFeatureStorage",
+                    "module_path": "qlib.data.storage.multi_field_storage",
+                }
+            },
+        }
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None, **kwargs)
+    for freq, pd_freq in [("5min", "5min"), ("240min", "4h")]:
+        fields = FIELDS + ["vwap"]
+        df = D.features(D.instruments("all"), [f"${f}" for f in fields], freq=freq)
+        for symbol, symbol_df in data.items():
+            expected = _resample(symbol_df, pd_freq)
+            res = df.loc[symbol].dropna(how="all")
+            res.columns = fields
+            pd.testing.assert_frame_equal(
+                res, expected[fields], check_dtype=False, check_names=False, check_freq=False, rtol=1e-5
+            )
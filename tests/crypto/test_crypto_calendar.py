@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from qlib.data.cache import H
+from qlib.data.crypto.calendar import CalendarProvider
+
+
+@pytest.fixture
+def provider():
+    H["c"].clear()
+    return CalendarProvider()
+
+
+def test_minute_calendar_is_arithmetic(provider):
+    cal = provider.calendar("2024-01-01 00:00:30", "2024-01-01 00:05:00", freq="1min")
+    expected = pd.date_range("2024-01-01 00:01", "2024-01-01 00:05", freq="1min")
+    assert list(cal) == list(expected)
+    assert isinstance(cal[0], pd.Timestamp)
+
+
+def test_locate_index_matches_date_range(provider):
+    full = pd.date_range(CalendarProvider.START, "2024-02-01", freq="1h")
+    start, end, si, ei = provider.locate_index("2024-01-03 10:30", "2024-01-05 07:59", freq="1h")
+    assert start == pd.Timestamp("2024-01-03 11:00")
+    assert end == pd.Timestamp("2024-01-05 07:00")
+    assert full[si] == start
+    assert full[ei] == end
+
+
+def test_daily_calendar_and_load(provider):
+    cal = provider.calendar("2024-01-01", "2024-01-03", freq="day")
+    assert list(cal) == list(pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]))
+    full = provider.load_calendar("day", future=False)
+    assert full[0] == CalendarProvider.START
+    assert len(full) == len(pd.date_range(CalendarProvider.START, pd.Timestamp.today(), freq="D"))
+
+
+def test_out_of_range(provider):
+    assert len(provider.calendar("1990-01-01", "1990-02-01", freq="day")) == 0
+    with pytest.raises(IndexError):
+        provider.locate_index("2200-01-01", "2200-01-02", freq="day")
+
+
+def test_irregular_freq_falls_back_to_timestamps(provider):
+    full = provider.load_calendar("MS", future=False)
+    assert isinstance(full, list) and full[0] == CalendarProvider.START
+    start, end, si, ei = provider.locate_index("2024-01-15", "2024-03-15", freq="MS")
+    assert (start, end) == (pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-01"))
+    assert isinstance(start, pd.Timestamp) and full[si] == start and full[ei] == end
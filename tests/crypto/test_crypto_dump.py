@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.joinpath("scripts")))
+from data_collector.crypto import dump  # noqa: E402
+from data_collector.crypto.dump import dump_to_qlib  # noqa: E402
+from qlib.data.storage.file_storage import FileFeatureStorage, FileInstrumentStorage  # noqa: E402
+from qlib.data.storage.multi_field_storage import MultiFieldBin  # noqa: E402
+
+FIELDS = ["open", "close", "volume"]
+
+
+def _normalized(symbol, start, periods, drop=()):
+    dates = pd.date_range(start, periods=periods, freq="1min")
+    rng = np.random.default_rng(ord(symbol[0]))
+    df = pd.DataFrame(rng.normal(size=(periods, len(FIELDS))), columns=FIELDS)
+    df.insert(0, "date", dates)
+    df["symbol"] = symbol
+    return df.drop(index=list(drop))
+
+
+@pytest.fixture()
+def normalize_dir(tmp_path):
+    normalize_dir = tmp_path.joinpath("normalize")
+    normalize_dir.mkdir()
+    data = {
+        "AAA": _normalized("AAA", "2024-01-01 00:00", 300, drop=[5, 6, 100]),
+        "BBB": _normalized("BBB", "2024-01-01 01:10", 120),
+        # the rows are not sorted and the last row is duplicated
+        "CCC": _normalized("CCC", "2024-01-01 00:30", 50, drop=[10]).iloc[::-1],
+    }
+    data["CCC"] = pd.concat([data["CCC"], data["CCC"].iloc[[0]]])
+    for symbol, df in data.items():
+        df.to_csv(normalize_dir.joinpath(f"{symbol}.csv"), index=False)
+    normalize_dir.joinpath("EMPTY.csv").write_text("date,open,close,volume,symbol\n")
+    return normalize_dir, data
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_dump_to_qlib(normalize_dir, tmp_path, max_workers, monkeypatch):
+    # the dates are merged into the calendar in many steps
+    monkeypatch.setattr(dump, "MERGE_SIZE", 100)
+    normalize_dir, data = normalize_dir
+    qlib_dir = tmp_path.joinpath("qlib")
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    dump_to_qlib(normalize_dir, qlib_dir, "1min", max_workers=max_workers)
+
+    calendar = pd.DatetimeIndex(sorted(set(pd.concat([df["date"] for df in data.values()]))))
+    assert qlib_dir.joinpath("calendars", "1min.txt").read_text().split("\n")[:-1] == list(
+        calendar.strftime("%Y-%m-%d %H:%M:%S")
+    )
+    instruments = FileInstrumentStorage("all", "1min", provider_uri={"1min": str(qlib_dir)}).data
+    assert sorted(instruments) == ["AAA", "BBB", "CCC"]
+    for symbol, df in data.items():
+        df = df.drop_duplicates("date").set_index("date").sort_index()
+        assert instruments[symbol] == [(df.index[0], df.index[-1])]
+        expected = df[FIELDS].reindex(calendar)
+        expected.index = range(len(calendar))
+        expected = expected.loc[calendar.get_loc(df.index[0]) : calendar.get_loc(df.index[-1])]
+        for field in FIELDS:
+            res = FileFeatureStorage(symbol, field, "1min", provider_uri={"1min": str(qlib_dir)})[:]
+            pd.testing.assert_series_equal(res, expected[field], check_dtype=False, check_names=False, atol=1e-6)
+
+
+def test_dump_to_qlib_multi_field(normalize_dir, tmp_path):
+    normalize_dir, data = normalize_dir
+    qlib_dir = tmp_path.joinpath("qlib")
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    dump_to_qlib(normalize_dir, qlib_dir, "1min", multi_field=True)
+
+    mbin = MultiFieldBin(qlib_dir.joinpath("features", "bbb", "fields.1min.mbin"))
+    # BBB starts at 01:10, the calendar starts at 00:00 without 00:05 and 00:06
+    si, values = mbin.read(FIELDS, slice(None, None))
+    assert si == 68
+    np.testing.assert_allclose(values, data["BBB"][FIELDS].values, rtol=1e-6)
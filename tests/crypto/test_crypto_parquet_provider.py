@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from qlib.contrib.data.crypto_provider import CryptoProvider, ParquetDatasetStorage
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+def _bars(start, periods, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(periods, len(FIELDS))), columns=FIELDS)
+    df.insert(0, "datetime", pd.date_range(start, periods=periods, freq="1min"))
+    return df
+
+
+@pytest.fixture()
+def uri(tmp_path):
+    ParquetDatasetStorage.clear_cache()
+    uri = tmp_path.joinpath("parquet")
+    # 3 daily partitions with row groups of 6 hours
+    ParquetDatasetStorage.write(_bars("2024-01-01", 3 * 1440), uri, "binance", "BTC/USDT", row_group_size=360)
+    ParquetDatasetStorage.write(_bars("2024-01-02", 1440, seed=1), uri, "okx", "ETH/USDT", row_group_size=360)
+    yield uri
+    ParquetDatasetStorage.clear_cache()
+
+
+def test_read_projects_and_prunes(uri, monkeypatch):
+    read = []
+    read_row_groups = pq.ParquetFile.read_row_groups
+
+    def _read_row_groups(self, row_groups, columns=None, **kwargs):
+        read.append((row_groups, columns))
+        return read_row_groups(self, row_groups, columns=columns, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, "read_row_groups", _read_row_groups)
+    storage = ParquetDatasetStorage("BTC/USDT", "1min", provider_uri={"1min": str(uri)}, exchange="binance")
+    assert [first for first, _ in storage.partitions()] == list(pd.date_range("2024-01-01", periods=3))
+
+    start, end = pd.Timestamp("2024-01-02 05:30"), pd.Timestamp("2024-01-02 06:10")
+    df = storage.read(["close", "volume"], start, end)
+    expected = _bars("2024-01-01", 3 * 1440).set_index("datetime").loc[start:end, ["close", "volume"]]
+    pd.testing.assert_frame_equal(df, expected, check_names=False, check_freq=False)
+    # only the 2 row groups of the second partition around 06:00 are read
+    assert read == [([0, 1], ["datetime", "close", "volume"])]
+
+    assert storage.read(["close"], pd.Timestamp("2025-01-01"), pd.Timestamp("2025-01-02")).empty
+
+
+def test_footer_cache(uri):
+    provider_uri = {"1min": str(uri)}
+    first = ParquetDatasetStorage("okx:ETH/USDT", "1min", provider_uri=provider_uri)
+    first.read(["close"], pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-02 01:00"))
+    files = dict(ParquetDatasetStorage._files)
+    assert len(files) == 1
+
+    # a new storage reuses the opened file and its footer
+    second = ParquetDatasetStorage("okx:ETH/USDT", "1min", provider_uri=provider_uri)
+    second.read(["open"], pd.Timestamp("2024-01-02 02:00"), pd.Timestamp("2024-01-02 03:00"))
+    assert {k: v[1] for k, v in ParquetDatasetStorage._files.items()} == {k: v[1] for k, v in files.items()}
+
+    # the modified partitions and the new ones are reloaded
+    ParquetDatasetStorage.write(_bars("2024-01-02", 2 * 1440, seed=2), uri, "okx", "ETH/USDT")
+    df = second.read(["open"], pd.Timestamp("2024-01-02 23:59"), pd.Timestamp("2024-01-03 00:00"))
+    assert df["open"].tolist() == _bars("2024-01-02", 2 * 1440, seed=2)["open"].iloc[1439:1441].tolist()
+
+
+def test_crypto_provider_features(uri, monkeypatch):
+    provider = CryptoProvider(
+        backend={
+            "class": "ParquetDatasetStorage",
+            "module_path": "qlib.contrib.data.crypto_provider",
+            "kwargs": {"provider_uri": {"1min": str(uri)}},
+        }
+    )
+    cal = pd.date_range("2024-01-01 23:58", periods=4, freq="1min")
+    monkeypatch.setattr(provider, "calendar", lambda *args, **kwargs: cal)
+    df = provider.features(["binance:BTC/USDT", "okx:ETH/USDT"], ["$close"], freq="1min")
+    assert df.loc["okx:ETH/USDT", "close"].isna().tolist() == [True, True, False, False]
+    assert (
+        df.loc["binance:BTC/USDT", "close"].tolist() == _bars("2024-01-01", 3 * 1440)["close"].iloc[1438:1442].tolist()
+    )
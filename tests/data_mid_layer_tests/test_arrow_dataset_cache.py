@@ -0,0 +1,116 @@
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import ArrowDatasetCache, DiskDatasetCache
+
+FIELDS = ["$close", "Ref($close, 1) / $close", "Mean($close, 5)", "Ref($close, -2)", "$close"]
+
+
+@pytest.fixture(scope="module")
+def qlib_dir(synthetic_qlib_dir, tmp_path_factory):
+    # the caches are written into the data directory
+    qlib_dir = tmp_path_factory.mktemp("arrow_cache").joinpath("data")
+    shutil.copytree(synthetic_qlib_dir, qlib_dir)
+    return qlib_dir
+
+
+def _init(qlib_dir, dataset_cache):
+    qlib.init(
+        provider_uri=str(qlib_dir),
+        expression_cache=None,
+        dataset_cache=dataset_cache,
+        cache_lock_backend="file",
+        cache_lock_dir=str(qlib_dir.parent.joinpath("locks")),
+        kernels=1,
+    )
+
+
+@pytest.mark.parametrize(
+    "instruments, start_time, end_time",
+    [
+        ("all", None, None),
+        ("all", "2020-02-01", "2020-03-31"),
+        (["DDD", "CCC"], "2020-03-20", "2020-04-10"),
+        (["CCC"], "2020-01-01", "2020-01-10"),  # CCC starts on 2020-01-11
+    ],
+)
+def test_arrow_dataset_cache(qlib_dir, instruments, start_time, end_time):
+    _init(qlib_dir, None)
+    if isinstance(instruments, str):
+        instruments = D.instruments(instruments)
+    expected = D.features(instruments, FIELDS, start_time, end_time)
+    _init(qlib_dir, "ArrowDatasetCache")
+    # the cache is generated by the first call and read by the second one
+    for _ in range(2):
+        res = D.features(instruments, FIELDS, start_time, end_time)
+        if expected.empty:
+            assert res.empty
+        else:
+            pd.testing.assert_frame_equal(res, expected, check_dtype=False)
+    assert list(qlib_dir.joinpath(C.arrow_dataset_cache_dir_name).glob("*.meta"))
+
+
+def test_arrow_dataset_cache_update(qlib_dir):
+    _init(qlib_dir, None)
+    instruments = D.instruments("all")
+    expected = D.features(instruments, FIELDS)
+    _init(qlib_dir, "ArrowDatasetCache")
+    D.features(instruments, FIELDS)
+    cache = ArrowDatasetCache(provider=None)
+    cache_dir = cache.get_cache_dir("day")
+    uri = cache._uri(instruments, FIELDS, None, None, "day", disk_cache=1)
+    # pretend the cache was generated 10 days ago
+    meta_path = cache_dir.joinpath(uri).with_suffix(".meta")
+    with meta_path.open("rb") as f:
+        meta = pickle.load(f)
+    meta["info"]["last_update"] = "2020-04-19"
+    with meta_path.open("wb") as f:
+        pickle.dump(meta, f)
+    history = ArrowDatasetCache.read_data_from_cache(cache_dir.joinpath(uri), None, "2020-04-19", FIELDS)
+    cache_path = cache_dir.joinpath(uri)
+    cache.write_cache(cache_path, history.swaplevel().sort_index(), meta["info"])
+
+    from qlib.data.data import DatasetD  # pylint: disable=C0415
+
+    assert DatasetD.update(uri, "day") == 0
+    res = ArrowDatasetCache.read_data_from_cache(cache_path, None, None, FIELDS)
+    pd.testing.assert_frame_equal(res, expected, check_dtype=False)
+
+
+def _make_features(n_inst, n_days, n_fields):
+    rng = np.random.default_rng(0)
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2015-01-01", periods=n_days, freq="D"), [f"PAIR{i:04d}" for i in range(n_inst)]],
+        names=["datetime", "instrument"],
+    )
+    values = rng.normal(size=(len(index), n_fields)).astype(np.float32)
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=index, columns=[f"$f{i}" for i in range(n_fields)])
+
+
+@pytest.mark.slow
+def test_arrow_read_benchmark(tmp_path):
+    """a cache hit of the Arrow dataset cache gives the data of the HDF one, the timings are printed"""
+    features = _make_features(500, 1500, 6)
+    fields = ["$f3", "$f0"]
+    caches = {"hdf": DiskDatasetCache(provider=None), "arrow": ArrowDatasetCache(provider=None)}
+    for name, cache in caches.items():
+        cache.write_cache(tmp_path.joinpath(name), features, {"instruments": "all", "freq": "day"})
+    for start_time, end_time in [(None, None), ("2017-01-01", "2017-12-31")]:
+        res = {}
+        for name, cache in caches.items():
+            t = time.time()
+            res[name] = cache.read_data_from_cache(tmp_path.joinpath(name), start_time, end_time, fields)
+            print(f"\n{name} [{start_time}, {end_time}]: {time.time() - t:.3f}s")
+        pd.testing.assert_frame_equal(res["arrow"], res["hdf"])
+        # the cached data is ordered by <instrument, datetime>
+        expected = features.loc[slice(start_time, end_time), fields].swaplevel().sort_index()
+        pd.testing.assert_frame_equal(res["arrow"], expected, check_names=False)
@@ -0,0 +1,84 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.cli.cache import update_cache
+from qlib.data import D
+from qlib.data.cache import ArrowDatasetCache
+
+FIELDS = ["$close", "Mean($close, 5)", "Ref($close, -2) / $close", "Corr($close, $volume, 10)"]
+
+
+@pytest.fixture()
+def qlib_dir(synthetic_qlib_dir, tmp_path):
+    qlib_dir = tmp_path.joinpath("data")
+    shutil.copytree(synthetic_qlib_dir, qlib_dir)
+    return qlib_dir
+
+
+def _init(qlib_dir, **kwargs):
+    qlib.init(
+        provider_uri=str(qlib_dir),
+        cache_lock_backend="file",
+        cache_lock_dir=str(qlib_dir.parent.joinpath("locks")),
+        kernels=1,
+        **kwargs,
+    )
+
+
+# the window stable fields are updated incrementally, the others(e.g. EMA) are computed again
+@pytest.mark.parametrize("fields", [FIELDS, FIELDS + ["EMA($close, 10)"]])
+@pytest.mark.parametrize("dataset_cache", ["DiskDatasetCache", "ArrowDatasetCache"])
+def test_update_cache(qlib_dir, dataset_cache, fields, monkeypatch):
+    # many small batches in the Arrow cache
+    monkeypatch.setattr(ArrowDatasetCache, "BATCH_ROWS", 30)
+    _init(qlib_dir, expression_cache=None, dataset_cache=None)
+    instruments = D.instruments("all")
+    expected = D.features(instruments, fields)
+
+    # generate the caches before the last 15 days are dumped
+    calendar_path = qlib_dir.joinpath("calendars", "day.txt")
+    calendar = calendar_path.read_text().split()
+    calendar_path.write_text("\n".join(calendar[:-15]) + "\n")
+    _init(qlib_dir, expression_cache="DiskExpressionCache", dataset_cache=dataset_cache)
+    D.features(instruments, fields)
+    calendar_path.write_text("\n".join(calendar) + "\n")
+
+    status = update_cache(
+        str(qlib_dir),
+        dataset_cache=dataset_cache,
+        cache_lock_backend="file",
+        cache_lock_dir=str(qlib_dir.parent.joinpath("locks")),
+        kernels=1,
+    )
+    n_expressions = 4 * (len(fields) - 1)
+    assert status["expression"] == {"updated": n_expressions}
+    assert status["dataset"] == {"updated": 1}
+    res = D.features(instruments, fields)
+    pd.testing.assert_frame_equal(res, expected, check_dtype=False)
+    # the dataset cache is read without being generated again
+    res = D.features(instruments, fields, "2020-04-01", None)
+    pd.testing.assert_frame_equal(res, expected.loc(axis=0)[:, "2020-04-01":], check_dtype=False)
+
+    # nothing to update
+    status = update_cache(str(qlib_dir), dataset_cache=dataset_cache, cache_lock_backend="file", kernels=1)
+    assert status["expression"] == {"skipped": n_expressions} and status["dataset"] == {"skipped": 1}
+
+
+def test_update_expression_cache_tail(qlib_dir):
+    calendar_path = qlib_dir.joinpath("calendars", "day.txt")
+    calendar = calendar_path.read_text().split()
+    calendar_path.write_text("\n".join(calendar[:-1]) + "\n")
+    _init(qlib_dir, expression_cache="DiskExpressionCache", dataset_cache=None)
+    D.features(["AAA"], ["Mean($close, 5)"])
+    cache_file = [p for p in qlib_dir.joinpath("features_cache", "aaa").iterdir() if p.suffix == ""][0]
+    before = np.fromfile(cache_file, dtype="<f")
+    calendar_path.write_text("\n".join(calendar) + "\n")
+
+    update_cache(str(qlib_dir), dataset_cache=None, cache_lock_backend="file", kernels=1)
+    after = np.fromfile(cache_file, dtype="<f")
+    assert len(after) == len(before) + 1
+    np.testing.assert_array_equal(after[: len(before)], before)
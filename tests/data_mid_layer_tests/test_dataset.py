@@ -146,6 +146,30 @@ class TestTSDataSampler(unittest.TestCase):
         self.assertEqual(dataset[0][1], dataset[1][0])
         self.assertEqual(dataset[0][2], dataset[1][1])
 
+    def test_TSDataSampler_batch(self):
+        """
+        The batch of samples is the same as the samples got one by one
+        """
+        rng = np.random.default_rng(0)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2000-01-01", periods=30), [f"{i:06d}" for i in range(8)]], names=["datetime", "instrument"]
+        )
+        test_df = pd.DataFrame(data=rng.normal(size=(len(index), 3)), index=index)
+        test_df = test_df[rng.random(len(test_df)) > 0.2]
+        flt_data = pd.Series(rng.random(len(test_df)) > 0.3, index=test_df.index)
+        for fillna_type in ["none", "ffill", "ffill+bfill"]:
+            dataset = TSDataSampler(
+                test_df.copy(), "2000-01-05", "2000-01-25", step_len=6, fillna_type=fillna_type, flt_data=flt_data
+            )
+            idx = rng.integers(0, len(dataset), 50)
+            expected = np.stack([dataset[int(i)] for i in idx])
+            np.testing.assert_array_equal(dataset[idx], expected)
+            np.testing.assert_array_equal(dataset[idx.tolist()], expected)
+            pairs = [tuple(key) for key in dataset.get_index()[idx]]
+            np.testing.assert_array_equal(dataset[pairs], expected)
+        with self.assertRaises(KeyError):
+            dataset[[0, len(dataset)]]
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=10)
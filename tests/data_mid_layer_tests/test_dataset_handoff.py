@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.config import C
+from qlib.data import D
+
+FIELDS = ["$close", "Ref($close, 1) / $close", "Mean($close, 5)", "$close > $open", "Corr($close, $volume, 10)"]
+
+
+@pytest.fixture(scope="module")
+def init_qlib(synthetic_qlib_dir):
+    qlib.init(provider_uri=str(synthetic_qlib_dir), expression_cache=None, dataset_cache=None, kernels=2)
+    yield
+    C["dataset_handoff"] = None
+
+
+def _features(handoff, *args, **kwargs):
+    C["dataset_handoff"] = handoff
+    return D.features(*args, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "instruments, start_time, end_time",
+    [
+        ("all", None, None),
+        ("all", "2020-02-01", "2020-03-31"),
+        (["DDD", "CCC", "AAA"], "2020-01-05", "2020-04-10"),
+        (["CCC"], "2020-01-01", "2020-01-10"),  # CCC starts on 2020-01-11
+    ],
+)
+def test_memmap_handoff(init_qlib, instruments, start_time, end_time):
+    if isinstance(instruments, str):
+        instruments = D.instruments(instruments)
+    expected = _features(None, instruments, FIELDS, start_time, end_time)
+    res = _features("memmap", instruments, FIELDS, start_time, end_time)
+    assert (res.dtypes == np.float32).all()
+    pd.testing.assert_frame_equal(res, expected.astype(np.float32))
+
+
+@pytest.mark.slow
+def test_memmap_handoff_benchmark(init_qlib):
+    """the handoffs by pickling and by the memory mapped block give the same wide data, the timings are printed"""
+    fields = [f"Mean($close, {i}) / $close" for i in range(1, 41)]
+    res = {}
+    for handoff in [None, "memmap"]:
+        t = time.time()
+        res[handoff] = _features(handoff, D.instruments("all"), fields)
+        print(f"\nhandoff={handoff}: {time.time() - t:.3f}s")
+    pd.testing.assert_frame_equal(res["memmap"], res[None].astype(np.float32))
@@ -0,0 +1,98 @@
+import fcntl
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import CacheUtils
+
+FIELDS = ["$close", "Ref($close, 1) / $close", "Mean($close, 5)", "Corr($close, $volume, 10)"]
+
+
+@pytest.fixture(scope="module")
+def qlib_dir(synthetic_qlib_dir, tmp_path_factory):
+    # the caches are written into the data directory
+    qlib_dir = tmp_path_factory.mktemp("cached_qlib").joinpath("data")
+    shutil.copytree(synthetic_qlib_dir, qlib_dir)
+    return qlib_dir
+
+
+def _init(qlib_dir, **kwargs):
+    qlib.init(
+        provider_uri=str(qlib_dir),
+        expression_cache="DiskExpressionCache",
+        dataset_cache="DiskDatasetCache",
+        cache_lock_dir=str(qlib_dir.parent.joinpath("locks")),
+        kernels=1,
+        **kwargs,
+    )
+
+
+def _features():
+    return D.features(D.instruments("all"), FIELDS, "2020-02-01", "2020-04-01")
+
+
+def test_auto_backend_keeps_caches(qlib_dir):
+    _init(qlib_dir, cache_lock_backend="auto")
+    assert C.cache_lock_backend in ("redis", "file")
+    assert C.expression_cache is not None and C.dataset_cache is not None
+
+
+def test_file_lock_cache(qlib_dir):
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None, kernels=1)
+    expected = _features()
+
+    _init(qlib_dir, cache_lock_backend="file")
+    assert C.cache_lock_backend == "file"
+    # the processes generate the same caches concurrently
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_features_in_process, range(4)))
+    for res in results + [_features(), _features()]:
+        pd.testing.assert_frame_equal(res, expected, check_dtype=False)
+
+    cache_files = [p for p in qlib_dir.rglob("*") if p.is_file() and "cache" in p.parent.name]
+    assert any(p.suffix == ".meta" for p in cache_files)
+    assert not [p for p in qlib_dir.rglob("*.tmp")]
+
+
+def _features_in_process(_):
+    return _features()
+
+
+def test_file_lock(qlib_dir, tmp_path):
+    C["cache_lock_dir"] = str(tmp_path)
+
+    def _try_lock(flag):
+        fd = os.open(next(tmp_path.glob("*.lock")), os.O_RDWR)
+        try:
+            fcntl.flock(fd, flag | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+        finally:
+            os.close(fd)
+
+    with CacheUtils.file_lock("dataset-x", shared=True):
+        assert _try_lock(fcntl.LOCK_SH) and not _try_lock(fcntl.LOCK_EX)
+    with CacheUtils.file_lock("dataset-x"):
+        assert not _try_lock(fcntl.LOCK_SH)
+    assert _try_lock(fcntl.LOCK_EX)
+
+
+def test_atomic_path(tmp_path):
+    path = tmp_path.joinpath("data")
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with CacheUtils.atomic_path(path) as tmp:
+            tmp.write_text("new")
+            raise RuntimeError
+    assert path.read_text() == "old" and len(list(tmp_path.iterdir())) == 1
+    with CacheUtils.atomic_path(path) as tmp:
+        tmp.write_text("new")
+        assert path.read_text() == "old"
+    assert path.read_text() == "new" and len(list(tmp_path.iterdir())) == 1
@@ -1,10 +1,26 @@
 import os
 import pickle
 import shutil
+import tracemalloc
 import unittest
+
+import numpy as np
+import pandas as pd
+
 from qlib.tests import TestAutoData
 from qlib.data import D
-from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.handler import DataHandler, DataHandlerLP
+from qlib.data.dataset.loader import StaticDataLoader
+from qlib.data.dataset.processor import (
+    CSRankNorm,
+    DropnaLabel,
+    Fillna,
+    MinMaxNorm,
+    Processor,
+    RobustZScoreNorm,
+    ZScoreNorm,
+)
+from qlib.log import MemoryInspector
 
 
 class HandlerTests(TestAutoData):
@@ -33,5 +49,151 @@ class HandlerTests(TestAutoData):
         os.remove(fname)
 
 
+class AddOne(Processor):
+    """a processor writing all the columns inplace without declaring them"""
+
+    def __call__(self, df):
+        df.values[:] += 1
+        return df
+
+
+class HandlerProcessTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2024-01-01", periods=500, freq="1min"), [f"S{i:02d}" for i in range(40)]],
+            names=["datetime", "instrument"],
+        )
+        columns = pd.MultiIndex.from_tuples([("feature", f"f{i}") for i in range(30)] + [("label", "LABEL0")])
+        values = rng.normal(size=(len(index), len(columns))).astype(np.float32)
+        values[rng.random(values.shape) < 0.05] = np.nan
+        self.df = pd.DataFrame(values, index=index, columns=columns)
+
+    def _processors(self):
+        return dict(
+            infer_processors=[
+                RobustZScoreNorm(None, "2024-01-01 03:00", fields_group="feature"),
+                Fillna(fields_group="feature"),
+            ],
+            learn_processors=[DropnaLabel(), CSRankNorm(fields_group="label")],
+        )
+
+    def test_process_without_copy(self):
+        raw = self.df.copy()
+        for process_type in [DataHandlerLP.PTYPE_A, DataHandlerLP.PTYPE_I]:
+            dh = DataHandlerLP(data_loader=StaticDataLoader(self.df), process_type=process_type, **self._processors())
+            # the raw data is not modified
+            pd.testing.assert_frame_equal(dh._data, raw)
+
+            # the same results as the processors on copies
+            procs = self._processors()
+            infer = raw.copy()
+            for proc in procs["infer_processors"]:
+                proc.fit(infer)
+                infer = proc(infer)
+            learn = (infer if process_type == DataHandlerLP.PTYPE_A else raw).copy()
+            for proc in procs["learn_processors"]:
+                proc.fit(learn)
+                learn = proc(learn)
+            pd.testing.assert_frame_equal(dh._infer, infer)
+            pd.testing.assert_frame_equal(dh._learn, learn)
+
+            # only the features are copied for inference
+            self.assertTrue(
+                np.shares_memory(dh._infer[("label", "LABEL0")].values, dh._data[("label", "LABEL0")].values)
+            )
+            self.assertFalse(np.shares_memory(dh._infer[("feature", "f0")].values, dh._data[("feature", "f0")].values))
+
+    def test_undeclared_writes(self):
+        raw = self.df.copy()
+        dh = DataHandlerLP(data_loader=StaticDataLoader(self.df), infer_processors=[AddOne()])
+        pd.testing.assert_frame_equal(dh._data, raw)
+        pd.testing.assert_frame_equal(dh._infer, raw + 1)
+
+    def test_drop_raw_shared_processors(self):
+        raw = self.df.copy()
+        dh = DataHandlerLP(
+            data_loader=StaticDataLoader(self.df), shared_processors=[Fillna(fields_group="feature")], drop_raw=True
+        )
+        # the frame of the loader is not modified, so the data is processed again from the raw data
+        pd.testing.assert_frame_equal(self.df, raw)
+        expected = Fillna(fields_group="feature")(raw.copy())
+        pd.testing.assert_frame_equal(dh._infer, expected)
+        dh.setup_data()
+        pd.testing.assert_frame_equal(self.df, raw)
+        pd.testing.assert_frame_equal(dh._infer, expected)
+
+    def test_peak_memory(self):
+        dh = DataHandlerLP(data_loader=StaticDataLoader(self.df), init_data=False, **self._processors())
+        DataHandler.setup_data(dh)  # load the data only
+        tracemalloc.start()
+        try:
+            with MemoryInspector.logm("process") as stats:
+                dh.process_data(with_fit=True)
+        finally:
+            tracemalloc.stop()
+        # the features for inference, the data for learning and the temporary values of one processor
+        self.assertLess(stats["peak"], 2.5 * self.df.memory_usage().sum())
+
+
+class HandlerChunkTests(unittest.TestCase):
+    setUp = HandlerProcessTests.setUp
+
+    def _handler(self, **kwargs):
+        return DataHandlerLP(
+            start_time="2024-01-01 00:00",
+            end_time="2024-01-01 08:19",
+            data_loader=StaticDataLoader(self.df),
+            shared_processors=[MinMaxNorm(None, "2024-01-01 03:00", fields_group="feature")],
+            infer_processors=[
+                RobustZScoreNorm("2024-01-01 00:30", "2024-01-01 03:00", fields_group="feature"),
+                Fillna(fields_group="feature"),
+            ],
+            learn_processors=[DropnaLabel(), ZScoreNorm(None, "2024-01-01 03:00", fields_group="label")],
+            **kwargs,
+        )
+
+    def test_chunked_handler(self):
+        dh = self._handler()
+        chunk_dir = "_handler_chunks"
+        dh_c = self._handler(chunk_freq="1h", chunk_dir=chunk_dir)
+        try:
+            self.assertEqual(len(dh_c._data), 9)
+            self.assertEqual(len(os.listdir(os.path.join(chunk_dir, "raw"))), 9)
+
+            # the states fitted chunk by chunk
+            for proc, proc_c in zip(dh.get_all_processors(), dh_c.get_all_processors()):
+                for attr in "min_val", "max_val", "mean_train", "std_train":
+                    if hasattr(proc, attr):
+                        np.testing.assert_allclose(getattr(proc_c, attr), getattr(proc, attr), rtol=1e-6)
+
+            for data_key in DataHandlerLP.DK_I, DataHandlerLP.DK_L:
+                for selector in [
+                    slice(None),
+                    slice("2024-01-01 00:50", "2024-01-01 02:10"),
+                    pd.Timestamp("2024-01-01 02:00"),
+                ]:
+                    for col_set in ["feature", DataHandler.CS_ALL, DataHandler.CS_RAW, ["label", "feature"]]:
+                        pd.testing.assert_frame_equal(
+                            dh_c.fetch(selector, col_set=col_set, data_key=data_key),
+                            dh.fetch(selector, col_set=col_set, data_key=data_key),
+                            rtol=1e-5,
+                        )
+                pd.testing.assert_frame_equal(
+                    dh_c.fetch(["S01", "S03"], level="instrument", data_key=data_key),
+                    dh.fetch(["S01", "S03"], level="instrument", data_key=data_key),
+                    rtol=1e-5,
+                )
+            self.assertEqual(dh_c.get_cols(), dh.get_cols())
+            # the intermediate data are removed
+            self.assertEqual(sorted(os.listdir(chunk_dir)), ["infer_0", "learn_1", "raw"])
+
+            dh_c = self._handler(chunk_freq="1h", chunk_dir=chunk_dir, drop_raw=True)
+            self.assertEqual(sorted(os.listdir(chunk_dir)), ["infer_0", "learn_1"])
+            pd.testing.assert_frame_equal(dh_c.fetch(), dh.fetch(), rtol=1e-5)
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,17 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import tempfile
 import unittest
+import warnings
 import numpy as np
+import pandas as pd
 from qlib.data import D
 from qlib.tests import TestAutoData
-from qlib.data.dataset.processor import MinMaxNorm, ZScoreNorm, CSZScoreNorm, CSZFillna
+from qlib.data.dataset.accumulator import Accumulator, MeanVarAccumulator, MinMaxAccumulator, QuantileAccumulator
+from qlib.data.dataset.processor import MinMaxNorm, ZScoreNorm, CSZScoreNorm, CSZFillna, CSRankNorm, RobustZScoreNorm
+from qlib.data.dataset.storage import ChunkedDFStorage
+from qlib.utils.data import robust_zscore, zscore
 
 
 class TestProcessor(TestAutoData):
@@ -71,5 +77,124 @@ class TestProcessor(TestAutoData):
         assert (df[2:4] == ((origin_df[2:4] - origin_df[2:4].mean()).div(origin_df[2:4].std()))).all().all()
 
 
+class TestCSProcessor(unittest.TestCase):
+    """the cross sectional processors give the same bits as grouping by datetime"""
+
+    @staticmethod
+    def _get_df(dtype, balanced):
+        rng = np.random.default_rng(0)
+        dates = pd.date_range("2024-01-01", periods=200, freq="1min")
+        index = pd.MultiIndex.from_product([dates, [f"S{i:02d}" for i in range(30)]], names=["datetime", "instrument"])
+        columns = pd.MultiIndex.from_product([["feature"], ["a", "b", "c"]])
+        df = pd.DataFrame((rng.standard_t(3, size=(len(index), 3)) * 10).astype(dtype), index=index, columns=columns)
+        df.iloc[rng.random(df.shape) < 0.1] = np.nan
+        # ties and some datetimes with a single row or only nan
+        df.iloc[rng.random(len(df)) < 0.05] = 1.0
+        df.loc[dates[3]] = np.nan
+        if not balanced:
+            df = df[(rng.random(len(df)) > 0.3) | (df.index.get_level_values("instrument") == "S00")]
+            df = df.drop(index=[(dates[5], f"S{i:02d}") for i in range(1, 30)], errors="ignore")
+        return df
+
+    def _check(self, processor, expected_func):
+        for dtype in ["float32", "float64"]:
+            for balanced in [True, False]:
+                df = self._get_df(dtype, balanced)
+                expected = df.copy()
+                expected[df.columns] = expected_func(df)
+                res = processor(df.copy())
+                pd.testing.assert_index_equal(res.index, expected.index)
+                pd.testing.assert_series_equal(res.dtypes, expected.dtypes)
+                self.assertTrue(np.array_equal(res.values, expected.values, equal_nan=True))
+
+    def test_CSZScoreNorm(self):
+        self._check(CSZScoreNorm("feature"), lambda df: df.groupby("datetime", group_keys=False).apply(zscore))
+        self._check(
+            CSZScoreNorm("feature", method="robust"),
+            lambda df: df.groupby("datetime", group_keys=False).apply(robust_zscore),
+        )
+
+    def test_CSRankNorm(self):
+        self._check(CSRankNorm("feature"), lambda df: (df.groupby("datetime").rank(pct=True) - 0.5) * 3.46)
+
+    def test_CSZFillna(self):
+        self._check(
+            CSZFillna("feature"),
+            lambda df: df.groupby("datetime", group_keys=False).apply(lambda x: x.fillna(x.mean())),
+        )
+
+
+class TestAccumulator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.standard_t(4, size=(20000, 4))
+        self.values[rng.random(self.values.shape) < 0.1] = np.nan
+        self.values[:, 3] = np.nan  # a column without value
+
+    def _merge(self, make_acc, values):
+        # the accumulators of the chunks are merged in a tree like the results of the workers
+        accs = [make_acc(values.shape[1]).update(part) for part in np.array_split(values, 7)]
+        return Accumulator.merge_all([Accumulator.merge_all(accs[:3]), Accumulator.merge_all(accs[3:])])
+
+    def test_mean_var(self):
+        acc = self._merge(MeanVarAccumulator, self.values)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # the column without value
+            np.testing.assert_allclose(acc.mean, np.nanmean(self.values, axis=0), rtol=1e-12)
+            np.testing.assert_allclose(acc.std, np.nanstd(self.values, axis=0), rtol=1e-12)
+
+    def test_min_max(self):
+        acc = self._merge(MinMaxAccumulator, self.values)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            np.testing.assert_array_equal(acc.min, np.nanmin(self.values, axis=0))
+            np.testing.assert_array_equal(acc.max, np.nanmax(self.values, axis=0))
+
+    def test_quantile(self):
+        for values, rtol in [(self.values, 1e-2), (self.values[:999], 0)]:
+            acc = self._merge(QuantileAccumulator, values)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                median = np.nanmedian(values, axis=0)
+                mad = np.nanmedian(np.abs(values - median), axis=0)
+                quantile = np.nanquantile(values, 0.9, axis=0, method="hazen")
+            # exact if there are few values
+            np.testing.assert_allclose(acc.median(), median, rtol=rtol, atol=rtol)
+            np.testing.assert_allclose(acc.abs_deviation_median(median), mad, rtol=rtol)
+            np.testing.assert_allclose(acc.quantile(0.9), quantile, rtol=rtol)
+
+    def test_fit_chunks(self):
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2024-01-01", periods=len(self.values) // 10), [f"S{i}" for i in range(10)]],
+            names=["datetime", "instrument"],
+        )
+        df = pd.DataFrame(
+            self.values[:, :3].astype(np.float32),
+            index=index,
+            columns=pd.MultiIndex.from_product([["feature"], ["a", "b", "c"]]),
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            chunks = ChunkedDFStorage(tmp_dir)
+            for _, chunk in df.groupby(pd.Grouper(level="datetime", freq="MS")):
+                chunks.append(chunk)
+            for processor, attrs, rtol in [
+                (MinMaxNorm("2024-01-10", "2024-05-01"), ["min_val", "max_val"], 0),
+                (ZScoreNorm("2024-01-10", "2024-05-01"), ["mean_train", "std_train"], 1e-6),
+                (RobustZScoreNorm("2024-01-10", "2024-05-01"), ["mean_train", "std_train"], 0),
+                (
+                    RobustZScoreNorm("2024-01-10", "2024-05-01", sketch_compression=100),
+                    ["mean_train", "std_train"],
+                    1e-2,
+                ),
+            ]:
+                processor.fit(df)
+                expected = [getattr(processor, attr) for attr in attrs]
+                for n_jobs in [1, 2]:
+                    processor.fit_chunks(chunks, n_jobs=n_jobs)
+                    for attr, value in zip(attrs, expected):
+                        self.assertEqual(getattr(processor, attr).dtype, value.dtype)
+                        np.testing.assert_allclose(getattr(processor, attr), value, rtol=rtol, atol=rtol)
+
+
 if __name__ == "__main__":
     unittest.main()
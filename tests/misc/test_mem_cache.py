@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qlib.data.cache import MemCache, MemCacheLengthUnit, MemCacheNbytesUnit
+
+
+def test_nbytes_size():
+    series = pd.Series(np.zeros(1000, dtype=np.float32), index=np.arange(1000, dtype=np.int64))
+    assert MemCacheNbytesUnit.nbytes(series) >= 1000 * (4 + 8)
+    df = pd.DataFrame(np.zeros((100, 3)))
+    assert MemCacheNbytesUnit.nbytes(df) >= 100 * 3 * 8
+    assert MemCacheNbytesUnit.nbytes((5, np.zeros(10))) >= 80
+
+
+def test_lru_and_counters():
+    unit = MemCacheNbytesUnit(size_limit=3 * 8000)
+    for i in range(3):
+        unit[i] = np.zeros(1000)
+    assert unit.total_size == 3 * 8000
+    # make 0 the latest, 1 is evicted
+    assert unit.get(0) is not None
+    unit[3] = np.zeros(1000)
+    assert 1 not in unit and 0 in unit and unit.get(1, "default") == "default"
+    assert unit.stats() == {
+        "hits": 2,
+        "misses": 2,
+        "evictions": 1,
+        "items": 3,
+        "total_size": 3 * 8000,
+        "size_limit": 3 * 8000,
+    }
+    # replacing a value adjusts the size
+    unit[0] = np.zeros(10)
+    assert unit.total_size == 2 * 8000 + 80
+    unit.set_limit_size(8000)
+    assert list(unit.od) == [0] and unit.evictions == 3
+    unit.pop(0)
+    assert unit.total_size == 0
+
+
+def test_namespace_budgets():
+    cache = MemCache({"c": 2, "f": 1}, limit_type="length")
+    for i in range(5):
+        for key in ("c", "i", "f"):
+            cache[key][i] = i
+    assert [len(cache[key]) for key in ("c", "i", "f")] == [2, 5, 1]
+    assert isinstance(cache["f"], MemCacheLengthUnit)
+    # the items are kept if the limit type doesn't change
+    cache.configure({"c": 1}, "length")
+    assert [len(cache[key]) for key in ("c", "i", "f")] == [1, 5, 1]
+    cache.configure(1024, "nbytes")
+    assert isinstance(cache["f"], MemCacheNbytesUnit) and len(cache["i"]) == 0
+    assert set(cache.stats()) == {"c", "i", "f"}
+    with pytest.raises(ValueError):
+        cache.configure(1, "unknown")
+    with pytest.raises(KeyError):
+        cache.configure({"x": 1}, "length")
+
+
+def test_thread_safe():
+    unit = MemCacheNbytesUnit(size_limit=50 * 800)
+
+    def _worker(seed):
+        rng = np.random.default_rng(seed)
+        for key in rng.integers(0, 100, 2000):
+            if unit.get(key) is None:
+                unit[key] = np.zeros(100)
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert unit.total_size == len(unit) * 800 <= 50 * 800
+    stats = unit.stats()
+    assert stats["hits"] + stats["misses"] == 8 * 2000
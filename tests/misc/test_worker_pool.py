@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+from joblib import delayed
+
+import qlib
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.utils.paral import WorkerPool, get_worker_pool, shutdown_worker_pool
+
+FIELDS = ["$close", "Ref($close, 1) / $close", "Mean($close, 5)", "Corr($close, $volume, 10)"]
+
+
+def _cached_features():
+    return sorted(H["f"].od)
+
+
+def _config_value(key):
+    return C.get(key)
+
+
+@pytest.fixture(scope="module")
+def init_qlib(synthetic_qlib_dir):
+    qlib.init(provider_uri=str(synthetic_qlib_dir), expression_cache=None, dataset_cache=None, kernels=2)
+    yield
+    C["worker_pool"] = False
+    shutdown_worker_pool()
+
+
+def test_affinity_and_order(init_qlib):
+    with WorkerPool(2) as pool:
+        keys = ["AAA", "BBB", "CCC", "DDD"] * 2
+        pids = pool([delayed(os.getpid)() for _ in keys], keys=keys)
+        assert pids == pool([delayed(os.getpid)() for _ in keys], keys=keys)
+        for key, pid in zip(keys, pids):
+            assert pid == pids[keys.index(key)]
+            assert (pid == pids[0]) == (pool.worker_of(key) == pool.worker_of(keys[0]))
+        assert pool([delayed(abs)(-i) for i in range(10)]) == list(range(10))
+
+
+def test_config_propagation(init_qlib):
+    with WorkerPool(1) as pool:
+        C["pool_test_flag"] = 1
+        assert pool([delayed(_config_value)("pool_test_flag")]) == [1]
+        C["pool_test_flag"] = 2
+        assert pool([delayed(_config_value)("pool_test_flag")]) == [2]
+    C["pool_test_flag"] = None
+
+
+def test_features_with_worker_pool(init_qlib):
+    instruments = D.instruments("all")
+    expected = D.features(instruments, FIELDS)
+    C["worker_pool"] = True
+    try:
+        pool = get_worker_pool(2)
+        res = D.features(instruments, FIELDS)
+        pd.testing.assert_frame_equal(res, expected)
+        # the features loaded by the first call are still cached in the workers
+        cached = pool([delayed(_cached_features)() for _ in range(2)], keys=[0, 1])
+        assert sum(len(c) for c in cached) > 0
+        pd.testing.assert_frame_equal(D.features(instruments, FIELDS), expected)
+        assert pool([delayed(_cached_features)() for _ in range(2)], keys=[0, 1]) == cached
+    finally:
+        C["worker_pool"] = False
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data.base import array_mode, series_to_array
+from qlib.data.data import LocalExpressionProvider
+
+FIELDS = [
+    "$close",
+    "Ref($close, 1)",
+    "Ref($close, -2)",
+    "$close / Ref($close, 1) - 1",
+    "Mean($close / Ref($close, 1) - 1, 5)",
+    "Std(Abs($close - $open) / ($high - $low + 1e-12), 10)",
+    "Corr($close, Log($volume + 1), 10)",
+    "Cov($close, $volume, 5)",
+    "EMA($close, 10)",
+    "Delta($close, 3)",
+    "Max($high, 0)",
+    "IdxMin($low, 5)",
+    "Rank($close, 5)",
+    "Rsquare($close, 10)",
+    "Sign($close - Ref($close, 1))",
+    "If($close > Ref($close, 1), $high, $low)",
+    "Ref($close > $open, 1)",
+    "Mean($close > Ref($close, 1), 5)",
+    "ChangeInstrument('CCC', $close) / $close",
+    "Sum(Greater($close - Ref($close, 1), 0), 5) / (Sum(Abs($close - Ref($close, 1)), 5) + 1e-12)",
+]
+
+
+@pytest.fixture(scope="module")
+def init_qlib(synthetic_qlib_dir):
+    qlib.init(provider_uri=str(synthetic_qlib_dir), expression_cache=None, dataset_cache=None, kernels=1)
+
+
+@pytest.mark.parametrize("inst", ["AAA", "CCC", "DDD"])
+def test_array_mode_matches_pandas(init_qlib, inst):
+    series_provider = LocalExpressionProvider()
+    array_provider = LocalExpressionProvider(array_mode=True)
+    for field in FIELDS:
+        expected = series_provider.expression(inst, field, "2020-01-20", "2020-04-20", "day")
+        res = array_provider.expression(inst, field, "2020-01-20", "2020-04-20", "day")
+        pd.testing.assert_series_equal(res, expected, check_names=False, check_index_type=False)
+
+    expected = series_provider.expressions(inst, FIELDS, "2020-01-20", "2020-04-20", "day")
+    res = array_provider.expressions(inst, FIELDS, "2020-01-20", "2020-04-20", "day")
+    for field in FIELDS:
+        pd.testing.assert_series_equal(res[field], expected[field], check_names=False, check_index_type=False)
+
+
+def test_load_in_array_mode(init_qlib):
+    from qlib.data.ops import Mean, Feature  # pylint: disable=C0415
+
+    expr = Mean(Feature("close"), 5)
+    start, values = expr.load_array("CCC", 0, 30, "day")
+    # CCC starts at calendar index 10
+    assert start == 10 and len(values) == 21
+    with array_mode():
+        series = expr.load("CCC", 0, 30, "day")
+    assert series.index[0] == 10
+    np.testing.assert_array_equal(series.values, values)
+
+
+def test_series_to_array():
+    start, values = series_to_array(pd.Series([1.0, 2.0, 4.0], index=[3, 4, 6]))
+    assert start == 3
+    np.testing.assert_array_equal(values, [1.0, 2.0, np.nan, 4.0])
+    assert series_to_array(pd.Series(dtype=np.float32), 5)[0] == 5
+    with pytest.raises(TypeError):
+        series_to_array(pd.Series([1.0], index=pd.DatetimeIndex(["2020-01-01"])))
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data import D
+from qlib.data.data import ExpressionD
+from qlib.data.planner import ExpressionPlan, is_window_stable
+from qlib.data.ops import Operators  # noqa: F401  pylint: disable=W0611
+from qlib.utils import parse_field
+
+FIELDS = [
+    "$close",
+    "Ref($close, 1)",
+    "$close / Ref($close, 1) - 1",
+    "Mean($close / Ref($close, 1) - 1, 5)",
+    "Std($close / Ref($close, 1) - 1, 10)",
+    "Corr($close, Log($volume + 1), 10)",
+    "EMA($close, 10)",
+    "Delta($close, 3)",
+    "Max($high, 0)",
+]
+
+
+@pytest.fixture(scope="module")
+def init_qlib(synthetic_qlib_dir):
+    qlib.init(provider_uri=str(synthetic_qlib_dir), expression_cache=None, dataset_cache=None, kernels=1)
+
+
+def _parse(field):
+    return eval(parse_field(field))  # pylint: disable=W0123
+
+
+def test_window_stable(init_qlib):
+    assert is_window_stable(_parse("Mean($close / Ref($close, 1) - 1, 5)"))
+    assert not is_window_stable(_parse("EMA($close, 10)"))
+    assert not is_window_stable(_parse("Max($high, 0) + $close"))
+    assert not is_window_stable(_parse("Delta($close, 3)"))
+
+
+def test_plan_dedup(init_qlib):
+    plan = ExpressionPlan(FIELDS, [_parse(f) for f in FIELDS])
+    assert plan.n_unique_nodes < plan.n_nodes
+    # the window of the shared fields: Std(Ref(..., 1), 10)
+    assert plan.extended_window_size == (10, 0)
+    assert [shared for _, _, shared in plan] == [True] * 6 + [False] * 3
+
+
+def test_expressions_match_expression(init_qlib):
+    for inst in ["AAA", "CCC", "DDD"]:
+        res = ExpressionD.expressions(inst, FIELDS, "2020-01-20", "2020-04-01", "day")
+        for field in FIELDS:
+            expected = ExpressionD.expression(inst, field, "2020-01-20", "2020-04-01", "day")
+            pd.testing.assert_series_equal(res[field], expected, check_names=False)
+
+    df = D.features(["AAA", "DDD"], FIELDS, start_time="2020-01-20", end_time="2020-04-01")
+    assert list(df.columns) == FIELDS
+    assert not df.empty
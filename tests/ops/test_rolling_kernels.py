@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qlib.data._libs import expanding, rolling
+
+
+def _mad(x):
+    x1 = x[~np.isnan(x)]
+    return np.mean(np.abs(x1 - x1.mean()))
+
+
+def _weighted_mean(x):
+    w = np.arange(len(x)) + 1
+    w = w / w.sum()
+    return np.nanmean(w * x)
+
+
+def _exp_weighted_mean(x):
+    a = 1 - 2 / (1 + len(x))
+    w = a ** np.arange(len(x))[::-1]
+    w /= w.sum()
+    return np.nansum(w * x)
+
+
+# the pandas implementations used by the operators before the kernels, they are the reference of the kernels
+REFERENCES = {
+    "std": lambda r, other: r.std(),
+    "var": lambda r, other: r.var(),
+    "skew": lambda r, other: r.skew(),
+    "kurt": lambda r, other: r.kurt(),
+    "quantile": lambda r, other: r.quantile(0.8),
+    "rank": lambda r, other: r.rank(pct=True),
+    "idxmax": lambda r, other: r.apply(lambda x: x.argmax() + 1, raw=True),
+    "idxmin": lambda r, other: r.apply(lambda x: x.argmin() + 1, raw=True),
+    "mad": lambda r, other: r.apply(_mad, raw=True),
+    "wma": lambda r, other: r.apply(_weighted_mean, raw=True),
+    "corr": lambda r, other: r.corr(other),
+    "cov": lambda r, other: r.cov(other),
+}
+
+# the kernels matching the online algorithms of pandas give the same bits
+EXACT = {"std", "var", "skew", "kurt", "quantile", "rank", "idxmax", "idxmin", "corr", "cov"}
+
+
+def _kernel(name, x, y, window):
+    args = {"quantile": (0.8,), "corr": (y,), "cov": (y,)}.get(name, ())
+    if window == 0:
+        return getattr(expanding, f"expanding_{name}")(x, *args)
+    if name in ("corr", "cov"):
+        return getattr(rolling, f"rolling_{name}")(x, y, window)
+    return getattr(rolling, f"rolling_{name}")(x, window, *args)
+
+
+def _make_data(n, seed):
+    rng = np.random.default_rng(seed)
+    x = (np.cumsum(rng.normal(size=n)) + 100).astype(np.float32)
+    x[rng.random(n) < 0.05] = np.nan
+    x[n // 10 : n // 10 + 20] = x[n // 10]  # constant values
+    x[n // 3 : n // 3 + 30] = np.nan  # a gap longer than the windows
+    x[n // 2] = np.inf
+    return x
+
+
+def _assert_match(name, expected, res):
+    np.testing.assert_array_equal(np.isnan(res), np.isnan(expected), err_msg=f"nan mismatch of {name}")
+    if name in EXACT:
+        np.testing.assert_array_equal(res, expected, err_msg=name)
+    else:
+        np.testing.assert_allclose(res, expected, rtol=1e-12, atol=1e-12, err_msg=name)
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 20, 0])
+@pytest.mark.parametrize("name", list(REFERENCES))
+def test_kernel_matches_pandas(name, window):
+    x, y = _make_data(500, 0), _make_data(500, 1)
+    series = pd.Series(x)
+    r = series.expanding(min_periods=1) if window == 0 else series.rolling(window, min_periods=1)
+    expected = REFERENCES[name](r, pd.Series(y)).values
+    _assert_match(name, expected, _kernel(name, x, y, window))
+
+
+def test_expanding_ema():
+    x = _make_data(300, 2)
+    expected = pd.Series(x).expanding(min_periods=1).apply(_exp_weighted_mean, raw=True).values
+    res = expanding.expanding_ema(x)
+    np.testing.assert_array_equal(np.isnan(res), np.isnan(expected))
+    np.testing.assert_allclose(res, expected, rtol=1e-12)
+
+
+def test_empty_and_all_nan():
+    for name in REFERENCES:
+        assert len(_kernel(name, np.array([]), np.array([]), 5)) == 0
+        assert np.isnan(_kernel(name, np.full(4, np.nan), np.full(4, np.nan), 3)).all()
+
+
+@pytest.mark.slow
+def test_benchmark():
+    """the kernels match the pandas implementations they replace on a long series, the timings are printed"""
+    window = 20
+    x, y = _make_data(20000, 3), _make_data(20000, 4)
+    series = pd.Series(x)
+    print(f"\n{'op':<10}{'pandas (s)':>12}{'kernel (s)':>12}{'speedup':>10}")
+    for name, ref in REFERENCES.items():
+        t = time.time()
+        expected = ref(series.rolling(window, min_periods=1), pd.Series(y)).values
+        t_pandas = time.time() - t
+        t = time.time()
+        res = _kernel(name, x, y, window)
+        t_kernel = time.time() - t
+        _assert_match(name, expected, res)
+        print(f"{name:<10}{t_pandas:>12.4f}{t_kernel:>12.4f}{t_pandas / max(t_kernel, 1e-9):>9.1f}x")
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data import D
+from qlib.data.data import LocalExpressionProvider
+from qlib.data.stream import StreamEvaluator
+
+FIELDS = [
+    "$close",
+    "Ref($close, 1)",
+    "Ref($close, 0)",
+    "$close / Ref($close, 1) - 1",
+    "Delta($close, 3)",
+    "Mean($close / Ref($close, 1) - 1, 5)",
+    "Mean($close, 0)",
+    "Sum(Greater($close - Ref($close, 1), 0), 5) / (Sum(Abs($close - Ref($close, 1)), 5) + 1e-12)",
+    "Std(Abs($close - $open) / ($high - $low + 1e-12), 10)",
+    "Var($close, 1)",
+    "Skew($close, 10)",
+    "Kurt($volume, 20)",
+    "Max($high, 5) / Min($low, 0)",
+    "IdxMax($high, 5) - IdxMin($low, 10)",
+    "Count(If($close > $open, $close, Ref($close, 10)), 5)",
+    "Quantile($close, 10, 0.8)",
+    "Med($close, 6)",
+    "Rank($close, 5)",
+    "Mad($close, 5)",
+    "WMA($close, 3)",
+    "WMA($close, 0)",
+    "EMA($close, 10)",
+    "EMA($close, 0.3)",
+    "Mean($close, 0.5)",
+    "Slope($close, 10)",
+    "Rsquare($close, 10)",
+    "Resi($close, 0)",
+    "Corr($close, Log($volume + 1), 10)",
+    "Cov($close, $volume, 5)",
+    "Sign($close - Ref($close, 1)) * Log($volume)",
+    "Mean($close > Ref($close, 1), 5)",
+]
+
+
+@pytest.fixture(scope="module")
+def init_qlib(synthetic_qlib_dir):
+    qlib.init(provider_uri=str(synthetic_qlib_dir), expression_cache=None, dataset_cache=None, kernels=1)
+
+
+@pytest.mark.parametrize("inst", ["AAA", "CCC", "DDD"])
+def test_stream_matches_batch(init_qlib, inst):
+    bars = D.features([inst], ["$open", "$high", "$low", "$close", "$volume"], freq="day").droplevel("instrument")
+    stream = StreamEvaluator(FIELDS)
+    res = stream.warmup(inst, bars.iloc[:-10])
+    res = pd.concat([res] + [stream.update(inst, bar, time=t).to_frame().T for t, bar in bars.iloc[-10:].iterrows()])
+
+    provider = LocalExpressionProvider()
+    for field in FIELDS:
+        expected = provider.expression(inst, field, bars.index[0], bars.index[-1], "day")
+        np.testing.assert_allclose(res[field].values, expected.values, rtol=1e-5, atol=1e-8, err_msg=field)
+
+
+def test_stream_dag(init_qlib):
+    stream = StreamEvaluator(["$close / Ref($close, 1)", "Mean($close / Ref($close, 1), 5)", "Ref($close, 1)"])
+    # $close, Ref($close, 1), the ratio and its mean
+    assert stream.n_nodes == 4
+    assert stream.features == ["close"]
+    res = stream.update("X", {"close": 1.0}, time=pd.Timestamp("2024-01-01"))
+    assert np.isnan(res.iloc[0]) and res.name == pd.Timestamp("2024-01-01")
+    res = stream.update("X", {"$close": 2.0}, time=pd.Timestamp("2024-01-02"))
+    assert res.tolist() == [2.0, 2.0, 1.0]
+    # the instruments have their own states
+    assert np.isnan(stream.update("Y", {"close": 2.0}).iloc[0])
+    with pytest.raises(ValueError):
+        stream.update("X", {"close": 3.0}, time=pd.Timestamp("2024-01-02"))
+    stream.reset("X")
+    assert np.isnan(stream.update("X", {"close": 3.0}, time=pd.Timestamp("2024-01-02")).iloc[0])
+
+
+def test_stream_expanding_no_window(init_qlib):
+    fields = ["Mean($close, 0)", "Std($close, 0)", "Skew($close, 0)", "Count($close, 0)", "WMA($close, 0)"]
+    stream = StreamEvaluator(fields)
+    stream.warmup("X", pd.DataFrame({"close": np.arange(100.0)}))
+    assert all(len(state.window) == 0 for state in stream._states["X"] if hasattr(state, "window"))
+
+
+@pytest.mark.parametrize(
+    "field",
+    [
+        "Ref($close, -1)",
+        "EMA($close, 0)",
+        "ChangeInstrument('AAA', $close)",
+        "$$roe_q",
+        "Quantile($close, 0, 0.5)",
+        "Rank($close, 0)",
+        "Mad($close, 0)",
+    ],
+)
+def test_stream_unsupported(init_qlib, field):
+    with pytest.raises(NotImplementedError):
+        StreamEvaluator([field])
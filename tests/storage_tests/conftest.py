@@ -0,0 +1,13 @@
+import pytest
+
+import qlib
+
+
+@pytest.fixture
+def provider_uri(tmp_path):
+    """an empty daily qlib dataset of one instrument (btcusdt) and one day, qlib is initialized on it"""
+    tmp_path.joinpath("calendars").mkdir()
+    tmp_path.joinpath("calendars", "day.txt").write_text("2020-01-01\n")
+    tmp_path.joinpath("features", "btcusdt").mkdir(parents=True)
+    qlib.init(provider_uri=str(tmp_path), expression_cache=None, dataset_cache=None)
+    return str(tmp_path)
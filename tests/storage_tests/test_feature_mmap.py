@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import qlib
+
+from qlib.data.storage.file_storage import FileFeatureStorage
+
+
+def test_mmap_read_and_append(provider_uri):
+    fs = FileFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    assert fs[0] == (None, None)
+    assert fs[:].empty
+
+    fs.write(np.arange(5, dtype=np.float32), index=3)
+    s = fs[4:6]
+    assert list(s.index) == [4, 5]
+    assert list(s.values) == [1.0, 2.0]
+    assert fs[7] == (7, 4.0)
+    with pytest.raises(IndexError):
+        fs[1]
+
+    si, arr = fs.read_array(slice(None, None))
+    assert si == 3 and not arr.flags.writeable
+    # the same map is reused by later reads
+    assert fs.read_array(slice(5, 6))[1].base is arr.base
+
+    # data appended by another writer becomes visible once a query asks beyond the mapped end
+    FileFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri).write([10.0], index=9)
+    s = fs[7:10]
+    assert list(s.index) == [7, 8, 9]
+    assert np.isnan(s[8]) and s[9] == 10.0
+
+    fs.clear()
+    assert fs[:].empty
+
+
+def test_mmap_rewritten_file(provider_uri):
+    fs = FileFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    fs.write(np.arange(5, dtype=np.float32), index=0)
+    assert list(fs[:].values) == [0, 1, 2, 3, 4]
+    # rewritten by another writer (e.g. a backfill) without changing the size: the map is not stale
+    with fs.uri.open("r+b") as fp:
+        np.array([0] + [7] * 5, dtype="<f").tofile(fp)
+    assert list(fs[:].values) == [7] * 5
+    # replaced by a shorter file
+    tmp_uri = fs.uri.with_name("close.day.bin.tmp")
+    np.array([0, 9, 9], dtype="<f").tofile(tmp_uri)
+    tmp_uri.replace(fs.uri)
+    assert list(fs[:].values) == [9, 9]
+
+
+def test_provider_storage_cache_bound(provider_uri):
+    from qlib.data.data import LocalFeatureProvider  # pylint: disable=C0415
+
+    qlib.init(provider_uri=provider_uri, expression_cache=None, dataset_cache=None, mmap_cache_size=2)
+    for field in ["open", "high", "low"]:
+        FileFeatureStorage("BTCUSDT", field, "day", provider_uri=provider_uri).write([1.0], index=0)
+    provider = LocalFeatureProvider(
+        backend={"class": "FileFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+    )
+    storages = []
+    for field in ["open", "high", "low"]:
+        assert provider.feature("BTCUSDT", f"${field}", 0, 0, "day").tolist() == [1.0]
+        storages.append(provider._get_storage("BTCUSDT", field, "day"))
+    assert len(provider._storage_cache) == 2
+    # the least recently used storage is evicted and its map closed
+    assert storages[0]._mmap_data is None and storages[2]._mmap_data is not None
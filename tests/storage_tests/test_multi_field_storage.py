@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data.storage.file_storage import FileFeatureStorage
+from qlib.data.storage.multi_field_storage import FileMultiFieldFeatureStorage, MultiFieldBin
+
+
+@pytest.fixture(autouse=True)
+def clear_opened_bins():
+    # the bins opened by the previous tests map the files of other datasets
+    MultiFieldBin.clear_cache()
+
+
+def _ohlc(n, start=0.0):
+    values = np.arange(start, start + n, dtype=np.float32)
+    return pd.DataFrame({"open": values, "close": values + 0.5, "volume": values * 10})
+
+
+def test_multi_field_bin_roundtrip(provider_uri):
+    fs = FileMultiFieldFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    assert fs[:].empty and fs.start_index is None
+    fs.bin.write(_ohlc(5), start_index=2)
+
+    assert (fs.start_index, fs.end_index, len(fs)) == (2, 6, 5)
+    s = fs[3:5]
+    assert list(s.index) == [3, 4] and list(s.values) == [1.5, 2.5]
+    assert fs[6] == (6, 4.5)
+
+    df = fs.read_fields(["volume", "open", "vwap"], slice(5, 100))
+    assert list(df.index) == [5, 6]
+    assert list(df["volume"]) == [30.0, 40.0] and df["vwap"].isna().all()
+
+    # append full rows after a gap
+    fs.bin.append(_ohlc(2, start=10), start_index=9)
+    assert fs.end_index == 10
+    assert np.isnan(fs[7:9]).all() and fs[9] == (9, 10.5)
+
+    # storages of other fields share the same file
+    vol = FileMultiFieldFeatureStorage("BTCUSDT", "volume", "day", provider_uri=provider_uri)
+    assert vol.bin is fs.bin and vol[2] == (2, 0.0)
+
+
+def test_single_field_write(provider_uri):
+    fs = FileMultiFieldFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    fs.bin.write(_ohlc(3), start_index=0)
+    fs.write([100.0, 101.0], index=2)
+    assert list(fs[:].values) == [0.5, 1.5, 100.0, 101.0]
+    opens = FileMultiFieldFeatureStorage("BTCUSDT", "open", "day", provider_uri=provider_uri)
+    assert opens[2] == (2, 2.0) and np.isnan(opens[3][1])
+
+    fs.clear()
+    assert fs[:].empty
+    assert len(opens[:]) == 4
+
+    # same values as the one-file-per-field layout
+    ffs = FileFeatureStorage("BTCUSDT", "open", "day", provider_uri=provider_uri)
+    ffs.write(opens[:].values, index=0)
+    pd.testing.assert_series_equal(ffs[1:3], opens[1:3])
+
+
+def test_opened_bins_bound(provider_uri):
+    qlib.init(provider_uri=provider_uri, expression_cache=None, dataset_cache=None, mmap_cache_size=2)
+    bins = []
+    for name in ["btcusdt", "ethusdt", "solusdt"]:
+        fs = FileMultiFieldFeatureStorage(name.upper(), "close", "day", provider_uri=provider_uri)
+        fs.bin.write(_ohlc(3), start_index=0)
+        assert fs[0] == (0, 0.5)
+        bins.append(fs.bin)
+    assert len(MultiFieldBin._opened) == 2
+    # the least recently used bin is evicted and its map closed
+    assert not bins[0].exists and bins[2].exists
+
+    # the file is replaced by another writer with the same size: the map is not stale
+    MultiFieldBin(bins[2].path).write(_ohlc(3, start=7), start_index=0)
+    assert fs[0] == (0, 7.5)
+
+
+@pytest.mark.parametrize("columns", [["close", "open"], ["close"]])
+def test_append_overwrites_with_nan(provider_uri, columns):
+    # the same fields are appended in place, a subset of the fields rewrites the file
+    fs = FileMultiFieldFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    fs.bin.write(pd.DataFrame({"close": [1.0, 2.0, 3.0], "open": [4.0, 5.0, 6.0]}), start_index=0)
+    new = pd.DataFrame({"close": [np.nan, 9.0], "open": [np.nan, 8.0]})[columns]
+    fs.bin.append(new, start_index=1)
+    df = fs.bin.to_frame()
+    assert list(df.index) == [0, 1, 2]
+    np.testing.assert_array_equal(df["close"], [1.0, np.nan, 9.0])
+    np.testing.assert_array_equal(df["open"], [4.0, np.nan, 8.0] if "open" in columns else [4.0, 5.0, 6.0])
+
+
+def test_single_field_write_in_place(provider_uri):
+    fs = FileMultiFieldFeatureStorage("BTCUSDT", "close", "day", provider_uri=provider_uri)
+    fs.bin.write(_ohlc(3), start_index=2)
+    inode = fs.uri.stat().st_ino
+    # overlap the stored rows (nan included) and extend them after a gap
+    fs.write([np.nan, 100.0, 101.0, 102.0], index=3)
+    fs.write([200.0], index=8)
+    assert fs.uri.stat().st_ino == inode
+    df = fs.bin.to_frame()
+    assert list(df.index) == list(range(2, 9)) and list(df.columns) == ["open", "close", "volume"]
+    np.testing.assert_array_equal(df["close"], [0.5, np.nan, 100.0, 101.0, 102.0, np.nan, 200.0])
+    np.testing.assert_array_equal(df["open"], [0.0, 1.0, 2.0] + [np.nan] * 4)
+
+    # a new field and the rows before the first one rewrite the file
+    FileMultiFieldFeatureStorage("BTCUSDT", "vwap", "day", provider_uri=provider_uri).write([7.0], index=4)
+    fs.write([-1.0], index=0)
+    df = fs.bin.to_frame()
+    assert list(df.index) == list(range(0, 9)) and list(df.columns) == ["open", "close", "volume", "vwap"]
+    np.testing.assert_array_equal(df["close"][:5], [-1.0, np.nan, 0.5, np.nan, 100.0])
+    np.testing.assert_array_equal(df["vwap"].dropna(), [7.0])
@@ -0,0 +1,154 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import qlib
+from qlib.data import D
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.joinpath("scripts")))
+from dump_bin import DumpDataAll, DumpDataFix, DumpDataUpdate  # noqa: E402
+
+FIELDS = ["open", "close", "volume"]
+QLIB_FIELDS = [f"${f}" for f in FIELDS]
+
+
+def _make_source(source_dir, symbols, start, periods, freq="1min", drop_every=0, seed=0):
+    source_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    res = {}
+    for i, symbol in enumerate(symbols):
+        # the symbols are listed one by one and some bars are missing
+        dates = pd.date_range(start, periods=periods, freq=freq)[i:]
+        if drop_every:
+            dates = dates[np.arange(len(dates)) % drop_every != i % drop_every]
+        df = pd.DataFrame(rng.normal(size=(len(dates), len(FIELDS))).astype(np.float32), columns=FIELDS)
+        df.insert(0, "date", dates)
+        df["symbol"] = symbol
+        df.to_csv(source_dir.joinpath(f"{symbol.lower()}.csv"), index=False)
+        res[symbol] = df
+    return res
+
+
+def _expected(data, freq):
+    df = pd.concat(data.values()).rename(columns=dict(zip(FIELDS, QLIB_FIELDS), symbol="instrument", date="datetime"))
+    df = df.set_index(["instrument", "datetime"]).sort_index()[QLIB_FIELDS]
+    # the missing bars inside the range of a symbol are nan
+    calendar = pd.DatetimeIndex(sorted(set(df.index.get_level_values("datetime"))))
+    res = []
+    for symbol, _df in df.groupby(level="instrument"):
+        dates = _df.index.get_level_values("datetime")
+        index = calendar[(calendar >= dates.min()) & (calendar <= dates.max())]
+        res.append(_df.droplevel("instrument").reindex(index).assign(instrument=symbol))
+    res = pd.concat(res).rename_axis("datetime").set_index("instrument", append=True)
+    return res.swaplevel().sort_index()
+
+
+def _features(qlib_dir, freq):
+    qlib.init(provider_uri={freq: str(qlib_dir)}, expression_cache=None, dataset_cache=None)
+    return D.features(D.instruments("all"), QLIB_FIELDS, freq=freq)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+@pytest.mark.parametrize("multi_field", [False, True])
+def test_dump_all_and_update(tmp_path, max_workers, multi_field):
+    freq = "1min"
+    kwargs = dict(
+        qlib_dir=tmp_path.joinpath("qlib"),
+        freq=freq,
+        max_workers=max_workers,
+        exclude_fields="symbol",
+        multi_field=multi_field,
+    )
+    data = _make_source(tmp_path.joinpath("source"), ["AAA", "BBB", "CCC"], "2024-01-01 00:00", 50, drop_every=7)
+    DumpDataAll(data_path=tmp_path.joinpath("source"), **kwargs).dump()
+    if not multi_field:
+        pd.testing.assert_frame_equal(_features(tmp_path.joinpath("qlib"), freq), _expected(data, freq))
+
+    # the new bars of the existing symbols and a new symbol
+    new_data = _make_source(
+        tmp_path.joinpath("update"), ["AAA", "BBB", "CCC", "DDD"], "2024-01-01 00:45", 30, drop_every=5, seed=1
+    )
+    DumpDataUpdate(data_path=tmp_path.joinpath("update"), **kwargs).dump()
+    expected = {
+        symbol: pd.concat([data.get(symbol), df[df["date"] > data[symbol]["date"].max()] if symbol in data else df])
+        for symbol, df in new_data.items()
+    }
+    calendar = pd.read_csv(tmp_path.joinpath("qlib", "calendars", f"{freq}.txt"), header=None)[0]
+    assert list(pd.to_datetime(calendar)) == sorted(set(pd.concat(expected.values())["date"]))
+    instruments = pd.read_csv(tmp_path.joinpath("qlib", "instruments", "all.txt"), sep="\t", header=None)
+    assert instruments[0].tolist() == ["AAA", "BBB", "CCC", "DDD"]
+    assert instruments[2].tolist() == [str(df["date"].max()) for df in expected.values()]
+    if not multi_field:
+        pd.testing.assert_frame_equal(_features(tmp_path.joinpath("qlib"), freq), _expected(expected, freq))
+    else:
+        qlib.init(
+            provider_uri={freq: str(tmp_path.joinpath("qlib"))},
+            expression_cache=None,
+            dataset_cache=None,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {
+                        "class": "FileMultiFieldFeatureStorage",
+                        "module_path": "qlib.data.storage.multi_field_storage",
+                    }
+                },
+            },
+        )
+        res = D.features(D.instruments("all"), QLIB_FIELDS, freq=freq)
+        pd.testing.assert_frame_equal(res, _expected(expected, freq))
+
+
+def test_dump_fix(tmp_path):
+    data = _make_source(tmp_path.joinpath("source"), ["AAA", "BBB"], "2024-01-01", 20, freq="D")
+    kwargs = dict(qlib_dir=tmp_path.joinpath("qlib"), max_workers=1, exclude_fields="symbol")
+    DumpDataAll(data_path=tmp_path.joinpath("source"), **kwargs).dump()
+    # dump a new symbol on the existing calendar
+    data.update(_make_source(tmp_path.joinpath("fix"), ["CCC"], "2024-01-05", 10, freq="D", seed=1))
+    DumpDataFix(data_path=tmp_path.joinpath("fix"), **kwargs).dump()
+    assert tmp_path.joinpath("qlib", "calendars", "day.txt").read_text().split("\n")[:2] == ["2024-01-01", "2024-01-02"]
+    pd.testing.assert_frame_equal(_features(tmp_path.joinpath("qlib"), "day"), _expected(data, "day"))
+
+
+@pytest.mark.slow
+def test_dump_bin_benchmark(tmp_path):
+    """compare the vectorized calendar mapping of `_data_to_bin` with the pandas reindex of the previous version"""
+    n_symbols, periods = 5000, 240
+    calendar = pd.date_range("2024-01-01", periods=periods * 10, freq="1min")
+    rng = np.random.default_rng(0)
+    dumper = DumpDataAll(data_path=tmp_path, qlib_dir=tmp_path.joinpath("qlib"), freq="1min", max_workers=1)
+    dumper._calendar = calendar.values.view(np.int64)
+    calendar_list = list(calendar)
+    frames = []
+    for i in range(n_symbols):
+        start = rng.integers(0, len(calendar) - periods)
+        df = pd.DataFrame(rng.normal(size=(periods, len(FIELDS))), columns=FIELDS)
+        df.insert(0, "date", calendar[start : start + periods])
+        frames.append(df)
+
+    def _pandas_data_to_bin(df, features_dir):
+        cal_df = pd.DataFrame({"date": calendar_list})
+        cal_df = cal_df[(cal_df["date"] >= df["date"].min()) & (cal_df["date"] <= df["date"].max())]
+        _df = df.set_index("date").reindex(cal_df.set_index("date").index)
+        date_index = calendar_list.index(_df.index.min())
+        for field in FIELDS:
+            np.hstack([date_index, _df[field]]).astype("<f").tofile(features_dir.joinpath(f"{field}.1min.bin"))
+
+    res = {}
+    for name, func in [("pandas", _pandas_data_to_bin), ("vectorized", dumper._data_to_bin)]:
+        features_dir = tmp_path.joinpath(name)
+        features_dir.mkdir()
+        t = time.time()
+        for df in frames:
+            func(df, features_dir)
+        res[name] = time.time() - t
+        print(f"\n{name}: {n_symbols} symbols {res[name]:.2f}s")
+    for field in FIELDS:
+        np.testing.assert_array_equal(
+            np.fromfile(tmp_path.joinpath("pandas", f"{field}.1min.bin"), dtype="<f"),
+            np.fromfile(tmp_path.joinpath("vectorized", f"{field}.1min.bin"), dtype="<f"),
+        )